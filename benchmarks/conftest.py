@@ -6,8 +6,11 @@
 #
 
 from collections import namedtuple
+from dataclasses import asdict, dataclass
 from functools import partial
+import io
 from operator import attrgetter
+from typing import List
 
 Contender = namedtuple('Contender', 'name,dumps,loads')
 
@@ -152,8 +155,156 @@ def pytest_generate_tests(metafunc):
     if 'datetimes_loads_contender' in metafunc.fixturenames:
         metafunc.parametrize('datetimes_loads_contender',
                              [rj.loads,
-                              partial(rj.loads, datetime_mode=rj.DM_ISO8601)],
-                             ids=['Ignore datetimes', 'Parse datetimes'])
+                              partial(rj.loads, datetime_mode=rj.DM_ISO8601),
+                              partial(rj.loads,
+                                      datetime_mode=rj.DM_ISO8601 | rj.DM_SHIFT_TO_UTC)],
+                             ids=['Ignore datetimes', 'Parse datetimes', 'Shift to UTC'])
+
+    if 'uuids_loads_contender' in metafunc.fixturenames:
+        metafunc.parametrize('uuids_loads_contender',
+                             [rj.loads,
+                              partial(rj.loads, uuid_mode=rj.UM_CANONICAL),
+                              partial(rj.loads, uuid_mode=rj.UM_HEX)],
+                             ids=['Ignore UUIDs', 'Canonical UUIDs', 'Hex UUIDs'])
+
+    if 'lazy_contender' in metafunc.fixturenames:
+        metafunc.parametrize('lazy_contender',
+                             [rj.Decoder(), rj.Decoder(lazy=True)],
+                             ids=['Eager decoding', 'Lazy decoding'])
+
+    if 'extract_contender' in metafunc.fixturenames:
+        pointers = rj.PointerSet(['/3/field1', '/3/field10', '/3/field100'])
+
+        def full_decoding(data):
+            doc = rj.loads(data)[3]
+            return {'/3/field1': doc['field1'],
+                    '/3/field10': doc['field10'],
+                    '/3/field100': doc['field100']}
+
+        metafunc.parametrize('extract_contender',
+                             [full_decoding, partial(rj.extract, pointers=pointers)],
+                             ids=['Full decoding', 'Pointer extraction'])
+
+    if 'ndjson_contender' in metafunc.fixturenames:
+        metafunc.parametrize('ndjson_contender',
+                             [lambda data: [rj.loads(line) for line in io.BytesIO(data)],
+                              lambda data: list(rj.iterload(io.BytesIO(data)))],
+                             ids=['Line by line', 'iterload'])
+
+    if 'records_contender' in metafunc.fixturenames:
+        metafunc.parametrize('records_contender',
+                             [lambda data: list(rj.load(io.BytesIO(data))['records']),
+                              lambda data: [record for path, event, record
+                                            in rj.iterparse(io.BytesIO(data),
+                                                            '/records')]],
+                             ids=['Full decoding', 'iterparse'])
+
+    if 'columns_contender' in metafunc.fixturenames:
+        def rows_to_columns(data):
+            rows = rj.loads(data)
+            return {key: [row[key] for row in rows] for key in rows[0]}
+
+        metafunc.parametrize('columns_contender',
+                             [rows_to_columns, rj.loads_columns],
+                             ids=['Rows to columns', 'loads_columns'])
+
+    if 'target_contender' in metafunc.fixturenames:
+        @dataclass
+        class Reading:
+            id: int
+            x: float
+            y: float
+            sensor: str
+
+        def object_hook(data):
+            return [Reading(**row) for row in rj.loads(data)]
+
+        metafunc.parametrize('target_contender',
+                             [object_hook, rj.Decoder(target=List[Reading])],
+                             ids=['Dicts to dataclasses', 'Decoder target'])
+
+    if 'batch_contender' in metafunc.fixturenames:
+        def one_at_a_time(documents):
+            return [rj.loads(document) for document in documents]
+
+        metafunc.parametrize('batch_contender',
+                             [one_at_a_time, rj.loads_many],
+                             ids=['One at a time', 'loads_many'])
+
+    if 'datetime_keys_contender' in metafunc.fixturenames:
+        modes = dict(datetime_mode=rj.DM_ISO8601, uuid_mode=rj.UM_CANONICAL)
+        metafunc.parametrize('datetime_keys_contender',
+                             [rj.Decoder(**modes),
+                              rj.Decoder(datetime_keys={'created'}, uuid_keys={'id'},
+                                         **modes)],
+                             ids=['Every string', 'Named keys'])
+
+    if 'bytes_contender' in metafunc.fixturenames:
+        buffer = bytearray()
+
+        def encoded_str(obj):
+            return rj.dumps(obj).encode('utf-8')
+
+        def into_buffer(obj):
+            return rj.dumps_into(obj, buffer)
+
+        metafunc.parametrize('bytes_contender',
+                             [encoded_str, partial(rj.dumps, as_bytes=True), into_buffer],
+                             ids=['Encoded str', 'as_bytes', 'dumps_into'])
+
+    if 'file_contender' in metafunc.fixturenames:
+        def load_stream(opener, path):
+            with opener(path) as stream:
+                return rj.load(stream)
+
+        metafunc.parametrize('file_contender',
+                             [partial(load_stream,
+                                      partial(open, mode='r', encoding='utf-8')),
+                              partial(load_stream, partial(open, mode='rb')),
+                              partial(load_stream, partial(open, mode='rb', buffering=0)),
+                              rj.load_path],
+                             ids=['Text file', 'Buffered binary file',
+                                  'Unbuffered binary file', 'load_path'])
+
+    if 'serializers_contender' in metafunc.fixturenames:
+        def default_encoder(serializers):
+            class DefaultEncoder(rj.Encoder):
+                def default(self, obj):
+                    for type, spec in serializers.items():
+                        if isinstance(obj, type):
+                            if spec == 'str':
+                                return str(obj)
+                            return {name: getattr(obj, name) for name in spec}
+                    raise TypeError('%r is not JSON serializable' % obj)
+
+            return DefaultEncoder()
+
+        def registering_encoder(serializers):
+            encoder = rj.Encoder()
+            for type, spec in serializers.items():
+                encoder.register(type, spec)
+            return encoder
+
+        metafunc.parametrize('serializers_contender',
+                             [default_encoder, registering_encoder],
+                             ids=['default', 'register'])
+
+    if 'dataclass_contender' in metafunc.fixturenames:
+        metafunc.parametrize('dataclass_contender',
+                             [partial(rj.dumps, default=asdict),
+                              partial(rj.dumps, object_mode=rj.OM_DATACLASS)],
+                             ids=['asdict', 'OM_DATACLASS'])
+
+    if 'key_cache_contender' in metafunc.fixturenames:
+        metafunc.parametrize('key_cache_contender',
+                             [rj.Decoder(), rj.Decoder(key_cache_size=64)],
+                             ids=['Without key cache', 'With key cache'])
+
+    if 'gil_contender' in metafunc.fixturenames:
+        metafunc.parametrize('gil_contender',
+                             [rj.loads,
+                              partial(rj.loads, release_gil=True)],
+                             ids=['Holding GIL', 'Releasing GIL'])
 
     if 'numbers_contender' in metafunc.fixturenames:
         metafunc.parametrize('numbers_contender', numbers_contenders, ids=attrgetter('name'))
@@ -6,16 +6,22 @@
 # :Copyright: © 2015, 2016, 2017, 2018 Lele Gaifax
 #
 
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 import datetime
+import json
 import pathlib
 import random
 import sys
+import uuid
 
 import pytest
 
 
 benchmark = pytest.importorskip('pytest_benchmark')
 
+import rapidjson as rj
+
 
 composite_object = {
     'words': """
@@ -50,6 +56,7 @@ unicode_strings = []
 strings = []
 booleans = []
 datetimes = []
+uuids = [str(uuid.UUID(int=random.getrandbits(128))) for i in range(1024)]
 list_dicts = []
 dict_lists = {}
 russian_string = "привет, мир!" * 1000
@@ -75,6 +82,12 @@ for _ in range(256):
                                     random.randint(0, 59)),
                       datetime.datetime.now()])
 
+timezones = [datetime.timezone(datetime.timedelta(hours=h)) for h in (-5, 1, 2)]
+naive_timestamps = [datetime.datetime(2020, 1, 1)
+                    + datetime.timedelta(seconds=random.randrange(366 * 86400))
+                    for _ in range(1024)]
+aware_timestamps = [ts.replace(tzinfo=random.choice(timezones)) for ts in naive_timestamps]
+
 for _ in range(100):
     arrays = []
     list_dicts.append({str(random.random()*20): int(random.random()*1000000)})
@@ -101,6 +114,12 @@ def test_dumps(contender, data, benchmark):
     benchmark(contender.dumps, data)
 
 
+@pytest.mark.benchmark(group='serialize to bytes')
+@pytest.mark.parametrize('data', [d[1] for d in datasets], ids=[d[0] for d in datasets])
+def test_dumps_bytes(bytes_contender, data, benchmark):
+    benchmark(bytes_contender, data)
+
+
 @pytest.mark.benchmark(group='deserialize')
 @pytest.mark.parametrize('data', [d[1] for d in datasets], ids=[d[0] for d in datasets])
 def test_loads(contender, data, benchmark):
@@ -111,13 +130,22 @@ def test_loads(contender, data, benchmark):
 # Special case 1: load datetimes as plain strings vs datetime.xxx instances
 
 @pytest.mark.benchmark(group='deserialize')
-@pytest.mark.parametrize('data', [datetimes], ids=['256x3 datetimes'])
+@pytest.mark.parametrize('data', [datetimes, naive_timestamps, aware_timestamps],
+                         ids=['256x3 datetimes', '1024 naive timestamps',
+                              '1024 aware timestamps'])
 def test_loads_datetimes(datetimes_loads_contender, data, benchmark):
     from rapidjson import dumps, DM_ISO8601
     data = dumps(data, datetime_mode=DM_ISO8601)
     benchmark(datetimes_loads_contender, data)
 
 
+@pytest.mark.benchmark(group='deserialize')
+@pytest.mark.parametrize('data', [uuids], ids=['1024 UUIDs'])
+def test_loads_uuids(uuids_loads_contender, data, benchmark):
+    data = rj.dumps(data)
+    benchmark(uuids_loads_contender, data)
+
+
 # Special case 2: native numbers
 
 @pytest.mark.benchmark(group='serialize')
@@ -174,3 +202,184 @@ def test_dumps_sample(contender, sample, benchmark):
 @pytest.mark.parametrize('sample', samples, ids=[s.name for s in samples])
 def test_loads_sample(contender, sample, benchmark):
     benchmark(contender.loads, sample.read_text())
+
+
+THREADS = 4
+
+@pytest.mark.benchmark(group='deserialize threaded')
+@pytest.mark.parametrize('sample', samples, ids=[s.name for s in samples])
+def test_loads_threaded(gil_contender, sample, benchmark):
+    data = sample.read_text()
+    with ThreadPoolExecutor(THREADS) as executor:
+        benchmark(lambda: list(executor.map(gil_contender, [data] * (THREADS * 4))))
+
+
+events = [{'field%d' % i: (random.random() if i % 3 else 'value %d' % i)
+           for i in range(2000)}
+          for _ in range(8)]
+
+@pytest.mark.benchmark(group='deserialize few fields')
+@pytest.mark.parametrize('data', [events], ids=['8 objects of 2000 keys'])
+def test_loads_few_fields(lazy_contender, data, benchmark):
+    data = rj.dumps(data)
+
+    def load_few_fields():
+        return [(e['field1'], e['field10'], e['field100'], e['field1000'])
+                for e in lazy_contender(data)]
+
+    benchmark(load_few_fields)
+
+
+@pytest.mark.benchmark(group='extract few fields')
+@pytest.mark.parametrize('data', [events], ids=['8 objects of 2000 keys'])
+def test_extract_few_fields(extract_contender, data, benchmark):
+    data = rj.dumps(data)
+    benchmark(extract_contender, data)
+
+
+@pytest.mark.benchmark(group='deserialize ndjson')
+@pytest.mark.parametrize('data', [[user] * 10000, [complex_object] * 100],
+                         ids=['10000 user lines', '100 complex object lines'])
+def test_loads_ndjson(ndjson_contender, data, benchmark):
+    data = b''.join(rj.dumps(item).encode('utf-8') + b'\n' for item in data)
+    benchmark(ndjson_contender, data)
+
+
+@pytest.mark.benchmark(group='deserialize records')
+@pytest.mark.parametrize('data', [{'records': [user] * 10000}], ids=['10000 user records'])
+def test_loads_records(records_contender, data, benchmark):
+    data = rj.dumps(data).encode('utf-8')
+    benchmark(records_contender, data)
+
+
+@pytest.mark.benchmark(group='deserialize small messages')
+@pytest.mark.parametrize('data', [[user] * 1000], ids=['1000 user messages'])
+def test_loads_small_messages(key_cache_contender, data, benchmark):
+    messages = [rj.dumps(item) for item in data]
+    benchmark(lambda: [key_cache_contender(message) for message in messages])
+
+
+readings = [{'id': i, 'x': i * 0.5, 'y': i * -0.25, 'sensor': 'sensor%d' % (i % 8)}
+            for i in range(10000)]
+
+
+@pytest.mark.benchmark(group='deserialize columns')
+@pytest.mark.parametrize('data', [readings], ids=['10000 sensor readings'])
+def test_loads_columns(columns_contender, data, benchmark):
+    data = rj.dumps(data).encode('utf-8')
+    benchmark(columns_contender, data)
+
+
+@pytest.mark.benchmark(group='deserialize into dataclasses')
+@pytest.mark.parametrize('data', [readings], ids=['10000 sensor readings'])
+def test_loads_target(target_contender, data, benchmark):
+    data = rj.dumps(data).encode('utf-8')
+    benchmark(target_contender, data)
+
+
+@pytest.mark.benchmark(group='deserialize batches')
+@pytest.mark.parametrize('data', [[user] * 2000], ids=['2000 user messages'])
+def test_loads_batch(batch_contender, data, benchmark):
+    messages = [rj.dumps(item).encode('utf-8') for item in data]
+    benchmark(batch_contender, messages)
+
+
+# Special case 3: the coordinates of canada.json, mostly floats with many digits
+
+canada = (pathlib.Path(__file__).parent / 'json' / 'canada.json').read_text('utf-8')
+
+
+@pytest.mark.benchmark(group='deserialize numbers')
+@pytest.mark.parametrize('data', [canada], ids=['canada.json'])
+def test_loads_canada(numbers_contender, data, benchmark):
+    # The native conversion must give the very same values of float(repr)
+    assert rj.loads(data) == json.loads(data)
+    benchmark(numbers_contender.loads, data)
+
+
+@pytest.mark.benchmark(group='serialize numbers')
+@pytest.mark.parametrize('data', [canada], ids=['canada.json'])
+def test_dumps_canada(numbers_contender, data, benchmark):
+    data = rj.loads(data)
+    # The output must be the very same of json.dumps(), that uses float.__repr__()
+    assert rj.dumps(data) == json.dumps(data, ensure_ascii=True, separators=(',', ':'))
+    benchmark(numbers_contender.dumps, data)
+
+
+articles = [{'id': str(uuid.UUID(int=random.getrandbits(128))),
+             'created': '2020-01-%02dT10:20:30Z' % (i % 28 + 1),
+             'title': 'Article number %d about something' % i,
+             'body': ' '.join(['Some free text, without any date in it.'] * 20),
+             'tags': ['alpha', 'beta', 'gamma'],
+             'comments': [{'author': 'user%d' % j, 'text': 'Agreed, nice article!'}
+                          for j in range(5)]}
+            for i in range(500)]
+
+
+@pytest.mark.benchmark(group='deserialize datetimes')
+@pytest.mark.parametrize('data', [articles], ids=['500 articles'])
+def test_loads_datetime_keys(datetime_keys_contender, data, benchmark):
+    data = rj.dumps(data)
+    benchmark(datetime_keys_contender, data)
+
+
+@pytest.mark.benchmark(group='deserialize files')
+def test_load_file(file_contender, tmp_path, benchmark):
+    path = tmp_path / 'canada.json'
+    path.write_text(canada, 'utf-8')
+    benchmark(file_contender, path)
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Money:
+    def __init__(self, amount, currency):
+        self.amount = amount
+        self.currency = currency
+
+    def __str__(self):
+        return '%s %s' % (self.amount, self.currency)
+
+
+invoices = [{'id': i,
+             'origin': Point(random.random(), random.random()),
+             'lines': [{'where': Point(j, -j), 'price': Money(j * 1.5, 'EUR')}
+                       for j in range(10)]}
+            for i in range(100)]
+
+
+@pytest.mark.benchmark(group='serialize custom types')
+@pytest.mark.parametrize('data', [invoices], ids=['100 invoices'])
+def test_dumps_custom_types(serializers_contender, data, benchmark):
+    encoder = serializers_contender({Point: ('x', 'y'), Money: 'str'})
+    benchmark(encoder, data)
+
+
+@dataclass
+class Author:
+    id: int
+    name: str
+
+
+@dataclass
+class Response:
+    id: int
+    title: str
+    tags: list
+    authors: list
+
+
+responses = [Response(i, 'Response number %d' % i, ['alpha', 'beta'],
+                      [Author(j, 'author%d' % j) for j in range(5)])
+             for i in range(500)]
+
+
+@pytest.mark.benchmark(group='serialize dataclasses')
+@pytest.mark.parametrize('data', [responses], ids=['500 responses'])
+def test_dumps_dataclasses(dataclass_contender, data, benchmark):
+    assert dataclass_contender(data) == rj.dumps(data, default=lambda o: o.__dict__)
+    benchmark(dataclass_contender, data)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Memory usage benchmarks
+# :License:   MIT License
+#
+
+import mmap
+import os
+import pathlib
+import subprocess
+import sys
+import tracemalloc
+
+import pytest
+
+
+benchmark = pytest.importorskip('pytest_benchmark')
+resource = pytest.importorskip('resource')
+
+import rapidjson as rj
+
+
+def read_mmap(path):
+    with path.open('rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# The "decoded" contender replicates what loads() used to do with bytes input, that is
+# decoding them into a string and then parsing a copy of its UTF-8 representation
+
+contenders = {
+    'decoded': (pathlib.Path.read_bytes, lambda data: rj.loads(data.decode('utf-8'))),
+    'bytes': (pathlib.Path.read_bytes, rj.loads),
+    'mmap': (read_mmap, rj.loads),
+}
+
+samples = [pathlib.Path(__file__).parent / 'json' / name
+           for name in ('canada.json', 'twitter.json', 'github.json')]
+
+
+@pytest.fixture(scope='module', params=samples + ['big'],
+                ids=[s.name for s in samples] + ['64 x canada.json'])
+def sample(request, tmp_path_factory):
+    if request.param != 'big':
+        return request.param
+
+    # The differences are more evident with a document much bigger than the
+    # interpreter itself
+    big = tmp_path_factory.mktemp('memory') / 'big.json'
+    canada = samples[0].read_text('utf-8')
+    big.write_text('[%s]' % ','.join([canada] * 64), 'utf-8')
+    return big
+
+
+def max_rss():
+    "Return the peak resident set size of the current process, in bytes."
+
+    # On Linux ru_maxrss survives exec(), so a child would start with the peak of its
+    # parent, while the VmHWM of the process status does not
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    # ru_maxrss is in bytes on macOS, in kilobytes elsewhere
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def peak_rss(kind, sample):
+    """Return the peak RSS of a fresh interpreter loading `sample` with the given
+    contender, and how much it grew while doing that, in bytes."""
+
+    # Make sure the child process loads the very same module
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(rj.__file__),
+                                                      env.get('PYTHONPATH')]))
+    output = subprocess.run([sys.executable, __file__, kind, str(sample)],
+                            check=True, capture_output=True, text=True, env=env).stdout
+    before, after = map(int, output.split())
+    return after, after - before
+
+
+@pytest.mark.benchmark(group='memory')
+@pytest.mark.parametrize('kind', list(contenders))
+def test_loads_peak_rss(kind, sample, benchmark):
+    peak, growth = peak_rss(kind, sample)
+    benchmark.extra_info['peak_rss'] = peak
+    benchmark.extra_info['peak_rss_growth'] = growth
+
+    reader, loader = contenders[kind]
+    benchmark(loader, reader(sample))
+
+
+def traced_retained_memory(func, *args):
+    "Return the memory held by the result of `func`."
+
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return current
+
+
+telemetry = rj.dumps([{'status': ('OK', 'WARNING', 'ERROR')[i % 3],
+                       'region': ('eu-west-1', 'us-east-1')[i % 2],
+                       'value': i}
+                      for i in range(10000)])
+
+string_cache_contenders = {
+    'plain': rj.Decoder(),
+    'cached': rj.Decoder(string_cache_size=64),
+}
+
+
+@pytest.mark.benchmark(group='retained memory')
+@pytest.mark.parametrize('data', [telemetry], ids=['10000 telemetry records'])
+@pytest.mark.parametrize('kind', list(string_cache_contenders))
+def test_loads_retained_memory(kind, data, benchmark):
+    decoder = string_cache_contenders[kind]
+    benchmark.extra_info['retained_memory'] = traced_retained_memory(decoder, data)
+    benchmark(decoder, data)
+
+
+array_mode_contenders = {
+    'lists': rj.Decoder(),
+    'typed': rj.Decoder(array_mode=rj.AM_TYPED),
+}
+
+canada = samples[0]
+
+
+@pytest.mark.benchmark(group='retained memory')
+@pytest.mark.parametrize('data', [canada.read_bytes()], ids=[canada.name])
+@pytest.mark.parametrize('kind', list(array_mode_contenders))
+def test_loads_typed_arrays_retained_memory(kind, data, benchmark):
+    decoder = array_mode_contenders[kind]
+    benchmark.extra_info['retained_memory'] = traced_retained_memory(decoder, data)
+    benchmark(decoder, data)
+
+
+if __name__ == '__main__':
+    # Measure the peak RSS of a single contender, see peak_rss()
+    kind, sample = sys.argv[1:]
+    reader, loader = contenders[kind]
+    data = reader(pathlib.Path(sample))
+    before = max_rss()
+    result = loader(data)
+    after = max_rss()
+    print(before, after)
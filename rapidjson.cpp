@@ -13,10 +13,27 @@
 #include <structmember.h>
 
 #include <algorithm>
+#include <atomic>
+#include <cerrno>
+#include <cfloat>
 #include <cmath>
+#include <cstdlib>
+#include <limits>
+#include <new>
 #include <string>
+#include <system_error>
+#include <thread>
 #include <vector>
 
+#ifdef _WIN32
+#include <io.h>
+#else
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+#include "rapidjson/memorystream.h"
 #include "rapidjson/reader.h"
 #include "rapidjson/schema.h"
 #include "rapidjson/stringbuffer.h"
@@ -47,6 +64,10 @@ static PyObject* decimal_type = NULL;
 static PyObject* timezone_type = NULL;
 static PyObject* timezone_utc = NULL;
 static PyObject* uuid_type = NULL;
+static PyObject* uuid_safe_unknown = NULL;
+static bool uuid_bypass_init = false;
+static PyObject* array_type = NULL;
+static PyObject* fileio_type = NULL;
 static PyObject* validation_error = NULL;
 static PyObject* decode_error = NULL;
 
@@ -60,6 +81,10 @@ static PyObject* decode_error = NULL;
 
 static PyObject* astimezone_name = NULL;
 static PyObject* hex_name = NULL;
+static PyObject* int_name = NULL;
+static PyObject* str_name = NULL;
+static PyObject* repr_name = NULL;
+static PyObject* is_safe_name = NULL;
 static PyObject* timestamp_name = NULL;
 static PyObject* total_seconds_name = NULL;
 static PyObject* utcoffset_name = NULL;
@@ -71,8 +96,20 @@ static PyObject* default_name = NULL;
 static PyObject* end_array_name = NULL;
 static PyObject* string_name = NULL;
 static PyObject* read_name = NULL;
+static PyObject* readinto_name = NULL;
+static PyObject* readable_name = NULL;
+static PyObject* close_name = NULL;
 static PyObject* write_name = NULL;
 static PyObject* encoding_name = NULL;
+static PyObject* frombytes_name = NULL;
+static PyObject* start_map_name = NULL;
+static PyObject* map_key_name = NULL;
+static PyObject* end_map_name = NULL;
+static PyObject* start_array_name = NULL;
+static PyObject* null_name = NULL;
+static PyObject* boolean_name = NULL;
+static PyObject* number_name = NULL;
+static PyObject* item_name = NULL;
 
 static PyObject* minus_inf_string_value = NULL;
 static PyObject* nan_string_value = NULL;
@@ -86,6 +123,7 @@ struct HandlerContext {
     bool isObject;
     bool keyValuePairs;
     bool copiedKey;
+    bool typed;     // whether the numbers are still going to PyHandler's native buffer
 };
 
 
@@ -138,6 +176,42 @@ days_per_month(int year, int month) {
 }
 
 
+/* Shift a date and time by the given offset in seconds to UTC, carrying the change over
+   to the day, the month and the year: return false when the result falls outside the
+   range supported by the datetime module. */
+
+static bool
+shift_to_utc(int& year, int& month, int& day, int& hours, int& mins, int tzoff) {
+    // ISO 8601 offsets are always a whole number of minutes
+    int minutes = hours * 60 + mins - tzoff / 60;
+
+    if (minutes < 0) {
+        minutes += 24 * 60;
+        if (--day == 0) {
+            if (--month == 0) {
+                month = 12;
+                year--;
+            }
+            day = days_per_month(year, month);
+        }
+    } else if (minutes >= 24 * 60) {
+        minutes -= 24 * 60;
+        if (++day > days_per_month(year, month)) {
+            day = 1;
+            if (++month > 12) {
+                month = 1;
+                year++;
+            }
+        }
+    }
+
+    hours = minutes / 60;
+    mins = minutes % 60;
+
+    return year >= 1 && year <= 9999;
+}
+
+
 enum UuidMode {
     UM_NONE = 0,
     UM_CANONICAL = 1<<0, // 4-dashed 32 hex chars: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx
@@ -155,6 +229,17 @@ enum NumberMode {
 };
 
 
+enum ArrayMode {
+    AM_NONE = 0,
+    AM_TYPED = 1<<0,    // decode arrays of numbers into array.array instances
+    AM_MAX = 1<<1
+};
+
+
+// The largest integer that can be exactly represented by a double
+#define TYPED_MAX_EXACT_INT ((int64_t) 1 << 53)
+
+
 enum BytesMode {
     BM_NONE = 0,
     BM_UTF8 = 1<<0,             // try to convert to UTF-8
@@ -195,33 +280,84 @@ enum MappingMode {
 };
 
 
+enum ObjectMode {
+    OM_NONE = 0,                // Default, objects are left to the default function
+    OM_DATACLASS = 1<<0,        // Dataclass instances are dumped as JSON objects
+    OM_NAMEDTUPLE = 1<<1,       // Named tuples are dumped as JSON objects
+    OM_SLOTS = 1<<2,            // Instances of classes with only __slots__ as well
+    OM_MAX = 1<<3
+};
+
+
 //////////////////////////
 // Forward declarations //
 //////////////////////////
 
 
 static PyObject* do_decode(PyObject* decoder,
-                           const char* jsonStr, Py_ssize_t jsonStrlen,
+                           const char* jsonStr, Py_ssize_t jsonStrlen, bool isBuffer,
                            PyObject* jsonStream, size_t chunkSize,
                            PyObject* objectHook,
                            unsigned numberMode, unsigned datetimeMode,
-                           unsigned uuidMode, unsigned parseMode);
+                           unsigned uuidMode, unsigned parseMode, unsigned arrayMode,
+                           bool releaseGil);
+static PyObject* do_lazy_decode(const char* jsonStr, Py_ssize_t jsonStrLen,
+                                bool isBuffer, PyObject* jsonStream, size_t chunkSize,
+                                unsigned numberMode, unsigned datetimeMode,
+                                unsigned uuidMode, unsigned parseMode, bool releaseGil,
+                                size_t errorOffset);
 static PyObject* decoder_call(PyObject* self, PyObject* args, PyObject* kwargs);
+static PyObject* decoder_extract(PyObject* self, PyObject* args, PyObject* kwargs);
+static PyObject* decoder_iter(PyObject* self, PyObject* args, PyObject* kwargs);
+static PyObject* decoder_iterparse(PyObject* self, PyObject* args, PyObject* kwargs);
+static PyObject* decoder_columns(PyObject* self, PyObject* args, PyObject* kwargs);
+static PyObject* decoder_map(PyObject* self, PyObject* args, PyObject* kwargs);
+static PyObject* decoder_feed(PyObject* self, PyObject* data);
+static PyObject* decoder_close(PyObject* self, PyObject* unused);
+static void decoder_dealloc(PyObject* self);
 static PyObject* decoder_new(PyTypeObject* type, PyObject* args, PyObject* kwargs);
-
-
-static PyObject* do_encode(PyObject* value, PyObject* defaultFn, bool ensureAscii,
+static int decoder_setattro(PyObject* self, PyObject* name, PyObject* value);
+static struct StringCache* decoder_key_cache(PyObject* decoder);
+static struct StringCache* decoder_string_cache(PyObject* decoder);
+static unsigned decoder_array_mode(PyObject* decoder);
+static struct Schema* decoder_schema(PyObject* decoder);
+static unsigned decoder_hooks(PyObject* decoder);
+static const struct KeySet* decoder_datetime_keys(PyObject* decoder);
+static const struct KeySet* decoder_uuid_keys(PyObject* decoder);
+static struct DecoderState* decoder_state(PyObject* decoder);
+static struct Schema* schema_compile(PyObject* target);
+static PyObject* slots_fields(PyTypeObject* type);
+static PyObject* do_schema_decode(PyObject* decoder, const char* jsonStr,
+                                  Py_ssize_t jsonStrLen, bool isBuffer,
+                                  PyObject* jsonStream, size_t chunkSize,
+                                  unsigned numberMode, unsigned datetimeMode,
+                                  unsigned uuidMode, unsigned parseMode,
+                                  unsigned arrayMode, bool releaseGil);
+
+
+struct SerializerRegistry;
+
+static PyObject* do_encode(PyObject* value, PyObject* defaultFn,
+                           SerializerRegistry* registry, bool ensureAscii,
                            unsigned writeMode, char indentChar, unsigned indentCount,
                            unsigned numberMode, unsigned datetimeMode,
                            unsigned uuidMode, unsigned bytesMode,
-                           unsigned iterableMode, unsigned mappingMode);
+                           unsigned iterableMode, unsigned mappingMode,
+                           unsigned objectMode, bool asBytes);
 static PyObject* do_stream_encode(PyObject* value, PyObject* stream, size_t chunkSize,
+                                  PyObject* defaultFn, SerializerRegistry* registry,
+                                  bool ensureAscii, unsigned writeMode, char indentChar,
+                                  unsigned indentCount, unsigned numberMode,
+                                  unsigned datetimeMode, unsigned uuidMode,
+                                  unsigned bytesMode, unsigned iterableMode,
+                                  unsigned mappingMode, unsigned objectMode);
+static PyObject* do_buffer_encode(PyObject* value, PyObject* buffer, Py_ssize_t offset,
                                   PyObject* defaultFn, bool ensureAscii,
                                   unsigned writeMode, char indentChar,
                                   unsigned indentCount, unsigned numberMode,
                                   unsigned datetimeMode, unsigned uuidMode,
                                   unsigned bytesMode, unsigned iterableMode,
-                                  unsigned mappingMode);
+                                  unsigned mappingMode, unsigned objectMode);
 static PyObject* encoder_call(PyObject* self, PyObject* args, PyObject* kwargs);
 static PyObject* encoder_new(PyTypeObject* type, PyObject* args, PyObject* kwargs);
 
@@ -236,6 +372,19 @@ static PyObject* validator_new(PyTypeObject* type, PyObject* args, PyObject* kwa
 ///////////////////////////////////////////////////
 
 
+/* The stream is consumed in one of three ways: text streams, and any other object
+   providing just a read() method, return a new str or bytes for every chunk; binary
+   streams fill a single bytearray thru their readinto() method; unbuffered files opened
+   in binary mode, that is exact io.FileIO instances, are read directly from their file
+   descriptor, with the GIL released. */
+
+enum ReadMethod {
+    RM_READ,
+    RM_READINTO,
+    RM_FD
+};
+
+
 class PyReadStreamWrapper {
 public:
     typedef char Ch;
@@ -243,13 +392,40 @@ public:
     PyReadStreamWrapper(PyObject* stream, size_t size)
         : stream(stream) {
         Py_INCREF(stream);
-        chunkSize = PyLong_FromUnsignedLong(size);
+        chunkSize = NULL;
         buffer = NULL;
         chunk = NULL;
         chunkLen = 0;
         pos = 0;
         offset = 0;
         eof = false;
+        fd = -1;
+        method = RM_READ;
+
+        if (Py_TYPE(stream) == (PyTypeObject*) fileio_type) {
+            // A closed file or one not opened for reading goes thru read(), that raises
+            // the appropriate error
+            PyObject* readable = PyObject_CallMethodObjArgs(stream, readable_name, NULL);
+            if (readable == Py_True)
+                fd = PyObject_AsFileDescriptor(stream);
+            Py_XDECREF(readable);
+            if (fd != -1)
+                method = RM_FD;
+            PyErr_Clear();
+        } else if (PyObject_HasAttr(stream, readinto_name)) {
+            method = RM_READINTO;
+        }
+
+        if (method != RM_READ) {
+            chunk = PyByteArray_FromStringAndSize(NULL, size);
+            if (chunk == NULL) {
+                PyErr_Clear();
+                method = RM_READ;
+            }
+        }
+
+        if (method == RM_READ)
+            chunkSize = PyLong_FromUnsignedLong(size);
     }
 
     ~PyReadStreamWrapper() {
@@ -296,33 +472,97 @@ public:
 
 private:
     void Read() {
-        Py_CLEAR(chunk);
+        Py_ssize_t len;
 
-        chunk = PyObject_CallMethodObjArgs(stream, read_name, chunkSize, NULL);
+        switch (method) {
+        case RM_READ:
+            len = ReadChunk();
+            break;
+
+        case RM_READINTO:
+            len = ReadIntoChunk();
+            break;
 
-        if (chunk == NULL) {
+        default:
+            len = ReadFromFd();
+            break;
+        }
+
+        if (len <= 0) {
             eof = true;
         } else {
-            Py_ssize_t len;
+            offset += chunkLen;
+            chunkLen = len;
+            pos = 0;
+        }
+    }
 
-            if (PyBytes_Check(chunk)) {
-                len = PyBytes_GET_SIZE(chunk);
-                buffer = PyBytes_AS_STRING(chunk);
-            } else {
-                buffer = PyUnicode_AsUTF8AndSize(chunk, &len);
-                if (buffer == NULL) {
-                    len = 0;
-                }
-            }
+    Py_ssize_t ReadChunk() {
+        Py_CLEAR(chunk);
 
-            if (len == 0) {
-                eof = true;
-            } else {
-                offset += chunkLen;
-                chunkLen = len;
-                pos = 0;
+        chunk = PyObject_CallMethodObjArgs(stream, read_name, chunkSize, NULL);
+
+        if (chunk == NULL)
+            return -1;
+
+        Py_ssize_t len;
+
+        if (PyBytes_Check(chunk)) {
+            len = PyBytes_GET_SIZE(chunk);
+            buffer = PyBytes_AS_STRING(chunk);
+        } else {
+            buffer = PyUnicode_AsUTF8AndSize(chunk, &len);
+            if (buffer == NULL) {
+                len = 0;
             }
         }
+
+        return len;
+    }
+
+    Py_ssize_t ReadIntoChunk() {
+        PyObject* result = PyObject_CallMethodObjArgs(stream, readinto_name, chunk, NULL);
+
+        if (result == NULL)
+            return -1;
+
+        Py_ssize_t len = PyLong_AsSsize_t(result);
+        Py_DECREF(result);
+
+        if (len == -1 && PyErr_Occurred())
+            return -1;
+
+        if (len < 0 || len > PyByteArray_GET_SIZE(chunk)) {
+            PyErr_Format(PyExc_ValueError,
+                         "readinto() returned %zd outside the range [0, %zd]",
+                         len, PyByteArray_GET_SIZE(chunk));
+            return -1;
+        }
+
+        buffer = PyByteArray_AS_STRING(chunk);
+        return len;
+    }
+
+    Py_ssize_t ReadFromFd() {
+        char* data = PyByteArray_AS_STRING(chunk);
+        size_t size = (size_t) PyByteArray_GET_SIZE(chunk);
+        Py_ssize_t len;
+
+        do {
+            Py_BEGIN_ALLOW_THREADS
+#ifdef _WIN32
+            len = _read(fd, data, (unsigned) std::min(size, (size_t) INT_MAX));
+#else
+            len = read(fd, data, size);
+#endif
+            Py_END_ALLOW_THREADS
+        } while (len < 0 && errno == EINTR && PyErr_CheckSignals() == 0);
+
+        if (len < 0 && !PyErr_Occurred())
+            PyErr_SetFromErrno(PyExc_OSError);
+
+        buffer = data;
+        return len;
     }
 
     PyObject* stream;
@@ -333,6 +573,8 @@ private:
     size_t pos;
     size_t offset;
     bool eof;
+    int fd;
+    ReadMethod method;
 };
 
 
@@ -443,6 +685,223 @@ inline void PutUnsafe(PyWriteStreamWrapper& stream, char c) {
 }
 
 
+/* Output stream writing straight into the memory of a caller-owned buffer, starting at
+   the given offset: a bytearray is enlarged as needed, any other writable bytes-like
+   object must be big enough, otherwise the output is just counted. The buffer is
+   exported for the whole duration, so that it cannot be resized by other code, for
+   example a default() function. The original content is saved in chunks right before
+   being overwritten, so that the buffer can be restored when the encoding fails. */
+
+class PyBufferWriteStream {
+public:
+    typedef char Ch;
+
+    PyBufferWriteStream(PyObject* target, Py_ssize_t offset)
+        : target(target), offset(offset) {
+        Py_INCREF(target);
+        growable = PyByteArray_Check(target);
+        exported = false;
+        failed = false;
+        start = cursor = limit = bufferEnd = NULL;
+        overflow = 0;
+        initialSize = 0;
+    }
+
+    ~PyBufferWriteStream() {
+        if (exported)
+            PyBuffer_Release(&view);
+        Py_CLEAR(target);
+    }
+
+    bool Open() {
+        if (PyObject_GetBuffer(target, &view, PyBUF_WRITABLE) < 0)
+            return false;
+        exported = true;
+        initialSize = view.len;
+
+        if (offset < 0 || offset > view.len) {
+            PyErr_Format(PyExc_ValueError,
+                         "offset must be between 0 and %zd, the size of the buffer",
+                         view.len);
+            return false;
+        }
+
+        start = (Ch*) view.buf + offset;
+        cursor = start;
+        bufferEnd = (Ch*) view.buf + view.len;
+        // The first write saves the original content
+        limit = offset < initialSize ? start : bufferEnd;
+        return true;
+    }
+
+    // Return the number of bytes written, or -1 with an exception set, restoring the
+    // original content of the buffer when the encoding failed
+    Py_ssize_t Close(bool ok) {
+        size_t length = (size_t)(cursor - start) + overflow;
+
+        if (!ok || failed || PyErr_Occurred()) {
+            Restore();
+            return -1;
+        }
+
+        if (overflow) {
+            Restore();
+            PyErr_Format(PyExc_ValueError,
+                         "Buffer too small, %zu bytes needed from offset %zd",
+                         length, offset);
+            return -1;
+        }
+
+        if (exported) {
+            PyBuffer_Release(&view);
+            exported = false;
+        }
+
+        // Trim the extra room left by Grow(), but never shrink the bytearray
+        if (growable) {
+            Py_ssize_t size = std::max(initialSize, offset + (Py_ssize_t) length);
+            if (PyByteArray_GET_SIZE(target) != size
+                && PyByteArray_Resize(target, size) < 0)
+                return -1;
+        }
+
+        return (Py_ssize_t) length;
+    }
+
+    Ch Peek() {
+        assert(false);
+        return 0;
+    }
+
+    Ch Take() {
+        assert(false);
+        return 0;
+    }
+
+    size_t Tell() const {
+        assert(false);
+        return 0;
+    }
+
+    void Flush() {
+    }
+
+    void Put(Ch c) {
+        if (RAPIDJSON_UNLIKELY(cursor == limit) && !Reserve()) {
+            overflow++;
+            return;
+        }
+        *cursor++ = c;
+    }
+
+    Ch* PutBegin() {
+        assert(false);
+        return 0;
+    }
+
+    size_t PutEnd(Ch* begin) {
+        assert(false);
+        return 0;
+    }
+
+private:
+    // Size of the chunks of original content saved at once
+    static const Py_ssize_t BACKUP_CHUNK_SIZE = 4096;
+
+    // Make room for the next byte, saving the original content about to be overwritten
+    bool Reserve() {
+        Py_ssize_t used = cursor - (Ch*) view.buf;
+
+        if (used < initialSize) {
+            Py_ssize_t count = std::min(BACKUP_CHUNK_SIZE, initialSize - used);
+            try {
+                backup.insert(backup.end(), cursor, cursor + count);
+            } catch (const std::bad_alloc&) {
+                // Propagate the error state, it will be caught by dumps_internal()
+                PyErr_NoMemory();
+                failed = true;
+                return false;
+            }
+            limit = cursor + count;
+            return true;
+        }
+
+        limit = bufferEnd;
+        return cursor < bufferEnd || Grow();
+    }
+
+    // Put back the original size and content of the buffer, preserving the current error
+    void Restore() {
+        PyObject* etype;
+        PyObject* evalue;
+        PyObject* etraceback;
+        PyErr_Fetch(&etype, &evalue, &etraceback);
+
+        if (growable) {
+            if (exported) {
+                PyBuffer_Release(&view);
+                exported = false;
+            }
+            if (PyByteArray_GET_SIZE(target) == initialSize
+                || PyByteArray_Resize(target, initialSize) == 0)
+                memcpy(PyByteArray_AS_STRING(target) + offset, backup.data(),
+                       backup.size());
+            else
+                PyErr_Clear();
+        } else if (exported) {
+            memcpy((Ch*) view.buf + offset, backup.data(), backup.size());
+            PyBuffer_Release(&view);
+            exported = false;
+        }
+
+        PyErr_Restore(etype, evalue, etraceback);
+    }
+
+    bool Grow() {
+        if (!growable || failed)
+            return false;
+
+        Py_ssize_t used = cursor - (Ch*) view.buf;
+        Py_ssize_t size = view.len < 64 ? 128 : view.len * 2;
+
+        PyBuffer_Release(&view);
+        exported = false;
+
+        // Propagate the error state, it will be caught by dumps_internal()
+        if (PyByteArray_Resize(target, size) < 0
+            || PyObject_GetBuffer(target, &view, PyBUF_WRITABLE) < 0) {
+            failed = true;
+            return false;
+        }
+
+        exported = true;
+        start = (Ch*) view.buf + offset;
+        cursor = (Ch*) view.buf + used;
+        limit = bufferEnd = (Ch*) view.buf + view.len;
+        return true;
+    }
+
+    PyObject* target;
+    Py_buffer view;
+    Py_ssize_t offset;
+    Py_ssize_t initialSize;
+    Ch* start;
+    Ch* cursor;
+    Ch* limit;            // where the next byte needs either a backup or more room
+    Ch* bufferEnd;
+    std::vector<Ch> backup;
+    size_t overflow;
+    bool growable;
+    bool exported;
+    bool failed;
+};
+
+
+inline void PutUnsafe(PyBufferWriteStream& stream, char c) {
+    stream.Put(c);
+}
+
+
 /////////////
 // RawJSON //
 /////////////
@@ -733,6 +1192,25 @@ accept_mapping_mode_arg(PyObject* arg, unsigned &mapping_mode)
     return true;
 }
 
+static bool
+accept_object_mode_arg(PyObject* arg, unsigned &object_mode)
+{
+    if (arg != NULL && arg != Py_None) {
+        if (PyLong_Check(arg)) {
+            long mode = PyLong_AsLong(arg);
+            if (mode < 0 || mode >= OM_MAX) {
+                PyErr_SetString(PyExc_ValueError, "Invalid object_mode, out of range");
+                return false;
+            }
+            object_mode = (unsigned) mode;
+        } else {
+            PyErr_SetString(PyExc_TypeError, "object_mode must be a non-negative int");
+            return false;
+        }
+    }
+    return true;
+}
+
 static bool
 accept_chunk_size_arg(PyObject* arg, size_t &chunk_size)
 {
@@ -753,6 +1231,31 @@ accept_chunk_size_arg(PyObject* arg, size_t &chunk_size)
     return true;
 }
 
+
+// Upper limit of the key_cache_size and string_cache_size options
+#define STRING_CACHE_MAX_SIZE (1 << 20)
+
+
+static bool
+accept_cache_size_arg(PyObject* arg, const char* option, unsigned &cache_size)
+{
+    if (arg != NULL && arg != Py_None) {
+        if (PyLong_Check(arg)) {
+            Py_ssize_t size = PyNumber_AsSsize_t(arg, PyExc_ValueError);
+            if (PyErr_Occurred() || size < 0 || size > STRING_CACHE_MAX_SIZE) {
+                PyErr_Format(PyExc_ValueError, "Invalid %s, out of range", option);
+                return false;
+            }
+            cache_size = (unsigned) size;
+        } else {
+            PyErr_Format(PyExc_TypeError, "%s must be a non-negative int or None",
+                         option);
+            return false;
+        }
+    }
+    return true;
+}
+
 static bool
 accept_parse_mode_arg(PyObject* arg, unsigned &parse_mode)
 {
@@ -774,6 +1277,27 @@ accept_parse_mode_arg(PyObject* arg, unsigned &parse_mode)
 }
 
 
+static bool
+accept_array_mode_arg(PyObject* arg, unsigned &array_mode)
+{
+    if (arg != NULL && arg != Py_None) {
+        if (PyLong_Check(arg)) {
+            long mode = PyLong_AsLong(arg);
+            if (mode < 0 || mode >= AM_MAX) {
+                PyErr_SetString(PyExc_ValueError, "Invalid array_mode, out of range");
+                return false;
+            }
+            array_mode = (unsigned) mode;
+        } else {
+            PyErr_SetString(PyExc_TypeError,
+                            "array_mode must be a non-negative int");
+            return false;
+        }
+    }
+    return true;
+}
+
+
 /////////////
 // Decoder //
 /////////////
@@ -801,1478 +1325,8865 @@ float_from_string(const char* s, Py_ssize_t len)
 }
 
 
-struct PyHandler {
-    PyObject* decoderStartObject;
-    PyObject* decoderEndObject;
-    PyObject* decoderEndArray;
-    PyObject* decoderString;
-    PyObject* sharedKeys;
-    PyObject* root;
-    PyObject* objectHook;
-    unsigned datetimeMode;
-    unsigned uuidMode;
-    unsigned numberMode;
-    std::vector<HandlerContext> stack;
+/* Offset aware timestamps usually carry just a few distinct offsets: the timezone
+   instance of each one is created once, and kept in a table indexed by the offset in
+   minutes, that goes from -23:59 to +23:59. */
 
-    PyHandler(PyObject* decoder,
-              PyObject* hook,
-              unsigned dm,
-              unsigned um,
-              unsigned nm)
-        : decoderStartObject(NULL),
-          decoderEndObject(NULL),
-          decoderEndArray(NULL),
-          decoderString(NULL),
-          root(NULL),
-          objectHook(hook),
-          datetimeMode(dm),
-          uuidMode(um),
-          numberMode(nm)
-        {
-            stack.reserve(128);
-            if (decoder != NULL) {
-                assert(!objectHook);
-                if (PyObject_HasAttr(decoder, start_object_name)) {
-                    decoderStartObject = PyObject_GetAttr(decoder, start_object_name);
-                }
-                if (PyObject_HasAttr(decoder, end_object_name)) {
-                    decoderEndObject = PyObject_GetAttr(decoder, end_object_name);
-                }
-                if (PyObject_HasAttr(decoder, end_array_name)) {
-                    decoderEndArray = PyObject_GetAttr(decoder, end_array_name);
-                }
-                if (PyObject_HasAttr(decoder, string_name)) {
-                    decoderString = PyObject_GetAttr(decoder, string_name);
-                }
-            }
-            sharedKeys = PyDict_New();
-        }
+static PyObject* timezones[2 * (24 * 60 - 1) + 1];
 
-    ~PyHandler() {
-        while (!stack.empty()) {
-            const HandlerContext& ctx = stack.back();
-            if (ctx.copiedKey)
-                PyMem_Free((void*) ctx.key);
-            if (ctx.object != NULL)
-                Py_DECREF(ctx.object);
-            stack.pop_back();
-        }
-        Py_CLEAR(decoderStartObject);
-        Py_CLEAR(decoderEndObject);
-        Py_CLEAR(decoderEndArray);
-        Py_CLEAR(decoderString);
-        Py_CLEAR(sharedKeys);
-    }
+static PyObject*
+timezone_from_offset(int tzoff)
+{
+    PyObject*& tz = timezones[tzoff / 60 + 24 * 60 - 1];
 
-    bool Handle(PyObject* value) {
-        if (root) {
-            const HandlerContext& current = stack.back();
+    if (tz == NULL) {
+        PyObject* offset = PyDateTimeAPI->Delta_FromDelta(0, tzoff, 0, 1,
+                                                          PyDateTimeAPI->DeltaType);
+        if (offset == NULL)
+            return NULL;
 
-            if (current.isObject) {
-                PyObject* key = PyUnicode_FromStringAndSize(current.key,
-                                                            current.keyLength);
-                if (key == NULL) {
-                    Py_DECREF(value);
-                    return false;
-                }
+        tz = PyObject_CallFunctionObjArgs(timezone_type, offset, NULL);
+        Py_DECREF(offset);
 
-                PyObject* shared_key = PyDict_SetDefault(sharedKeys, key, key);
-                if (shared_key == NULL) {
-                    Py_DECREF(key);
-                    Py_DECREF(value);
-                    return false;
-                }
-                Py_INCREF(shared_key);
-                Py_DECREF(key);
-                key = shared_key;
+        if (tz == NULL)
+            return NULL;
+    }
 
-                int rc;
-                if (current.keyValuePairs) {
-                    PyObject* pair = PyTuple_Pack(2, key, value);
+    Py_INCREF(tz);
+    return tz;
+}
 
-                    Py_DECREF(key);
-                    Py_DECREF(value);
-                    if (pair == NULL) {
-                        return false;
-                    }
-                    rc = PyList_Append(current.object, pair);
-                    Py_DECREF(pair);
-                } else {
-                    if (PyDict_CheckExact(current.object))
-                        // If it's a standard dictionary, this is +20% faster
-                        rc = PyDict_SetItem(current.object, key, value);
-                    else
-                        rc = PyObject_SetItem(current.object, key, value);
-                    Py_DECREF(key);
-                    Py_DECREF(value);
-                }
 
-                if (rc == -1) {
-                    return false;
-                }
-            } else {
-                PyList_Append(current.object, value);
-                Py_DECREF(value);
-            }
-        } else {
-            root = value;
-        }
-        return true;
-    }
+/* Build an UUID instance from its 32 hex digits: when possible, this is done like the
+   uuid module itself does in its private constructors, that is creating a bare instance
+   and assigning its int attribute, skipping the parsing of the digits in Python that
+   UUID.__init__() would do. */
 
-    bool Key(const char* str, SizeType length, bool copy) {
-        HandlerContext& current = stack.back();
+static PyObject*
+uuid_from_hex(const char* hex)
+{
+    if (!uuid_bypass_init)
+        return PyObject_CallFunction(uuid_type, "s", hex);
 
-        // This happens when operating in stream mode and kParseInsituFlag is not set: we
-        // must copy the incoming string in the context, and destroy the duplicate when
-        // the context gets reused for the next dictionary key
+    PyObject* integer = PyLong_FromString(hex, NULL, 16);
+    if (integer == NULL)
+        return NULL;
 
-        if (current.key && current.copiedKey) {
-            PyMem_Free((void*) current.key);
-            current.key = NULL;
-        }
+    PyTypeObject* type = (PyTypeObject*) uuid_type;
+    PyObject* args = PyTuple_New(0);
+    PyObject* uuid = args != NULL ? type->tp_new(type, args, NULL) : NULL;
+    Py_XDECREF(args);
 
-        if (copy) {
-            char* copied_str = (char*) PyMem_Malloc(length+1);
-            if (copied_str == NULL)
-                return false;
-            memcpy(copied_str, str, length+1);
-            str = copied_str;
-            assert(!current.key);
-        }
+    // UUID instances are immutable, so set the attributes the same way object.__setattr__
+    // does, bypassing UUID.__setattr__()
 
-        current.key = str;
-        current.keyLength = length;
-        current.copiedKey = copy;
+    if (uuid != NULL
+        && (PyObject_GenericSetAttr(uuid, int_name, integer) == -1
+            || (uuid_safe_unknown != NULL
+                && PyObject_GenericSetAttr(uuid, is_safe_name, uuid_safe_unknown) == -1)))
+        Py_CLEAR(uuid);
 
-        return true;
-    }
+    Py_DECREF(integer);
+    return uuid;
+}
 
-    bool StartObject() {
-        PyObject* mapping;
-        bool key_value_pairs;
 
-        if (decoderStartObject != NULL) {
-            mapping = PyObject_CallFunctionObjArgs(decoderStartObject, NULL);
-            if (mapping == NULL)
-                return false;
-            key_value_pairs = PyList_Check(mapping);
-            if (!PyMapping_Check(mapping) && !key_value_pairs) {
-                Py_DECREF(mapping);
-                PyErr_SetString(PyExc_ValueError,
-                                "start_object() must return a mapping or a list instance");
-                return false;
-            }
-        } else {
-            mapping = PyDict_New();
-            if (mapping == NULL) {
-                return false;
-            }
-            key_value_pairs = false;
-        }
+/* Enable the shortcut in uuid_from_hex() only if it yields the same result of the
+   regular constructor, in case a future version of the uuid module changes its
+   internals. */
 
-        if (!Handle(mapping)) {
-            return false;
-        }
+static void
+check_uuid_bypass_init()
+{
+    const char* hex = "7202d1157ff34c81a7c12a1f067b1ece";
+
+    PyObject* expected = PyObject_CallFunction(uuid_type, "s", hex);
+    uuid_bypass_init = true;
+    PyObject* result = uuid_from_hex(hex);
+    uuid_bypass_init = (expected != NULL && result != NULL
+                        && Py_TYPE(result) == Py_TYPE(expected)
+                        && PyObject_RichCompareBool(result, expected, Py_EQ) == 1);
+    Py_XDECREF(expected);
+    Py_XDECREF(result);
+    PyErr_Clear();
+}
 
-        HandlerContext ctx;
-        ctx.isObject = true;
-        ctx.keyValuePairs = key_value_pairs;
-        ctx.object = mapping;
-        ctx.key = NULL;
-        ctx.copiedKey = false;
-        Py_INCREF(mapping);
 
-        stack.push_back(ctx);
+/* Native conversion of the textual representation of a JSON number, as validated by the
+   reader: integers with up to 18 digits always fit in an int64_t, while floats with up to
+   19 significant digits are computed with correct rounding, either by a single IEEE
+   operation when both the significand and the power of ten are exact doubles (the "fast
+   path" of Clinger's algorithm), or else by the Eisel-Lemire algorithm, multiplying the
+   significand by a 128-bit approximation of the power of ten, and giving up in the rare
+   cases where that is not precise enough to decide the rounding. Anything else, including
+   longer literals, subnormals, overflows, NaN and Infinity, is left to PyLong_FromString()
+   and PyOS_string_to_double(). */
+
+enum NumberKind {
+    NK_OTHER,
+    NK_INT,
+    NK_FLOAT
+};
 
-        return true;
-    }
 
-    bool EndObject(SizeType member_count) {
-        const HandlerContext& ctx = stack.back();
+static const double exact_powers_of_ten[] = {
+    1e0, 1e1, 1e2, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9, 1e10, 1e11,
+    1e12, 1e13, 1e14, 1e15, 1e16, 1e17, 1e18, 1e19, 1e20, 1e21, 1e22
+};
 
-        if (ctx.copiedKey)
-            PyMem_Free((void*) ctx.key);
 
-        PyObject* mapping = ctx.object;
-        stack.pop_back();
+// The powers of five from 5^-342 to 5^308, each scaled by a power of two to a 128-bit
+// value with the most significant bit set, stored as pairs of high and low halves
+
+static const int MIN_POWER_OF_FIVE = -342;
+static const int MAX_POWER_OF_FIVE = 308;
+
+static const uint64_t powers_of_five[] = {
+    0xeef453d6923bd65a, 0x113faa2906a13b3f, 0x9558b4661b6565f8, 0x4ac7ca59a424c507,
+    0xbaaee17fa23ebf76, 0x5d79bcf00d2df649, 0xe95a99df8ace6f53, 0xf4d82c2c107973dc,
+    0x91d8a02bb6c10594, 0x79071b9b8a4be869, 0xb64ec836a47146f9, 0x9748e2826cdee284,
+    0xe3e27a444d8d98b7, 0xfd1b1b2308169b25, 0x8e6d8c6ab0787f72, 0xfe30f0f5e50e20f7,
+    0xb208ef855c969f4f, 0xbdbd2d335e51a935, 0xde8b2b66b3bc4723, 0xad2c788035e61382,
+    0x8b16fb203055ac76, 0x4c3bcb5021afcc31, 0xaddcb9e83c6b1793, 0xdf4abe242a1bbf3d,
+    0xd953e8624b85dd78, 0xd71d6dad34a2af0d, 0x87d4713d6f33aa6b, 0x8672648c40e5ad68,
+    0xa9c98d8ccb009506, 0x680efdaf511f18c2, 0xd43bf0effdc0ba48, 0x0212bd1b2566def2,
+    0x84a57695fe98746d, 0x014bb630f7604b57, 0xa5ced43b7e3e9188, 0x419ea3bd35385e2d,
+    0xcf42894a5dce35ea, 0x52064cac828675b9, 0x818995ce7aa0e1b2, 0x7343efebd1940993,
+    0xa1ebfb4219491a1f, 0x1014ebe6c5f90bf8, 0xca66fa129f9b60a6, 0xd41a26e077774ef6,
+    0xfd00b897478238d0, 0x8920b098955522b4, 0x9e20735e8cb16382, 0x55b46e5f5d5535b0,
+    0xc5a890362fddbc62, 0xeb2189f734aa831d, 0xf712b443bbd52b7b, 0xa5e9ec7501d523e4,
+    0x9a6bb0aa55653b2d, 0x47b233c92125366e, 0xc1069cd4eabe89f8, 0x999ec0bb696e840a,
+    0xf148440a256e2c76, 0xc00670ea43ca250d, 0x96cd2a865764dbca, 0x380406926a5e5728,
+    0xbc807527ed3e12bc, 0xc605083704f5ecf2, 0xeba09271e88d976b, 0xf7864a44c633682e,
+    0x93445b8731587ea3, 0x7ab3ee6afbe0211d, 0xb8157268fdae9e4c, 0x5960ea05bad82964,
+    0xe61acf033d1a45df, 0x6fb92487298e33bd, 0x8fd0c16206306bab, 0xa5d3b6d479f8e056,
+    0xb3c4f1ba87bc8696, 0x8f48a4899877186c, 0xe0b62e2929aba83c, 0x331acdabfe94de87,
+    0x8c71dcd9ba0b4925, 0x9ff0c08b7f1d0b14, 0xaf8e5410288e1b6f, 0x07ecf0ae5ee44dd9,
+    0xdb71e91432b1a24a, 0xc9e82cd9f69d6150, 0x892731ac9faf056e, 0xbe311c083a225cd2,
+    0xab70fe17c79ac6ca, 0x6dbd630a48aaf406, 0xd64d3d9db981787d, 0x092cbbccdad5b108,
+    0x85f0468293f0eb4e, 0x25bbf56008c58ea5, 0xa76c582338ed2621, 0xaf2af2b80af6f24e,
+    0xd1476e2c07286faa, 0x1af5af660db4aee1, 0x82cca4db847945ca, 0x50d98d9fc890ed4d,
+    0xa37fce126597973c, 0xe50ff107bab528a0, 0xcc5fc196fefd7d0c, 0x1e53ed49a96272c8,
+    0xff77b1fcbebcdc4f, 0x25e8e89c13bb0f7a, 0x9faacf3df73609b1, 0x77b191618c54e9ac,
+    0xc795830d75038c1d, 0xd59df5b9ef6a2417, 0xf97ae3d0d2446f25, 0x4b0573286b44ad1d,
+    0x9becce62836ac577, 0x4ee367f9430aec32, 0xc2e801fb244576d5, 0x229c41f793cda73f,
+    0xf3a20279ed56d48a, 0x6b43527578c1110f, 0x9845418c345644d6, 0x830a13896b78aaa9,
+    0xbe5691ef416bd60c, 0x23cc986bc656d553, 0xedec366b11c6cb8f, 0x2cbfbe86b7ec8aa8,
+    0x94b3a202eb1c3f39, 0x7bf7d71432f3d6a9, 0xb9e08a83a5e34f07, 0xdaf5ccd93fb0cc53,
+    0xe858ad248f5c22c9, 0xd1b3400f8f9cff68, 0x91376c36d99995be, 0x23100809b9c21fa1,
+    0xb58547448ffffb2d, 0xabd40a0c2832a78a, 0xe2e69915b3fff9f9, 0x16c90c8f323f516c,
+    0x8dd01fad907ffc3b, 0xae3da7d97f6792e3, 0xb1442798f49ffb4a, 0x99cd11cfdf41779c,
+    0xdd95317f31c7fa1d, 0x40405643d711d583, 0x8a7d3eef7f1cfc52, 0x482835ea666b2572,
+    0xad1c8eab5ee43b66, 0xda3243650005eecf, 0xd863b256369d4a40, 0x90bed43e40076a82,
+    0x873e4f75e2224e68, 0x5a7744a6e804a291, 0xa90de3535aaae202, 0x711515d0a205cb36,
+    0xd3515c2831559a83, 0x0d5a5b44ca873e03, 0x8412d9991ed58091, 0xe858790afe9486c2,
+    0xa5178fff668ae0b6, 0x626e974dbe39a872, 0xce5d73ff402d98e3, 0xfb0a3d212dc8128f,
+    0x80fa687f881c7f8e, 0x7ce66634bc9d0b99, 0xa139029f6a239f72, 0x1c1fffc1ebc44e80,
+    0xc987434744ac874e, 0xa327ffb266b56220, 0xfbe9141915d7a922, 0x4bf1ff9f0062baa8,
+    0x9d71ac8fada6c9b5, 0x6f773fc3603db4a9, 0xc4ce17b399107c22, 0xcb550fb4384d21d3,
+    0xf6019da07f549b2b, 0x7e2a53a146606a48, 0x99c102844f94e0fb, 0x2eda7444cbfc426d,
+    0xc0314325637a1939, 0xfa911155fefb5308, 0xf03d93eebc589f88, 0x793555ab7eba27ca,
+    0x96267c7535b763b5, 0x4bc1558b2f3458de, 0xbbb01b9283253ca2, 0x9eb1aaedfb016f16,
+    0xea9c227723ee8bcb, 0x465e15a979c1cadc, 0x92a1958a7675175f, 0x0bfacd89ec191ec9,
+    0xb749faed14125d36, 0xcef980ec671f667b, 0xe51c79a85916f484, 0x82b7e12780e7401a,
+    0x8f31cc0937ae58d2, 0xd1b2ecb8b0908810, 0xb2fe3f0b8599ef07, 0x861fa7e6dcb4aa15,
+    0xdfbdcece67006ac9, 0x67a791e093e1d49a, 0x8bd6a141006042bd, 0xe0c8bb2c5c6d24e0,
+    0xaecc49914078536d, 0x58fae9f773886e18, 0xda7f5bf590966848, 0xaf39a475506a899e,
+    0x888f99797a5e012d, 0x6d8406c952429603, 0xaab37fd7d8f58178, 0xc8e5087ba6d33b83,
+    0xd5605fcdcf32e1d6, 0xfb1e4a9a90880a64, 0x855c3be0a17fcd26, 0x5cf2eea09a55067f,
+    0xa6b34ad8c9dfc06f, 0xf42faa48c0ea481e, 0xd0601d8efc57b08b, 0xf13b94daf124da26,
+    0x823c12795db6ce57, 0x76c53d08d6b70858, 0xa2cb1717b52481ed, 0x54768c4b0c64ca6e,
+    0xcb7ddcdda26da268, 0xa9942f5dcf7dfd09, 0xfe5d54150b090b02, 0xd3f93b35435d7c4c,
+    0x9efa548d26e5a6e1, 0xc47bc5014a1a6daf, 0xc6b8e9b0709f109a, 0x359ab6419ca1091b,
+    0xf867241c8cc6d4c0, 0xc30163d203c94b62, 0x9b407691d7fc44f8, 0x79e0de63425dcf1d,
+    0xc21094364dfb5636, 0x985915fc12f542e4, 0xf294b943e17a2bc4, 0x3e6f5b7b17b2939d,
+    0x979cf3ca6cec5b5a, 0xa705992ceecf9c42, 0xbd8430bd08277231, 0x50c6ff782a838353,
+    0xece53cec4a314ebd, 0xa4f8bf5635246428, 0x940f4613ae5ed136, 0x871b7795e136be99,
+    0xb913179899f68584, 0x28e2557b59846e3f, 0xe757dd7ec07426e5, 0x331aeada2fe589cf,
+    0x9096ea6f3848984f, 0x3ff0d2c85def7621, 0xb4bca50b065abe63, 0x0fed077a756b53a9,
+    0xe1ebce4dc7f16dfb, 0xd3e8495912c62894, 0x8d3360f09cf6e4bd, 0x64712dd7abbbd95c,
+    0xb080392cc4349dec, 0xbd8d794d96aacfb3, 0xdca04777f541c567, 0xecf0d7a0fc5583a0,
+    0x89e42caaf9491b60, 0xf41686c49db57244, 0xac5d37d5b79b6239, 0x311c2875c522ced5,
+    0xd77485cb25823ac7, 0x7d633293366b828b, 0x86a8d39ef77164bc, 0xae5dff9c02033197,
+    0xa8530886b54dbdeb, 0xd9f57f830283fdfc, 0xd267caa862a12d66, 0xd072df63c324fd7b,
+    0x8380dea93da4bc60, 0x4247cb9e59f71e6d, 0xa46116538d0deb78, 0x52d9be85f074e608,
+    0xcd795be870516656, 0x67902e276c921f8b, 0x806bd9714632dff6, 0x00ba1cd8a3db53b6,
+    0xa086cfcd97bf97f3, 0x80e8a40eccd228a4, 0xc8a883c0fdaf7df0, 0x6122cd128006b2cd,
+    0xfad2a4b13d1b5d6c, 0x796b805720085f81, 0x9cc3a6eec6311a63, 0xcbe3303674053bb0,
+    0xc3f490aa77bd60fc, 0xbedbfc4411068a9c, 0xf4f1b4d515acb93b, 0xee92fb5515482d44,
+    0x991711052d8bf3c5, 0x751bdd152d4d1c4a, 0xbf5cd54678eef0b6, 0xd262d45a78a0635d,
+    0xef340a98172aace4, 0x86fb897116c87c34, 0x9580869f0e7aac0e, 0xd45d35e6ae3d4da0,
+    0xbae0a846d2195712, 0x8974836059cca109, 0xe998d258869facd7, 0x2bd1a438703fc94b,
+    0x91ff83775423cc06, 0x7b6306a34627ddcf, 0xb67f6455292cbf08, 0x1a3bc84c17b1d542,
+    0xe41f3d6a7377eeca, 0x20caba5f1d9e4a93, 0x8e938662882af53e, 0x547eb47b7282ee9c,
+    0xb23867fb2a35b28d, 0xe99e619a4f23aa43, 0xdec681f9f4c31f31, 0x6405fa00e2ec94d4,
+    0x8b3c113c38f9f37e, 0xde83bc408dd3dd04, 0xae0b158b4738705e, 0x9624ab50b148d445,
+    0xd98ddaee19068c76, 0x3badd624dd9b0957, 0x87f8a8d4cfa417c9, 0xe54ca5d70a80e5d6,
+    0xa9f6d30a038d1dbc, 0x5e9fcf4ccd211f4c, 0xd47487cc8470652b, 0x7647c3200069671f,
+    0x84c8d4dfd2c63f3b, 0x29ecd9f40041e073, 0xa5fb0a17c777cf09, 0xf468107100525890,
+    0xcf79cc9db955c2cc, 0x7182148d4066eeb4, 0x81ac1fe293d599bf, 0xc6f14cd848405530,
+    0xa21727db38cb002f, 0xb8ada00e5a506a7c, 0xca9cf1d206fdc03b, 0xa6d90811f0e4851c,
+    0xfd442e4688bd304a, 0x908f4a166d1da663, 0x9e4a9cec15763e2e, 0x9a598e4e043287fe,
+    0xc5dd44271ad3cdba, 0x40eff1e1853f29fd, 0xf7549530e188c128, 0xd12bee59e68ef47c,
+    0x9a94dd3e8cf578b9, 0x82bb74f8301958ce, 0xc13a148e3032d6e7, 0xe36a52363c1faf01,
+    0xf18899b1bc3f8ca1, 0xdc44e6c3cb279ac1, 0x96f5600f15a7b7e5, 0x29ab103a5ef8c0b9,
+    0xbcb2b812db11a5de, 0x7415d448f6b6f0e7, 0xebdf661791d60f56, 0x111b495b3464ad21,
+    0x936b9fcebb25c995, 0xcab10dd900beec34, 0xb84687c269ef3bfb, 0x3d5d514f40eea742,
+    0xe65829b3046b0afa, 0x0cb4a5a3112a5112, 0x8ff71a0fe2c2e6dc, 0x47f0e785eaba72ab,
+    0xb3f4e093db73a093, 0x59ed216765690f56, 0xe0f218b8d25088b8, 0x306869c13ec3532c,
+    0x8c974f7383725573, 0x1e414218c73a13fb, 0xafbd2350644eeacf, 0xe5d1929ef90898fa,
+    0xdbac6c247d62a583, 0xdf45f746b74abf39, 0x894bc396ce5da772, 0x6b8bba8c328eb783,
+    0xab9eb47c81f5114f, 0x066ea92f3f326564, 0xd686619ba27255a2, 0xc80a537b0efefebd,
+    0x8613fd0145877585, 0xbd06742ce95f5f36, 0xa798fc4196e952e7, 0x2c48113823b73704,
+    0xd17f3b51fca3a7a0, 0xf75a15862ca504c5, 0x82ef85133de648c4, 0x9a984d73dbe722fb,
+    0xa3ab66580d5fdaf5, 0xc13e60d0d2e0ebba, 0xcc963fee10b7d1b3, 0x318df905079926a8,
+    0xffbbcfe994e5c61f, 0xfdf17746497f7052, 0x9fd561f1fd0f9bd3, 0xfeb6ea8bedefa633,
+    0xc7caba6e7c5382c8, 0xfe64a52ee96b8fc0, 0xf9bd690a1b68637b, 0x3dfdce7aa3c673b0,
+    0x9c1661a651213e2d, 0x06bea10ca65c084e, 0xc31bfa0fe5698db8, 0x486e494fcff30a62,
+    0xf3e2f893dec3f126, 0x5a89dba3c3efccfa, 0x986ddb5c6b3a76b7, 0xf89629465a75e01c,
+    0xbe89523386091465, 0xf6bbb397f1135823, 0xee2ba6c0678b597f, 0x746aa07ded582e2c,
+    0x94db483840b717ef, 0xa8c2a44eb4571cdc, 0xba121a4650e4ddeb, 0x92f34d62616ce413,
+    0xe896a0d7e51e1566, 0x77b020baf9c81d17, 0x915e2486ef32cd60, 0x0ace1474dc1d122e,
+    0xb5b5ada8aaff80b8, 0x0d819992132456ba, 0xe3231912d5bf60e6, 0x10e1fff697ed6c69,
+    0x8df5efabc5979c8f, 0xca8d3ffa1ef463c1, 0xb1736b96b6fd83b3, 0xbd308ff8a6b17cb2,
+    0xddd0467c64bce4a0, 0xac7cb3f6d05ddbde, 0x8aa22c0dbef60ee4, 0x6bcdf07a423aa96b,
+    0xad4ab7112eb3929d, 0x86c16c98d2c953c6, 0xd89d64d57a607744, 0xe871c7bf077ba8b7,
+    0x87625f056c7c4a8b, 0x11471cd764ad4972, 0xa93af6c6c79b5d2d, 0xd598e40d3dd89bcf,
+    0xd389b47879823479, 0x4aff1d108d4ec2c3, 0x843610cb4bf160cb, 0xcedf722a585139ba,
+    0xa54394fe1eedb8fe, 0xc2974eb4ee658828, 0xce947a3da6a9273e, 0x733d226229feea32,
+    0x811ccc668829b887, 0x0806357d5a3f525f, 0xa163ff802a3426a8, 0xca07c2dcb0cf26f7,
+    0xc9bcff6034c13052, 0xfc89b393dd02f0b5, 0xfc2c3f3841f17c67, 0xbbac2078d443ace2,
+    0x9d9ba7832936edc0, 0xd54b944b84aa4c0d, 0xc5029163f384a931, 0x0a9e795e65d4df11,
+    0xf64335bcf065d37d, 0x4d4617b5ff4a16d5, 0x99ea0196163fa42e, 0x504bced1bf8e4e45,
+    0xc06481fb9bcf8d39, 0xe45ec2862f71e1d6, 0xf07da27a82c37088, 0x5d767327bb4e5a4c,
+    0x964e858c91ba2655, 0x3a6a07f8d510f86f, 0xbbe226efb628afea, 0x890489f70a55368b,
+    0xeadab0aba3b2dbe5, 0x2b45ac74ccea842e, 0x92c8ae6b464fc96f, 0x3b0b8bc90012929d,
+    0xb77ada0617e3bbcb, 0x09ce6ebb40173744, 0xe55990879ddcaabd, 0xcc420a6a101d0515,
+    0x8f57fa54c2a9eab6, 0x9fa946824a12232d, 0xb32df8e9f3546564, 0x47939822dc96abf9,
+    0xdff9772470297ebd, 0x59787e2b93bc56f7, 0x8bfbea76c619ef36, 0x57eb4edb3c55b65a,
+    0xaefae51477a06b03, 0xede622920b6b23f1, 0xdab99e59958885c4, 0xe95fab368e45eced,
+    0x88b402f7fd75539b, 0x11dbcb0218ebb414, 0xaae103b5fcd2a881, 0xd652bdc29f26a119,
+    0xd59944a37c0752a2, 0x4be76d3346f0495f, 0x857fcae62d8493a5, 0x6f70a4400c562ddb,
+    0xa6dfbd9fb8e5b88e, 0xcb4ccd500f6bb952, 0xd097ad07a71f26b2, 0x7e2000a41346a7a7,
+    0x825ecc24c873782f, 0x8ed400668c0c28c8, 0xa2f67f2dfa90563b, 0x728900802f0f32fa,
+    0xcbb41ef979346bca, 0x4f2b40a03ad2ffb9, 0xfea126b7d78186bc, 0xe2f610c84987bfa8,
+    0x9f24b832e6b0f436, 0x0dd9ca7d2df4d7c9, 0xc6ede63fa05d3143, 0x91503d1c79720dbb,
+    0xf8a95fcf88747d94, 0x75a44c6397ce912a, 0x9b69dbe1b548ce7c, 0xc986afbe3ee11aba,
+    0xc24452da229b021b, 0xfbe85badce996168, 0xf2d56790ab41c2a2, 0xfae27299423fb9c3,
+    0x97c560ba6b0919a5, 0xdccd879fc967d41a, 0xbdb6b8e905cb600f, 0x5400e987bbc1c920,
+    0xed246723473e3813, 0x290123e9aab23b68, 0x9436c0760c86e30b, 0xf9a0b6720aaf6521,
+    0xb94470938fa89bce, 0xf808e40e8d5b3e69, 0xe7958cb87392c2c2, 0xb60b1d1230b20e04,
+    0x90bd77f3483bb9b9, 0xb1c6f22b5e6f48c2, 0xb4ecd5f01a4aa828, 0x1e38aeb6360b1af3,
+    0xe2280b6c20dd5232, 0x25c6da63c38de1b0, 0x8d590723948a535f, 0x579c487e5a38ad0e,
+    0xb0af48ec79ace837, 0x2d835a9df0c6d851, 0xdcdb1b2798182244, 0xf8e431456cf88e65,
+    0x8a08f0f8bf0f156b, 0x1b8e9ecb641b58ff, 0xac8b2d36eed2dac5, 0xe272467e3d222f3f,
+    0xd7adf884aa879177, 0x5b0ed81dcc6abb0f, 0x86ccbb52ea94baea, 0x98e947129fc2b4e9,
+    0xa87fea27a539e9a5, 0x3f2398d747b36224, 0xd29fe4b18e88640e, 0x8eec7f0d19a03aad,
+    0x83a3eeeef9153e89, 0x1953cf68300424ac, 0xa48ceaaab75a8e2b, 0x5fa8c3423c052dd7,
+    0xcdb02555653131b6, 0x3792f412cb06794d, 0x808e17555f3ebf11, 0xe2bbd88bbee40bd0,
+    0xa0b19d2ab70e6ed6, 0x5b6aceaeae9d0ec4, 0xc8de047564d20a8b, 0xf245825a5a445275,
+    0xfb158592be068d2e, 0xeed6e2f0f0d56712, 0x9ced737bb6c4183d, 0x55464dd69685606b,
+    0xc428d05aa4751e4c, 0xaa97e14c3c26b886, 0xf53304714d9265df, 0xd53dd99f4b3066a8,
+    0x993fe2c6d07b7fab, 0xe546a8038efe4029, 0xbf8fdb78849a5f96, 0xde98520472bdd033,
+    0xef73d256a5c0f77c, 0x963e66858f6d4440, 0x95a8637627989aad, 0xdde7001379a44aa8,
+    0xbb127c53b17ec159, 0x5560c018580d5d52, 0xe9d71b689dde71af, 0xaab8f01e6e10b4a6,
+    0x9226712162ab070d, 0xcab3961304ca70e8, 0xb6b00d69bb55c8d1, 0x3d607b97c5fd0d22,
+    0xe45c10c42a2b3b05, 0x8cb89a7db77c506a, 0x8eb98a7a9a5b04e3, 0x77f3608e92adb242,
+    0xb267ed1940f1c61c, 0x55f038b237591ed3, 0xdf01e85f912e37a3, 0x6b6c46dec52f6688,
+    0x8b61313bbabce2c6, 0x2323ac4b3b3da015, 0xae397d8aa96c1b77, 0xabec975e0a0d081a,
+    0xd9c7dced53c72255, 0x96e7bd358c904a21, 0x881cea14545c7575, 0x7e50d64177da2e54,
+    0xaa242499697392d2, 0xdde50bd1d5d0b9e9, 0xd4ad2dbfc3d07787, 0x955e4ec64b44e864,
+    0x84ec3c97da624ab4, 0xbd5af13bef0b113e, 0xa6274bbdd0fadd61, 0xecb1ad8aeacdd58e,
+    0xcfb11ead453994ba, 0x67de18eda5814af2, 0x81ceb32c4b43fcf4, 0x80eacf948770ced7,
+    0xa2425ff75e14fc31, 0xa1258379a94d028d, 0xcad2f7f5359a3b3e, 0x096ee45813a04330,
+    0xfd87b5f28300ca0d, 0x8bca9d6e188853fc, 0x9e74d1b791e07e48, 0x775ea264cf55347e,
+    0xc612062576589dda, 0x95364afe032a819e, 0xf79687aed3eec551, 0x3a83ddbd83f52205,
+    0x9abe14cd44753b52, 0xc4926a9672793543, 0xc16d9a0095928a27, 0x75b7053c0f178294,
+    0xf1c90080baf72cb1, 0x5324c68b12dd6339, 0x971da05074da7bee, 0xd3f6fc16ebca5e04,
+    0xbce5086492111aea, 0x88f4bb1ca6bcf585, 0xec1e4a7db69561a5, 0x2b31e9e3d06c32e6,
+    0x9392ee8e921d5d07, 0x3aff322e62439fd0, 0xb877aa3236a4b449, 0x09befeb9fad487c3,
+    0xe69594bec44de15b, 0x4c2ebe687989a9b4, 0x901d7cf73ab0acd9, 0x0f9d37014bf60a11,
+    0xb424dc35095cd80f, 0x538484c19ef38c95, 0xe12e13424bb40e13, 0x2865a5f206b06fba,
+    0x8cbccc096f5088cb, 0xf93f87b7442e45d4, 0xafebff0bcb24aafe, 0xf78f69a51539d749,
+    0xdbe6fecebdedd5be, 0xb573440e5a884d1c, 0x89705f4136b4a597, 0x31680a88f8953031,
+    0xabcc77118461cefc, 0xfdc20d2b36ba7c3e, 0xd6bf94d5e57a42bc, 0x3d32907604691b4d,
+    0x8637bd05af6c69b5, 0xa63f9a49c2c1b110, 0xa7c5ac471b478423, 0x0fcf80dc33721d54,
+    0xd1b71758e219652b, 0xd3c36113404ea4a9, 0x83126e978d4fdf3b, 0x645a1cac083126ea,
+    0xa3d70a3d70a3d70a, 0x3d70a3d70a3d70a4, 0xcccccccccccccccc, 0xcccccccccccccccd,
+    0x8000000000000000, 0x0000000000000000, 0xa000000000000000, 0x0000000000000000,
+    0xc800000000000000, 0x0000000000000000, 0xfa00000000000000, 0x0000000000000000,
+    0x9c40000000000000, 0x0000000000000000, 0xc350000000000000, 0x0000000000000000,
+    0xf424000000000000, 0x0000000000000000, 0x9896800000000000, 0x0000000000000000,
+    0xbebc200000000000, 0x0000000000000000, 0xee6b280000000000, 0x0000000000000000,
+    0x9502f90000000000, 0x0000000000000000, 0xba43b74000000000, 0x0000000000000000,
+    0xe8d4a51000000000, 0x0000000000000000, 0x9184e72a00000000, 0x0000000000000000,
+    0xb5e620f480000000, 0x0000000000000000, 0xe35fa931a0000000, 0x0000000000000000,
+    0x8e1bc9bf04000000, 0x0000000000000000, 0xb1a2bc2ec5000000, 0x0000000000000000,
+    0xde0b6b3a76400000, 0x0000000000000000, 0x8ac7230489e80000, 0x0000000000000000,
+    0xad78ebc5ac620000, 0x0000000000000000, 0xd8d726b7177a8000, 0x0000000000000000,
+    0x878678326eac9000, 0x0000000000000000, 0xa968163f0a57b400, 0x0000000000000000,
+    0xd3c21bcecceda100, 0x0000000000000000, 0x84595161401484a0, 0x0000000000000000,
+    0xa56fa5b99019a5c8, 0x0000000000000000, 0xcecb8f27f4200f3a, 0x0000000000000000,
+    0x813f3978f8940984, 0x4000000000000000, 0xa18f07d736b90be5, 0x5000000000000000,
+    0xc9f2c9cd04674ede, 0xa400000000000000, 0xfc6f7c4045812296, 0x4d00000000000000,
+    0x9dc5ada82b70b59d, 0xf020000000000000, 0xc5371912364ce305, 0x6c28000000000000,
+    0xf684df56c3e01bc6, 0xc732000000000000, 0x9a130b963a6c115c, 0x3c7f400000000000,
+    0xc097ce7bc90715b3, 0x4b9f100000000000, 0xf0bdc21abb48db20, 0x1e86d40000000000,
+    0x96769950b50d88f4, 0x1314448000000000, 0xbc143fa4e250eb31, 0x17d955a000000000,
+    0xeb194f8e1ae525fd, 0x5dcfab0800000000, 0x92efd1b8d0cf37be, 0x5aa1cae500000000,
+    0xb7abc627050305ad, 0xf14a3d9e40000000, 0xe596b7b0c643c719, 0x6d9ccd05d0000000,
+    0x8f7e32ce7bea5c6f, 0xe4820023a2000000, 0xb35dbf821ae4f38b, 0xdda2802c8a800000,
+    0xe0352f62a19e306e, 0xd50b2037ad200000, 0x8c213d9da502de45, 0x4526f422cc340000,
+    0xaf298d050e4395d6, 0x9670b12b7f410000, 0xdaf3f04651d47b4c, 0x3c0cdd765f114000,
+    0x88d8762bf324cd0f, 0xa5880a69fb6ac800, 0xab0e93b6efee0053, 0x8eea0d047a457a00,
+    0xd5d238a4abe98068, 0x72a4904598d6d880, 0x85a36366eb71f041, 0x47a6da2b7f864750,
+    0xa70c3c40a64e6c51, 0x999090b65f67d924, 0xd0cf4b50cfe20765, 0xfff4b4e3f741cf6d,
+    0x82818f1281ed449f, 0xbff8f10e7a8921a4, 0xa321f2d7226895c7, 0xaff72d52192b6a0d,
+    0xcbea6f8ceb02bb39, 0x9bf4f8a69f764490, 0xfee50b7025c36a08, 0x02f236d04753d5b4,
+    0x9f4f2726179a2245, 0x01d762422c946590, 0xc722f0ef9d80aad6, 0x424d3ad2b7b97ef5,
+    0xf8ebad2b84e0d58b, 0xd2e0898765a7deb2, 0x9b934c3b330c8577, 0x63cc55f49f88eb2f,
+    0xc2781f49ffcfa6d5, 0x3cbf6b71c76b25fb, 0xf316271c7fc3908a, 0x8bef464e3945ef7a,
+    0x97edd871cfda3a56, 0x97758bf0e3cbb5ac, 0xbde94e8e43d0c8ec, 0x3d52eeed1cbea317,
+    0xed63a231d4c4fb27, 0x4ca7aaa863ee4bdd, 0x945e455f24fb1cf8, 0x8fe8caa93e74ef6a,
+    0xb975d6b6ee39e436, 0xb3e2fd538e122b44, 0xe7d34c64a9c85d44, 0x60dbbca87196b616,
+    0x90e40fbeea1d3a4a, 0xbc8955e946fe31cd, 0xb51d13aea4a488dd, 0x6babab6398bdbe41,
+    0xe264589a4dcdab14, 0xc696963c7eed2dd1, 0x8d7eb76070a08aec, 0xfc1e1de5cf543ca2,
+    0xb0de65388cc8ada8, 0x3b25a55f43294bcb, 0xdd15fe86affad912, 0x49ef0eb713f39ebe,
+    0x8a2dbf142dfcc7ab, 0x6e3569326c784337, 0xacb92ed9397bf996, 0x49c2c37f07965404,
+    0xd7e77a8f87daf7fb, 0xdc33745ec97be906, 0x86f0ac99b4e8dafd, 0x69a028bb3ded71a3,
+    0xa8acd7c0222311bc, 0xc40832ea0d68ce0c, 0xd2d80db02aabd62b, 0xf50a3fa490c30190,
+    0x83c7088e1aab65db, 0x792667c6da79e0fa, 0xa4b8cab1a1563f52, 0x577001b891185938,
+    0xcde6fd5e09abcf26, 0xed4c0226b55e6f86, 0x80b05e5ac60b6178, 0x544f8158315b05b4,
+    0xa0dc75f1778e39d6, 0x696361ae3db1c721, 0xc913936dd571c84c, 0x03bc3a19cd1e38e9,
+    0xfb5878494ace3a5f, 0x04ab48a04065c723, 0x9d174b2dcec0e47b, 0x62eb0d64283f9c76,
+    0xc45d1df942711d9a, 0x3ba5d0bd324f8394, 0xf5746577930d6500, 0xca8f44ec7ee36479,
+    0x9968bf6abbe85f20, 0x7e998b13cf4e1ecb, 0xbfc2ef456ae276e8, 0x9e3fedd8c321a67e,
+    0xefb3ab16c59b14a2, 0xc5cfe94ef3ea101e, 0x95d04aee3b80ece5, 0xbba1f1d158724a12,
+    0xbb445da9ca61281f, 0x2a8a6e45ae8edc97, 0xea1575143cf97226, 0xf52d09d71a3293bd,
+    0x924d692ca61be758, 0x593c2626705f9c56, 0xb6e0c377cfa2e12e, 0x6f8b2fb00c77836c,
+    0xe498f455c38b997a, 0x0b6dfb9c0f956447, 0x8edf98b59a373fec, 0x4724bd4189bd5eac,
+    0xb2977ee300c50fe7, 0x58edec91ec2cb657, 0xdf3d5e9bc0f653e1, 0x2f2967b66737e3ed,
+    0x8b865b215899f46c, 0xbd79e0d20082ee74, 0xae67f1e9aec07187, 0xecd8590680a3aa11,
+    0xda01ee641a708de9, 0xe80e6f4820cc9495, 0x884134fe908658b2, 0x3109058d147fdcdd,
+    0xaa51823e34a7eede, 0xbd4b46f0599fd415, 0xd4e5e2cdc1d1ea96, 0x6c9e18ac7007c91a,
+    0x850fadc09923329e, 0x03e2cf6bc604ddb0, 0xa6539930bf6bff45, 0x84db8346b786151c,
+    0xcfe87f7cef46ff16, 0xe612641865679a63, 0x81f14fae158c5f6e, 0x4fcb7e8f3f60c07e,
+    0xa26da3999aef7749, 0xe3be5e330f38f09d, 0xcb090c8001ab551c, 0x5cadf5bfd3072cc5,
+    0xfdcb4fa002162a63, 0x73d9732fc7c8f7f6, 0x9e9f11c4014dda7e, 0x2867e7fddcdd9afa,
+    0xc646d63501a1511d, 0xb281e1fd541501b8, 0xf7d88bc24209a565, 0x1f225a7ca91a4226,
+    0x9ae757596946075f, 0x3375788de9b06958, 0xc1a12d2fc3978937, 0x0052d6b1641c83ae,
+    0xf209787bb47d6b84, 0xc0678c5dbd23a49a, 0x9745eb4d50ce6332, 0xf840b7ba963646e0,
+    0xbd176620a501fbff, 0xb650e5a93bc3d898, 0xec5d3fa8ce427aff, 0xa3e51f138ab4cebe,
+    0x93ba47c980e98cdf, 0xc66f336c36b10137, 0xb8a8d9bbe123f017, 0xb80b0047445d4184,
+    0xe6d3102ad96cec1d, 0xa60dc059157491e5, 0x9043ea1ac7e41392, 0x87c89837ad68db2f,
+    0xb454e4a179dd1877, 0x29babe4598c311fb, 0xe16a1dc9d8545e94, 0xf4296dd6fef3d67a,
+    0x8ce2529e2734bb1d, 0x1899e4a65f58660c, 0xb01ae745b101e9e4, 0x5ec05dcff72e7f8f,
+    0xdc21a1171d42645d, 0x76707543f4fa1f73, 0x899504ae72497eba, 0x6a06494a791c53a8,
+    0xabfa45da0edbde69, 0x0487db9d17636892, 0xd6f8d7509292d603, 0x45a9d2845d3c42b6,
+    0x865b86925b9bc5c2, 0x0b8a2392ba45a9b2, 0xa7f26836f282b732, 0x8e6cac7768d7141e,
+    0xd1ef0244af2364ff, 0x3207d795430cd926, 0x8335616aed761f1f, 0x7f44e6bd49e807b8,
+    0xa402b9c5a8d3a6e7, 0x5f16206c9c6209a6, 0xcd036837130890a1, 0x36dba887c37a8c0f,
+    0x802221226be55a64, 0xc2494954da2c9789, 0xa02aa96b06deb0fd, 0xf2db9baa10b7bd6c,
+    0xc83553c5c8965d3d, 0x6f92829494e5acc7, 0xfa42a8b73abbf48c, 0xcb772339ba1f17f9,
+    0x9c69a97284b578d7, 0xff2a760414536efb, 0xc38413cf25e2d70d, 0xfef5138519684aba,
+    0xf46518c2ef5b8cd1, 0x7eb258665fc25d69, 0x98bf2f79d5993802, 0xef2f773ffbd97a61,
+    0xbeeefb584aff8603, 0xaafb550ffacfd8fa, 0xeeaaba2e5dbf6784, 0x95ba2a53f983cf38,
+    0x952ab45cfa97a0b2, 0xdd945a747bf26183, 0xba756174393d88df, 0x94f971119aeef9e4,
+    0xe912b9d1478ceb17, 0x7a37cd5601aab85d, 0x91abb422ccb812ee, 0xac62e055c10ab33a,
+    0xb616a12b7fe617aa, 0x577b986b314d6009, 0xe39c49765fdf9d94, 0xed5a7e85fda0b80b,
+    0x8e41ade9fbebc27d, 0x14588f13be847307, 0xb1d219647ae6b31c, 0x596eb2d8ae258fc8,
+    0xde469fbd99a05fe3, 0x6fca5f8ed9aef3bb, 0x8aec23d680043bee, 0x25de7bb9480d5854,
+    0xada72ccc20054ae9, 0xaf561aa79a10ae6a, 0xd910f7ff28069da4, 0x1b2ba1518094da04,
+    0x87aa9aff79042286, 0x90fb44d2f05d0842, 0xa99541bf57452b28, 0x353a1607ac744a53,
+    0xd3fa922f2d1675f2, 0x42889b8997915ce8, 0x847c9b5d7c2e09b7, 0x69956135febada11,
+    0xa59bc234db398c25, 0x43fab9837e699095, 0xcf02b2c21207ef2e, 0x94f967e45e03f4bb,
+    0x8161afb94b44f57d, 0x1d1be0eebac278f5, 0xa1ba1ba79e1632dc, 0x6462d92a69731732,
+    0xca28a291859bbf93, 0x7d7b8f7503cfdcfe, 0xfcb2cb35e702af78, 0x5cda735244c3d43e,
+    0x9defbf01b061adab, 0x3a0888136afa64a7, 0xc56baec21c7a1916, 0x088aaa1845b8fdd0,
+    0xf6c69a72a3989f5b, 0x8aad549e57273d45, 0x9a3c2087a63f6399, 0x36ac54e2f678864b,
+    0xc0cb28a98fcf3c7f, 0x84576a1bb416a7dd, 0xf0fdf2d3f3c30b9f, 0x656d44a2a11c51d5,
+    0x969eb7c47859e743, 0x9f644ae5a4b1b325, 0xbc4665b596706114, 0x873d5d9f0dde1fee,
+    0xeb57ff22fc0c7959, 0xa90cb506d155a7ea, 0x9316ff75dd87cbd8, 0x09a7f12442d588f2,
+    0xb7dcbf5354e9bece, 0x0c11ed6d538aeb2f, 0xe5d3ef282a242e81, 0x8f1668c8a86da5fa,
+    0x8fa475791a569d10, 0xf96e017d694487bc, 0xb38d92d760ec4455, 0x37c981dcc395a9ac,
+    0xe070f78d3927556a, 0x85bbe253f47b1417, 0x8c469ab843b89562, 0x93956d7478ccec8e,
+    0xaf58416654a6babb, 0x387ac8d1970027b2, 0xdb2e51bfe9d0696a, 0x06997b05fcc0319e,
+    0x88fcf317f22241e2, 0x441fece3bdf81f03, 0xab3c2fddeeaad25a, 0xd527e81cad7626c3,
+    0xd60b3bd56a5586f1, 0x8a71e223d8d3b074, 0x85c7056562757456, 0xf6872d5667844e49,
+    0xa738c6bebb12d16c, 0xb428f8ac016561db, 0xd106f86e69d785c7, 0xe13336d701beba52,
+    0x82a45b450226b39c, 0xecc0024661173473, 0xa34d721642b06084, 0x27f002d7f95d0190,
+    0xcc20ce9bd35c78a5, 0x31ec038df7b441f4, 0xff290242c83396ce, 0x7e67047175a15271,
+    0x9f79a169bd203e41, 0x0f0062c6e984d386, 0xc75809c42c684dd1, 0x52c07b78a3e60868,
+    0xf92e0c3537826145, 0xa7709a56ccdf8a82, 0x9bbcc7a142b17ccb, 0x88a66076400bb691,
+    0xc2abf989935ddbfe, 0x6acff893d00ea435, 0xf356f7ebf83552fe, 0x0583f6b8c4124d43,
+    0x98165af37b2153de, 0xc3727a337a8b704a, 0xbe1bf1b059e9a8d6, 0x744f18c0592e4c5c,
+    0xeda2ee1c7064130c, 0x1162def06f79df73, 0x9485d4d1c63e8be7, 0x8addcb5645ac2ba8,
+    0xb9a74a0637ce2ee1, 0x6d953e2bd7173692, 0xe8111c87c5c1ba99, 0xc8fa8db6ccdd0437,
+    0x910ab1d4db9914a0, 0x1d9c9892400a22a2, 0xb54d5e4a127f59c8, 0x2503beb6d00cab4b,
+    0xe2a0b5dc971f303a, 0x2e44ae64840fd61d, 0x8da471a9de737e24, 0x5ceaecfed289e5d2,
+    0xb10d8e1456105dad, 0x7425a83e872c5f47, 0xdd50f1996b947518, 0xd12f124e28f77719,
+    0x8a5296ffe33cc92f, 0x82bd6b70d99aaa6f, 0xace73cbfdc0bfb7b, 0x636cc64d1001550b,
+    0xd8210befd30efa5a, 0x3c47f7e05401aa4e, 0x8714a775e3e95c78, 0x65acfaec34810a71,
+    0xa8d9d1535ce3b396, 0x7f1839a741a14d0d, 0xd31045a8341ca07c, 0x1ede48111209a050,
+    0x83ea2b892091e44d, 0x934aed0aab460432, 0xa4e4b66b68b65d60, 0xf81da84d5617853f,
+    0xce1de40642e3f4b9, 0x36251260ab9d668e, 0x80d2ae83e9ce78f3, 0xc1d72b7c6b426019,
+    0xa1075a24e4421730, 0xb24cf65b8612f81f, 0xc94930ae1d529cfc, 0xdee033f26797b627,
+    0xfb9b7cd9a4a7443c, 0x169840ef017da3b1, 0x9d412e0806e88aa5, 0x8e1f289560ee864e,
+    0xc491798a08a2ad4e, 0xf1a6f2bab92a27e2, 0xf5b5d7ec8acb58a2, 0xae10af696774b1db,
+    0x9991a6f3d6bf1765, 0xacca6da1e0a8ef29, 0xbff610b0cc6edd3f, 0x17fd090a58d32af3,
+    0xeff394dcff8a948e, 0xddfc4b4cef07f5b0, 0x95f83d0a1fb69cd9, 0x4abdaf101564f98e,
+    0xbb764c4ca7a4440f, 0x9d6d1ad41abe37f1, 0xea53df5fd18d5513, 0x84c86189216dc5ed,
+    0x92746b9be2f8552c, 0x32fd3cf5b4e49bb4, 0xb7118682dbb66a77, 0x3fbc8c33221dc2a1,
+    0xe4d5e82392a40515, 0x0fabaf3feaa5334a, 0x8f05b1163ba6832d, 0x29cb4d87f2a7400e,
+    0xb2c71d5bca9023f8, 0x743e20e9ef511012, 0xdf78e4b2bd342cf6, 0x914da9246b255416,
+    0x8bab8eefb6409c1a, 0x1ad089b6c2f7548e, 0xae9672aba3d0c320, 0xa184ac2473b529b1,
+    0xda3c0f568cc4f3e8, 0xc9e5d72d90a2741e, 0x8865899617fb1871, 0x7e2fa67c7a658892,
+    0xaa7eebfb9df9de8d, 0xddbb901b98feeab7, 0xd51ea6fa85785631, 0x552a74227f3ea565,
+    0x8533285c936b35de, 0xd53a88958f87275f, 0xa67ff273b8460356, 0x8a892abaf368f137,
+    0xd01fef10a657842c, 0x2d2b7569b0432d85, 0x8213f56a67f6b29b, 0x9c3b29620e29fc73,
+    0xa298f2c501f45f42, 0x8349f3ba91b47b8f, 0xcb3f2f7642717713, 0x241c70a936219a73,
+    0xfe0efb53d30dd4d7, 0xed238cd383aa0110, 0x9ec95d1463e8a506, 0xf4363804324a40aa,
+    0xc67bb4597ce2ce48, 0xb143c6053edcd0d5, 0xf81aa16fdc1b81da, 0xdd94b7868e94050a,
+    0x9b10a4e5e9913128, 0xca7cf2b4191c8326, 0xc1d4ce1f63f57d72, 0xfd1c2f611f63a3f0,
+    0xf24a01a73cf2dccf, 0xbc633b39673c8cec, 0x976e41088617ca01, 0xd5be0503e085d813,
+    0xbd49d14aa79dbc82, 0x4b2d8644d8a74e18, 0xec9c459d51852ba2, 0xddf8e7d60ed1219e,
+    0x93e1ab8252f33b45, 0xcabb90e5c942b503, 0xb8da1662e7b00a17, 0x3d6a751f3b936243,
+    0xe7109bfba19c0c9d, 0x0cc512670a783ad4, 0x906a617d450187e2, 0x27fb2b80668b24c5,
+    0xb484f9dc9641e9da, 0xb1f9f660802dedf6, 0xe1a63853bbd26451, 0x5e7873f8a0396973,
+    0x8d07e33455637eb2, 0xdb0b487b6423e1e8, 0xb049dc016abc5e5f, 0x91ce1a9a3d2cda62,
+    0xdc5c5301c56b75f7, 0x7641a140cc7810fb, 0x89b9b3e11b6329ba, 0xa9e904c87fcb0a9d,
+    0xac2820d9623bf429, 0x546345fa9fbdcd44, 0xd732290fbacaf133, 0xa97c177947ad4095,
+    0x867f59a9d4bed6c0, 0x49ed8eabcccc485d, 0xa81f301449ee8c70, 0x5c68f256bfff5a74,
+    0xd226fc195c6a2f8c, 0x73832eec6fff3111, 0x83585d8fd9c25db7, 0xc831fd53c5ff7eab,
+    0xa42e74f3d032f525, 0xba3e7ca8b77f5e55, 0xcd3a1230c43fb26f, 0x28ce1bd2e55f35eb,
+    0x80444b5e7aa7cf85, 0x7980d163cf5b81b3, 0xa0555e361951c366, 0xd7e105bcc332621f,
+    0xc86ab5c39fa63440, 0x8dd9472bf3fefaa7, 0xfa856334878fc150, 0xb14f98f6f0feb951,
+    0x9c935e00d4b9d8d2, 0x6ed1bf9a569f33d3, 0xc3b8358109e84f07, 0x0a862f80ec4700c8,
+    0xf4a642e14c6262c8, 0xcd27bb612758c0fa, 0x98e7e9cccfbd7dbd, 0x8038d51cb897789c,
+    0xbf21e44003acdd2c, 0xe0470a63e6bd56c3, 0xeeea5d5004981478, 0x1858ccfce06cac74,
+    0x95527a5202df0ccb, 0x0f37801e0c43ebc8, 0xbaa718e68396cffd, 0xd30560258f54e6ba,
+    0xe950df20247c83fd, 0x47c6b82ef32a2069, 0x91d28b7416cdd27e, 0x4cdc331d57fa5441,
+    0xb6472e511c81471d, 0xe0133fe4adf8e952, 0xe3d8f9e563a198e5, 0x58180fddd97723a6,
+    0x8e679c2f5e44ff8f, 0x570f09eaa7ea7648
+};
 
-        if (objectHook == NULL && decoderEndObject == NULL) {
-            Py_DECREF(mapping);
-            return true;
-        }
 
-        PyObject* replacement;
-        if (decoderEndObject != NULL) {
-            replacement = PyObject_CallFunctionObjArgs(decoderEndObject, mapping, NULL);
-        } else /* if (objectHook != NULL) */ {
-            replacement = PyObject_CallFunctionObjArgs(objectHook, mapping, NULL);
-        }
+// Return the high half of the 128-bit product of a and b, storing the low one in low
 
-        Py_DECREF(mapping);
-        if (replacement == NULL)
-            return false;
+static inline uint64_t
+multiply_128(uint64_t a, uint64_t b, uint64_t& low)
+{
+#if defined(__SIZEOF_INT128__)
+    __extension__ typedef unsigned __int128 uint128_t;
+    uint128_t product = (uint128_t) a * b;
+    low = (uint64_t) product;
+    return (uint64_t) (product >> 64);
+#else
+    uint64_t aLow = a & 0xFFFFFFFF, aHigh = a >> 32;
+    uint64_t bLow = b & 0xFFFFFFFF, bHigh = b >> 32;
+    uint64_t ll = aLow * bLow;
+    uint64_t lh = aLow * bHigh;
+    uint64_t hl = aHigh * bLow;
+    uint64_t middle = (ll >> 32) + (lh & 0xFFFFFFFF) + (hl & 0xFFFFFFFF);
+    low = (middle << 32) | (ll & 0xFFFFFFFF);
+    return aHigh * bHigh + (lh >> 32) + (hl >> 32) + (middle >> 32);
+#endif
+}
 
-        if (!stack.empty()) {
-            HandlerContext& current = stack.back();
 
-            if (current.isObject) {
-                PyObject* key = PyUnicode_FromStringAndSize(current.key,
-                                                            current.keyLength);
-                if (key == NULL) {
-                    Py_DECREF(replacement);
-                    return false;
-                }
+static inline int
+leading_zeros(uint64_t value)
+{
+#if defined(__GNUC__)
+    return __builtin_clzll(value);
+#else
+    int count = 0;
+    while (!(value & ((uint64_t) 1 << 63))) {
+        value <<= 1;
+        count++;
+    }
+    return count;
+#endif
+}
 
-                PyObject* shared_key = PyDict_SetDefault(sharedKeys, key, key);
-                if (shared_key == NULL) {
-                    Py_DECREF(key);
-                    Py_DECREF(replacement);
-                    return false;
-                }
-                Py_INCREF(shared_key);
-                Py_DECREF(key);
-                key = shared_key;
 
-                int rc;
-                if (current.keyValuePairs) {
-                    PyObject* pair = PyTuple_Pack(2, key, replacement);
+// Compute the double nearest to significand * 10^exponent, the former being nonzero,
+// with Clinger's fast path
 
-                    Py_DECREF(key);
-                    Py_DECREF(replacement);
-                    if (pair == NULL) {
-                        return false;
-                    }
+static bool
+clinger_fast_path(uint64_t significand, int exponent, double& d)
+{
+#if defined(FLT_EVAL_METHOD) && FLT_EVAL_METHOD == 0
+    const uint64_t maxExactSignificand = (uint64_t) 1 << 53;
 
-                    Py_ssize_t listLen = PyList_GET_SIZE(current.object);
+    if (significand > maxExactSignificand)
+        return false;
 
-                    rc = PyList_SetItem(current.object, listLen - 1, pair);
+    if (exponent > 22) {
+        // Move the excess of the exponent to the significand, as long as it stays exact
+        int excess = exponent - 22;
+        if (excess > 15)
+            return false;
+        uint64_t scale = (uint64_t) exact_powers_of_ten[excess];
+        if (significand > maxExactSignificand / scale)
+            return false;
+        significand *= scale;
+        exponent = 22;
+    } else if (exponent < -22)
+        return false;
 
-                    // NB: PyList_SetItem() steals a reference on the replacement, so it
-                    // must not be DECREFed when the operation succeeds
+    d = (double) significand;
 
-                    if (rc == -1) {
-                        Py_DECREF(pair);
-                        return false;
-                    }
-                } else {
-                    if (PyDict_CheckExact(current.object))
-                        // If it's a standard dictionary, this is +20% faster
-                        rc = PyDict_SetItem(current.object, key, replacement);
-                    else
-                        rc = PyObject_SetItem(current.object, key, replacement);
-                    Py_DECREF(key);
-                    Py_DECREF(replacement);
-                    if (rc == -1) {
-                        return false;
-                    }
-                }
-            } else {
-                // Change these to PySequence_Size() and PySequence_SetItem(),
-                // should we implement Decoder.start_array()
-                Py_ssize_t listLen = PyList_GET_SIZE(current.object);
-                int rc = PyList_SetItem(current.object, listLen - 1, replacement);
+    if (exponent < 0)
+        d /= exact_powers_of_ten[-exponent];
+    else
+        d *= exact_powers_of_ten[exponent];
 
-                // NB: PyList_SetItem() steals a reference on the replacement, so it must
-                // not be DECREFed when the operation succeeds
+    return true;
+#else
+    // Intermediate results may be kept with a greater precision, causing double rounding
+    return false;
+#endif
+}
 
-                if (rc == -1) {
-                    Py_DECREF(replacement);
-                    return false;
-                }
-            }
-        } else {
-            Py_SETREF(root, replacement);
-        }
 
-        return true;
+// Compute the double nearest to significand * 10^exponent, the former being nonzero,
+// with the Eisel-Lemire algorithm, see https://arxiv.org/abs/2101.11408
+
+static bool
+eisel_lemire(uint64_t significand, int exponent, double& d)
+{
+    if (exponent < MIN_POWER_OF_FIVE || exponent > MAX_POWER_OF_FIVE)
+        return false;
+
+    int lz = leading_zeros(significand);
+    significand <<= lz;
+
+    const uint64_t* power = powers_of_five + 2 * (exponent - MIN_POWER_OF_FIVE);
+    uint64_t low;
+    uint64_t high = multiply_128(significand, power[0], low);
+
+    // When the bits below the 55 that matter are all ones, a carry from the lower half of
+    // the power could change them
+    if ((high & 0x1FF) == 0x1FF) {
+        uint64_t secondLow;
+        uint64_t secondHigh = multiply_128(significand, power[1], secondLow);
+        low += secondHigh;
+        if (secondHigh > low)
+            high++;
     }
 
-    bool StartArray() {
-        PyObject* list = PyList_New(0);
-        if (list == NULL) {
-            return false;
-        }
+    // Outside this range the approximation may still be too coarse
+    if (low == UINT64_MAX && (exponent < -27 || exponent > 55))
+        return false;
 
-        if (!Handle(list)) {
+    int upperBit = (int) (high >> 63);
+    int shift = upperBit + 64 - 52 - 3;
+    uint64_t mantissa = high >> shift;
+    int binaryExponent = (((152170 + 65536) * exponent) >> 16) + 63 + upperBit - lz + 1023;
+
+    // Subnormals and overflows
+    if (binaryExponent <= 0 || binaryExponent >= 0x7FF)
+        return false;
+
+    // An exact halfway case, to be rounded to even
+    if (low <= 1 && exponent >= -4 && exponent <= 23 && (mantissa & 3) == 1
+        && (mantissa << shift) == high)
+        mantissa &= ~(uint64_t) 1;
+
+    mantissa += mantissa & 1;
+    mantissa >>= 1;
+    if (mantissa >= ((uint64_t) 2 << 52)) {
+        mantissa = (uint64_t) 1 << 52;
+        binaryExponent++;
+        if (binaryExponent >= 0x7FF)
             return false;
-        }
+    }
+    mantissa &= ~((uint64_t) 1 << 52);
 
-        HandlerContext ctx;
-        ctx.isObject = false;
-        ctx.object = list;
-        ctx.key = NULL;
-        ctx.copiedKey = false;
-        Py_INCREF(list);
+    uint64_t bits = mantissa | ((uint64_t) binaryExponent << 52);
+    memcpy(&d, &bits, sizeof(d));
+    return true;
+}
 
-        stack.push_back(ctx);
 
-        return true;
+static NumberKind
+number_from_string(const char* str, SizeType length, int64_t& i, double& d)
+{
+    const char* p = str;
+    const char* end = str + length;
+    bool negative = false;
+    bool isFloat = false;
+    uint64_t significand = 0;
+    int digits = 0;                // significant digits accumulated so far
+    int exponent = 0;
+
+    if (p < end && *p == '-') {
+        negative = true;
+        p++;
     }
 
-    bool EndArray(SizeType elementCount) {
-        const HandlerContext& ctx = stack.back();
-
-        if (ctx.copiedKey)
-            PyMem_Free((void*) ctx.key);
+    if (p == end || *p < '0' || *p > '9')
+        return NK_OTHER;
 
-        PyObject* sequence = ctx.object;
-        stack.pop_back();
+    for (; p < end && *p >= '0' && *p <= '9'; p++) {
+        if (digits == 19)
+            return NK_OTHER;
+        significand = significand * 10 + (*p - '0');
+        if (significand != 0)
+            digits++;
+    }
 
-        if (decoderEndArray == NULL) {
-            Py_DECREF(sequence);
-            return true;
+    if (p < end && *p == '.') {
+        isFloat = true;
+        for (p++; p < end && *p >= '0' && *p <= '9'; p++) {
+            if (digits == 19 || exponent < -1000)
+                return NK_OTHER;
+            significand = significand * 10 + (*p - '0');
+            if (significand != 0)
+                digits++;
+            exponent--;
         }
+    }
 
-        PyObject* replacement = PyObject_CallFunctionObjArgs(decoderEndArray, sequence,
-                                                             NULL);
-        Py_DECREF(sequence);
-        if (replacement == NULL)
-            return false;
+    if (p < end && (*p == 'e' || *p == 'E')) {
+        int sign = 1;
+        int value = 0;
 
-        if (!stack.empty()) {
-            const HandlerContext& current = stack.back();
+        isFloat = true;
+        p++;
+        if (p < end && (*p == '-' || *p == '+')) {
+            if (*p == '-')
+                sign = -1;
+            p++;
+        }
+        for (; p < end && *p >= '0' && *p <= '9'; p++) {
+            if (value > 1000)
+                return NK_OTHER;
+            value = value * 10 + (*p - '0');
+        }
+        exponent += sign * value;
+    }
 
-            if (current.isObject) {
-                PyObject* key = PyUnicode_FromStringAndSize(current.key,
-                                                            current.keyLength);
-                if (key == NULL) {
-                    Py_DECREF(replacement);
-                    return false;
-                }
+    if (p != end)
+        return NK_OTHER;
 
-                int rc;
-                if (PyDict_Check(current.object))
-                    // If it's a standard dictionary, this is +20% faster
-                    rc = PyDict_SetItem(current.object, key, replacement);
-                else
-                    rc = PyObject_SetItem(current.object, key, replacement);
+    if (!isFloat) {
+        if (digits > 18)
+            return NK_OTHER;
+        i = negative ? -(int64_t) significand : (int64_t) significand;
+        return NK_INT;
+    }
 
-                Py_DECREF(key);
-                Py_DECREF(replacement);
+    if (significand == 0)
+        d = 0.0;
+    else if (!clinger_fast_path(significand, exponent, d)
+             && !eisel_lemire(significand, exponent, d))
+        return NK_OTHER;
 
-                if (rc == -1) {
-                    return false;
-                }
-            } else {
-                // Change these to PySequence_Size() and PySequence_SetItem(),
-                // should we implement Decoder.start_array()
-                Py_ssize_t listLen = PyList_GET_SIZE(current.object);
-                int rc = PyList_SetItem(current.object, listLen - 1, replacement);
+    if (negative)
+        d = -d;
+    return NK_FLOAT;
+}
 
-                // NB: PyList_SetItem() steals a reference on the replacement, so it must
-                // not be DECREFed when the operation succeeds
 
-                if (rc == -1) {
-                    Py_DECREF(replacement);
-                    return false;
-                }
-            }
-        } else {
-            Py_SETREF(root, replacement);
-        }
+/* Bounded cache of str instances, used for dictionary keys and short string values, kept
+   by a Decoder across calls: strings are looked up by their UTF-8 bytes before creating
+   any Python object, in an open addressing table with linear probing; when the cache is
+   full, entries are evicted following the clock algorithm. */
 
-        return true;
-    }
+struct StringCacheEntry {
+    size_t hash;
+    SizeType length;
+    bool referenced;
+    PyObject* value;
+    char bytes[64];
+};
 
-    bool NaN() {
-        if (!(numberMode & NM_NAN)) {
-            PyErr_SetString(PyExc_ValueError,
-                            "Out of range float values are not JSON compliant");
-            return false;
-        }
 
-        PyObject* value;
-        if (numberMode & NM_DECIMAL) {
-            value = PyObject_CallFunctionObjArgs(decimal_type, nan_string_value, NULL);
-        } else {
-            value = PyFloat_FromString(nan_string_value);
+struct StringCache {
+    static const SizeType MAX_LENGTH = sizeof(StringCacheEntry::bytes);
+
+    std::vector<StringCacheEntry> entries;
+    std::vector<size_t> slots;      // position of the entry plus one, zero when free
+    size_t capacity;
+    size_t size;
+    size_t hand;
+    size_t hits;
+    size_t misses;
+
+    StringCache(size_t c)
+        : capacity(c),
+          size(0),
+          hand(0),
+          hits(0),
+          misses(0)
+        {
+            size_t slotsCount = 8;
+            while (slotsCount < capacity * 2)
+                slotsCount <<= 1;
+            slots.assign(slotsCount, 0);
+            entries.resize(capacity);
         }
 
-        if (value == NULL)
-            return false;
+    ~StringCache() {
+        Clear();
+    }
 
-        return Handle(value);
+    void Clear() {
+        for (size_t i = 0; i < size; i++)
+            Py_DECREF(entries[i].value);
+        std::fill(slots.begin(), slots.end(), 0);
+        size = hand = 0;
     }
 
-    bool Infinity(bool minus) {
-        if (!(numberMode & NM_NAN)) {
-            PyErr_SetString(PyExc_ValueError,
-                            "Out of range float values are not JSON compliant");
-            return false;
+    static size_t Hash(const char* str, SizeType length) {
+        // FNV-1a
+        size_t hash = 2166136261u;
+        for (SizeType i = 0; i < length; i++) {
+            hash ^= (unsigned char) str[i];
+            hash *= 16777619u;
         }
+        return hash;
+    }
 
-        PyObject* value;
-        if (numberMode & NM_DECIMAL) {
-            value = PyObject_CallFunctionObjArgs(decimal_type,
-                                                 minus
-                                                 ? minus_inf_string_value
-                                                 : plus_inf_string_value, NULL);
-        } else {
-            value = PyFloat_FromString(minus
-                                       ? minus_inf_string_value
-                                       : plus_inf_string_value);
+    // Return a new reference to the string, creating and caching it when not found;
+    // a repeated lookup of the same occurrence passes counted=false to keep the
+    // statistics exact
+    PyObject* Get(const char* str, SizeType length, bool counted = true) {
+        size_t hash = Hash(str, length);
+        size_t mask = slots.size() - 1;
+
+        for (size_t slot = hash & mask; slots[slot] != 0; slot = (slot + 1) & mask) {
+            StringCacheEntry& entry = entries[slots[slot] - 1];
+            if (entry.hash == hash
+                && entry.length == length
+                && memcmp(entry.bytes, str, length) == 0) {
+                if (counted)
+                    hits++;
+                entry.referenced = true;
+                Py_INCREF(entry.value);
+                return entry.value;
+            }
         }
 
+        if (counted)
+            misses++;
+
+        PyObject* value = PyUnicode_FromStringAndSize(str, length);
         if (value == NULL)
-            return false;
+            return NULL;
 
-        return Handle(value);
-    }
+        size_t position;
+        if (size < capacity) {
+            position = size++;
+        } else {
+            while (entries[hand].referenced) {
+                entries[hand].referenced = false;
+                hand = (hand + 1) % capacity;
+            }
+            position = hand;
+            hand = (hand + 1) % capacity;
+            Remove(position);
+            Py_DECREF(entries[position].value);
+        }
 
-    bool Null() {
-        PyObject* value = Py_None;
+        StringCacheEntry& entry = entries[position];
+        entry.hash = hash;
+        entry.length = length;
+        entry.referenced = false;
         Py_INCREF(value);
+        entry.value = value;
+        memcpy(entry.bytes, str, length);
 
-        return Handle(value);
-    }
-
-    bool Bool(bool b) {
-        PyObject* value = b ? Py_True : Py_False;
-        Py_INCREF(value);
+        size_t slot = hash & mask;
+        while (slots[slot] != 0)
+            slot = (slot + 1) & mask;
+        slots[slot] = position + 1;
 
-        return Handle(value);
+        return value;
     }
 
-    bool Int(int i) {
-        PyObject* value = PyLong_FromLong(i);
-        return Handle(value);
+    // Remove the entry at the given position from the table, shifting back the following
+    // ones in the same cluster so that no tombstone is needed
+    void Remove(size_t position) {
+        size_t mask = slots.size() - 1;
+        size_t hole = entries[position].hash & mask;
+
+        while (slots[hole] != position + 1)
+            hole = (hole + 1) & mask;
+
+        for (size_t slot = (hole + 1) & mask; slots[slot] != 0; slot = (slot + 1) & mask) {
+            size_t home = entries[slots[slot] - 1].hash & mask;
+            if (hole <= slot ? (hole < home && home <= slot) : (hole < home || home <= slot))
+                continue;
+            slots[hole] = slots[slot];
+            hole = slot;
+        }
+        slots[hole] = 0;
     }
+};
 
-    bool Uint(unsigned i) {
-        PyObject* value = PyLong_FromUnsignedLong(i);
-        return Handle(value);
-    }
 
-    bool Int64(int64_t i) {
-        PyObject* value = PyLong_FromLongLong(i);
-        return Handle(value);
-    }
+/* A native buffer collecting a sequence of numbers: integers go into ints until the
+   first float, then everything goes into doubles, remembering which items were integers,
+   so that the very same Python values can be rebuilt when the sequence turns out to
+   contain something else. */
 
-    bool Uint64(uint64_t i) {
-        PyObject* value = PyLong_FromUnsignedLongLong(i);
-        return Handle(value);
+struct TypedBuffer {
+    std::vector<int64_t> ints;
+    std::vector<double> doubles;
+    std::vector<size_t> intPositions;
+    bool allInts;
+    bool inexactInts;
+
+    TypedBuffer()
+        : allInts(true),
+          inexactInts(false)
+        {}
+
+    bool Empty() const {
+        return ints.empty() && doubles.empty();
     }
 
-    bool Double(double d) {
-        PyObject* value = PyFloat_FromDouble(d);
-        return Handle(value);
+    void Clear() {
+        ints.clear();
+        doubles.clear();
+        intPositions.clear();
+        allInts = true;
+        inexactInts = false;
     }
 
-    bool RawNumber(const char* str, SizeType length, bool copy) {
-        PyObject* value;
-        bool isFloat = false;
+    // Add an integer, returning false when it cannot be represented exactly along with
+    // the floats already there
+    bool AddInt(int64_t i) {
+        bool inexact = i < -TYPED_MAX_EXACT_INT || i > TYPED_MAX_EXACT_INT;
+        try {
+            if (allInts) {
+                ints.push_back(i);
+                inexactInts = inexactInts || inexact;
+            } else if (inexact) {
+                return false;
+            } else {
+                intPositions.push_back(doubles.size());
+                doubles.push_back((double) i);
+            }
+        } catch (const std::bad_alloc&) {
+            return false;
+        }
+        return true;
+    }
 
-        for (int i = length - 1; i >= 0; --i) {
-            // consider it a float if there is at least one non-digit character,
-            // it may be either a decimal number or +-infinity or nan
-            if (!isdigit(str[i]) && str[i] != '-') {
-                isFloat = true;
-                break;
+    // Add a float, moving there the integers seen so far
+    bool AddDouble(double d) {
+        try {
+            if (allInts) {
+                if (inexactInts)
+                    return false;
+                for (size_t i = 0, n = ints.size(); i < n; i++) {
+                    intPositions.push_back(i);
+                    doubles.push_back((double) ints[i]);
+                }
+                ints.clear();
+                allInts = false;
             }
+            doubles.push_back(d);
+        } catch (const std::bad_alloc&) {
+            return false;
         }
+        return true;
+    }
+
+    // Add a number in its textual representation, yielding the very same value
+    // float_from_string() or PyLong_FromString() would
+    bool AddRawNumber(const char* str, SizeType length, bool isFloat) {
+        std::string zstr(str, length);
 
         if (isFloat) {
+            char* end;
+            double d = PyOS_string_to_double(zstr.c_str(), &end, NULL);
+            if (end != zstr.c_str() + length || (d == -1.0 && PyErr_Occurred())) {
+                PyErr_Clear();
+                return false;
+            }
+            return AddDouble(d);
+        } else {
+            char* end;
+            errno = 0;
+            long long i = strtoll(zstr.c_str(), &end, 10);
+            if (end != zstr.c_str() + length || errno == ERANGE)
+                return false;
+            return AddInt(i);
+        }
+    }
 
-            if (numberMode & NM_DECIMAL) {
-                PyObject* pystr = PyUnicode_FromStringAndSize(str, length);
-                if (pystr == NULL)
+    // Append the corresponding Python values to the given list, emptying the buffer
+    bool Flush(PyObject* list) {
+        if (allInts) {
+            for (size_t i = 0, n = ints.size(); i < n; i++) {
+                PyObject* value = PyLong_FromLongLong(ints[i]);
+                if (value == NULL)
+                    return false;
+                int rc = PyList_Append(list, value);
+                Py_DECREF(value);
+                if (rc == -1)
                     return false;
-                value = PyObject_CallFunctionObjArgs(decimal_type, pystr, NULL);
-                Py_DECREF(pystr);
-            } else {
-                std::string zstr(str, length);
-
-                value = float_from_string(zstr.c_str(), length);
             }
-
         } else {
-            std::string zstr(str, length);
-
-            value = PyLong_FromString(zstr.c_str(), NULL, 10);
+            size_t nextInt = 0;
+            for (size_t i = 0, n = doubles.size(); i < n; i++) {
+                PyObject* value;
+                if (nextInt < intPositions.size() && intPositions[nextInt] == i) {
+                    value = PyLong_FromLongLong((int64_t) doubles[i]);
+                    nextInt++;
+                } else {
+                    value = PyFloat_FromDouble(doubles[i]);
+                }
+                if (value == NULL)
+                    return false;
+                int rc = PyList_Append(list, value);
+                Py_DECREF(value);
+                if (rc == -1)
+                    return false;
+            }
         }
 
-        if (value == NULL) {
-            PyErr_SetString(PyExc_ValueError,
-                            isFloat
-                            ? "Invalid float value"
-                            : "Invalid integer value");
-            return false;
+        Clear();
+        return true;
+    }
+
+    // Build an array.array, filling it straight from the buffer memory, and empty it
+    PyObject* MakeArray() {
+        const char* typecode;
+        const char* data;
+        Py_ssize_t size;
+
+        if (allInts) {
+            typecode = "q";
+            data = (const char*) ints.data();
+            size = (Py_ssize_t) (ints.size() * sizeof(int64_t));
         } else {
-            return Handle(value);
+            typecode = "d";
+            data = (const char*) doubles.data();
+            size = (Py_ssize_t) (doubles.size() * sizeof(double));
         }
-    }
 
-#define digit(idx) (str[idx] - '0')
+        PyObject* array = PyObject_CallFunction(array_type, "s", typecode);
+        if (array == NULL)
+            return NULL;
 
-    bool IsIso8601Date(const char* str, int& year, int& month, int& day) {
-        // we've already checked that str is a valid length and that 5 and 8 are '-'
-        if (!isdigit(str[0]) || !isdigit(str[1]) || !isdigit(str[2]) || !isdigit(str[3])
-            || !isdigit(str[5]) || !isdigit(str[6])
-            || !isdigit(str[8]) || !isdigit(str[9])) return false;
+        PyObject* view = PyMemoryView_FromMemory((char*) data, size, PyBUF_READ);
+        if (view == NULL) {
+            Py_DECREF(array);
+            return NULL;
+        }
 
-        year = digit(0)*1000 + digit(1)*100 + digit(2)*10 + digit(3);
-        month = digit(5)*10 + digit(6);
-        day = digit(8)*10 + digit(9);
+        PyObject* rc = PyObject_CallMethodObjArgs(array, frombytes_name, view, NULL);
+        Py_DECREF(view);
+        if (rc == NULL) {
+            Py_DECREF(array);
+            return NULL;
+        }
+        Py_DECREF(rc);
 
-        return year > 0 && month <= 12 && day <= days_per_month(year, month);
+        Clear();
+        return array;
     }
+};
 
-    bool IsIso8601Offset(const char* str, int& tzoff) {
-        if (!isdigit(str[1]) || !isdigit(str[2]) || str[3] != ':'
-            || !isdigit(str[4]) || !isdigit(str[5])) return false;
-
-        int hofs = 0, mofs = 0, tzsign = 1;
-        hofs = digit(1)*10 + digit(2);
-        mofs = digit(4)*10 + digit(5);
 
-        if (hofs > 23 || mofs > 59) return false;
+/* A set of dictionary keys, restricting the detection of datetimes or UUIDs done by a
+   Decoder to the strings that are values of those keys. */
 
-        if (str[0] == '-') tzsign = -1;
-        tzoff = tzsign * (hofs * 3600 + mofs * 60);
-        return true;
-    }
+struct KeySet {
+    std::vector<std::string> keys;    // sorted
 
-    bool IsIso8601Time(const char* str, SizeType length,
-                       int& hours, int& mins, int& secs, int& usecs, int& tzoff) {
-        // we've already checked that str is a minimum valid length, but nothing else
-        if (!isdigit(str[0]) || !isdigit(str[1]) || str[2] != ':'
-            || !isdigit(str[3]) || !isdigit(str[4]) || str[5] != ':'
-            || !isdigit(str[6]) || !isdigit(str[7])) return false;
+    bool Contains(const char* str, SizeType length) const {
+        size_t lo = 0;
+        size_t hi = keys.size();
 
-        hours = digit(0)*10 + digit(1);
-        mins = digit(3)*10 + digit(4);
-        secs = digit(6)*10 + digit(7);
+        while (lo < hi) {
+            size_t mid = lo + (hi - lo) / 2;
+            int cmp = keys[mid].compare(0, std::string::npos, str, length);
+            if (cmp == 0)
+                return true;
+            if (cmp < 0)
+                lo = mid + 1;
+            else
+                hi = mid;
+        }
+        return false;
+    }
+};
 
-        if (hours > 23 || mins > 59 || secs > 59) return false;
 
-        if (length == 8 || (length == 9 && str[8] == 'Z')) {
-            // just time
-            return true;
-        }
+/* The hooks implemented by a Decoder, looked up at its first call, so that the following
+   ones do not pay for the failed lookups of the missing ones; they are looked up again
+   after an attribute of the decoder is set, or when its type changes. */
 
+enum DecoderHooks {
+    HOOK_START_OBJECT = 1<<0,
+    HOOK_END_OBJECT = 1<<1,
+    HOOK_END_ARRAY = 1<<2,
+    HOOK_STRING = 1<<3,
+    HOOKS_UNRESOLVED = 1<<4
+};
 
-        if (length == 14 && (str[8] == '-' || str[8] == '+')) {
-            return IsIso8601Offset(&str[8], tzoff);
-        }
 
-        // at this point we need a . AND at least 1 more digit
-        if (length == 9 || str[8] != '.' || !isdigit(str[9])) return false;
+/* The resources a Decoder keeps across calls, instead of allocating them anew every time:
+   each of them is lent to a single parse at a time, and nested or concurrent calls get
+   fresh ones. */
 
-        int usecLength;
-        if (str[length - 1] == 'Z') {
-            usecLength = length - 10;
-        } else if (str[length - 3] == ':') {
-            if (!IsIso8601Offset(&str[length - 6], tzoff)) return false;
-            usecLength = length - 15;
-        } else {
-            usecLength = length - 9;
-        }
+struct DecoderState {
+    // Bigger resources are released at the end of the call
+    static const size_t MAX_BUFFER_SIZE = 1<<20;
+    static const size_t MAX_STACK_SIZE = 1024;
 
-        if (usecLength > 9) return false;
+    bool parsing;            // whether the reader and the buffer are lent
+    bool building;           // whether the stack is lent
+    Reader* reader;
+    std::vector<char> buffer;
+    std::vector<HandlerContext> stack;
 
-        switch (usecLength) {
-            case 9: if (!isdigit(str[17])) { return false; }
-            case 8: if (!isdigit(str[16])) { return false; }
-            case 7: if (!isdigit(str[15])) { return false; }
-            case 6: if (!isdigit(str[14])) { return false; } usecs += digit(14);
-            case 5: if (!isdigit(str[13])) { return false; } usecs += digit(13)*10;
-            case 4: if (!isdigit(str[12])) { return false; } usecs += digit(12)*100;
-            case 3: if (!isdigit(str[11])) { return false; } usecs += digit(11)*1000;
-            case 2: if (!isdigit(str[10])) { return false; } usecs += digit(10)*10000;
-            case 1: if (!isdigit(str[9])) { return false; } usecs += digit(9)*100000;
-        }
+    DecoderState()
+        : parsing(false),
+          building(false),
+          reader(NULL)
+        {}
 
-        return true;
+    ~DecoderState() {
+        delete reader;
     }
+};
 
-    bool IsIso8601(const char* str, SizeType length,
-                   int& year, int& month, int& day,
-                   int& hours, int& mins, int &secs, int& usecs, int& tzoff) {
-        year = -1;
-        month = day = hours = mins = secs = usecs = tzoff = 0;
-
-        // Early exit for values that are clearly not valid (too short or too long)
-        if (length < 8 || length > 35) return false;
 
-        bool isDate = str[4] == '-' && str[7] == '-';
+struct PyHandler {
+    PyObject* decoderStartObject;
+    PyObject* decoderEndObject;
+    PyObject* decoderEndArray;
+    PyObject* decoderString;
+    PyObject* sharedKeys;
+    StringCache* keyCache;
+    StringCache* stringCache;
+    PyObject* root;
+    PyObject* objectHook;
+    unsigned datetimeMode;
+    unsigned uuidMode;
+    unsigned numberMode;
+    unsigned arrayMode;
+    std::vector<HandlerContext> stack;
+    DecoderState* state;     // the lender of the stack, if any
+    const KeySet* datetimeKeys;
+    const KeySet* uuidKeys;
 
-        if (!isDate) {
-            return IsIso8601Time(str, length, hours, mins, secs, usecs, tzoff);
+    // Native buffer of the innermost array, while it contains only numbers
+    TypedBuffer typedBuffer;
+
+    PyHandler(PyObject* decoder,
+              PyObject* hook,
+              unsigned dm,
+              unsigned um,
+              unsigned nm)
+        : decoderStartObject(NULL),
+          decoderEndObject(NULL),
+          decoderEndArray(NULL),
+          decoderString(NULL),
+          sharedKeys(NULL),
+          keyCache(NULL),
+          stringCache(NULL),
+          root(NULL),
+          objectHook(hook),
+          datetimeMode(dm),
+          uuidMode(um),
+          numberMode(nm),
+          arrayMode(AM_NONE),
+          state(NULL),
+          datetimeKeys(NULL),
+          uuidKeys(NULL)
+        {
+            if (decoder != NULL) {
+                assert(!objectHook);
+                BindHooks(decoder);
+                keyCache = decoder_key_cache(decoder);
+                stringCache = decoder_string_cache(decoder);
+                arrayMode = decoder_array_mode(decoder);
+                datetimeKeys = decoder_datetime_keys(decoder);
+                uuidKeys = decoder_uuid_keys(decoder);
+
+                state = decoder_state(decoder);
+                if (state != NULL && !state->building) {
+                    state->building = true;
+                    stack.swap(state->stack);
+                } else
+                    state = NULL;
+            }
+            if (state == NULL)
+                stack.reserve(128);
         }
 
-        if (length == 10) {
-            // if it looks like just a date, validate just the date
-            return IsIso8601Date(str, year, month, day);
+    ~PyHandler() {
+        while (!stack.empty()) {
+            const HandlerContext& ctx = stack.back();
+            if (ctx.copiedKey)
+                PyMem_Free((void*) ctx.key);
+            if (ctx.object != NULL)
+                Py_DECREF(ctx.object);
+            stack.pop_back();
         }
-        if (length > 18 && (str[10] == 'T' || str[10] == ' ')) {
-            // if it looks like a date + time, validate date + time
-            return IsIso8601Date(str, year, month, day)
-                && IsIso8601Time(&str[11], length - 11, hours, mins, secs, usecs, tzoff);
+        if (state != NULL) {
+            if (stack.capacity() <= DecoderState::MAX_STACK_SIZE)
+                stack.swap(state->stack);
+            state->building = false;
         }
-        // can't be valid
-        return false;
+        ReleaseHooks();
+        Py_CLEAR(sharedKeys);
     }
 
-    bool HandleIso8601(const char* str, SizeType length,
-                       int year, int month, int day,
-                       int hours, int mins, int secs, int usecs, int tzoff) {
-        // we treat year 0 as invalid and thus the default when there is no date
-        bool hasDate = year > 0;
-
-        if (length == 10 && hasDate) {
-            // just a date, handle quickly
-            return Handle(PyDate_FromDate(year, month, day));
+    // Lookup the methods overridden by the decoder's subclass
+    void BindHooks(PyObject* decoder) {
+        unsigned hooks = decoder_hooks(decoder);
+        if (hooks & HOOK_START_OBJECT) {
+            decoderStartObject = PyObject_GetAttr(decoder, start_object_name);
+        }
+        if (hooks & HOOK_END_OBJECT) {
+            decoderEndObject = PyObject_GetAttr(decoder, end_object_name);
         }
+        if (hooks & HOOK_END_ARRAY) {
+            decoderEndArray = PyObject_GetAttr(decoder, end_array_name);
+        }
+        if (hooks & HOOK_STRING) {
+            decoderString = PyObject_GetAttr(decoder, string_name);
+        }
+    }
 
-        bool isZ = str[length - 1] == 'Z';
-        bool hasOffset = !isZ && (str[length - 6] == '-' || str[length - 6] == '+');
+    // Drop the bound methods, that keep the decoder alive
+    void ReleaseHooks() {
+        Py_CLEAR(decoderStartObject);
+        Py_CLEAR(decoderEndObject);
+        Py_CLEAR(decoderEndArray);
+        Py_CLEAR(decoderString);
+    }
 
-        PyObject* value;
+    // Return a new reference to the str instance for the given key, shared with the
+    // other occurrences of the same key, possibly across calls when the decoder has a
+    // key cache
+    PyObject* MakeKey(const char* str, SizeType length, bool counted = true) {
+        if (keyCache != NULL && length <= StringCache::MAX_LENGTH)
+            return keyCache->Get(str, length, counted);
 
-        if ((datetimeMode & DM_NAIVE_IS_UTC || isZ) && !hasOffset) {
-            if (hasDate) {
-                value = PyDateTimeAPI->DateTime_FromDateAndTime(
-                    year, month, day, hours, mins, secs, usecs, timezone_utc,
-                    PyDateTimeAPI->DateTimeType);
-            } else {
-                value = PyDateTimeAPI->Time_FromTime(
-                    hours, mins, secs, usecs, timezone_utc, PyDateTimeAPI->TimeType);
-            }
-        } else if (datetimeMode & DM_IGNORE_TZ || (!hasOffset && !isZ)) {
-            if (hasDate) {
-                value = PyDateTime_FromDateAndTime(year, month, day,
-                                                   hours, mins, secs, usecs);
-            } else {
-                value = PyTime_FromTime(hours, mins, secs, usecs);
-            }
-        } else if (!hasDate && datetimeMode & DM_SHIFT_TO_UTC && tzoff) {
-            PyErr_Format(PyExc_ValueError,
-                         "Time literal cannot be shifted to UTC: %s", str);
-            value = NULL;
-        } else if (!hasDate && datetimeMode & DM_SHIFT_TO_UTC) {
-            value = PyDateTimeAPI->Time_FromTime(
-                hours, mins, secs, usecs, timezone_utc, PyDateTimeAPI->TimeType);
-        } else {
-            PyObject* offset = PyDateTimeAPI->Delta_FromDelta(0, tzoff, 0, 1,
-                                                              PyDateTimeAPI->DeltaType);
-            if (offset == NULL) {
-                value = NULL;
-            } else {
-                PyObject* tz = PyObject_CallFunctionObjArgs(timezone_type, offset, NULL);
-                Py_DECREF(offset);
-                if (tz == NULL) {
-                    value = NULL;
-                } else {
-                    if (hasDate) {
-                        value = PyDateTimeAPI->DateTime_FromDateAndTime(
-                            year, month, day, hours, mins, secs, usecs, tz,
-                            PyDateTimeAPI->DateTimeType);
-                        if (value != NULL && datetimeMode & DM_SHIFT_TO_UTC) {
-                            PyObject* asUTC = PyObject_CallMethodObjArgs(
-                                value, astimezone_name, timezone_utc, NULL);
-                            Py_DECREF(value);
-                            if (asUTC == NULL) {
-                                value = NULL;
-                            } else {
-                                value = asUTC;
-                            }
-                        }
-                    } else {
-                        value = PyDateTimeAPI->Time_FromTime(hours, mins, secs, usecs, tz,
-                                                             PyDateTimeAPI->TimeType);
-                    }
-                    Py_DECREF(tz);
-                }
-            }
+        if (sharedKeys == NULL) {
+            sharedKeys = PyDict_New();
+            if (sharedKeys == NULL)
+                return NULL;
         }
 
-        if (value == NULL)
-            return false;
+        PyObject* key = PyUnicode_FromStringAndSize(str, length);
+        if (key == NULL)
+            return NULL;
 
-        return Handle(value);
+        PyObject* shared_key = PyDict_SetDefault(sharedKeys, key, key);
+        if (shared_key == NULL) {
+            Py_DECREF(key);
+            return NULL;
+        }
+        Py_INCREF(shared_key);
+        Py_DECREF(key);
+        return shared_key;
     }
 
-#undef digit
+    // Whether the current value is an item of an array still holding only numbers
+    bool InTypedArray() const {
+        return !stack.empty() && stack.back().typed;
+    }
 
-    bool IsUuid(const char* str, SizeType length) {
-        if (uuidMode == UM_HEX && length == 32) {
-            for (int i = length - 1; i >= 0; --i)
-                if (!isxdigit(str[i]))
+    bool Handle(PyObject* value) {
+        if (root) {
+            if (stack.back().typed) {
+                stack.back().typed = false;
+                if (!typedBuffer.Flush(stack.back().object)) {
+                    Py_DECREF(value);
                     return false;
-            return true;
-        } else if (length == 36
-                   && str[8] == '-' && str[13] == '-'
-                   && str[18] == '-' && str[23] == '-') {
-            for (int i = length - 1; i >= 0; --i)
-                if (i != 8 && i != 13 && i != 18 && i != 23 && !isxdigit(str[i]))
+                }
+            }
+
+            const HandlerContext& current = stack.back();
+
+            if (current.isObject) {
+                PyObject* key = MakeKey(current.key, current.keyLength);
+                if (key == NULL) {
+                    Py_DECREF(value);
                     return false;
-            return true;
-        }
-        return false;
-    }
+                }
 
-    bool HandleUuid(const char* str, SizeType length) {
-        PyObject* pystr = PyUnicode_FromStringAndSize(str, length);
-        if (pystr == NULL)
-            return false;
+                int rc;
+                if (current.keyValuePairs) {
+                    PyObject* pair = PyTuple_Pack(2, key, value);
 
-        PyObject* value = PyObject_CallFunctionObjArgs(uuid_type, pystr, NULL);
-        Py_DECREF(pystr);
+                    Py_DECREF(key);
+                    Py_DECREF(value);
+                    if (pair == NULL) {
+                        return false;
+                    }
+                    rc = PyList_Append(current.object, pair);
+                    Py_DECREF(pair);
+                } else {
+                    if (PyDict_CheckExact(current.object))
+                        // If it's a standard dictionary, this is +20% faster
+                        rc = PyDict_SetItem(current.object, key, value);
+                    else
+                        rc = PyObject_SetItem(current.object, key, value);
+                    Py_DECREF(key);
+                    Py_DECREF(value);
+                }
 
-        if (value == NULL)
-            return false;
-        else
-            return Handle(value);
+                if (rc == -1) {
+                    return false;
+                }
+            } else {
+                PyList_Append(current.object, value);
+                Py_DECREF(value);
+            }
+        } else {
+            root = value;
+        }
+        return true;
     }
 
-    bool String(const char* str, SizeType length, bool copy) {
-        PyObject* value;
+    bool Key(const char* str, SizeType length, bool copy) {
+        HandlerContext& current = stack.back();
 
-        if (datetimeMode != DM_NONE) {
-            int year, month, day, hours, mins, secs, usecs, tzoff;
+        // This happens when operating in stream mode and kParseInsituFlag is not set: we
+        // must copy the incoming string in the context, and destroy the duplicate when
+        // the context gets reused for the next dictionary key
 
-            if (IsIso8601(str, length, year, month, day,
-                          hours, mins, secs, usecs, tzoff))
-                return HandleIso8601(str, length, year, month, day,
-                                     hours, mins, secs, usecs, tzoff);
+        if (current.key && current.copiedKey) {
+            PyMem_Free((void*) current.key);
+            current.key = NULL;
         }
 
-        if (uuidMode != UM_NONE && IsUuid(str, length))
-            return HandleUuid(str, length);
-
-        value = PyUnicode_FromStringAndSize(str, length);
-        if (value == NULL)
-            return false;
-
-        if (decoderString != NULL) {
-            PyObject* replacement = PyObject_CallFunctionObjArgs(decoderString, value,
-                                                                 NULL);
-            Py_DECREF(value);
-            if (replacement == NULL)
+        if (copy) {
+            char* copied_str = (char*) PyMem_Malloc(length+1);
+            if (copied_str == NULL)
                 return false;
-            value = replacement;
+            memcpy(copied_str, str, length+1);
+            str = copied_str;
+            assert(!current.key);
         }
 
-        return Handle(value);
+        current.key = str;
+        current.keyLength = length;
+        current.copiedKey = copy;
+
+        return true;
     }
-};
 
+    bool StartObject() {
+        PyObject* mapping;
+        bool key_value_pairs;
 
-typedef struct {
-    PyObject_HEAD
-    unsigned datetimeMode;
-    unsigned uuidMode;
-    unsigned numberMode;
-    unsigned parseMode;
-} DecoderObject;
+        if (decoderStartObject != NULL) {
+            mapping = PyObject_CallFunctionObjArgs(decoderStartObject, NULL);
+            if (mapping == NULL)
+                return false;
+            key_value_pairs = PyList_Check(mapping);
+            if (!PyMapping_Check(mapping) && !key_value_pairs) {
+                Py_DECREF(mapping);
+                PyErr_SetString(PyExc_ValueError,
+                                "start_object() must return a mapping or a list instance");
+                return false;
+            }
+        } else {
+            mapping = PyDict_New();
+            if (mapping == NULL) {
+                return false;
+            }
+            key_value_pairs = false;
+        }
 
+        if (!Handle(mapping)) {
+            return false;
+        }
 
-PyDoc_STRVAR(loads_docstring,
-             "loads(string, *, object_hook=None, number_mode=None, datetime_mode=None,"
-             " uuid_mode=None, parse_mode=None, allow_nan=True)\n"
-             "\n"
-             "Decode a JSON string into a Python object.");
+        HandlerContext ctx;
+        ctx.isObject = true;
+        ctx.keyValuePairs = key_value_pairs;
+        ctx.object = mapping;
+        ctx.key = NULL;
+        ctx.copiedKey = false;
+        ctx.typed = false;
+        Py_INCREF(mapping);
 
+        stack.push_back(ctx);
 
-static PyObject*
-loads(PyObject* self, PyObject* args, PyObject* kwargs)
-{
-    /* Converts a JSON encoded string to a Python object. */
+        return true;
+    }
 
-    static char const* kwlist[] = {
-        "string",
-        "object_hook",
-        "number_mode",
-        "datetime_mode",
-        "uuid_mode",
-        "parse_mode",
+    // Put the replacement of the value just completed in place of the original one, in
+    // the enclosing container or as the root
+    bool Replace(PyObject* replacement) {
+        if (!stack.empty()) {
+            HandlerContext& current = stack.back();
 
-        /* compatibility with stdlib json */
-        "allow_nan",
+            if (current.isObject) {
+                // The key was already looked up when the original value was stored
+                PyObject* key = MakeKey(current.key, current.keyLength, false);
+                if (key == NULL) {
+                    Py_DECREF(replacement);
+                    return false;
+                }
 
-        NULL
-    };
-    PyObject* jsonObject;
-    PyObject* objectHook = NULL;
-    PyObject* datetimeModeObj = NULL;
-    unsigned datetimeMode = DM_NONE;
-    PyObject* uuidModeObj = NULL;
-    unsigned uuidMode = UM_NONE;
-    PyObject* numberModeObj = NULL;
-    unsigned numberMode = NM_NAN;
-    PyObject* parseModeObj = NULL;
-    unsigned parseMode = PM_NONE;
-    int allowNan = -1;
+                int rc;
+                if (current.keyValuePairs) {
+                    PyObject* pair = PyTuple_Pack(2, key, replacement);
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$OOOOOp:rapidjson.loads",
-                                     (char**) kwlist,
-                                     &jsonObject,
-                                     &objectHook,
-                                     &numberModeObj,
-                                     &datetimeModeObj,
-                                     &uuidModeObj,
-                                     &parseModeObj,
-                                     &allowNan))
-        return NULL;
+                    Py_DECREF(key);
+                    Py_DECREF(replacement);
+                    if (pair == NULL) {
+                        return false;
+                    }
 
-    if (objectHook && !PyCallable_Check(objectHook)) {
-        if (objectHook == Py_None) {
-            objectHook = NULL;
+                    Py_ssize_t listLen = PyList_GET_SIZE(current.object);
+
+                    rc = PyList_SetItem(current.object, listLen - 1, pair);
+
+                    // NB: PyList_SetItem() steals a reference on the replacement, so it
+                    // must not be DECREFed when the operation succeeds
+
+                    if (rc == -1) {
+                        Py_DECREF(pair);
+                        return false;
+                    }
+                } else {
+                    if (PyDict_CheckExact(current.object))
+                        // If it's a standard dictionary, this is +20% faster
+                        rc = PyDict_SetItem(current.object, key, replacement);
+                    else
+                        rc = PyObject_SetItem(current.object, key, replacement);
+                    Py_DECREF(key);
+                    Py_DECREF(replacement);
+                    if (rc == -1) {
+                        return false;
+                    }
+                }
+            } else {
+                // Change these to PySequence_Size() and PySequence_SetItem(),
+                // should we implement Decoder.start_array()
+                Py_ssize_t listLen = PyList_GET_SIZE(current.object);
+                int rc = PyList_SetItem(current.object, listLen - 1, replacement);
+
+                // NB: PyList_SetItem() steals a reference on the replacement, so it must
+                // not be DECREFed when the operation succeeds
+
+                if (rc == -1) {
+                    Py_DECREF(replacement);
+                    return false;
+                }
+            }
         } else {
-            PyErr_SetString(PyExc_TypeError, "object_hook is not callable");
-            return NULL;
+            Py_SETREF(root, replacement);
         }
-    }
-
-    if (!accept_number_mode_arg(numberModeObj, allowNan, numberMode))
-        return NULL;
-    if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
-        PyErr_SetString(PyExc_ValueError,
-                        "Invalid number_mode, combining NM_NATIVE with NM_DECIMAL"
-                        " is not supported");
-        return NULL;
-    }
 
-    if (!accept_datetime_mode_arg(datetimeModeObj, datetimeMode))
-        return NULL;
-    if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
-        PyErr_SetString(PyExc_ValueError,
-                        "Invalid datetime_mode, can deserialize only from"
-                        " ISO8601");
-        return NULL;
+        return true;
     }
 
-    if (!accept_uuid_mode_arg(uuidModeObj, uuidMode))
-        return NULL;
+    bool EndObject(SizeType member_count) {
+        const HandlerContext& ctx = stack.back();
 
-    if (!accept_parse_mode_arg(parseModeObj, parseMode))
-        return NULL;
+        if (ctx.copiedKey)
+            PyMem_Free((void*) ctx.key);
 
-    Py_ssize_t jsonStrLen;
-    const char* jsonStr;
-    PyObject* asUnicode = NULL;
+        PyObject* mapping = ctx.object;
+        stack.pop_back();
 
-    if (PyUnicode_Check(jsonObject)) {
-        jsonStr = PyUnicode_AsUTF8AndSize(jsonObject, &jsonStrLen);
-        if (jsonStr == NULL) {
-            return NULL;
+        if (objectHook == NULL && decoderEndObject == NULL) {
+            Py_DECREF(mapping);
+            return true;
         }
-    } else if (PyBytes_Check(jsonObject) || PyByteArray_Check(jsonObject)) {
-        asUnicode = PyUnicode_FromEncodedObject(jsonObject, "utf-8", NULL);
-        if (asUnicode == NULL)
-            return NULL;
-        jsonStr = PyUnicode_AsUTF8AndSize(asUnicode, &jsonStrLen);
-        if (jsonStr == NULL) {
-            Py_DECREF(asUnicode);
-            return NULL;
+
+        PyObject* replacement;
+        if (decoderEndObject != NULL) {
+            replacement = PyObject_CallFunctionObjArgs(decoderEndObject, mapping, NULL);
+        } else /* if (objectHook != NULL) */ {
+            replacement = PyObject_CallFunctionObjArgs(objectHook, mapping, NULL);
         }
-    } else {
-        PyErr_SetString(PyExc_TypeError,
-                        "Expected string or UTF-8 encoded bytes or bytearray");
-        return NULL;
+
+        Py_DECREF(mapping);
+        if (replacement == NULL)
+            return false;
+
+        return Replace(replacement);
     }
 
-    PyObject* result = do_decode(NULL, jsonStr, jsonStrLen, NULL, 0, objectHook,
-                                 numberMode, datetimeMode, uuidMode, parseMode);
+    bool StartArray() {
+        PyObject* list = PyList_New(0);
+        if (list == NULL) {
+            return false;
+        }
 
-    if (asUnicode != NULL)
-        Py_DECREF(asUnicode);
+        if (!Handle(list)) {
+            return false;
+        }
 
-    return result;
-}
+        HandlerContext ctx;
+        ctx.isObject = false;
+        ctx.object = list;
+        ctx.key = NULL;
+        ctx.copiedKey = false;
+        ctx.typed = (arrayMode & AM_TYPED) != 0;
+        Py_INCREF(list);
 
+        stack.push_back(ctx);
 
-PyDoc_STRVAR(load_docstring,
-             "load(stream, *, object_hook=None, number_mode=None, datetime_mode=None,"
-             " uuid_mode=None, parse_mode=None, chunk_size=65536, allow_nan=True)\n"
-             "\n"
-             "Decode a JSON stream into a Python object.");
+        if (ctx.typed)
+            typedBuffer.Clear();
 
+        return true;
+    }
 
-static PyObject*
-load(PyObject* self, PyObject* args, PyObject* kwargs)
-{
-    /* Converts a JSON encoded stream to a Python object. */
+    bool EndArray(SizeType elementCount) {
+        const HandlerContext& ctx = stack.back();
 
-    static char const* kwlist[] = {
-        "stream",
-        "object_hook",
-        "number_mode",
-        "datetime_mode",
-        "uuid_mode",
-        "parse_mode",
-        "chunk_size",
+        if (ctx.copiedKey)
+            PyMem_Free((void*) ctx.key);
 
-        /* compatibility with stdlib json */
-        "allow_nan",
+        PyObject* sequence = ctx.object;
+        bool typed = ctx.typed && !typedBuffer.Empty();
+        stack.pop_back();
 
-        NULL
-    };
-    PyObject* jsonObject;
-    PyObject* objectHook = NULL;
-    PyObject* datetimeModeObj = NULL;
-    unsigned datetimeMode = DM_NONE;
-    PyObject* uuidModeObj = NULL;
-    unsigned uuidMode = UM_NONE;
-    PyObject* numberModeObj = NULL;
-    unsigned numberMode = NM_NAN;
-    PyObject* parseModeObj = NULL;
-    unsigned parseMode = PM_NONE;
-    PyObject* chunkSizeObj = NULL;
-    size_t chunkSize = 65536;
-    int allowNan = -1;
+        if (typed) {
+            PyObject* array = typedBuffer.MakeArray();
+            Py_DECREF(sequence);
+            if (array == NULL)
+                return false;
+            sequence = array;
+        } else if (decoderEndArray == NULL) {
+            Py_DECREF(sequence);
+            return true;
+        }
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$OOOOOOp:rapidjson.load",
-                                     (char**) kwlist,
-                                     &jsonObject,
-                                     &objectHook,
-                                     &numberModeObj,
-                                     &datetimeModeObj,
-                                     &uuidModeObj,
-                                     &parseModeObj,
-                                     &chunkSizeObj,
-                                     &allowNan))
-        return NULL;
+        PyObject* replacement;
+        if (decoderEndArray != NULL) {
+            replacement = PyObject_CallFunctionObjArgs(decoderEndArray, sequence, NULL);
+            Py_DECREF(sequence);
+            if (replacement == NULL)
+                return false;
+        } else {
+            replacement = sequence;
+        }
 
-    if (!PyObject_HasAttr(jsonObject, read_name)) {
-        PyErr_SetString(PyExc_TypeError, "Expected file-like object");
-        return NULL;
+        return Replace(replacement);
     }
 
-    if (objectHook && !PyCallable_Check(objectHook)) {
-        if (objectHook == Py_None) {
-            objectHook = NULL;
+    bool NaN() {
+        if (!(numberMode & NM_NAN)) {
+            PyErr_SetString(PyExc_ValueError,
+                            "Out of range float values are not JSON compliant");
+            return false;
+        }
+
+        if (InTypedArray() && !(numberMode & NM_DECIMAL)
+            && typedBuffer.AddDouble(std::numeric_limits<double>::quiet_NaN()))
+            return true;
+
+        PyObject* value;
+        if (numberMode & NM_DECIMAL) {
+            value = PyObject_CallFunctionObjArgs(decimal_type, nan_string_value, NULL);
         } else {
-            PyErr_SetString(PyExc_TypeError, "object_hook is not callable");
-            return NULL;
+            value = PyFloat_FromString(nan_string_value);
         }
-    }
 
-    if (numberModeObj) {
-        if (numberModeObj == Py_None) {
-            numberMode = NM_NONE;
+        if (value == NULL)
+            return false;
+
+        return Handle(value);
+    }
+
+    bool Infinity(bool minus) {
+        if (!(numberMode & NM_NAN)) {
+            PyErr_SetString(PyExc_ValueError,
+                            "Out of range float values are not JSON compliant");
+            return false;
+        }
+
+        if (InTypedArray() && !(numberMode & NM_DECIMAL)
+            && typedBuffer.AddDouble(minus
+                              ? -std::numeric_limits<double>::infinity()
+                              : std::numeric_limits<double>::infinity()))
+            return true;
+
+        PyObject* value;
+        if (numberMode & NM_DECIMAL) {
+            value = PyObject_CallFunctionObjArgs(decimal_type,
+                                                 minus
+                                                 ? minus_inf_string_value
+                                                 : plus_inf_string_value, NULL);
+        } else {
+            value = PyFloat_FromString(minus
+                                       ? minus_inf_string_value
+                                       : plus_inf_string_value);
+        }
+
+        if (value == NULL)
+            return false;
+
+        return Handle(value);
+    }
+
+    bool Null() {
+        PyObject* value = Py_None;
+        Py_INCREF(value);
+
+        return Handle(value);
+    }
+
+    bool Bool(bool b) {
+        PyObject* value = b ? Py_True : Py_False;
+        Py_INCREF(value);
+
+        return Handle(value);
+    }
+
+    bool Int(int i) {
+        if (InTypedArray() && typedBuffer.AddInt(i))
+            return true;
+
+        PyObject* value = PyLong_FromLong(i);
+        return Handle(value);
+    }
+
+    bool Uint(unsigned i) {
+        if (InTypedArray() && typedBuffer.AddInt(i))
+            return true;
+
+        PyObject* value = PyLong_FromUnsignedLong(i);
+        return Handle(value);
+    }
+
+    bool Int64(int64_t i) {
+        if (InTypedArray() && typedBuffer.AddInt(i))
+            return true;
+
+        PyObject* value = PyLong_FromLongLong(i);
+        return Handle(value);
+    }
+
+    bool Uint64(uint64_t i) {
+        if (InTypedArray() && i <= (uint64_t) INT64_MAX && typedBuffer.AddInt((int64_t) i))
+            return true;
+
+        PyObject* value = PyLong_FromUnsignedLongLong(i);
+        return Handle(value);
+    }
+
+    bool Double(double d) {
+        if (InTypedArray() && typedBuffer.AddDouble(d))
+            return true;
+
+        PyObject* value = PyFloat_FromDouble(d);
+        return Handle(value);
+    }
+
+    bool RawNumber(const char* str, SizeType length, bool copy) {
+        PyObject* value;
+        int64_t integer;
+        double real;
+        NumberKind kind = number_from_string(str, length, integer, real);
+        bool isFloat = kind == NK_FLOAT;
+
+        if (kind == NK_OTHER) {
+            for (int i = length - 1; i >= 0; --i) {
+                // consider it a float if there is at least one non-digit character,
+                // it may be either a decimal number or +-infinity or nan
+                if (!isdigit(str[i]) && str[i] != '-') {
+                    isFloat = true;
+                    break;
+                }
+            }
+        }
+
+        if (InTypedArray() && !(isFloat && (numberMode & NM_DECIMAL))) {
+            bool added;
+            if (kind == NK_INT)
+                added = typedBuffer.AddInt(integer);
+            else if (kind == NK_FLOAT)
+                added = typedBuffer.AddDouble(real);
+            else
+                added = typedBuffer.AddRawNumber(str, length, isFloat);
+            if (added)
+                return true;
+        }
+
+        if (kind == NK_INT) {
+            value = PyLong_FromLongLong(integer);
+        } else if (kind == NK_FLOAT && !(numberMode & NM_DECIMAL)) {
+            value = PyFloat_FromDouble(real);
+        } else if (isFloat) {
+
+            if (numberMode & NM_DECIMAL) {
+                PyObject* pystr = PyUnicode_FromStringAndSize(str, length);
+                if (pystr == NULL)
+                    return false;
+                value = PyObject_CallFunctionObjArgs(decimal_type, pystr, NULL);
+                Py_DECREF(pystr);
+            } else {
+                std::string zstr(str, length);
+
+                value = float_from_string(zstr.c_str(), length);
+            }
+
+        } else {
+            std::string zstr(str, length);
+
+            value = PyLong_FromString(zstr.c_str(), NULL, 10);
+        }
+
+        if (value == NULL) {
+            PyErr_SetString(PyExc_ValueError,
+                            isFloat
+                            ? "Invalid float value"
+                            : "Invalid integer value");
+            return false;
+        } else {
+            return Handle(value);
+        }
+    }
+
+#define digit(idx) (str[idx] - '0')
+
+    bool IsIso8601Date(const char* str, int& year, int& month, int& day) {
+        // we've already checked that str is a valid length and that 5 and 8 are '-'
+        if (!isdigit(str[0]) || !isdigit(str[1]) || !isdigit(str[2]) || !isdigit(str[3])
+            || !isdigit(str[5]) || !isdigit(str[6])
+            || !isdigit(str[8]) || !isdigit(str[9])) return false;
+
+        year = digit(0)*1000 + digit(1)*100 + digit(2)*10 + digit(3);
+        month = digit(5)*10 + digit(6);
+        day = digit(8)*10 + digit(9);
+
+        return year > 0 && month <= 12 && day <= days_per_month(year, month);
+    }
+
+    bool IsIso8601Offset(const char* str, int& tzoff) {
+        if (!isdigit(str[1]) || !isdigit(str[2]) || str[3] != ':'
+            || !isdigit(str[4]) || !isdigit(str[5])) return false;
+
+        int hofs = 0, mofs = 0, tzsign = 1;
+        hofs = digit(1)*10 + digit(2);
+        mofs = digit(4)*10 + digit(5);
+
+        if (hofs > 23 || mofs > 59) return false;
+
+        if (str[0] == '-') tzsign = -1;
+        tzoff = tzsign * (hofs * 3600 + mofs * 60);
+        return true;
+    }
+
+    bool IsIso8601Time(const char* str, SizeType length,
+                       int& hours, int& mins, int& secs, int& usecs, int& tzoff) {
+        // we've already checked that str is a minimum valid length, but nothing else
+        if (!isdigit(str[0]) || !isdigit(str[1]) || str[2] != ':'
+            || !isdigit(str[3]) || !isdigit(str[4]) || str[5] != ':'
+            || !isdigit(str[6]) || !isdigit(str[7])) return false;
+
+        hours = digit(0)*10 + digit(1);
+        mins = digit(3)*10 + digit(4);
+        secs = digit(6)*10 + digit(7);
+
+        if (hours > 23 || mins > 59 || secs > 59) return false;
+
+        if (length == 8 || (length == 9 && str[8] == 'Z')) {
+            // just time
+            return true;
+        }
+
+
+        if (length == 14 && (str[8] == '-' || str[8] == '+')) {
+            return IsIso8601Offset(&str[8], tzoff);
+        }
+
+        // at this point we need a . AND at least 1 more digit
+        if (length == 9 || str[8] != '.' || !isdigit(str[9])) return false;
+
+        int usecLength;
+        if (str[length - 1] == 'Z') {
+            usecLength = length - 10;
+        } else if (str[length - 3] == ':') {
+            if (!IsIso8601Offset(&str[length - 6], tzoff)) return false;
+            usecLength = length - 15;
+        } else {
+            usecLength = length - 9;
+        }
+
+        if (usecLength > 9) return false;
+
+        switch (usecLength) {
+            case 9: if (!isdigit(str[17])) { return false; }
+            case 8: if (!isdigit(str[16])) { return false; }
+            case 7: if (!isdigit(str[15])) { return false; }
+            case 6: if (!isdigit(str[14])) { return false; } usecs += digit(14);
+            case 5: if (!isdigit(str[13])) { return false; } usecs += digit(13)*10;
+            case 4: if (!isdigit(str[12])) { return false; } usecs += digit(12)*100;
+            case 3: if (!isdigit(str[11])) { return false; } usecs += digit(11)*1000;
+            case 2: if (!isdigit(str[10])) { return false; } usecs += digit(10)*10000;
+            case 1: if (!isdigit(str[9])) { return false; } usecs += digit(9)*100000;
+        }
+
+        return true;
+    }
+
+    bool IsIso8601(const char* str, SizeType length,
+                   int& year, int& month, int& day,
+                   int& hours, int& mins, int &secs, int& usecs, int& tzoff) {
+        year = -1;
+        month = day = hours = mins = secs = usecs = tzoff = 0;
+
+        // Early exit for values that are clearly not valid (too short or too long)
+        if (length < 8 || length > 35) return false;
+
+        bool isDate = str[4] == '-' && str[7] == '-';
+
+        if (!isDate) {
+            return IsIso8601Time(str, length, hours, mins, secs, usecs, tzoff);
+        }
+
+        if (length == 10) {
+            // if it looks like just a date, validate just the date
+            return IsIso8601Date(str, year, month, day);
+        }
+        if (length > 18 && (str[10] == 'T' || str[10] == ' ')) {
+            // if it looks like a date + time, validate date + time
+            return IsIso8601Date(str, year, month, day)
+                && IsIso8601Time(&str[11], length - 11, hours, mins, secs, usecs, tzoff);
+        }
+        // can't be valid
+        return false;
+    }
+
+    bool HandleIso8601(const char* str, SizeType length,
+                       int year, int month, int day,
+                       int hours, int mins, int secs, int usecs, int tzoff) {
+        // we treat year 0 as invalid and thus the default when there is no date
+        bool hasDate = year > 0;
+
+        if (length == 10 && hasDate) {
+            // just a date, handle quickly
+            return Handle(PyDate_FromDate(year, month, day));
+        }
+
+        bool isZ = str[length - 1] == 'Z';
+        bool hasOffset = !isZ && (str[length - 6] == '-' || str[length - 6] == '+');
+
+        PyObject* value;
+
+        if ((datetimeMode & DM_NAIVE_IS_UTC || isZ) && !hasOffset) {
+            if (hasDate) {
+                value = PyDateTimeAPI->DateTime_FromDateAndTime(
+                    year, month, day, hours, mins, secs, usecs, timezone_utc,
+                    PyDateTimeAPI->DateTimeType);
+            } else {
+                value = PyDateTimeAPI->Time_FromTime(
+                    hours, mins, secs, usecs, timezone_utc, PyDateTimeAPI->TimeType);
+            }
+        } else if (datetimeMode & DM_IGNORE_TZ || (!hasOffset && !isZ)) {
+            if (hasDate) {
+                value = PyDateTime_FromDateAndTime(year, month, day,
+                                                   hours, mins, secs, usecs);
+            } else {
+                value = PyTime_FromTime(hours, mins, secs, usecs);
+            }
+        } else if (!hasDate && datetimeMode & DM_SHIFT_TO_UTC && tzoff) {
+            PyErr_Format(PyExc_ValueError,
+                         "Time literal cannot be shifted to UTC: %s", str);
+            value = NULL;
+        } else if (!hasDate && datetimeMode & DM_SHIFT_TO_UTC) {
+            value = PyDateTimeAPI->Time_FromTime(
+                hours, mins, secs, usecs, timezone_utc, PyDateTimeAPI->TimeType);
+        } else if (datetimeMode & DM_SHIFT_TO_UTC) {
+            if (!shift_to_utc(year, month, day, hours, mins, tzoff)) {
+                PyErr_SetString(PyExc_OverflowError, "date value out of range");
+                value = NULL;
+            } else {
+                value = PyDateTimeAPI->DateTime_FromDateAndTime(
+                    year, month, day, hours, mins, secs, usecs, timezone_utc,
+                    PyDateTimeAPI->DateTimeType);
+            }
+        } else {
+            PyObject* tz = timezone_from_offset(tzoff);
+            if (tz == NULL) {
+                value = NULL;
+            } else {
+                if (hasDate) {
+                    value = PyDateTimeAPI->DateTime_FromDateAndTime(
+                        year, month, day, hours, mins, secs, usecs, tz,
+                        PyDateTimeAPI->DateTimeType);
+                } else {
+                    value = PyDateTimeAPI->Time_FromTime(hours, mins, secs, usecs, tz,
+                                                         PyDateTimeAPI->TimeType);
+                }
+                Py_DECREF(tz);
+            }
+        }
+
+        if (value == NULL)
+            return false;
+
+        return Handle(value);
+    }
+
+#undef digit
+
+    bool IsUuid(const char* str, SizeType length) {
+        if (uuidMode == UM_HEX && length == 32) {
+            for (int i = length - 1; i >= 0; --i)
+                if (!isxdigit(str[i]))
+                    return false;
+            return true;
+        } else if (length == 36
+                   && str[8] == '-' && str[13] == '-'
+                   && str[18] == '-' && str[23] == '-') {
+            for (int i = length - 1; i >= 0; --i)
+                if (i != 8 && i != 13 && i != 18 && i != 23 && !isxdigit(str[i]))
+                    return false;
+            return true;
+        }
+        return false;
+    }
+
+    bool HandleUuid(const char* str, SizeType length) {
+        char hex[33];
+        SizeType digits = 0;
+
+        // IsUuid() already checked the format, either the canonical one or 32 hex digits
+        for (SizeType i = 0; i < length; i++)
+            if (str[i] != '-')
+                hex[digits++] = str[i];
+        hex[digits] = '\0';
+
+        PyObject* value = uuid_from_hex(hex);
+
+        if (value == NULL)
+            return false;
+        else
+            return Handle(value);
+    }
+
+    // Find the key of the innermost object member enclosing the current value
+    bool CurrentKey(const char*& key, SizeType& length) const {
+        for (size_t i = stack.size(); i-- > 0; ) {
+            if (stack[i].isObject) {
+                key = stack[i].key;
+                length = stack[i].keyLength;
+                return key != NULL;
+            }
+        }
+        return false;
+    }
+
+    bool String(const char* str, SizeType length, bool copy) {
+        PyObject* value;
+        bool tryDatetime = datetimeMode != DM_NONE;
+        bool tryUuid = uuidMode != UM_NONE;
+
+        if ((tryDatetime && datetimeKeys != NULL) || (tryUuid && uuidKeys != NULL)) {
+            const char* key = NULL;
+            SizeType keyLength = 0;
+            bool hasKey = CurrentKey(key, keyLength);
+
+            if (datetimeKeys != NULL)
+                tryDatetime = tryDatetime && hasKey
+                    && datetimeKeys->Contains(key, keyLength);
+            if (uuidKeys != NULL)
+                tryUuid = tryUuid && hasKey && uuidKeys->Contains(key, keyLength);
+        }
+
+        if (tryDatetime) {
+            int year, month, day, hours, mins, secs, usecs, tzoff;
+
+            if (IsIso8601(str, length, year, month, day,
+                          hours, mins, secs, usecs, tzoff))
+                return HandleIso8601(str, length, year, month, day,
+                                     hours, mins, secs, usecs, tzoff);
+        }
+
+        if (tryUuid && IsUuid(str, length))
+            return HandleUuid(str, length);
+
+        if (stringCache != NULL && length <= StringCache::MAX_LENGTH)
+            value = stringCache->Get(str, length);
+        else
+            value = PyUnicode_FromStringAndSize(str, length);
+        if (value == NULL)
+            return false;
+
+        if (decoderString != NULL) {
+            PyObject* replacement = PyObject_CallFunctionObjArgs(decoderString, value,
+                                                                 NULL);
+            Py_DECREF(value);
+            if (replacement == NULL)
+                return false;
+            value = replacement;
+        }
+
+        return Handle(value);
+    }
+};
+
+/////////////////////////////////
+// Native recording of a parse //
+/////////////////////////////////
+
+
+/* The Tape is a compact, GIL-independent representation of the events generated by the
+   SAX reader: it is filled by a TapeRecorder, that does not touch any Python object and
+   thus can run with the GIL released, and then replayed into a PyHandler to build the
+   actual Python values. */
+
+enum TapeEventType {
+    TE_NULL,
+    TE_BOOL,
+    TE_INT,
+    TE_UINT,
+    TE_INT64,
+    TE_UINT64,
+    TE_DOUBLE,
+    TE_RAW_NUMBER,
+    TE_STRING,
+    TE_KEY,
+    TE_START_OBJECT,
+    TE_END_OBJECT,
+    TE_START_ARRAY,
+    TE_END_ARRAY,
+    TE_NAN,
+    TE_INFINITY
+};
+
+
+struct TapeEvent {
+    unsigned char type;
+    SizeType length;   // length of the string, or count of container members
+    size_t offset;     // position in the input, to report errors
+    union {
+        bool b;
+        int64_t i;
+        uint64_t u;
+        double d;
+        size_t str;    // position of the string within Tape::strings
+        size_t end;    // index of the matching end event of a container
+    } value;
+};
+
+
+struct Tape {
+    std::vector<TapeEvent> events;
+    std::vector<char> strings;
+
+    const char* String(const TapeEvent& event) const {
+        return &strings[event.value.str];
+    }
+};
+
+
+template <typename InputStream>
+struct TapeRecorder {
+    Tape& tape;
+    InputStream& stream;
+    std::vector<size_t> starts;
+    bool outOfMemory;
+
+    TapeRecorder(Tape& t, InputStream& s)
+        : tape(t),
+          stream(s),
+          outOfMemory(false)
+        {}
+
+    bool Add(TapeEventType type, TapeEvent& event) {
+        event.type = type;
+        event.offset = stream.Tell();
+        try {
+            tape.events.push_back(event);
+        } catch (const std::bad_alloc&) {
+            outOfMemory = true;
+            return false;
+        }
+        return true;
+    }
+
+    bool AddString(TapeEventType type, const char* str, SizeType length) {
+        TapeEvent event;
+        event.length = length;
+        event.value.str = tape.strings.size();
+        try {
+            tape.strings.insert(tape.strings.end(), str, str + length);
+            tape.strings.push_back('\0');
+        } catch (const std::bad_alloc&) {
+            outOfMemory = true;
+            return false;
+        }
+        return Add(type, event);
+    }
+
+    bool Start(TapeEventType type) {
+        TapeEvent event;
+        event.length = 0;
+        event.value.end = 0;
+        try {
+            starts.push_back(tape.events.size());
+        } catch (const std::bad_alloc&) {
+            outOfMemory = true;
+            return false;
+        }
+        return Add(type, event);
+    }
+
+    bool End(TapeEventType type, SizeType count) {
+        size_t start = starts.back();
+        starts.pop_back();
+        tape.events[start].length = count;
+        tape.events[start].value.end = tape.events.size();
+        TapeEvent event;
+        event.length = count;
+        event.value.end = 0;
+        return Add(type, event);
+    }
+
+    bool Null() {
+        TapeEvent event;
+        event.length = 0;
+        event.value.u = 0;
+        return Add(TE_NULL, event);
+    }
+
+    bool Bool(bool b) {
+        TapeEvent event;
+        event.length = 0;
+        event.value.b = b;
+        return Add(TE_BOOL, event);
+    }
+
+    bool Int(int i) {
+        TapeEvent event;
+        event.length = 0;
+        event.value.i = i;
+        return Add(TE_INT, event);
+    }
+
+    bool Uint(unsigned i) {
+        TapeEvent event;
+        event.length = 0;
+        event.value.u = i;
+        return Add(TE_UINT, event);
+    }
+
+    bool Int64(int64_t i) {
+        TapeEvent event;
+        event.length = 0;
+        event.value.i = i;
+        return Add(TE_INT64, event);
+    }
+
+    bool Uint64(uint64_t i) {
+        TapeEvent event;
+        event.length = 0;
+        event.value.u = i;
+        return Add(TE_UINT64, event);
+    }
+
+    bool Double(double d) {
+        TapeEvent event;
+        event.length = 0;
+        event.value.d = d;
+        return Add(TE_DOUBLE, event);
+    }
+
+    bool NaN() {
+        TapeEvent event;
+        event.length = 0;
+        event.value.u = 0;
+        return Add(TE_NAN, event);
+    }
+
+    bool Infinity(bool minus) {
+        TapeEvent event;
+        event.length = 0;
+        event.value.b = minus;
+        return Add(TE_INFINITY, event);
+    }
+
+    bool RawNumber(const char* str, SizeType length, bool copy) {
+        return AddString(TE_RAW_NUMBER, str, length);
+    }
+
+    bool String(const char* str, SizeType length, bool copy) {
+        return AddString(TE_STRING, str, length);
+    }
+
+    bool Key(const char* str, SizeType length, bool copy) {
+        return AddString(TE_KEY, str, length);
+    }
+
+    bool StartObject() {
+        return Start(TE_START_OBJECT);
+    }
+
+    bool EndObject(SizeType memberCount) {
+        return End(TE_END_OBJECT, memberCount);
+    }
+
+    bool StartArray() {
+        return Start(TE_START_ARRAY);
+    }
+
+    bool EndArray(SizeType elementCount) {
+        return End(TE_END_ARRAY, elementCount);
+    }
+};
+
+
+/* Feed the events between first (included) and last (excluded) to the given handler: in
+   case of failure, return false and set errorOffset to the position of the culprit in
+   the original input. */
+
+template <typename Handler>
+static bool
+replay_tape(const Tape& tape, size_t first, size_t last, Handler& handler,
+            size_t& errorOffset)
+{
+    for (size_t i = first; i < last; i++) {
+        const TapeEvent& event = tape.events[i];
+        bool ok;
+
+        switch (event.type) {
+        case TE_NULL:
+            ok = handler.Null();
+            break;
+        case TE_BOOL:
+            ok = handler.Bool(event.value.b);
+            break;
+        case TE_INT:
+            ok = handler.Int((int) event.value.i);
+            break;
+        case TE_UINT:
+            ok = handler.Uint((unsigned) event.value.u);
+            break;
+        case TE_INT64:
+            ok = handler.Int64(event.value.i);
+            break;
+        case TE_UINT64:
+            ok = handler.Uint64(event.value.u);
+            break;
+        case TE_DOUBLE:
+            ok = handler.Double(event.value.d);
+            break;
+        case TE_RAW_NUMBER:
+            ok = handler.RawNumber(tape.String(event), event.length, false);
+            break;
+        case TE_STRING:
+            ok = handler.String(tape.String(event), event.length, false);
+            break;
+        case TE_KEY:
+            ok = handler.Key(tape.String(event), event.length, false);
+            break;
+        case TE_START_OBJECT:
+            ok = handler.StartObject();
+            break;
+        case TE_END_OBJECT:
+            ok = handler.EndObject(event.length);
+            break;
+        case TE_START_ARRAY:
+            ok = handler.StartArray();
+            break;
+        case TE_END_ARRAY:
+            ok = handler.EndArray(event.length);
+            break;
+        case TE_NAN:
+            ok = handler.NaN();
+            break;
+        case TE_INFINITY:
+            ok = handler.Infinity(event.value.b);
+            break;
+        default:
+            assert(false);
+            ok = false;
+        }
+
+        if (!ok) {
+            errorOffset = event.offset;
+            return false;
+        }
+    }
+    return true;
+}
+
+
+typedef struct {
+    PyObject_HEAD
+    unsigned datetimeMode;
+    unsigned uuidMode;
+    unsigned numberMode;
+    unsigned parseMode;
+    unsigned arrayMode;
+    bool releaseGil;
+    bool lazy;
+    struct FeedState* feed;
+    unsigned keyCacheSize;
+    struct StringCache* keyCache;
+    unsigned stringCacheSize;
+    struct StringCache* stringCache;
+    PyObject* target;
+    struct Schema* schema;
+    unsigned hooks;
+    unsigned int hooksVersion;  // the tp_version_tag of the type when hooks was resolved
+    struct DecoderState* state;
+    PyObject* datetimeKeysObj;
+    struct KeySet* datetimeKeys;
+    PyObject* uuidKeysObj;
+    struct KeySet* uuidKeys;
+} DecoderObject;
+
+
+static StringCache*
+decoder_key_cache(PyObject* decoder)
+{
+    return ((DecoderObject*) decoder)->keyCache;
+}
+
+
+static StringCache*
+decoder_string_cache(PyObject* decoder)
+{
+    return ((DecoderObject*) decoder)->stringCache;
+}
+
+
+static unsigned
+decoder_array_mode(PyObject* decoder)
+{
+    return ((DecoderObject*) decoder)->arrayMode;
+}
+
+
+static Schema*
+decoder_schema(PyObject* decoder)
+{
+    return ((DecoderObject*) decoder)->schema;
+}
+
+
+static unsigned
+decoder_hooks(PyObject* decoder)
+{
+    DecoderObject* d = (DecoderObject*) decoder;
+    unsigned int version = Py_TYPE(decoder)->tp_version_tag;
+
+    // A zero version tag means that the type could have been modified
+    if ((d->hooks & HOOKS_UNRESOLVED) || version == 0 || version != d->hooksVersion) {
+        d->hooks = 0;
+        if (PyObject_HasAttr(decoder, start_object_name))
+            d->hooks |= HOOK_START_OBJECT;
+        if (PyObject_HasAttr(decoder, end_object_name))
+            d->hooks |= HOOK_END_OBJECT;
+        if (PyObject_HasAttr(decoder, end_array_name))
+            d->hooks |= HOOK_END_ARRAY;
+        if (PyObject_HasAttr(decoder, string_name))
+            d->hooks |= HOOK_STRING;
+        // The lookups above assign a version tag to the type, if it had none
+        d->hooksVersion = Py_TYPE(decoder)->tp_version_tag;
+    }
+    return d->hooks;
+}
+
+
+static int
+decoder_setattro(PyObject* self, PyObject* name, PyObject* value)
+{
+    int rc = PyObject_GenericSetAttr(self, name, value);
+    if (rc == 0)
+        ((DecoderObject*) self)->hooks = HOOKS_UNRESOLVED;
+    return rc;
+}
+
+
+static const KeySet*
+decoder_datetime_keys(PyObject* decoder)
+{
+    return ((DecoderObject*) decoder)->datetimeKeys;
+}
+
+
+static const KeySet*
+decoder_uuid_keys(PyObject* decoder)
+{
+    return ((DecoderObject*) decoder)->uuidKeys;
+}
+
+
+// Return the resources retained by the decoder, NULL if they cannot be allocated
+
+static DecoderState*
+decoder_state(PyObject* decoder)
+{
+    DecoderObject* d = (DecoderObject*) decoder;
+
+    if (d->state == NULL)
+        d->state = new (std::nothrow) DecoderState();
+    return d->state;
+}
+
+
+// Check that the decoder is not lazy and, unless the given method builds its values the
+// way __call__() does, that it has no target type nor datetime_keys and uuid_keys,
+// raising a ValueError otherwise
+
+static bool
+decoder_check_options(PyObject* decoder, const char* method, bool honorsOptions)
+{
+    DecoderObject* d = (DecoderObject*) decoder;
+
+    if (d->lazy) {
+        PyErr_Format(PyExc_ValueError, "Lazy decoding does not support %s()", method);
+        return false;
+    }
+
+    if (!honorsOptions && d->schema != NULL) {
+        PyErr_Format(PyExc_ValueError, "%s() does not support a target type", method);
+        return false;
+    }
+
+    if (!honorsOptions && (d->datetimeKeys != NULL || d->uuidKeys != NULL)) {
+        PyErr_Format(PyExc_ValueError,
+                     "%s() does not support datetime_keys and uuid_keys", method);
+        return false;
+    }
+
+    return true;
+}
+
+
+PyDoc_STRVAR(loads_docstring,
+             "loads(string, *, object_hook=None, number_mode=None, datetime_mode=None,"
+             " uuid_mode=None, parse_mode=None, array_mode=None, release_gil=False,"
+             " allow_nan=True)\n"
+             "\n"
+             "Decode a JSON string into a Python object.");
+
+
+static PyObject*
+loads(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    /* Converts a JSON encoded string to a Python object. */
+
+    static char const* kwlist[] = {
+        "string",
+        "object_hook",
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "parse_mode",
+        "array_mode",
+        "release_gil",
+
+        /* compatibility with stdlib json */
+        "allow_nan",
+
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* objectHook = NULL;
+    PyObject* datetimeModeObj = NULL;
+    unsigned datetimeMode = DM_NONE;
+    PyObject* uuidModeObj = NULL;
+    unsigned uuidMode = UM_NONE;
+    PyObject* numberModeObj = NULL;
+    unsigned numberMode = NM_NAN;
+    PyObject* parseModeObj = NULL;
+    unsigned parseMode = PM_NONE;
+    PyObject* arrayModeObj = NULL;
+    unsigned arrayMode = AM_NONE;
+    int releaseGil = false;
+    int allowNan = -1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$OOOOOOpp:rapidjson.loads",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &objectHook,
+                                     &numberModeObj,
+                                     &datetimeModeObj,
+                                     &uuidModeObj,
+                                     &parseModeObj,
+                                     &arrayModeObj,
+                                     &releaseGil,
+                                     &allowNan))
+        return NULL;
+
+    if (objectHook && !PyCallable_Check(objectHook)) {
+        if (objectHook == Py_None) {
+            objectHook = NULL;
+        } else {
+            PyErr_SetString(PyExc_TypeError, "object_hook is not callable");
+            return NULL;
+        }
+    }
+
+    if (!accept_number_mode_arg(numberModeObj, allowNan, numberMode))
+        return NULL;
+    if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid number_mode, combining NM_NATIVE with NM_DECIMAL"
+                        " is not supported");
+        return NULL;
+    }
+
+    if (!accept_datetime_mode_arg(datetimeModeObj, datetimeMode))
+        return NULL;
+    if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid datetime_mode, can deserialize only from"
+                        " ISO8601");
+        return NULL;
+    }
+
+    if (!accept_uuid_mode_arg(uuidModeObj, uuidMode))
+        return NULL;
+
+    if (!accept_parse_mode_arg(parseModeObj, parseMode))
+        return NULL;
+
+    if (!accept_array_mode_arg(arrayModeObj, arrayMode))
+        return NULL;
+
+    Py_ssize_t jsonStrLen;
+    const char* jsonStr;
+    Py_buffer view;
+    bool isBuffer = false;
+
+    if (PyUnicode_Check(jsonObject)) {
+        jsonStr = PyUnicode_AsUTF8AndSize(jsonObject, &jsonStrLen);
+        if (jsonStr == NULL) {
+            return NULL;
+        }
+    } else if (PyObject_CheckBuffer(jsonObject)) {
+        // Parse bytes, bytearray, memoryview, mmap and whatever else implements the
+        // buffer protocol straight from their memory, letting the reader validate the
+        // UTF-8 encoding
+        if (PyObject_GetBuffer(jsonObject, &view, PyBUF_SIMPLE) < 0)
+            return NULL;
+        isBuffer = true;
+        jsonStr = (const char*) view.buf;
+        jsonStrLen = view.len;
+    } else {
+        PyErr_SetString(PyExc_TypeError,
+                        "Expected string or UTF-8 encoded bytes-like object");
+        return NULL;
+    }
+
+    PyObject* result = do_decode(NULL, jsonStr, jsonStrLen, isBuffer, NULL, 0, objectHook,
+                                 numberMode, datetimeMode, uuidMode, parseMode,
+                                 arrayMode, releaseGil ? true : false);
+
+    if (isBuffer)
+        PyBuffer_Release(&view);
+
+    return result;
+}
+
+
+PyDoc_STRVAR(load_docstring,
+             "load(stream, *, object_hook=None, number_mode=None, datetime_mode=None,"
+             " uuid_mode=None, parse_mode=None, array_mode=None, chunk_size=65536,"
+             " allow_nan=True)\n"
+             "\n"
+             "Decode a JSON stream into a Python object.");
+
+
+static PyObject*
+load(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    /* Converts a JSON encoded stream to a Python object. */
+
+    static char const* kwlist[] = {
+        "stream",
+        "object_hook",
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "parse_mode",
+        "array_mode",
+        "chunk_size",
+
+        /* compatibility with stdlib json */
+        "allow_nan",
+
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* objectHook = NULL;
+    PyObject* datetimeModeObj = NULL;
+    unsigned datetimeMode = DM_NONE;
+    PyObject* uuidModeObj = NULL;
+    unsigned uuidMode = UM_NONE;
+    PyObject* numberModeObj = NULL;
+    unsigned numberMode = NM_NAN;
+    PyObject* parseModeObj = NULL;
+    unsigned parseMode = PM_NONE;
+    PyObject* arrayModeObj = NULL;
+    unsigned arrayMode = AM_NONE;
+    PyObject* chunkSizeObj = NULL;
+    size_t chunkSize = 65536;
+    int allowNan = -1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$OOOOOOOp:rapidjson.load",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &objectHook,
+                                     &numberModeObj,
+                                     &datetimeModeObj,
+                                     &uuidModeObj,
+                                     &parseModeObj,
+                                     &arrayModeObj,
+                                     &chunkSizeObj,
+                                     &allowNan))
+        return NULL;
+
+    if (!PyObject_HasAttr(jsonObject, read_name)) {
+        PyErr_SetString(PyExc_TypeError, "Expected file-like object");
+        return NULL;
+    }
+
+    if (objectHook && !PyCallable_Check(objectHook)) {
+        if (objectHook == Py_None) {
+            objectHook = NULL;
+        } else {
+            PyErr_SetString(PyExc_TypeError, "object_hook is not callable");
+            return NULL;
+        }
+    }
+
+    if (numberModeObj) {
+        if (numberModeObj == Py_None) {
+            numberMode = NM_NONE;
+        } else if (PyLong_Check(numberModeObj)) {
+            int mode = PyLong_AsLong(numberModeObj);
+            if (mode < 0 || mode >= NM_MAX) {
+                PyErr_SetString(PyExc_ValueError, "Invalid number_mode");
+                return NULL;
+            }
+            numberMode = (unsigned) mode;
+            if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
+                PyErr_SetString(PyExc_ValueError,
+                                "Combining NM_NATIVE with NM_DECIMAL is not supported");
+                return NULL;
+            }
+        }
+    }
+    if (allowNan != -1) {
+        if (allowNan)
+            numberMode |= NM_NAN;
+        else
+            numberMode &= ~NM_NAN;
+    }
+
+    if (datetimeModeObj) {
+        if (datetimeModeObj == Py_None) {
+            datetimeMode = DM_NONE;
+        } else if (PyLong_Check(datetimeModeObj)) {
+            int mode = PyLong_AsLong(datetimeModeObj);
+            if (!valid_datetime_mode(mode)) {
+                PyErr_SetString(PyExc_ValueError, "Invalid datetime_mode");
+                return NULL;
+            }
+            datetimeMode = (unsigned) mode;
+            if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
+                PyErr_SetString(PyExc_ValueError,
+                                "Invalid datetime_mode, can deserialize only from"
+                                " ISO8601");
+                return NULL;
+            }
+        } else {
+            PyErr_SetString(PyExc_TypeError,
+                            "datetime_mode must be a non-negative integer value or None");
+            return NULL;
+        }
+    }
+
+    if (uuidModeObj) {
+        if (uuidModeObj == Py_None) {
+            uuidMode = UM_NONE;
+        } else if (PyLong_Check(uuidModeObj)) {
+            int mode = PyLong_AsLong(uuidModeObj);
+            if (mode < 0 || mode >= UM_MAX) {
+                PyErr_SetString(PyExc_ValueError, "Invalid uuid_mode");
+                return NULL;
+            }
+            uuidMode = (unsigned) mode;
+        } else {
+            PyErr_SetString(PyExc_TypeError,
+                            "uuid_mode must be an integer value or None");
+            return NULL;
+        }
+    }
+
+    if (parseModeObj) {
+        if (parseModeObj == Py_None) {
+            parseMode = PM_NONE;
+        } else if (PyLong_Check(parseModeObj)) {
+            int mode = PyLong_AsLong(parseModeObj);
+            if (mode < 0 || mode >= PM_MAX) {
+                PyErr_SetString(PyExc_ValueError, "Invalid parse_mode");
+                return NULL;
+            }
+            parseMode = (unsigned) mode;
+        } else {
+            PyErr_SetString(PyExc_TypeError,
+                            "parse_mode must be an integer value or None");
+            return NULL;
+        }
+    }
+
+    if (!accept_array_mode_arg(arrayModeObj, arrayMode))
+        return NULL;
+
+    if (chunkSizeObj && chunkSizeObj != Py_None) {
+        if (PyLong_Check(chunkSizeObj)) {
+            Py_ssize_t size = PyNumber_AsSsize_t(chunkSizeObj, PyExc_ValueError);
+            if (PyErr_Occurred() || size < 4 || size > UINT_MAX) {
+                PyErr_SetString(PyExc_ValueError,
+                                "Invalid chunk_size, must be an integer between 4 and"
+                                " UINT_MAX");
+                return NULL;
+            }
+            chunkSize = (size_t) size;
+        } else {
+            PyErr_SetString(PyExc_TypeError,
+                            "chunk_size must be an unsigned integer value or None");
+            return NULL;
+        }
+    }
+
+    return do_decode(NULL, NULL, 0, false, jsonObject, chunkSize, objectHook,
+                     numberMode, datetimeMode, uuidMode, parseMode, arrayMode, false);
+}
+
+
+/////////////////////////
+// Whole file decoding //
+/////////////////////////
+
+
+/* The content of a file descriptor, from its current position up to the end: regular
+   files are mapped in memory, anything else is read in large blocks. In both cases the
+   I/O happens with the GIL released. */
+
+class FileContent {
+public:
+    enum { BLOCK_SIZE = 1 << 20 };
+
+    const char* data;
+    size_t size;
+
+    FileContent()
+        : data(NULL), size(0), block(NULL), map(NULL), mapSize(0) {}
+
+    ~FileContent() {
+#ifndef _WIN32
+        if (map != NULL)
+            munmap(map, mapSize);
+#endif
+        PyMem_RawFree(block);
+    }
+
+    bool Load(int fd) {
+#ifndef _WIN32
+        struct stat st;
+        off_t start;
+
+        Py_BEGIN_ALLOW_THREADS
+        if (fstat(fd, &st) == 0 && S_ISREG(st.st_mode)
+            && (start = lseek(fd, 0, SEEK_CUR)) >= 0 && start < st.st_size) {
+            int flags = MAP_PRIVATE;
+#ifdef MAP_POPULATE
+            // Fault in all the pages now, instead of while parsing
+            flags |= MAP_POPULATE;
+#endif
+            void* m = mmap(NULL, (size_t) st.st_size, PROT_READ, flags, fd, 0);
+            if (m != MAP_FAILED) {
+                map = m;
+                mapSize = (size_t) st.st_size;
+                data = (const char*) m + start;
+                size = mapSize - (size_t) start;
+                // Leave the file positioned at its end, as reading it would do
+                lseek(fd, st.st_size, SEEK_SET);
+            }
+        }
+        Py_END_ALLOW_THREADS
+
+        if (map != NULL)
+            return true;
+#endif
+
+        return ReadAll(fd);
+    }
+
+private:
+    bool ReadAll(int fd) {
+        size_t capacity = 0;
+
+        while (true) {
+            if (size == capacity) {
+                size_t newCapacity = capacity ? capacity * 2 : BLOCK_SIZE;
+                char* newBlock = (char*) PyMem_RawRealloc(block, newCapacity);
+                if (newBlock == NULL) {
+                    PyErr_NoMemory();
+                    return false;
+                }
+                block = newBlock;
+                capacity = newCapacity;
+            }
+
+            Py_ssize_t len;
+
+            Py_BEGIN_ALLOW_THREADS
+#ifdef _WIN32
+            len = _read(fd, block + size,
+                        (unsigned) std::min(capacity - size, (size_t) INT_MAX));
+#else
+            len = read(fd, block + size, capacity - size);
+#endif
+            Py_END_ALLOW_THREADS
+
+            if (len < 0) {
+                if (errno == EINTR && PyErr_CheckSignals() == 0)
+                    continue;
+                if (!PyErr_Occurred())
+                    PyErr_SetFromErrno(PyExc_OSError);
+                return false;
+            }
+
+            if (len == 0)
+                break;
+
+            size += (size_t) len;
+        }
+
+        data = block;
+        return true;
+    }
+
+    char* block;
+    void* map;
+    size_t mapSize;
+};
+
+
+PyDoc_STRVAR(load_path_docstring,
+             "load_path(path, *, object_hook=None, number_mode=None, datetime_mode=None,"
+             " uuid_mode=None, parse_mode=None, array_mode=None, release_gil=False,"
+             " allow_nan=True)\n"
+             "\n"
+             "Decode the JSON content of the file at the given path into a Python object.");
+
+
+PyDoc_STRVAR(load_fd_docstring,
+             "load_fd(fd, *, object_hook=None, number_mode=None, datetime_mode=None,"
+             " uuid_mode=None, parse_mode=None, array_mode=None, release_gil=False,"
+             " allow_nan=True)\n"
+             "\n"
+             "Decode the JSON content read from the given file descriptor into a Python"
+             " object.");
+
+
+static PyObject*
+do_load_file(PyObject* args, PyObject* kwargs, bool isPath)
+{
+    static char const* pathKwlist[] = {
+        "path",
+        "object_hook",
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "parse_mode",
+        "array_mode",
+        "release_gil",
+
+        /* compatibility with stdlib json */
+        "allow_nan",
+
+        NULL
+    };
+    static char const* fdKwlist[] = {
+        "fd",
+        "object_hook",
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "parse_mode",
+        "array_mode",
+        "release_gil",
+
+        /* compatibility with stdlib json */
+        "allow_nan",
+
+        NULL
+    };
+    PyObject* fileObject;
+    PyObject* objectHook = NULL;
+    PyObject* datetimeModeObj = NULL;
+    unsigned datetimeMode = DM_NONE;
+    PyObject* uuidModeObj = NULL;
+    unsigned uuidMode = UM_NONE;
+    PyObject* numberModeObj = NULL;
+    unsigned numberMode = NM_NAN;
+    PyObject* parseModeObj = NULL;
+    unsigned parseMode = PM_NONE;
+    PyObject* arrayModeObj = NULL;
+    unsigned arrayMode = AM_NONE;
+    int releaseGil = false;
+    int allowNan = -1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs,
+                                     isPath
+                                     ? "O|$OOOOOOpp:rapidjson.load_path"
+                                     : "O|$OOOOOOpp:rapidjson.load_fd",
+                                     (char**) (isPath ? pathKwlist : fdKwlist),
+                                     &fileObject,
+                                     &objectHook,
+                                     &numberModeObj,
+                                     &datetimeModeObj,
+                                     &uuidModeObj,
+                                     &parseModeObj,
+                                     &arrayModeObj,
+                                     &releaseGil,
+                                     &allowNan))
+        return NULL;
+
+    if (objectHook && !PyCallable_Check(objectHook)) {
+        if (objectHook == Py_None) {
+            objectHook = NULL;
+        } else {
+            PyErr_SetString(PyExc_TypeError, "object_hook is not callable");
+            return NULL;
+        }
+    }
+
+    if (!accept_number_mode_arg(numberModeObj, allowNan, numberMode))
+        return NULL;
+    if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid number_mode, combining NM_NATIVE with NM_DECIMAL"
+                        " is not supported");
+        return NULL;
+    }
+
+    if (!accept_datetime_mode_arg(datetimeModeObj, datetimeMode))
+        return NULL;
+    if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid datetime_mode, can deserialize only from"
+                        " ISO8601");
+        return NULL;
+    }
+
+    if (!accept_uuid_mode_arg(uuidModeObj, uuidMode))
+        return NULL;
+
+    if (!accept_parse_mode_arg(parseModeObj, parseMode))
+        return NULL;
+
+    if (!accept_array_mode_arg(arrayModeObj, arrayMode))
+        return NULL;
+
+    PyObject* file = NULL;
+    int fd;
+
+    if (isPath && PyLong_Check(fileObject)) {
+        // io.FileIO would take it as a file descriptor, and close it
+        PyErr_SetString(PyExc_TypeError,
+                        "path must be a string, bytes or path-like object");
+        return NULL;
+    } else if (isPath) {
+        // Let io.FileIO deal with str, bytes and path-like objects, and raise the usual
+        // exceptions
+        file = PyObject_CallFunction(fileio_type, "Os", fileObject, "rb");
+        if (file == NULL)
+            return NULL;
+        fd = PyObject_AsFileDescriptor(file);
+    } else if (PyLong_Check(fileObject)) {
+        fd = PyObject_AsFileDescriptor(fileObject);
+    } else {
+        PyErr_SetString(PyExc_TypeError, "fd must be an integer file descriptor");
+        return NULL;
+    }
+
+    PyObject* result = NULL;
+
+    if (fd != -1) {
+        FileContent content;
+
+        if (content.Load(fd))
+            result = do_decode(NULL, content.data, content.size, true, NULL, 0,
+                               objectHook, numberMode, datetimeMode, uuidMode,
+                               parseMode, arrayMode, releaseGil ? true : false);
+    }
+
+    if (file != NULL) {
+        // Close the file without hiding a previous error
+        PyObject *type, *value, *traceback;
+        PyErr_Fetch(&type, &value, &traceback);
+
+        PyObject* closed = PyObject_CallMethodObjArgs(file, close_name, NULL);
+        Py_DECREF(file);
+
+        if (closed != NULL)
+            Py_DECREF(closed);
+        else if (result != NULL)
+            Py_CLEAR(result);
+
+        if (type != NULL) {
+            PyErr_Clear();
+            PyErr_Restore(type, value, traceback);
+        }
+    }
+
+    return result;
+}
+
+
+static PyObject*
+load_path(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    /* Converts the JSON content of a file to a Python object. */
+
+    return do_load_file(args, kwargs, true);
+}
+
+
+static PyObject*
+load_fd(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    /* Converts the JSON content read from a file descriptor to a Python object. */
+
+    return do_load_file(args, kwargs, false);
+}
+
+
+PyDoc_STRVAR(decoder_doc,
+             "Decoder(number_mode=None, datetime_mode=None, uuid_mode=None,"
+             " parse_mode=None, release_gil=False, lazy=False, key_cache_size=0,"
+             " string_cache_size=0, array_mode=None, target=None, datetime_keys=None,"
+             " uuid_keys=None)\n"
+             "\n"
+             "Create and return a new Decoder instance.");
+
+
+static PyMemberDef decoder_members[] = {
+    {"datetime_mode",
+     T_UINT, offsetof(DecoderObject, datetimeMode), READONLY,
+     "The datetime mode, whether and how datetime literals will be recognized."},
+    {"uuid_mode",
+     T_UINT, offsetof(DecoderObject, uuidMode), READONLY,
+     "The UUID mode, whether and how UUID literals will be recognized."},
+    {"number_mode",
+     T_UINT, offsetof(DecoderObject, numberMode), READONLY,
+     "The number mode, whether numeric literals will be decoded."},
+    {"parse_mode",
+     T_UINT, offsetof(DecoderObject, parseMode), READONLY,
+     "The parse mode, whether comments and trailing commas are allowed."},
+    {"array_mode",
+     T_UINT, offsetof(DecoderObject, arrayMode), READONLY,
+     "The array mode, whether arrays of numbers are decoded into array.array."},
+    {"target",
+     T_OBJECT, offsetof(DecoderObject, target), READONLY,
+     "The type the documents are decoded into, None for plain decoding."},
+    {"datetime_keys",
+     T_OBJECT, offsetof(DecoderObject, datetimeKeysObj), READONLY,
+     "The keys whose values may be decoded as datetimes, None for any string."},
+    {"uuid_keys",
+     T_OBJECT, offsetof(DecoderObject, uuidKeysObj), READONLY,
+     "The keys whose values may be decoded as UUIDs, None for any string."},
+    {"release_gil",
+     T_BOOL, offsetof(DecoderObject, releaseGil), READONLY,
+     "Whether the GIL is released while parsing strings."},
+    {"lazy",
+     T_BOOL, offsetof(DecoderObject, lazy), READONLY,
+     "Whether JSON objects and arrays are decoded on demand."},
+    {"key_cache_size",
+     T_UINT, offsetof(DecoderObject, keyCacheSize), READONLY,
+     "The maximum number of dictionary keys kept across calls, 0 if disabled."},
+    {"string_cache_size",
+     T_UINT, offsetof(DecoderObject, stringCacheSize), READONLY,
+     "The maximum number of distinct short string values kept across calls, 0 if"
+     " disabled."},
+    {NULL}
+};
+
+
+PyDoc_STRVAR(decoder_extract_docstring,
+             "extract(json, pointers, *, chunk_size=65536, stop_early=False)\n"
+             "\n"
+             "Decode only the values addressed by the given JSON Pointers, returning a"
+             " dictionary keyed by pointer.");
+
+
+PyDoc_STRVAR(decoder_iter_docstring,
+             "iter(json, *, chunk_size=65536)\n"
+             "\n"
+             "Iterate over the JSON documents contained in a string, a bytes-like object or"
+             " a stream, either concatenated or one per line.");
+
+
+PyDoc_STRVAR(decoder_iterparse_docstring,
+             "iterparse(json, prefix=None, *, chunk_size=65536)\n"
+             "\n"
+             "Iterate over the parsing events of a JSON document, as (path, event, value)"
+             " tuples, or over the fully decoded items of the container addressed by the"
+             " prefix JSON Pointer.");
+
+
+PyDoc_STRVAR(decoder_columns_docstring,
+             "columns(json, path=None, *, chunk_size=65536)\n"
+             "\n"
+             "Decode an array of objects, possibly addressed by the path JSON Pointer, into"
+             " a dictionary of columns, packing the numeric ones into array.array"
+             " instances.");
+
+
+PyDoc_STRVAR(decoder_map_docstring,
+             "map(documents, *, workers=None)\n"
+             "\n"
+             "Decode an iterable of JSON strings or bytes-like objects into a list of"
+             " Python objects, parsing them in parallel on a pool of native threads.");
+
+
+PyDoc_STRVAR(decoder_feed_docstring,
+             "feed(data)\n"
+             "\n"
+             "Push a chunk of JSON data, either a string or a bytes-like object, returning"
+             " the list of the top level values completed by it.");
+
+
+PyDoc_STRVAR(decoder_close_docstring,
+             "close()\n"
+             "\n"
+             "Signal the end of the data pushed with feed(), returning the list of the"
+             " remaining values.");
+
+
+static PyObject*
+string_cache_info(StringCache* cache)
+{
+    if (cache == NULL)
+        return Py_BuildValue("{s:i,s:i,s:i,s:i}",
+                             "hits", 0, "misses", 0, "maxsize", 0, "currsize", 0);
+
+    return Py_BuildValue("{s:n,s:n,s:n,s:n}",
+                         "hits", (Py_ssize_t) cache->hits,
+                         "misses", (Py_ssize_t) cache->misses,
+                         "maxsize", (Py_ssize_t) cache->capacity,
+                         "currsize", (Py_ssize_t) cache->size);
+}
+
+
+PyDoc_STRVAR(decoder_key_cache_info_docstring,
+             "key_cache_info()\n"
+             "\n"
+             "Return a dictionary with the statistics of the key cache: the number of hits"
+             " and misses, its maximum and current size.");
+
+
+static PyObject*
+decoder_key_cache_info(PyObject* self, PyObject* unused)
+{
+    return string_cache_info(((DecoderObject*) self)->keyCache);
+}
+
+
+PyDoc_STRVAR(decoder_string_cache_info_docstring,
+             "string_cache_info()\n"
+             "\n"
+             "Return a dictionary with the statistics of the string values cache: the"
+             " number of hits and misses, its maximum and current size.");
+
+
+static PyObject*
+decoder_string_cache_info(PyObject* self, PyObject* unused)
+{
+    return string_cache_info(((DecoderObject*) self)->stringCache);
+}
+
+
+static PyMethodDef decoder_methods[] = {
+    {"extract", (PyCFunction) decoder_extract, METH_VARARGS | METH_KEYWORDS,
+     decoder_extract_docstring},
+    {"iter", (PyCFunction) decoder_iter, METH_VARARGS | METH_KEYWORDS,
+     decoder_iter_docstring},
+    {"iterparse", (PyCFunction) decoder_iterparse, METH_VARARGS | METH_KEYWORDS,
+     decoder_iterparse_docstring},
+    {"columns", (PyCFunction) decoder_columns, METH_VARARGS | METH_KEYWORDS,
+     decoder_columns_docstring},
+    {"map", (PyCFunction) decoder_map, METH_VARARGS | METH_KEYWORDS,
+     decoder_map_docstring},
+    {"feed", (PyCFunction) decoder_feed, METH_O,
+     decoder_feed_docstring},
+    {"close", (PyCFunction) decoder_close, METH_NOARGS,
+     decoder_close_docstring},
+    {"key_cache_info", (PyCFunction) decoder_key_cache_info, METH_NOARGS,
+     decoder_key_cache_info_docstring},
+    {"string_cache_info", (PyCFunction) decoder_string_cache_info, METH_NOARGS,
+     decoder_string_cache_info_docstring},
+    {NULL, NULL}
+};
+
+
+static PyTypeObject Decoder_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "rapidjson.Decoder",                      /* tp_name */
+    sizeof(DecoderObject),                    /* tp_basicsize */
+    0,                                        /* tp_itemsize */
+    decoder_dealloc,                          /* tp_dealloc */
+    0,                                        /* tp_print */
+    0,                                        /* tp_getattr */
+    0,                                        /* tp_setattr */
+    0,                                        /* tp_compare */
+    0,                                        /* tp_repr */
+    0,                                        /* tp_as_number */
+    0,                                        /* tp_as_sequence */
+    0,                                        /* tp_as_mapping */
+    0,                                        /* tp_hash */
+    (ternaryfunc) decoder_call,               /* tp_call */
+    0,                                        /* tp_str */
+    0,                                        /* tp_getattro */
+    decoder_setattro,                         /* tp_setattro */
+    0,                                        /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, /* tp_flags */
+    decoder_doc,                              /* tp_doc */
+    0,                                        /* tp_traverse */
+    0,                                        /* tp_clear */
+    0,                                        /* tp_richcompare */
+    0,                                        /* tp_weaklistoffset */
+    0,                                        /* tp_iter */
+    0,                                        /* tp_iternext */
+    decoder_methods,                          /* tp_methods */
+    decoder_members,                          /* tp_members */
+    0,                                        /* tp_getset */
+    0,                                        /* tp_base */
+    0,                                        /* tp_dict */
+    0,                                        /* tp_descr_get */
+    0,                                        /* tp_descr_set */
+    0,                                        /* tp_dictoffset */
+    0,                                        /* tp_init */
+    0,                                        /* tp_alloc */
+    decoder_new,                              /* tp_new */
+    PyObject_Del,                             /* tp_free */
+};
+
+
+#define Decoder_CheckExact(v) (Py_TYPE(v) == &Decoder_Type)
+#define Decoder_Check(v) PyObject_TypeCheck(v, &Decoder_Type)
+
+
+#define DECODE_WITH(r, m, f, s, h)                                      \
+    do {                                                                \
+        /* FIXME: isn't there a cleverer way to write the following?    \
+                                                                        \
+           Ideally, one would do something like:                        \
+                                                                        \
+               unsigned flags = kParseInsituFlag;                       \
+                                                                        \
+               if (! (numberMode & NM_NATIVE))                          \
+                   flags |= kParseNumbersAsStringsFlag;                 \
+               if (numberMode & NM_NAN)                                 \
+                   flags |= kParseNanAndInfFlag;                        \
+               if (parseMode & PM_COMMENTS)                             \
+                   flags |= kParseCommentsFlag;                         \
+               if (parseMode & PM_TRAILING_COMMAS)                      \
+                   flags |= kParseTrailingCommasFlag;                   \
+                                                                        \
+               reader.Parse<flags>(ss, handler);                        \
+                                                                        \
+           but C++ does not allow that...                               \
+        */                                                              \
+                                                                        \
+        if (numberMode & NM_NAN) {                                      \
+            if (numberMode & NM_NATIVE) {                               \
+                if (parseMode & PM_TRAILING_COMMAS) {                   \
+                    if (parseMode & PM_COMMENTS) {                      \
+                        r.m<f |                                         \
+                                kParseNanAndInfFlag |                   \
+                                kParseCommentsFlag |                    \
+                                kParseTrailingCommasFlag>(s, h);        \
+                    } else {                                            \
+                        r.m<f |                                         \
+                                kParseNanAndInfFlag |                   \
+                                kParseTrailingCommasFlag>(s, h);        \
+                    }                                                   \
+                } else if (parseMode & PM_COMMENTS) {                   \
+                    r.m<f |                                             \
+                            kParseNanAndInfFlag |                       \
+                            kParseCommentsFlag>(s, h);                  \
+                } else {                                                \
+                    r.m<f |                                             \
+                            kParseNanAndInfFlag>(s, h);                 \
+                }                                                       \
+            } else if (parseMode & PM_TRAILING_COMMAS) {                \
+                if (parseMode & PM_COMMENTS) {                          \
+                    r.m<f |                                             \
+                            kParseNumbersAsStringsFlag |                \
+                            kParseNanAndInfFlag |                       \
+                            kParseCommentsFlag |                        \
+                            kParseTrailingCommasFlag>(s, h);            \
+                } else {                                                \
+                    r.m<f |                                             \
+                            kParseNumbersAsStringsFlag |                \
+                            kParseNanAndInfFlag |                       \
+                            kParseTrailingCommasFlag>(s, h);            \
+                }                                                       \
+            } else if (parseMode & PM_COMMENTS) {                       \
+                r.m<f |                                                 \
+                        kParseNumbersAsStringsFlag |                    \
+                        kParseNanAndInfFlag |                           \
+                        kParseCommentsFlag>(s, h);                      \
+            } else {                                                    \
+                r.m<f |                                                 \
+                        kParseNumbersAsStringsFlag |                    \
+                        kParseNanAndInfFlag>(s, h);                     \
+            }                                                           \
+        } else if (numberMode & NM_NATIVE) {                            \
+            if (parseMode & PM_TRAILING_COMMAS) {                       \
+                if (parseMode & PM_COMMENTS) {                          \
+                    r.m<f |                                             \
+                            kParseCommentsFlag |                        \
+                            kParseTrailingCommasFlag>(s, h);            \
+                } else {                                                \
+                    r.m<f |                                             \
+                            kParseTrailingCommasFlag>(s, h);            \
+                }                                                       \
+            } else if (parseMode & PM_COMMENTS) {                       \
+                r.m<f |                                                 \
+                        kParseCommentsFlag>(s, h);                      \
+            } else {                                                    \
+                r.m<f>(s, h);                                           \
+            }                                                           \
+        } else if (parseMode & PM_TRAILING_COMMAS) {                    \
+            if (parseMode & PM_COMMENTS) {                              \
+                r.m<f |                                                 \
+                        kParseCommentsFlag |                            \
+                        kParseNumbersAsStringsFlag>(s, h);              \
+            } else {                                                    \
+                r.m<f |                                                 \
+                        kParseNumbersAsStringsFlag |                    \
+                        kParseTrailingCommasFlag>(s, h);                \
+            }                                                           \
+        } else {                                                        \
+            r.m<f | kParseNumbersAsStringsFlag>(s, h);                  \
+        }                                                               \
+    } while(0)
+
+
+// Shortcut for the common case, calling the reader's Parse() method
+#define DECODE(r, f, s, h) DECODE_WITH(r, Parse, f, s, h)
+
+
+static void
+set_parse_error(size_t offset, ParseErrorCode code)
+{
+    if (PyErr_Occurred()) {
+        PyObject* etype;
+        PyObject* evalue;
+        PyObject* etraceback;
+        PyErr_Fetch(&etype, &evalue, &etraceback);
+
+        // Try to add the offset in the error message if the exception
+        // value is a string.  Otherwise, use the original exception since
+        // we can't be sure the exception type takes a single string.
+        if (evalue != NULL && PyUnicode_Check(evalue)) {
+            PyErr_Format(etype, "Parse error at offset %zu: %S", offset, evalue);
+            Py_DECREF(etype);
+            Py_DECREF(evalue);
+            Py_XDECREF(etraceback);
+        }
+        else
+            PyErr_Restore(etype, evalue, etraceback);
+    }
+    else
+        PyErr_Format(decode_error, "Parse error at offset %zu: %s",
+                     offset, GetParseError_En(code));
+}
+
+
+/* Parse a whole document with the given handler and reader, returning the value it
+   built; the in-situ copy of a string goes in buffer, when given. */
+
+template <typename Handler>
+static PyObject*
+parse_with(Handler& handler, Reader& reader, std::vector<char>* buffer,
+           const char* jsonStr, Py_ssize_t jsonStrLen, bool isBuffer,
+           PyObject* jsonStream, size_t chunkSize, unsigned numberMode,
+           unsigned parseMode, bool releaseGil)
+{
+    if (jsonStr != NULL && releaseGil) {
+        // Two-phase decode: first record the parser events in a native Tape, without
+        // holding the GIL...
+
+        Tape tape;
+        MemoryStream ms(jsonStr, jsonStrLen);
+        TapeRecorder<MemoryStream> recorder(tape, ms);
+
+        Py_BEGIN_ALLOW_THREADS
+        if (isBuffer)
+            DECODE(reader, kParseValidateEncodingFlag, ms, recorder);
+        else
+            DECODE(reader, kParseNoFlags, ms, recorder);
+        Py_END_ALLOW_THREADS
+
+        if (recorder.outOfMemory) {
+            PyErr_NoMemory();
+            return NULL;
+        }
+
+        if (reader.HasParseError()) {
+            set_parse_error(reader.GetErrorOffset(), reader.GetParseErrorCode());
+            return NULL;
+        }
+
+        // ... then replay them to build the Python values
+
+        size_t errorOffset;
+
+        if (!replay_tape(tape, 0, tape.events.size(), handler, errorOffset)) {
+            set_parse_error(errorOffset, kParseErrorTermination);
+            Py_XDECREF(handler.root);
+            return NULL;
+        }
+
+        return handler.root;
+    }
+
+    if (jsonStr != NULL && isBuffer) {
+        // The buffer is owned by some other object, so it cannot be parsed in-situ: on
+        // the other hand it does not need to be copied, and since it's not a str its
+        // content must be validated
+
+        MemoryStream ms(jsonStr, jsonStrLen);
+
+        DECODE(reader, kParseValidateEncodingFlag, ms, handler);
+    } else if (jsonStr != NULL) {
+        char* jsonStrCopy;
+
+        if (buffer != NULL) {
+            try {
+                buffer->assign(jsonStr, jsonStr + jsonStrLen + 1);
+            } catch (const std::bad_alloc&) {
+                return PyErr_NoMemory();
+            }
+            jsonStrCopy = buffer->data();
+        } else {
+            jsonStrCopy = (char*) PyMem_Malloc(sizeof(char) * (jsonStrLen+1));
+
+            if (jsonStrCopy == NULL)
+                return PyErr_NoMemory();
+
+            memcpy(jsonStrCopy, jsonStr, jsonStrLen+1);
+        }
+
+        InsituStringStream ss(jsonStrCopy);
+
+        DECODE(reader, kParseInsituFlag, ss, handler);
+
+        if (buffer == NULL)
+            PyMem_Free(jsonStrCopy);
+    } else {
+        PyReadStreamWrapper sw(jsonStream, chunkSize);
+
+        DECODE(reader, kParseNoFlags, sw, handler);
+    }
+
+    if (reader.HasParseError()) {
+        set_parse_error(reader.GetErrorOffset(), reader.GetParseErrorCode());
+        Py_XDECREF(handler.root);
+        return NULL;
+    } else if (PyErr_Occurred()) {
+        // Catch possible error raised in associated stream operations
+        Py_XDECREF(handler.root);
+        return NULL;
+    }
+
+    return handler.root;
+}
+
+
+/* Parse a whole document with the given handler, returning the value it built: this is
+   shared by the plain PyHandler and the schema-directed one, and uses the reader and the
+   buffer retained by the decoder, when available. */
+
+template <typename Handler>
+static PyObject*
+decode_with(PyObject* decoder, Handler& handler, const char* jsonStr,
+            Py_ssize_t jsonStrLen, bool isBuffer, PyObject* jsonStream, size_t chunkSize,
+            unsigned numberMode, unsigned parseMode, bool releaseGil)
+{
+    DecoderState* state = decoder != NULL ? decoder_state(decoder) : NULL;
+
+    if (state != NULL && !state->parsing && state->reader == NULL)
+        state->reader = new (std::nothrow) Reader();
+
+    if (state == NULL || state->parsing || state->reader == NULL) {
+        Reader reader;
+
+        return parse_with(handler, reader, NULL, jsonStr, jsonStrLen, isBuffer,
+                          jsonStream, chunkSize, numberMode, parseMode, releaseGil);
+    }
+
+    state->parsing = true;
+
+    PyObject* result = parse_with(handler, *state->reader, &state->buffer, jsonStr,
+                                  jsonStrLen, isBuffer, jsonStream, chunkSize,
+                                  numberMode, parseMode, releaseGil);
+
+    // The reader's stack grows up to the longest string: keep it only after parsing
+    // reasonably sized inputs
+
+    if (jsonStr == NULL || (size_t) jsonStrLen > DecoderState::MAX_BUFFER_SIZE) {
+        delete state->reader;
+        state->reader = NULL;
+    }
+    if (state->buffer.capacity() > DecoderState::MAX_BUFFER_SIZE)
+        std::vector<char>().swap(state->buffer);
+
+    state->parsing = false;
+
+    return result;
+}
+
+
+static PyObject*
+do_decode(PyObject* decoder, const char* jsonStr, Py_ssize_t jsonStrLen, bool isBuffer,
+          PyObject* jsonStream, size_t chunkSize, PyObject* objectHook,
+          unsigned numberMode, unsigned datetimeMode, unsigned uuidMode,
+          unsigned parseMode, unsigned arrayMode, bool releaseGil)
+{
+    if (decoder != NULL && decoder_schema(decoder) != NULL)
+        return do_schema_decode(decoder, jsonStr, jsonStrLen, isBuffer, jsonStream,
+                                chunkSize, numberMode, datetimeMode, uuidMode, parseMode,
+                                arrayMode, releaseGil);
+
+    PyHandler handler(decoder, objectHook, datetimeMode, uuidMode, numberMode);
+
+    handler.arrayMode = arrayMode;
+
+    return decode_with(decoder, handler, jsonStr, jsonStrLen, isBuffer, jsonStream,
+                       chunkSize, numberMode, parseMode, releaseGil);
+}
+
+
+static PyObject*
+decoder_call(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "json",
+        "chunk_size",
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* chunkSizeObj = NULL;
+    size_t chunkSize = 65536;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$O",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &chunkSizeObj))
+        return NULL;
+
+    if (chunkSizeObj && chunkSizeObj != Py_None) {
+        if (PyLong_Check(chunkSizeObj)) {
+            Py_ssize_t size = PyNumber_AsSsize_t(chunkSizeObj, PyExc_ValueError);
+            if (PyErr_Occurred() || size < 4 || size > UINT_MAX) {
+                PyErr_SetString(PyExc_ValueError,
+                                "Invalid chunk_size, must be an integer between 4 and"
+                                " UINT_MAX");
+                return NULL;
+            }
+            chunkSize = (size_t) size;
+        } else {
+            PyErr_SetString(PyExc_TypeError,
+                            "chunk_size must be an unsigned integer value or None");
+            return NULL;
+        }
+    }
+
+    Py_ssize_t jsonStrLen;
+    const char* jsonStr;
+    Py_buffer view;
+    bool isBuffer = false;
+
+    if (PyUnicode_Check(jsonObject)) {
+        jsonStr = PyUnicode_AsUTF8AndSize(jsonObject, &jsonStrLen);
+        if (jsonStr == NULL)
+            return NULL;
+    } else if (PyObject_CheckBuffer(jsonObject)) {
+        // This must come before the check on the read() method, because mmap objects
+        // have both
+        if (PyObject_GetBuffer(jsonObject, &view, PyBUF_SIMPLE) < 0)
+            return NULL;
+        isBuffer = true;
+        jsonStr = (const char*) view.buf;
+        jsonStrLen = view.len;
+    } else if (PyObject_HasAttr(jsonObject, read_name)) {
+        jsonStr = NULL;
+        jsonStrLen = 0;
+    } else {
+        PyErr_SetString(PyExc_TypeError,
+                        "Expected string or UTF-8 encoded bytes-like object");
+        return NULL;
+    }
+
+    DecoderObject* d = (DecoderObject*) self;
+    PyObject* result;
+
+    if (d->lazy)
+        result = do_lazy_decode(jsonStr, jsonStrLen, isBuffer, jsonObject, chunkSize,
+                                d->numberMode, d->datetimeMode, d->uuidMode,
+                                d->parseMode, d->releaseGil, 0);
+    else
+        result = do_decode(self, jsonStr, jsonStrLen, isBuffer, jsonObject, chunkSize,
+                           NULL, d->numberMode, d->datetimeMode, d->uuidMode,
+                           d->parseMode, d->arrayMode, d->releaseGil);
+
+    if (isBuffer)
+        PyBuffer_Release(&view);
+
+    return result;
+}
+
+
+/* Convert an iterable of str into a frozenset, exposed as attribute, and into the
+   corresponding KeySet. */
+
+static bool
+accept_key_set_arg(PyObject* arg, const char* name, PyObject*& frozen, KeySet*& keySet)
+{
+    if (PyUnicode_Check(arg) || PyBytes_Check(arg)) {
+        PyErr_Format(PyExc_TypeError, "%s must be an iterable of strings, not a string",
+                     name);
+        return false;
+    }
+
+    frozen = PyFrozenSet_New(arg);
+    if (frozen == NULL)
+        return false;
+
+    keySet = new (std::nothrow) KeySet();
+    if (keySet == NULL) {
+        PyErr_NoMemory();
+        return false;
+    }
+
+    PyObject* iterator = PyObject_GetIter(frozen);
+    if (iterator == NULL)
+        return false;
+
+    PyObject* key;
+    bool ok = true;
+
+    while (ok && (key = PyIter_Next(iterator)) != NULL) {
+        Py_ssize_t length;
+        const char* str = PyUnicode_Check(key)
+            ? PyUnicode_AsUTF8AndSize(key, &length)
+            : NULL;
+
+        if (str == NULL) {
+            if (!PyErr_Occurred())
+                PyErr_Format(PyExc_TypeError, "%s must contain only strings", name);
+            ok = false;
+        } else {
+            try {
+                keySet->keys.push_back(std::string(str, length));
+            } catch (const std::bad_alloc&) {
+                PyErr_NoMemory();
+                ok = false;
+            }
+        }
+        Py_DECREF(key);
+    }
+    Py_DECREF(iterator);
+
+    if (!ok || PyErr_Occurred())
+        return false;
+
+    std::sort(keySet->keys.begin(), keySet->keys.end());
+    return true;
+}
+
+
+static PyObject*
+decoder_new(PyTypeObject* type, PyObject* args, PyObject* kwargs)
+{
+    DecoderObject* d;
+    PyObject* datetimeModeObj = NULL;
+    unsigned datetimeMode = DM_NONE;
+    PyObject* uuidModeObj = NULL;
+    unsigned uuidMode = UM_NONE;
+    PyObject* numberModeObj = NULL;
+    unsigned numberMode = NM_NAN;
+    PyObject* parseModeObj = NULL;
+    unsigned parseMode = PM_NONE;
+    int releaseGil = false;
+    int lazy = false;
+    PyObject* keyCacheSizeObj = NULL;
+    unsigned keyCacheSize = 0;
+    PyObject* stringCacheSizeObj = NULL;
+    unsigned stringCacheSize = 0;
+    PyObject* arrayModeObj = NULL;
+    unsigned arrayMode = AM_NONE;
+    PyObject* target = NULL;
+    PyObject* datetimeKeysObj = NULL;
+    PyObject* uuidKeysObj = NULL;
+    static char const* kwlist[] = {
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "parse_mode",
+        "release_gil",
+        "lazy",
+        "key_cache_size",
+        "string_cache_size",
+        "array_mode",
+        "target",
+        "datetime_keys",
+        "uuid_keys",
+        NULL
+    };
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|OOOOppOOOOOO:Decoder",
+                                     (char**) kwlist,
+                                     &numberModeObj,
+                                     &datetimeModeObj,
+                                     &uuidModeObj,
+                                     &parseModeObj,
+                                     &releaseGil,
+                                     &lazy,
+                                     &keyCacheSizeObj,
+                                     &stringCacheSizeObj,
+                                     &arrayModeObj,
+                                     &target,
+                                     &datetimeKeysObj,
+                                     &uuidKeysObj))
+        return NULL;
+
+    if (numberModeObj) {
+        if (numberModeObj == Py_None) {
+            numberMode = NM_NONE;
         } else if (PyLong_Check(numberModeObj)) {
             int mode = PyLong_AsLong(numberModeObj);
             if (mode < 0 || mode >= NM_MAX) {
                 PyErr_SetString(PyExc_ValueError, "Invalid number_mode");
                 return NULL;
             }
-            numberMode = (unsigned) mode;
-            if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
-                PyErr_SetString(PyExc_ValueError,
-                                "Combining NM_NATIVE with NM_DECIMAL is not supported");
+            numberMode = (unsigned) mode;
+            if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
+                PyErr_SetString(PyExc_ValueError,
+                                "Combining NM_NATIVE with NM_DECIMAL is not supported");
+                return NULL;
+            }
+        }
+    }
+
+    if (datetimeModeObj) {
+        if (datetimeModeObj == Py_None) {
+            datetimeMode = DM_NONE;
+        } else if (PyLong_Check(datetimeModeObj)) {
+            int mode = PyLong_AsLong(datetimeModeObj);
+            if (!valid_datetime_mode(mode)) {
+                PyErr_SetString(PyExc_ValueError, "Invalid datetime_mode");
+                return NULL;
+            }
+            datetimeMode = (unsigned) mode;
+            if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
+                PyErr_SetString(PyExc_ValueError,
+                                "Invalid datetime_mode, can deserialize only from"
+                                " ISO8601");
+                return NULL;
+            }
+        } else {
+            PyErr_SetString(PyExc_TypeError,
+                            "datetime_mode must be a non-negative integer value or None");
+            return NULL;
+        }
+    }
+
+    if (uuidModeObj) {
+        if (uuidModeObj == Py_None) {
+            uuidMode = UM_NONE;
+        } else if (PyLong_Check(uuidModeObj)) {
+            int mode = PyLong_AsLong(uuidModeObj);
+            if (mode < 0 || mode >= UM_MAX) {
+                PyErr_SetString(PyExc_ValueError, "Invalid uuid_mode");
+                return NULL;
+            }
+            uuidMode = (unsigned) mode;
+        } else {
+            PyErr_SetString(PyExc_TypeError,
+                            "uuid_mode must be an integer value or None");
+            return NULL;
+        }
+    }
+
+    if (parseModeObj) {
+        if (parseModeObj == Py_None) {
+            parseMode = PM_NONE;
+        } else if (PyLong_Check(parseModeObj)) {
+            int mode = PyLong_AsLong(parseModeObj);
+            if (mode < 0 || mode >= PM_MAX) {
+                PyErr_SetString(PyExc_ValueError, "Invalid parse_mode");
+                return NULL;
+            }
+            parseMode = (unsigned) mode;
+        } else {
+            PyErr_SetString(PyExc_TypeError,
+                            "parse_mode must be an integer value or None");
+            return NULL;
+        }
+    }
+
+    if (!accept_cache_size_arg(keyCacheSizeObj, "key_cache_size", keyCacheSize))
+        return NULL;
+
+    if (!accept_cache_size_arg(stringCacheSizeObj, "string_cache_size", stringCacheSize))
+        return NULL;
+
+    if (!accept_array_mode_arg(arrayModeObj, arrayMode))
+        return NULL;
+
+    if (target == Py_None)
+        target = NULL;
+
+    if (target != NULL && lazy) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Lazy decoding does not support a target type");
+        return NULL;
+    }
+
+    if (datetimeKeysObj == Py_None)
+        datetimeKeysObj = NULL;
+    if (uuidKeysObj == Py_None)
+        uuidKeysObj = NULL;
+
+    if (datetimeKeysObj != NULL && datetimeMode == DM_NONE) {
+        PyErr_SetString(PyExc_ValueError, "datetime_keys requires a datetime_mode");
+        return NULL;
+    }
+    if (uuidKeysObj != NULL && uuidMode == UM_NONE) {
+        PyErr_SetString(PyExc_ValueError, "uuid_keys requires a uuid_mode");
+        return NULL;
+    }
+    if ((datetimeKeysObj != NULL || uuidKeysObj != NULL) && lazy) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Lazy decoding does not support datetime_keys and uuid_keys");
+        return NULL;
+    }
+    if ((datetimeKeysObj != NULL || uuidKeysObj != NULL) && target != NULL) {
+        PyErr_SetString(PyExc_ValueError,
+                        "A target type does not support datetime_keys and uuid_keys");
+        return NULL;
+    }
+
+    d = (DecoderObject*) type->tp_alloc(type, 0);
+    if (d == NULL)
+        return NULL;
+
+    d->datetimeMode = datetimeMode;
+    d->uuidMode = uuidMode;
+    d->numberMode = numberMode;
+    d->parseMode = parseMode;
+    d->arrayMode = arrayMode;
+    d->releaseGil = releaseGil ? true : false;
+    d->lazy = lazy ? true : false;
+    d->feed = NULL;
+    d->keyCacheSize = keyCacheSize;
+    d->keyCache = NULL;
+    d->stringCacheSize = stringCacheSize;
+    d->stringCache = NULL;
+    Py_XINCREF(target);
+    d->target = target;
+    d->schema = NULL;
+    d->hooks = HOOKS_UNRESOLVED;
+    d->hooksVersion = 0;
+    d->state = NULL;
+    d->datetimeKeysObj = NULL;
+    d->datetimeKeys = NULL;
+    d->uuidKeysObj = NULL;
+    d->uuidKeys = NULL;
+
+    if ((datetimeKeysObj != NULL
+         && !accept_key_set_arg(datetimeKeysObj, "datetime_keys", d->datetimeKeysObj,
+                                d->datetimeKeys))
+        || (uuidKeysObj != NULL
+            && !accept_key_set_arg(uuidKeysObj, "uuid_keys", d->uuidKeysObj,
+                                   d->uuidKeys))) {
+        Py_DECREF(d);
+        return NULL;
+    }
+
+    if (target != NULL) {
+        d->schema = schema_compile(target);
+        if (d->schema == NULL) {
+            Py_DECREF(d);
+            return NULL;
+        }
+    }
+
+    try {
+        if (keyCacheSize > 0)
+            d->keyCache = new StringCache(keyCacheSize);
+        if (stringCacheSize > 0)
+            d->stringCache = new StringCache(stringCacheSize);
+    } catch (const std::bad_alloc&) {
+        Py_DECREF(d);
+        return PyErr_NoMemory();
+    }
+
+    if (d->lazy && (PyObject_HasAttr((PyObject*) d, start_object_name)
+                    || PyObject_HasAttr((PyObject*) d, end_object_name)
+                    || PyObject_HasAttr((PyObject*) d, end_array_name)
+                    || PyObject_HasAttr((PyObject*) d, string_name))) {
+        Py_DECREF(d);
+        PyErr_SetString(PyExc_ValueError,
+                        "Lazy decoding does not support the start_object(),"
+                        " end_object(), end_array() and string() hooks");
+        return NULL;
+    }
+
+    return (PyObject*) d;
+}
+
+
+////////////////////
+// Lazy documents //
+////////////////////
+
+
+/* A lazily decoded document keeps the Tape recorded by the parser in a capsule, shared
+   by the LazyObject and LazyArray proxies that build the Python values only for the
+   members that are actually accessed, caching them afterwards. */
+
+struct LazyDocument {
+    Tape tape;
+    unsigned datetimeMode;
+    unsigned uuidMode;
+    unsigned numberMode;
+};
+
+
+static const char* lazy_document_name = "rapidjson.LazyDocument";
+
+
+static void
+lazy_document_destroy(PyObject* capsule)
+{
+    delete (LazyDocument*) PyCapsule_GetPointer(capsule, lazy_document_name);
+}
+
+
+static inline LazyDocument*
+lazy_document(PyObject* capsule)
+{
+    return (LazyDocument*) PyCapsule_GetPointer(capsule, lazy_document_name);
+}
+
+
+typedef struct {
+    PyObject_HEAD
+    PyObject* document;         // the capsule owning the LazyDocument
+    size_t start;               // index of the StartObject/StartArray event
+    Py_ssize_t size;            // number of members
+    size_t* members;            // index of the key (objects) or value (arrays) events
+    PyObject** values;          // materialized values, NULL until first access
+    PyObject** keys;            // materialized keys, only for objects
+    Py_ssize_t* distinct;       // members with distinct keys, only for objects
+    Py_ssize_t* index;          // the same members, ordered by key
+    Py_ssize_t distinctCount;   // -1 until computed
+    bool isObject;
+} LazyContainer;
+
+
+static PyObject* lazy_document_value(PyObject* document, size_t index);
+
+
+static void
+lazy_container_dealloc(PyObject* self)
+{
+    LazyContainer* c = (LazyContainer*) self;
+
+    if (c->values != NULL) {
+        for (Py_ssize_t m = 0; m < c->size; m++)
+            Py_XDECREF(c->values[m]);
+        PyMem_Free(c->values);
+    }
+    if (c->keys != NULL) {
+        for (Py_ssize_t m = 0; m < c->size; m++)
+            Py_XDECREF(c->keys[m]);
+        PyMem_Free(c->keys);
+    }
+    PyMem_Free(c->members);
+    PyMem_Free(c->distinct);
+    PyMem_Free(c->index);
+    Py_DECREF(c->document);
+    Py_TYPE(self)->tp_free(self);
+}
+
+
+/* Build the Python value corresponding to the events between first and last, using
+   the number, datetime and UUID modes of the document. */
+
+static PyObject*
+lazy_document_replay(PyObject* document, size_t first, size_t last)
+{
+    LazyDocument* doc = lazy_document(document);
+    PyHandler handler(NULL, NULL, doc->datetimeMode, doc->uuidMode, doc->numberMode);
+    size_t errorOffset;
+
+    if (!replay_tape(doc->tape, first, last, handler, errorOffset)) {
+        set_parse_error(errorOffset, kParseErrorTermination);
+        Py_XDECREF(handler.root);
+        return NULL;
+    }
+
+    return handler.root;
+}
+
+
+static PyObject*
+lazy_container_value(LazyContainer* self, Py_ssize_t m)
+{
+    PyObject* value = self->values[m];
+
+    if (value == NULL) {
+        size_t index = self->members[m];
+        if (self->isObject)
+            index++;
+        value = lazy_document_value(self->document, index);
+        if (value == NULL)
+            return NULL;
+        self->values[m] = value;
+    }
+
+    Py_INCREF(value);
+    return value;
+}
+
+
+/* Materialize the whole container, ignoring the cache. */
+
+static PyObject*
+lazy_container_materialize(LazyContainer* self)
+{
+    const Tape& tape = lazy_document(self->document)->tape;
+
+    return lazy_document_replay(self->document, self->start,
+                                tape.events[self->start].value.end + 1);
+}
+
+
+static PyObject*
+lazy_container_richcompare(PyObject* self, PyObject* other, int op)
+{
+    if (op != Py_EQ && op != Py_NE)
+        Py_RETURN_NOTIMPLEMENTED;
+
+    PyObject* value = lazy_container_materialize((LazyContainer*) self);
+    if (value == NULL)
+        return NULL;
+
+    PyObject* result = PyObject_RichCompare(value, other, op);
+    Py_DECREF(value);
+    return result;
+}
+
+
+PyDoc_STRVAR(lazy_container_materialize_docstring,
+             "materialize()\n"
+             "\n"
+             "Build and return the whole plain Python value.");
+
+
+////////////////
+// LazyObject //
+////////////////
+
+
+struct LazyKeyOrder {
+    const Tape& tape;
+    const size_t* members;
+
+    LazyKeyOrder(const Tape& t, const size_t* m) : tape(t), members(m) {}
+
+    bool operator()(Py_ssize_t a, Py_ssize_t b) const {
+        const TapeEvent& ka = tape.events[members[a]];
+        const TapeEvent& kb = tape.events[members[b]];
+        if (ka.length != kb.length)
+            return ka.length < kb.length;
+        return memcmp(tape.String(ka), tape.String(kb), ka.length) < 0;
+    }
+};
+
+
+/* Compute the members with distinct keys: as with dictionaries, when a key is repeated
+   the position of its first occurrence wins, but the value is taken from the last
+   one. The same members are also ordered by key, to look them up by bisection. */
+
+static bool
+lazy_object_distinct(LazyContainer* self)
+{
+    if (self->distinctCount >= 0)
+        return true;
+
+    if (self->size == 0) {
+        self->distinctCount = 0;
+        return true;
+    }
+
+    self->distinct = (Py_ssize_t*) PyMem_Malloc(self->size * sizeof(Py_ssize_t));
+    self->index = (Py_ssize_t*) PyMem_Malloc(self->size * sizeof(Py_ssize_t));
+    if (self->distinct == NULL || self->index == NULL) {
+        PyMem_Free(self->distinct);
+        PyMem_Free(self->index);
+        self->distinct = self->index = NULL;
+        PyErr_NoMemory();
+        return false;
+    }
+
+    const Tape& tape = lazy_document(self->document)->tape;
+
+    try {
+        std::vector<Py_ssize_t> order(self->size);
+        std::vector<Py_ssize_t> last(self->size, -1);
+
+        for (Py_ssize_t m = 0; m < self->size; m++)
+            order[m] = m;
+
+        LazyKeyOrder cmp(tape, self->members);
+        std::stable_sort(order.begin(), order.end(), cmp);
+
+        // Being the sort stable, the last member of each run of equal keys is the last
+        // occurrence of the key
+
+        Py_ssize_t run = 0;
+        Py_ssize_t indexed = 0;
+        for (Py_ssize_t m = 1; m <= self->size; m++) {
+            if (m == self->size || cmp(order[run], order[m])) {
+                last[order[run]] = order[m - 1];
+                self->index[indexed++] = order[m - 1];
+                run = m;
+            }
+        }
+
+        Py_ssize_t count = 0;
+        for (Py_ssize_t m = 0; m < self->size; m++)
+            if (last[m] >= 0)
+                self->distinct[count++] = last[m];
+        self->distinctCount = count;
+    } catch (const std::bad_alloc&) {
+        PyMem_Free(self->distinct);
+        PyMem_Free(self->index);
+        self->distinct = self->index = NULL;
+        PyErr_NoMemory();
+        return false;
+    }
+
+    return true;
+}
+
+
+// Objects up to this size are scanned linearly, bigger ones are looked up by bisection
+// of their members ordered by key
+
+static const Py_ssize_t LAZY_OBJECT_SCAN_SIZE = 8;
+
+
+/* Return the position of the last member with the given key, -1 if there's none. */
+
+static Py_ssize_t
+lazy_object_find(LazyContainer* self, PyObject* key, bool& error)
+{
+    error = false;
+
+    if (!PyUnicode_Check(key))
+        return -1;
+
+    Py_ssize_t length;
+    const char* str = PyUnicode_AsUTF8AndSize(key, &length);
+    if (str == NULL) {
+        error = true;
+        return -1;
+    }
+
+    const Tape& tape = lazy_document(self->document)->tape;
+
+    if (self->size <= LAZY_OBJECT_SCAN_SIZE) {
+        for (Py_ssize_t m = self->size - 1; m >= 0; m--) {
+            const TapeEvent& event = tape.events[self->members[m]];
+            if ((Py_ssize_t) event.length == length
+                && memcmp(tape.String(event), str, length) == 0)
+                return m;
+        }
+        return -1;
+    }
+
+    if (!lazy_object_distinct(self)) {
+        error = true;
+        return -1;
+    }
+
+    Py_ssize_t low = 0;
+    Py_ssize_t high = self->distinctCount;
+
+    while (low < high) {
+        Py_ssize_t middle = low + (high - low) / 2;
+        Py_ssize_t m = self->index[middle];
+        const TapeEvent& event = tape.events[self->members[m]];
+        int rc;
+
+        if ((Py_ssize_t) event.length != length)
+            rc = (Py_ssize_t) event.length < length ? -1 : 1;
+        else
+            rc = memcmp(tape.String(event), str, length);
+
+        if (rc == 0)
+            return m;
+        else if (rc < 0)
+            low = middle + 1;
+        else
+            high = middle;
+    }
+
+    return -1;
+}
+
+
+static PyObject*
+lazy_object_key(LazyContainer* self, Py_ssize_t m)
+{
+    PyObject* key = self->keys[m];
+
+    if (key == NULL) {
+        const Tape& tape = lazy_document(self->document)->tape;
+        const TapeEvent& event = tape.events[self->members[m]];
+        key = PyUnicode_FromStringAndSize(tape.String(event), event.length);
+        if (key == NULL)
+            return NULL;
+        self->keys[m] = key;
+    }
+
+    Py_INCREF(key);
+    return key;
+}
+
+
+static Py_ssize_t
+lazy_object_length(PyObject* self)
+{
+    LazyContainer* c = (LazyContainer*) self;
+
+    if (!lazy_object_distinct(c))
+        return -1;
+
+    return c->distinctCount;
+}
+
+
+static PyObject*
+lazy_object_subscript(PyObject* self, PyObject* key)
+{
+    bool error;
+    Py_ssize_t m = lazy_object_find((LazyContainer*) self, key, error);
+
+    if (m < 0) {
+        if (!error)
+            PyErr_SetObject(PyExc_KeyError, key);
+        return NULL;
+    }
+
+    return lazy_container_value((LazyContainer*) self, m);
+}
+
+
+static int
+lazy_object_contains(PyObject* self, PyObject* key)
+{
+    bool error;
+    Py_ssize_t m = lazy_object_find((LazyContainer*) self, key, error);
+
+    return error ? -1 : m >= 0;
+}
+
+
+enum LazyObjectItems {
+    LO_KEYS,
+    LO_VALUES,
+    LO_ITEMS
+};
+
+
+static PyObject*
+lazy_object_list(LazyContainer* self, LazyObjectItems what)
+{
+    if (!lazy_object_distinct(self))
+        return NULL;
+
+    PyObject* result = PyList_New(self->distinctCount);
+    if (result == NULL)
+        return NULL;
+
+    for (Py_ssize_t i = 0; i < self->distinctCount; i++) {
+        Py_ssize_t m = self->distinct[i];
+        PyObject* key = NULL;
+        PyObject* value = NULL;
+        PyObject* item;
+
+        if (what != LO_VALUES) {
+            key = lazy_object_key(self, m);
+            if (key == NULL) {
+                Py_DECREF(result);
+                return NULL;
+            }
+        }
+
+        if (what != LO_KEYS) {
+            value = lazy_container_value(self, m);
+            if (value == NULL) {
+                Py_XDECREF(key);
+                Py_DECREF(result);
+                return NULL;
+            }
+        }
+
+        if (what == LO_ITEMS) {
+            item = PyTuple_Pack(2, key, value);
+            Py_DECREF(key);
+            Py_DECREF(value);
+            if (item == NULL) {
+                Py_DECREF(result);
+                return NULL;
+            }
+        } else {
+            item = what == LO_KEYS ? key : value;
+        }
+
+        PyList_SET_ITEM(result, i, item);
+    }
+
+    return result;
+}
+
+
+static PyObject*
+lazy_object_keys(PyObject* self, PyObject* unused)
+{
+    return lazy_object_list((LazyContainer*) self, LO_KEYS);
+}
+
+
+static PyObject*
+lazy_object_values(PyObject* self, PyObject* unused)
+{
+    return lazy_object_list((LazyContainer*) self, LO_VALUES);
+}
+
+
+static PyObject*
+lazy_object_items(PyObject* self, PyObject* unused)
+{
+    return lazy_object_list((LazyContainer*) self, LO_ITEMS);
+}
+
+
+static PyObject*
+lazy_object_get(PyObject* self, PyObject* args)
+{
+    PyObject* key;
+    PyObject* defaultValue = Py_None;
+
+    if (!PyArg_ParseTuple(args, "O|O:get", &key, &defaultValue))
+        return NULL;
+
+    bool error;
+    Py_ssize_t m = lazy_object_find((LazyContainer*) self, key, error);
+
+    if (m < 0) {
+        if (error)
+            return NULL;
+        Py_INCREF(defaultValue);
+        return defaultValue;
+    }
+
+    return lazy_container_value((LazyContainer*) self, m);
+}
+
+
+static PyObject*
+lazy_object_iter(PyObject* self)
+{
+    PyObject* keys = lazy_object_list((LazyContainer*) self, LO_KEYS);
+    if (keys == NULL)
+        return NULL;
+
+    PyObject* result = PyObject_GetIter(keys);
+    Py_DECREF(keys);
+    return result;
+}
+
+
+static PyObject*
+lazy_object_materialize(PyObject* self, PyObject* unused)
+{
+    return lazy_container_materialize((LazyContainer*) self);
+}
+
+
+static PyMethodDef lazy_object_methods[] = {
+    {"get", (PyCFunction) lazy_object_get, METH_VARARGS,
+     "D.get(k[,d]) -> D[k] if k in D, else d. d defaults to None."},
+    {"keys", (PyCFunction) lazy_object_keys, METH_NOARGS,
+     "D.keys() -> list of D's keys"},
+    {"values", (PyCFunction) lazy_object_values, METH_NOARGS,
+     "D.values() -> list of D's values"},
+    {"items", (PyCFunction) lazy_object_items, METH_NOARGS,
+     "D.items() -> list of D's (key, value) pairs"},
+    {"materialize", (PyCFunction) lazy_object_materialize, METH_NOARGS,
+     lazy_container_materialize_docstring},
+    {NULL, NULL}
+};
+
+
+static PyMappingMethods lazy_object_as_mapping = {
+    lazy_object_length,                       /* mp_length */
+    lazy_object_subscript,                    /* mp_subscript */
+    0,                                        /* mp_ass_subscript */
+};
+
+
+static PySequenceMethods lazy_object_as_sequence = {
+    0,                                        /* sq_length */
+    0,                                        /* sq_concat */
+    0,                                        /* sq_repeat */
+    0,                                        /* sq_item */
+    0,                                        /* was_sq_slice */
+    0,                                        /* sq_ass_item */
+    0,                                        /* was_sq_ass_slice */
+    lazy_object_contains,                     /* sq_contains */
+};
+
+
+PyDoc_STRVAR(lazy_object_doc,
+             "Read-only mapping proxy of a lazily decoded JSON object\n"
+             "\n"
+             "Values are decoded on first access, and then cached.");
+
+
+static PyTypeObject LazyObject_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "rapidjson.LazyObject",                   /* tp_name */
+    sizeof(LazyContainer),                    /* tp_basicsize */
+    0,                                        /* tp_itemsize */
+    lazy_container_dealloc,                   /* tp_dealloc */
+    0,                                        /* tp_print */
+    0,                                        /* tp_getattr */
+    0,                                        /* tp_setattr */
+    0,                                        /* tp_compare */
+    0,                                        /* tp_repr */
+    0,                                        /* tp_as_number */
+    &lazy_object_as_sequence,                 /* tp_as_sequence */
+    &lazy_object_as_mapping,                  /* tp_as_mapping */
+    0,                                        /* tp_hash */
+    0,                                        /* tp_call */
+    0,                                        /* tp_str */
+    0,                                        /* tp_getattro */
+    0,                                        /* tp_setattro */
+    0,                                        /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                       /* tp_flags */
+    lazy_object_doc,                          /* tp_doc */
+    0,                                        /* tp_traverse */
+    0,                                        /* tp_clear */
+    lazy_container_richcompare,               /* tp_richcompare */
+    0,                                        /* tp_weaklistoffset */
+    lazy_object_iter,                         /* tp_iter */
+    0,                                        /* tp_iternext */
+    lazy_object_methods,                      /* tp_methods */
+    0,                                        /* tp_members */
+    0,                                        /* tp_getset */
+    0,                                        /* tp_base */
+    0,                                        /* tp_dict */
+    0,                                        /* tp_descr_get */
+    0,                                        /* tp_descr_set */
+    0,                                        /* tp_dictoffset */
+    0,                                        /* tp_init */
+    0,                                        /* tp_alloc */
+    0,                                        /* tp_new */
+};
+
+
+///////////////
+// LazyArray //
+///////////////
+
+
+static Py_ssize_t
+lazy_array_length(PyObject* self)
+{
+    return ((LazyContainer*) self)->size;
+}
+
+
+static PyObject*
+lazy_array_item(PyObject* self, Py_ssize_t i)
+{
+    LazyContainer* c = (LazyContainer*) self;
+
+    if (i < 0 || i >= c->size) {
+        PyErr_SetString(PyExc_IndexError, "LazyArray index out of range");
+        return NULL;
+    }
+
+    return lazy_container_value(c, i);
+}
+
+
+static PyObject*
+lazy_array_subscript(PyObject* self, PyObject* item)
+{
+    LazyContainer* c = (LazyContainer*) self;
+
+    if (PyIndex_Check(item)) {
+        Py_ssize_t i = PyNumber_AsSsize_t(item, PyExc_IndexError);
+        if (i == -1 && PyErr_Occurred())
+            return NULL;
+        if (i < 0)
+            i += c->size;
+        return lazy_array_item(self, i);
+    } else if (PySlice_Check(item)) {
+        Py_ssize_t start, stop, step, length;
+
+        if (PySlice_GetIndicesEx(item, c->size, &start, &stop, &step, &length) < 0)
+            return NULL;
+
+        PyObject* result = PyList_New(length);
+        if (result == NULL)
+            return NULL;
+
+        for (Py_ssize_t i = 0, m = start; i < length; i++, m += step) {
+            PyObject* value = lazy_container_value(c, m);
+            if (value == NULL) {
+                Py_DECREF(result);
+                return NULL;
+            }
+            PyList_SET_ITEM(result, i, value);
+        }
+
+        return result;
+    } else {
+        PyErr_Format(PyExc_TypeError,
+                     "LazyArray indices must be integers or slices, not %.200s",
+                     Py_TYPE(item)->tp_name);
+        return NULL;
+    }
+}
+
+
+static PyObject*
+lazy_array_materialize(PyObject* self, PyObject* unused)
+{
+    return lazy_container_materialize((LazyContainer*) self);
+}
+
+
+static PyMethodDef lazy_array_methods[] = {
+    {"materialize", (PyCFunction) lazy_array_materialize, METH_NOARGS,
+     lazy_container_materialize_docstring},
+    {NULL, NULL}
+};
+
+
+static PyMappingMethods lazy_array_as_mapping = {
+    lazy_array_length,                        /* mp_length */
+    lazy_array_subscript,                     /* mp_subscript */
+    0,                                        /* mp_ass_subscript */
+};
+
+
+static PySequenceMethods lazy_array_as_sequence = {
+    lazy_array_length,                        /* sq_length */
+    0,                                        /* sq_concat */
+    0,                                        /* sq_repeat */
+    lazy_array_item,                          /* sq_item */
+};
+
+
+PyDoc_STRVAR(lazy_array_doc,
+             "Read-only sequence proxy of a lazily decoded JSON array\n"
+             "\n"
+             "Items are decoded on first access, and then cached.");
+
+
+static PyTypeObject LazyArray_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "rapidjson.LazyArray",                    /* tp_name */
+    sizeof(LazyContainer),                    /* tp_basicsize */
+    0,                                        /* tp_itemsize */
+    lazy_container_dealloc,                   /* tp_dealloc */
+    0,                                        /* tp_print */
+    0,                                        /* tp_getattr */
+    0,                                        /* tp_setattr */
+    0,                                        /* tp_compare */
+    0,                                        /* tp_repr */
+    0,                                        /* tp_as_number */
+    &lazy_array_as_sequence,                  /* tp_as_sequence */
+    &lazy_array_as_mapping,                   /* tp_as_mapping */
+    0,                                        /* tp_hash */
+    0,                                        /* tp_call */
+    0,                                        /* tp_str */
+    0,                                        /* tp_getattro */
+    0,                                        /* tp_setattro */
+    0,                                        /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                       /* tp_flags */
+    lazy_array_doc,                           /* tp_doc */
+    0,                                        /* tp_traverse */
+    0,                                        /* tp_clear */
+    lazy_container_richcompare,               /* tp_richcompare */
+    0,                                        /* tp_weaklistoffset */
+    PySeqIter_New,                            /* tp_iter */
+    0,                                        /* tp_iternext */
+    lazy_array_methods,                       /* tp_methods */
+    0,                                        /* tp_members */
+    0,                                        /* tp_getset */
+    0,                                        /* tp_base */
+    0,                                        /* tp_dict */
+    0,                                        /* tp_descr_get */
+    0,                                        /* tp_descr_set */
+    0,                                        /* tp_dictoffset */
+    0,                                        /* tp_init */
+    0,                                        /* tp_alloc */
+    0,                                        /* tp_new */
+};
+
+
+static PyObject*
+lazy_container_new(PyTypeObject* type, PyObject* document, size_t start)
+{
+    const Tape& tape = lazy_document(document)->tape;
+    bool isObject = type == &LazyObject_Type;
+    LazyContainer* self = PyObject_New(LazyContainer, type);
+
+    if (self == NULL)
+        return NULL;
+
+    Py_INCREF(document);
+    self->document = document;
+    self->start = start;
+    self->size = tape.events[start].length;
+    self->members = NULL;
+    self->values = NULL;
+    self->keys = NULL;
+    self->distinct = NULL;
+    self->index = NULL;
+    self->distinctCount = -1;
+    self->isObject = isObject;
+
+    if (self->size == 0)
+        return (PyObject*) self;
+
+    self->members = (size_t*) PyMem_Malloc(self->size * sizeof(size_t));
+    self->values = (PyObject**) PyMem_Calloc(self->size, sizeof(PyObject*));
+    if (isObject)
+        self->keys = (PyObject**) PyMem_Calloc(self->size, sizeof(PyObject*));
+
+    if (self->members == NULL || self->values == NULL
+        || (isObject && self->keys == NULL)) {
+        Py_DECREF(self);
+        return PyErr_NoMemory();
+    }
+
+    // Locate the members, skipping over nested containers thanks to the index of their
+    // end event
+
+    size_t i = start + 1;
+    for (Py_ssize_t m = 0; m < self->size; m++) {
+        self->members[m] = i;
+        if (isObject)
+            i++;
+        const TapeEvent& event = tape.events[i];
+        if (event.type == TE_START_OBJECT || event.type == TE_START_ARRAY)
+            i = event.value.end + 1;
+        else
+            i++;
+    }
+
+    return (PyObject*) self;
+}
+
+
+/* Return either a new proxy or the scalar value for the event at the given index. */
+
+static PyObject*
+lazy_document_value(PyObject* document, size_t index)
+{
+    switch (lazy_document(document)->tape.events[index].type) {
+    case TE_START_OBJECT:
+        return lazy_container_new(&LazyObject_Type, document, index);
+    case TE_START_ARRAY:
+        return lazy_container_new(&LazyArray_Type, document, index);
+    default:
+        return lazy_document_replay(document, index, index + 1);
+    }
+}
+
+
+/* Record the parse of a JSON document into a new LazyDocument, returning either a
+   proxy, when the root is a container, or a plain scalar value; errorOffset is added to
+   the offset of parse errors. */
+
+static PyObject*
+do_lazy_decode(const char* jsonStr, Py_ssize_t jsonStrLen, bool isBuffer,
+               PyObject* jsonStream, size_t chunkSize,
+               unsigned numberMode, unsigned datetimeMode, unsigned uuidMode,
+               unsigned parseMode, bool releaseGil, size_t errorOffset)
+{
+    LazyDocument* doc = new (std::nothrow) LazyDocument;
+    if (doc == NULL)
+        return PyErr_NoMemory();
+
+    doc->datetimeMode = datetimeMode;
+    doc->uuidMode = uuidMode;
+    doc->numberMode = numberMode;
+
+    PyObject* document = PyCapsule_New(doc, lazy_document_name, lazy_document_destroy);
+    if (document == NULL) {
+        delete doc;
+        return NULL;
+    }
+
+    Reader reader;
+    bool outOfMemory;
+
+    if (jsonStr != NULL) {
+        MemoryStream ms(jsonStr, jsonStrLen);
+        TapeRecorder<MemoryStream> recorder(doc->tape, ms);
+        PyThreadState* state = releaseGil ? PyEval_SaveThread() : NULL;
+
+        if (isBuffer)
+            DECODE(reader, kParseValidateEncodingFlag, ms, recorder);
+        else
+            DECODE(reader, kParseNoFlags, ms, recorder);
+
+        if (state != NULL)
+            PyEval_RestoreThread(state);
+
+        outOfMemory = recorder.outOfMemory;
+    } else {
+        PyReadStreamWrapper sw(jsonStream, chunkSize);
+        TapeRecorder<PyReadStreamWrapper> recorder(doc->tape, sw);
+
+        DECODE(reader, kParseNoFlags, sw, recorder);
+
+        outOfMemory = recorder.outOfMemory;
+    }
+
+    if (outOfMemory) {
+        Py_DECREF(document);
+        return PyErr_NoMemory();
+    }
+
+    if (reader.HasParseError()) {
+        set_parse_error(errorOffset + reader.GetErrorOffset(),
+                        reader.GetParseErrorCode());
+        Py_DECREF(document);
+        return NULL;
+    } else if (PyErr_Occurred()) {
+        // Catch possible error raised in associated stream operations
+        Py_DECREF(document);
+        return NULL;
+    }
+
+    PyObject* result = lazy_document_value(document, 0);
+    Py_DECREF(document);
+    return result;
+}
+
+
+/////////////////////////////
+// JSON Pointer extraction //
+/////////////////////////////
+
+
+/* A PointerSet compiles a list of RFC 6901 JSON Pointers into a trie, where each node
+   corresponds to a reference token: the extraction walks it in parallel with the SAX
+   events, building Python values only for the subtrees addressed by the pointers. */
+
+struct PointerNode {
+    std::string token;               // the unescaped reference token
+    Py_ssize_t index;                // the token as an array index, -1 if not valid
+    size_t parent;
+    std::vector<size_t> children;
+    Py_ssize_t target;               // the pointer ending here, -1 if none
+    std::vector<Py_ssize_t> targets; // the pointers ending here or below
+};
+
+
+struct PointerTrie {
+    std::vector<PointerNode> nodes;
+    std::vector<size_t> targets;     // the node where each pointer ends
+
+    PointerTrie() {
+        AddNode(0, std::string());
+    }
+
+    size_t AddNode(size_t parent, const std::string& token) {
+        PointerNode node;
+        node.token = token;
+        node.index = -1;
+        node.parent = parent;
+        node.target = -1;
+
+        // A valid array index is either "0" or a sequence of digits without leading
+        // zeroes
+
+        if (!token.empty() && token.size() < 19
+            && (token == "0" || token[0] != '0')) {
+            bool digits = true;
+            for (size_t i = 0; digits && i < token.size(); i++)
+                digits = isdigit(token[i]);
+            if (digits)
+                node.index = (Py_ssize_t) strtoll(token.c_str(), NULL, 10);
+        }
+
+        nodes.push_back(node);
+        return nodes.size() - 1;
+    }
+
+    size_t Child(size_t parent, const std::string& token) {
+        const std::vector<size_t>& children = nodes[parent].children;
+        for (size_t i = 0; i < children.size(); i++)
+            if (nodes[children[i]].token == token)
+                return children[i];
+
+        size_t child = AddNode(parent, token);
+        nodes[parent].children.push_back(child);
+        return child;
+    }
+
+    size_t Find(size_t parent, const char* str, SizeType length) const {
+        const std::vector<size_t>& children = nodes[parent].children;
+        for (size_t i = 0; i < children.size(); i++) {
+            const std::string& token = nodes[children[i]].token;
+            if (token.size() == length && memcmp(token.data(), str, length) == 0)
+                return children[i];
+        }
+        return NO_POINTER_NODE;
+    }
+
+    size_t Find(size_t parent, SizeType index) const {
+        const std::vector<size_t>& children = nodes[parent].children;
+        for (size_t i = 0; i < children.size(); i++)
+            if (nodes[children[i]].index == (Py_ssize_t) index)
+                return children[i];
+        return NO_POINTER_NODE;
+    }
+
+    static const size_t NO_POINTER_NODE = (size_t) -1;
+};
+
+
+typedef struct {
+    PyObject_HEAD
+    PyObject* pointers;
+    PointerTrie* trie;
+} PointerSetObject;
+
+
+/* Parse a single pointer and insert it into the trie, appending it to the list of
+   distinct pointers. */
+
+static bool
+pointer_set_add(PointerTrie& trie, PyObject* pointer, PyObject* pointers)
+{
+    if (!PyUnicode_Check(pointer)) {
+        PyErr_SetString(PyExc_TypeError, "JSON Pointers must be strings");
+        return false;
+    }
+
+    Py_ssize_t length;
+    const char* str = PyUnicode_AsUTF8AndSize(pointer, &length);
+    if (str == NULL)
+        return false;
+
+    if (length > 0 && str[0] != '/') {
+        PyErr_Format(PyExc_ValueError,
+                     "Invalid JSON Pointer %R, must be empty or start with a slash",
+                     pointer);
+        return false;
+    }
+
+    size_t node = 0;
+    Py_ssize_t pos = 0;
+
+    while (pos < length) {
+        std::string token;
+
+        for (pos++; pos < length && str[pos] != '/'; pos++) {
+            if (str[pos] != '~') {
+                token += str[pos];
+            } else if (pos + 1 < length && (str[pos+1] == '0' || str[pos+1] == '1')) {
+                token += str[++pos] == '0' ? '~' : '/';
+            } else {
+                PyErr_Format(PyExc_ValueError,
+                             "Invalid JSON Pointer %R, bad escape sequence", pointer);
+                return false;
+            }
+        }
+
+        node = trie.Child(node, token);
+    }
+
+    if (trie.nodes[node].target >= 0)
+        return true;
+
+    Py_ssize_t target = PyList_GET_SIZE(pointers);
+    if (PyList_Append(pointers, pointer) < 0)
+        return false;
+
+    trie.nodes[node].target = target;
+    trie.targets.push_back(node);
+    for (size_t n = node; ; n = trie.nodes[n].parent) {
+        trie.nodes[n].targets.push_back(target);
+        if (n == 0)
+            break;
+    }
+
+    return true;
+}
+
+
+static PyObject*
+pointer_set_new(PyTypeObject* type, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "pointers",
+        NULL
+    };
+    PyObject* pointersObj;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O:PointerSet",
+                                     (char**) kwlist,
+                                     &pointersObj))
+        return NULL;
+
+    if (PyUnicode_Check(pointersObj)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "pointers must be an iterable of strings, not a string");
+        return NULL;
+    }
+
+    PyObject* iterator = PyObject_GetIter(pointersObj);
+    if (iterator == NULL)
+        return NULL;
+
+    PointerSetObject* ps = (PointerSetObject*) type->tp_alloc(type, 0);
+    if (ps == NULL) {
+        Py_DECREF(iterator);
+        return NULL;
+    }
+
+    ps->pointers = NULL;
+    ps->trie = NULL;
+
+    PyObject* pointers = PyList_New(0);
+    if (pointers == NULL) {
+        Py_DECREF(iterator);
+        Py_DECREF(ps);
+        return NULL;
+    }
+
+    try {
+        ps->trie = new PointerTrie();
+
+        PyObject* item;
+        while ((item = PyIter_Next(iterator)) != NULL) {
+            bool ok = pointer_set_add(*ps->trie, item, pointers);
+            Py_DECREF(item);
+            if (!ok)
+                break;
+        }
+    } catch (const std::bad_alloc&) {
+        PyErr_NoMemory();
+    }
+
+    Py_DECREF(iterator);
+
+    if (PyErr_Occurred()) {
+        Py_DECREF(pointers);
+        Py_DECREF(ps);
+        return NULL;
+    }
+
+    ps->pointers = PyList_AsTuple(pointers);
+    Py_DECREF(pointers);
+
+    if (ps->pointers == NULL) {
+        Py_DECREF(ps);
+        return NULL;
+    }
+
+    return (PyObject*) ps;
+}
+
+
+static void
+pointer_set_dealloc(PyObject* self)
+{
+    PointerSetObject* ps = (PointerSetObject*) self;
+
+    delete ps->trie;
+    Py_XDECREF(ps->pointers);
+    Py_TYPE(self)->tp_free(self);
+}
+
+
+static Py_ssize_t
+pointer_set_length(PyObject* self)
+{
+    return PyTuple_GET_SIZE(((PointerSetObject*) self)->pointers);
+}
+
+
+static PySequenceMethods pointer_set_as_sequence = {
+    pointer_set_length,                       /* sq_length */
+};
+
+
+static PyMemberDef pointer_set_members[] = {
+    {"pointers",
+     T_OBJECT_EX, offsetof(PointerSetObject, pointers), READONLY,
+     "The distinct JSON Pointers, in order."},
+    {NULL}
+};
+
+
+PyDoc_STRVAR(pointer_set_doc,
+             "PointerSet(pointers)\n"
+             "\n"
+             "Compile an iterable of RFC 6901 JSON Pointers, to be used with extract().");
+
+
+static PyTypeObject PointerSet_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "rapidjson.PointerSet",                   /* tp_name */
+    sizeof(PointerSetObject),                 /* tp_basicsize */
+    0,                                        /* tp_itemsize */
+    pointer_set_dealloc,                      /* tp_dealloc */
+    0,                                        /* tp_print */
+    0,                                        /* tp_getattr */
+    0,                                        /* tp_setattr */
+    0,                                        /* tp_compare */
+    0,                                        /* tp_repr */
+    0,                                        /* tp_as_number */
+    &pointer_set_as_sequence,                 /* tp_as_sequence */
+    0,                                        /* tp_as_mapping */
+    0,                                        /* tp_hash */
+    0,                                        /* tp_call */
+    0,                                        /* tp_str */
+    0,                                        /* tp_getattro */
+    0,                                        /* tp_setattro */
+    0,                                        /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                       /* tp_flags */
+    pointer_set_doc,                          /* tp_doc */
+    0,                                        /* tp_traverse */
+    0,                                        /* tp_clear */
+    0,                                        /* tp_richcompare */
+    0,                                        /* tp_weaklistoffset */
+    0,                                        /* tp_iter */
+    0,                                        /* tp_iternext */
+    0,                                        /* tp_methods */
+    pointer_set_members,                      /* tp_members */
+    0,                                        /* tp_getset */
+    0,                                        /* tp_base */
+    0,                                        /* tp_dict */
+    0,                                        /* tp_descr_get */
+    0,                                        /* tp_descr_set */
+    0,                                        /* tp_dictoffset */
+    0,                                        /* tp_init */
+    0,                                        /* tp_alloc */
+    pointer_set_new,                          /* tp_new */
+    PyObject_Del,                             /* tp_free */
+};
+
+
+#define PointerSet_Check(v) PyObject_TypeCheck(v, &PointerSet_Type)
+
+
+static bool
+accept_pointers_arg(PyObject* arg, PyObject*& pointerSet)
+{
+    if (PointerSet_Check(arg)) {
+        Py_INCREF(arg);
+        pointerSet = arg;
+    } else {
+        pointerSet = PyObject_CallFunctionObjArgs((PyObject*) &PointerSet_Type, arg, NULL);
+        if (pointerSet == NULL)
+            return false;
+    }
+    return true;
+}
+
+
+/* Follow the tokens from the node "from" down to the node "to" within an already built
+   Python value: return a new reference, or NULL when the value is not there. */
+
+static PyObject*
+walk_pointer(const PointerTrie& trie, size_t from, size_t to, PyObject* value)
+{
+    std::vector<size_t> path;
+    for (size_t n = to; n != from; n = trie.nodes[n].parent)
+        path.push_back(n);
+
+    Py_INCREF(value);
+
+    for (size_t i = path.size(); value != NULL && i-- > 0; ) {
+        const PointerNode& node = trie.nodes[path[i]];
+        PyObject* item;
+
+        if (PyList_Check(value) || PyTuple_Check(value)) {
+            item = node.index >= 0 ? PySequence_GetItem(value, node.index) : NULL;
+        } else if (PyMapping_Check(value)) {
+            PyObject* key = PyUnicode_FromStringAndSize(node.token.data(),
+                                                        node.token.size());
+            item = key != NULL ? PyObject_GetItem(value, key) : NULL;
+            Py_XDECREF(key);
+        } else {
+            item = NULL;
+        }
+
+        Py_DECREF(value);
+        value = item;
+    }
+
+    if (value == NULL && (PyErr_ExceptionMatches(PyExc_KeyError)
+                          || PyErr_ExceptionMatches(PyExc_IndexError)
+                          || PyErr_ExceptionMatches(PyExc_TypeError)))
+        PyErr_Clear();
+
+    return value;
+}
+
+
+struct ExtractFrame {
+    size_t node;       // the trie node matched by the container
+    size_t keyNode;    // the trie node matched by the current key, for objects
+    SizeType index;    // the index of the next item, for arrays
+    bool isObject;
+};
+
+
+struct ExtractHandler {
+    const PointerTrie& trie;
+    PyObject* pointers;
+    PyObject* result;
+    PyObject* decoder;
+    PyObject* objectHook;
+    unsigned datetimeMode;
+    unsigned uuidMode;
+    unsigned numberMode;
+    std::vector<ExtractFrame> stack;
+    std::vector<bool> resolved;
+    Py_ssize_t remaining;
+    PyHandler* capture;
+    size_t captureNode;
+    unsigned captureDepth;
+    size_t matched;
+    bool stopEarly;
+    bool done;
+
+    ExtractHandler(const PointerTrie& t, PyObject* p, PyObject* r, PyObject* d,
+                   PyObject* hook, unsigned dm, unsigned um, unsigned nm, bool stop)
+        : trie(t),
+          pointers(p),
+          result(r),
+          decoder(d),
+          objectHook(hook),
+          datetimeMode(dm),
+          uuidMode(um),
+          numberMode(nm),
+          resolved(t.targets.size(), false),
+          remaining(t.targets.size()),
+          capture(NULL),
+          captureNode(0),
+          captureDepth(0),
+          matched(PointerTrie::NO_POINTER_NODE),
+          stopEarly(stop),
+          done(false)
+        {}
+
+    ~ExtractHandler() {
+        if (capture != NULL) {
+            Py_XDECREF(capture->root);
+            delete capture;
+        }
+    }
+
+    // Return false to stop the parser as soon as all the pointers have been resolved,
+    // when so requested
+
+    bool Continue() {
+        if (remaining > 0 || !stopEarly)
+            return true;
+        done = true;
+        return false;
+    }
+
+    // Determine the trie node matched by an incoming value, and whether it must be
+    // captured: in that case the value is forwarded to a PyHandler
+
+    bool Capturing() {
+        if (capture != NULL)
+            return true;
+
+        size_t node;
+        if (stack.empty()) {
+            node = 0;
+        } else {
+            ExtractFrame& frame = stack.back();
+            if (frame.isObject)
+                node = frame.keyNode;
+            else if (frame.node == PointerTrie::NO_POINTER_NODE)
+                node = PointerTrie::NO_POINTER_NODE;
+            else
+                node = trie.Find(frame.node, frame.index);
+            if (!frame.isObject)
+                frame.index++;
+        }
+
+        if (node != PointerTrie::NO_POINTER_NODE) {
+            Py_ssize_t target = trie.nodes[node].target;
+            if (target >= 0 && !resolved[target]) {
+                capture = new PyHandler(decoder, objectHook,
+                                        datetimeMode, uuidMode, numberMode);
+                captureNode = node;
+                captureDepth = 0;
+                return true;
+            }
+        }
+
+        matched = node;
+        return false;
+    }
+
+    bool Forwarded(bool ok) {
+        if (!ok)
+            return false;
+        if (captureDepth > 0)
+            return true;
+
+        PyObject* value = capture->root;
+        capture->root = NULL;
+        delete capture;
+        capture = NULL;
+
+        if (value == NULL)
+            return false;
+
+        // Store the captured value and the ones addressed by the pointers below it
+
+        const std::vector<Py_ssize_t>& targets = trie.nodes[captureNode].targets;
+        for (size_t i = 0; i < targets.size(); i++) {
+            Py_ssize_t target = targets[i];
+            if (resolved[target])
+                continue;
+            resolved[target] = true;
+            remaining--;
+
+            PyObject* item = walk_pointer(trie, captureNode, trie.targets[target], value);
+            if (item == NULL) {
+                if (PyErr_Occurred()) {
+                    Py_DECREF(value);
+                    return false;
+                }
+                continue;
+            }
+
+            int rc = PyDict_SetItem(result, PyTuple_GET_ITEM(pointers, target), item);
+            Py_DECREF(item);
+            if (rc == -1) {
+                Py_DECREF(value);
+                return false;
+            }
+        }
+
+        Py_DECREF(value);
+        return Continue();
+    }
+
+    bool Push(bool isObject) {
+        ExtractFrame frame;
+        frame.node = matched;
+        frame.keyNode = PointerTrie::NO_POINTER_NODE;
+        frame.index = 0;
+        frame.isObject = isObject;
+        stack.push_back(frame);
+        return true;
+    }
+
+    bool Pop() {
+        size_t node = stack.back().node;
+        stack.pop_back();
+
+        if (node == PointerTrie::NO_POINTER_NODE)
+            return true;
+
+        // Whatever was not found within the container is missing
+
+        const std::vector<Py_ssize_t>& targets = trie.nodes[node].targets;
+        for (size_t i = 0; i < targets.size(); i++) {
+            if (!resolved[targets[i]]) {
+                resolved[targets[i]] = true;
+                remaining--;
+            }
+        }
+
+        return Continue();
+    }
+
+    bool Null() {
+        return Capturing() ? Forwarded(capture->Null()) : true;
+    }
+
+    bool Bool(bool b) {
+        return Capturing() ? Forwarded(capture->Bool(b)) : true;
+    }
+
+    bool Int(int i) {
+        return Capturing() ? Forwarded(capture->Int(i)) : true;
+    }
+
+    bool Uint(unsigned i) {
+        return Capturing() ? Forwarded(capture->Uint(i)) : true;
+    }
+
+    bool Int64(int64_t i) {
+        return Capturing() ? Forwarded(capture->Int64(i)) : true;
+    }
+
+    bool Uint64(uint64_t i) {
+        return Capturing() ? Forwarded(capture->Uint64(i)) : true;
+    }
+
+    bool Double(double d) {
+        return Capturing() ? Forwarded(capture->Double(d)) : true;
+    }
+
+    bool RawNumber(const char* str, SizeType length, bool copy) {
+        return Capturing() ? Forwarded(capture->RawNumber(str, length, copy)) : true;
+    }
+
+    bool String(const char* str, SizeType length, bool copy) {
+        return Capturing() ? Forwarded(capture->String(str, length, copy)) : true;
+    }
+
+    bool Key(const char* str, SizeType length, bool copy) {
+        if (capture != NULL)
+            return capture->Key(str, length, copy);
+
+        ExtractFrame& frame = stack.back();
+        if (frame.node == PointerTrie::NO_POINTER_NODE)
+            frame.keyNode = PointerTrie::NO_POINTER_NODE;
+        else
+            frame.keyNode = trie.Find(frame.node, str, length);
+
+        // Like loads(), let the last occurrence of a duplicated key win, forgetting
+        // whatever was found in the value of the previous one
+        if (!stopEarly && frame.keyNode != PointerTrie::NO_POINTER_NODE)
+            return Forget(frame.keyNode);
+        return true;
+    }
+
+    bool Forget(size_t node) {
+        const std::vector<Py_ssize_t>& targets = trie.nodes[node].targets;
+        for (size_t i = 0; i < targets.size(); i++) {
+            Py_ssize_t target = targets[i];
+            if (!resolved[target])
+                continue;
+            resolved[target] = false;
+            remaining++;
+
+            PyObject* pointer = PyTuple_GET_ITEM(pointers, target);
+            int rc = PyDict_Contains(result, pointer);
+            if (rc == 1)
+                rc = PyDict_DelItem(result, pointer);
+            if (rc == -1)
+                return false;
+        }
+        return true;
+    }
+
+    bool StartObject() {
+        if (Capturing()) {
+            captureDepth++;
+            return Forwarded(capture->StartObject());
+        }
+        return Push(true);
+    }
+
+    bool EndObject(SizeType memberCount) {
+        if (capture != NULL) {
+            captureDepth--;
+            return Forwarded(capture->EndObject(memberCount));
+        }
+        return Pop();
+    }
+
+    bool StartArray() {
+        if (Capturing()) {
+            captureDepth++;
+            return Forwarded(capture->StartArray());
+        }
+        return Push(false);
+    }
+
+    bool EndArray(SizeType elementCount) {
+        if (capture != NULL) {
+            captureDepth--;
+            return Forwarded(capture->EndArray(elementCount));
+        }
+        return Pop();
+    }
+};
+
+
+static PyObject*
+do_extract(PyObject* decoder, const char* jsonStr, Py_ssize_t jsonStrLen, bool isBuffer,
+           PyObject* jsonStream, size_t chunkSize, PyObject* pointerSet,
+           PyObject* objectHook, unsigned numberMode, unsigned datetimeMode,
+           unsigned uuidMode, unsigned parseMode, bool stopEarly)
+{
+    PointerSetObject* ps = (PointerSetObject*) pointerSet;
+    PyObject* result = PyDict_New();
+    if (result == NULL)
+        return NULL;
+
+    if (PyTuple_GET_SIZE(ps->pointers) == 0)
+        return result;
+
+    Reader reader;
+    bool done;
+
+    try {
+        ExtractHandler handler(*ps->trie, ps->pointers, result, decoder, objectHook,
+                               datetimeMode, uuidMode, numberMode, stopEarly);
+
+        if (jsonStr != NULL) {
+            MemoryStream ms(jsonStr, jsonStrLen);
+
+            if (isBuffer)
+                DECODE(reader, kParseValidateEncodingFlag, ms, handler);
+            else
+                DECODE(reader, kParseNoFlags, ms, handler);
+        } else {
+            PyReadStreamWrapper sw(jsonStream, chunkSize);
+
+            DECODE(reader, kParseNoFlags, sw, handler);
+        }
+
+        done = handler.done;
+    } catch (const std::bad_alloc&) {
+        Py_DECREF(result);
+        return PyErr_NoMemory();
+    }
+
+    // With stop_early, when all the pointers have been resolved the handler stops the
+    // parser, and the rest of the document is neither read nor validated
+
+    if (done) {
+        return result;
+    } else if (reader.HasParseError()) {
+        set_parse_error(reader.GetErrorOffset(), reader.GetParseErrorCode());
+        Py_DECREF(result);
+        return NULL;
+    } else if (PyErr_Occurred()) {
+        // Catch possible error raised in associated stream operations
+        Py_DECREF(result);
+        return NULL;
+    }
+
+    return result;
+}
+
+
+PyDoc_STRVAR(extract_docstring,
+             "extract(string, pointers, *, object_hook=None, number_mode=None,"
+             " datetime_mode=None, uuid_mode=None, parse_mode=None, stop_early=False,"
+             " allow_nan=True)\n"
+             "\n"
+             "Decode only the values addressed by the given JSON Pointers, returning a"
+             " dictionary keyed by pointer.");
+
+
+static PyObject*
+extract(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "string",
+        "pointers",
+        "object_hook",
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "parse_mode",
+        "stop_early",
+
+        /* compatibility with stdlib json */
+        "allow_nan",
+
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* pointersObj;
+    PyObject* objectHook = NULL;
+    PyObject* datetimeModeObj = NULL;
+    unsigned datetimeMode = DM_NONE;
+    PyObject* uuidModeObj = NULL;
+    unsigned uuidMode = UM_NONE;
+    PyObject* numberModeObj = NULL;
+    unsigned numberMode = NM_NAN;
+    PyObject* parseModeObj = NULL;
+    unsigned parseMode = PM_NONE;
+    int stopEarly = false;
+    int allowNan = -1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OO|$OOOOOpp:rapidjson.extract",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &pointersObj,
+                                     &objectHook,
+                                     &numberModeObj,
+                                     &datetimeModeObj,
+                                     &uuidModeObj,
+                                     &parseModeObj,
+                                     &stopEarly,
+                                     &allowNan))
+        return NULL;
+
+    if (objectHook && !PyCallable_Check(objectHook)) {
+        if (objectHook == Py_None) {
+            objectHook = NULL;
+        } else {
+            PyErr_SetString(PyExc_TypeError, "object_hook is not callable");
+            return NULL;
+        }
+    }
+
+    if (!accept_number_mode_arg(numberModeObj, allowNan, numberMode))
+        return NULL;
+    if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid number_mode, combining NM_NATIVE with NM_DECIMAL"
+                        " is not supported");
+        return NULL;
+    }
+
+    if (!accept_datetime_mode_arg(datetimeModeObj, datetimeMode))
+        return NULL;
+    if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid datetime_mode, can deserialize only from"
+                        " ISO8601");
+        return NULL;
+    }
+
+    if (!accept_uuid_mode_arg(uuidModeObj, uuidMode))
+        return NULL;
+
+    if (!accept_parse_mode_arg(parseModeObj, parseMode))
+        return NULL;
+
+    Py_ssize_t jsonStrLen;
+    const char* jsonStr;
+    Py_buffer view;
+    bool isBuffer = false;
+
+    if (PyUnicode_Check(jsonObject)) {
+        jsonStr = PyUnicode_AsUTF8AndSize(jsonObject, &jsonStrLen);
+        if (jsonStr == NULL) {
+            return NULL;
+        }
+    } else if (PyObject_CheckBuffer(jsonObject)) {
+        if (PyObject_GetBuffer(jsonObject, &view, PyBUF_SIMPLE) < 0)
+            return NULL;
+        isBuffer = true;
+        jsonStr = (const char*) view.buf;
+        jsonStrLen = view.len;
+    } else {
+        PyErr_SetString(PyExc_TypeError,
+                        "Expected string or UTF-8 encoded bytes-like object");
+        return NULL;
+    }
+
+    PyObject* pointerSet;
+    PyObject* result;
+
+    if (!accept_pointers_arg(pointersObj, pointerSet))
+        result = NULL;
+    else {
+        result = do_extract(NULL, jsonStr, jsonStrLen, isBuffer, NULL, 0, pointerSet,
+                            objectHook, numberMode, datetimeMode, uuidMode, parseMode,
+                            stopEarly != 0);
+        Py_DECREF(pointerSet);
+    }
+
+    if (isBuffer)
+        PyBuffer_Release(&view);
+
+    return result;
+}
+
+
+static PyObject*
+decoder_extract(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "json",
+        "pointers",
+        "chunk_size",
+        "stop_early",
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* pointersObj;
+    PyObject* chunkSizeObj = NULL;
+    size_t chunkSize = 65536;
+    int stopEarly = false;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OO|$Op:extract",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &pointersObj,
+                                     &chunkSizeObj,
+                                     &stopEarly))
+        return NULL;
+
+    if (!decoder_check_options(self, "extract", false))
+        return NULL;
+
+    if (!accept_chunk_size_arg(chunkSizeObj, chunkSize))
+        return NULL;
+
+    Py_ssize_t jsonStrLen;
+    const char* jsonStr;
+    Py_buffer view;
+    bool isBuffer = false;
+
+    if (PyUnicode_Check(jsonObject)) {
+        jsonStr = PyUnicode_AsUTF8AndSize(jsonObject, &jsonStrLen);
+        if (jsonStr == NULL)
+            return NULL;
+    } else if (PyObject_CheckBuffer(jsonObject)) {
+        if (PyObject_GetBuffer(jsonObject, &view, PyBUF_SIMPLE) < 0)
+            return NULL;
+        isBuffer = true;
+        jsonStr = (const char*) view.buf;
+        jsonStrLen = view.len;
+    } else if (PyObject_HasAttr(jsonObject, read_name)) {
+        jsonStr = NULL;
+        jsonStrLen = 0;
+    } else {
+        PyErr_SetString(PyExc_TypeError,
+                        "Expected string or UTF-8 encoded bytes-like object");
+        return NULL;
+    }
+
+    DecoderObject* d = (DecoderObject*) self;
+    PyObject* pointerSet;
+    PyObject* result;
+
+    if (!accept_pointers_arg(pointersObj, pointerSet))
+        result = NULL;
+    else {
+        result = do_extract(self, jsonStr, jsonStrLen, isBuffer, jsonObject, chunkSize,
+                            pointerSet, NULL, d->numberMode, d->datetimeMode,
+                            d->uuidMode, d->parseMode, stopEarly != 0);
+        Py_DECREF(pointerSet);
+    }
+
+    if (isBuffer)
+        PyBuffer_Release(&view);
+
+    return result;
+}
+
+
+////////////////////////
+// Documents iterator //
+////////////////////////
+
+
+/* Iterate over a sequence of JSON documents, either concatenated or one per line: the
+   reader is invoked with kParseStopWhenDoneFlag, so that each call to next() parses a
+   single value, resuming from where the previous one stopped. */
+
+typedef struct {
+    PyObject_HEAD
+    PyObject* decoder;
+    PyObject* objectHook;
+    PyObject* json;                 // the str, the owner of the buffer or the stream
+    Py_buffer view;
+    bool isBuffer;
+    MemoryStream* ms;
+    PyReadStreamWrapper* sw;
+    Reader* reader;
+    unsigned numberMode;
+    unsigned datetimeMode;
+    unsigned uuidMode;
+    unsigned parseMode;
+    bool finished;
+} DocumentIteratorObject;
+
+
+static void
+document_iterator_dealloc(PyObject* self)
+{
+    DocumentIteratorObject* it = (DocumentIteratorObject*) self;
+
+    delete it->reader;
+    delete it->ms;
+    delete it->sw;
+    if (it->isBuffer)
+        PyBuffer_Release(&it->view);
+    Py_XDECREF(it->decoder);
+    Py_XDECREF(it->objectHook);
+    Py_XDECREF(it->json);
+    Py_TYPE(self)->tp_free(self);
+}
+
+
+static PyObject* document_iterator_schema_next(DocumentIteratorObject* it,
+                                               const Schema& schema);
+
+
+// Parse the next document with the given handler, returning the value it built
+
+template <typename Handler>
+static PyObject*
+document_iterator_parse(DocumentIteratorObject* it, Handler& handler)
+{
+    Reader& reader = *it->reader;
+    unsigned numberMode = it->numberMode;
+    unsigned parseMode = it->parseMode;
+
+    if (it->sw != NULL)
+        DECODE(reader, kParseStopWhenDoneFlag, *it->sw, handler);
+    else if (it->isBuffer)
+        DECODE(reader, kParseStopWhenDoneFlag | kParseValidateEncodingFlag, *it->ms,
+               handler);
+    else
+        DECODE(reader, kParseStopWhenDoneFlag, *it->ms, handler);
+
+    if (reader.HasParseError()) {
+        it->finished = true;
+        Py_XDECREF(handler.root);
+        // Nothing but whitespace until the end: the iteration is over
+        if (reader.GetParseErrorCode() == kParseErrorDocumentEmpty && !PyErr_Occurred())
+            return NULL;
+        set_parse_error(reader.GetErrorOffset(), reader.GetParseErrorCode());
+        return NULL;
+    } else if (PyErr_Occurred()) {
+        // Catch possible error raised in associated stream operations
+        it->finished = true;
+        Py_XDECREF(handler.root);
+        return NULL;
+    }
+
+    return handler.root;
+}
+
+
+static PyObject*
+document_iterator_next(PyObject* self)
+{
+    DocumentIteratorObject* it = (DocumentIteratorObject*) self;
+
+    if (it->finished)
+        return NULL;
+
+    Schema* schema = it->decoder != NULL ? decoder_schema(it->decoder) : NULL;
+
+    if (schema != NULL)
+        return document_iterator_schema_next(it, *schema);
+
+    PyHandler handler(it->decoder, it->objectHook,
+                      it->datetimeMode, it->uuidMode, it->numberMode);
+
+    return document_iterator_parse(it, handler);
+}
+
+
+static PyTypeObject DocumentIterator_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "rapidjson.DocumentIterator",             /* tp_name */
+    sizeof(DocumentIteratorObject),           /* tp_basicsize */
+    0,                                        /* tp_itemsize */
+    document_iterator_dealloc,                /* tp_dealloc */
+    0,                                        /* tp_print */
+    0,                                        /* tp_getattr */
+    0,                                        /* tp_setattr */
+    0,                                        /* tp_compare */
+    0,                                        /* tp_repr */
+    0,                                        /* tp_as_number */
+    0,                                        /* tp_as_sequence */
+    0,                                        /* tp_as_mapping */
+    0,                                        /* tp_hash */
+    0,                                        /* tp_call */
+    0,                                        /* tp_str */
+    0,                                        /* tp_getattro */
+    0,                                        /* tp_setattro */
+    0,                                        /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                       /* tp_flags */
+    0,                                        /* tp_doc */
+    0,                                        /* tp_traverse */
+    0,                                        /* tp_clear */
+    0,                                        /* tp_richcompare */
+    0,                                        /* tp_weaklistoffset */
+    PyObject_SelfIter,                        /* tp_iter */
+    document_iterator_next,                   /* tp_iternext */
+};
+
+
+static PyObject*
+document_iterator_new(PyObject* decoder, PyObject* json, size_t chunkSize,
+                      PyObject* objectHook, unsigned numberMode, unsigned datetimeMode,
+                      unsigned uuidMode, unsigned parseMode)
+{
+    const char* jsonStr = NULL;
+    Py_ssize_t jsonStrLen = 0;
+    Py_buffer view;
+    bool isBuffer = false;
+
+    if (PyUnicode_Check(json)) {
+        jsonStr = PyUnicode_AsUTF8AndSize(json, &jsonStrLen);
+        if (jsonStr == NULL)
+            return NULL;
+    } else if (PyObject_CheckBuffer(json)) {
+        // This must come before the check on the read() method, because mmap objects
+        // have both
+        if (PyObject_GetBuffer(json, &view, PyBUF_SIMPLE) < 0)
+            return NULL;
+        isBuffer = true;
+        jsonStr = (const char*) view.buf;
+        jsonStrLen = view.len;
+    } else if (!PyObject_HasAttr(json, read_name)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "Expected string, UTF-8 encoded bytes-like object or"
+                        " file-like object");
+        return NULL;
+    }
+
+    DocumentIteratorObject* it = PyObject_New(DocumentIteratorObject,
+                                              &DocumentIterator_Type);
+    if (it == NULL) {
+        if (isBuffer)
+            PyBuffer_Release(&view);
+        return NULL;
+    }
+
+    Py_XINCREF(decoder);
+    it->decoder = decoder;
+    Py_XINCREF(objectHook);
+    it->objectHook = objectHook;
+    Py_INCREF(json);
+    it->json = json;
+    it->isBuffer = isBuffer;
+    if (isBuffer)
+        it->view = view;
+    it->ms = NULL;
+    it->sw = NULL;
+    it->numberMode = numberMode;
+    it->datetimeMode = datetimeMode;
+    it->uuidMode = uuidMode;
+    it->parseMode = parseMode;
+    it->finished = false;
+
+    it->reader = new (std::nothrow) Reader();
+    if (jsonStr != NULL)
+        it->ms = new (std::nothrow) MemoryStream(jsonStr, jsonStrLen);
+    else
+        it->sw = new (std::nothrow) PyReadStreamWrapper(json, chunkSize);
+
+    if (it->reader == NULL || (it->ms == NULL && it->sw == NULL)) {
+        Py_DECREF(it);
+        return PyErr_NoMemory();
+    }
+
+    return (PyObject*) it;
+}
+
+
+PyDoc_STRVAR(iterload_docstring,
+             "iterload(json, *, object_hook=None, number_mode=None, datetime_mode=None,"
+             " uuid_mode=None, parse_mode=None, chunk_size=65536, allow_nan=True)\n"
+             "\n"
+             "Iterate over the JSON documents contained in a string, a bytes-like object or"
+             " a stream, either concatenated or one per line.");
+
+
+static PyObject*
+iterload(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "json",
+        "object_hook",
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "parse_mode",
+        "chunk_size",
+
+        /* compatibility with stdlib json */
+        "allow_nan",
+
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* objectHook = NULL;
+    PyObject* datetimeModeObj = NULL;
+    unsigned datetimeMode = DM_NONE;
+    PyObject* uuidModeObj = NULL;
+    unsigned uuidMode = UM_NONE;
+    PyObject* numberModeObj = NULL;
+    unsigned numberMode = NM_NAN;
+    PyObject* parseModeObj = NULL;
+    unsigned parseMode = PM_NONE;
+    PyObject* chunkSizeObj = NULL;
+    size_t chunkSize = 65536;
+    int allowNan = -1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$OOOOOOp:rapidjson.iterload",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &objectHook,
+                                     &numberModeObj,
+                                     &datetimeModeObj,
+                                     &uuidModeObj,
+                                     &parseModeObj,
+                                     &chunkSizeObj,
+                                     &allowNan))
+        return NULL;
+
+    if (objectHook && !PyCallable_Check(objectHook)) {
+        if (objectHook == Py_None) {
+            objectHook = NULL;
+        } else {
+            PyErr_SetString(PyExc_TypeError, "object_hook is not callable");
+            return NULL;
+        }
+    }
+
+    if (!accept_number_mode_arg(numberModeObj, allowNan, numberMode))
+        return NULL;
+    if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid number_mode, combining NM_NATIVE with NM_DECIMAL"
+                        " is not supported");
+        return NULL;
+    }
+
+    if (!accept_datetime_mode_arg(datetimeModeObj, datetimeMode))
+        return NULL;
+    if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid datetime_mode, can deserialize only from"
+                        " ISO8601");
+        return NULL;
+    }
+
+    if (!accept_uuid_mode_arg(uuidModeObj, uuidMode))
+        return NULL;
+
+    if (!accept_parse_mode_arg(parseModeObj, parseMode))
+        return NULL;
+
+    if (!accept_chunk_size_arg(chunkSizeObj, chunkSize))
+        return NULL;
+
+    return document_iterator_new(NULL, jsonObject, chunkSize, objectHook,
+                                 numberMode, datetimeMode, uuidMode, parseMode);
+}
+
+
+static PyObject*
+decoder_iter(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "json",
+        "chunk_size",
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* chunkSizeObj = NULL;
+    size_t chunkSize = 65536;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$O:iter",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &chunkSizeObj))
+        return NULL;
+
+    if (!decoder_check_options(self, "iter", true))
+        return NULL;
+
+    if (!accept_chunk_size_arg(chunkSizeObj, chunkSize))
+        return NULL;
+
+    DecoderObject* d = (DecoderObject*) self;
+
+    return document_iterator_new(self, jsonObject, chunkSize, NULL, d->numberMode,
+                                 d->datetimeMode, d->uuidMode, d->parseMode);
+}
+
+
+/////////////////////
+// Events iterator //
+/////////////////////
+
+
+/* Iterate over the events generated by the SAX reader, driven one token at a time by
+   its iterative parser, so that memory usage does not depend on the document size:
+   each event is a (path, event, value) tuple, where the path is the JSON Pointer of the
+   value the event refers to. When a prefix is given, only the items of the container it
+   addresses are yielded, each fully built by an embedded PyHandler. */
+
+struct IterParseFrame {
+    bool isObject;
+    size_t index;         // the index of the next item, for arrays
+    size_t pathLength;    // the length of the pointer to the container
+    std::string key;      // the escaped current key, for objects
+};
+
+
+struct IterParseHandler {
+    PyHandler builder;
+    std::vector<IterParseFrame> frames;
+    std::string path;
+    bool hasPrefix;
+    std::string prefix;
+    bool building;
+    PyObject* event;
+
+    IterParseHandler(PyObject* decoder,
+                     PyObject* hook,
+                     unsigned dm,
+                     unsigned um,
+                     unsigned nm,
+                     bool hp,
+                     const std::string& p)
+        : builder(decoder, hook, dm, um, nm),
+          hasPrefix(hp),
+          prefix(p),
+          building(false),
+          event(NULL)
+        {}
+
+    ~IterParseHandler() {
+        Py_CLEAR(builder.root);
+        Py_CLEAR(event);
+    }
+
+    bool Emit(PyObject* name, PyObject* value) {
+        PyObject* pointer = PyUnicode_FromStringAndSize(path.data(), path.size());
+        if (pointer == NULL) {
+            Py_DECREF(value);
+            return false;
+        }
+        event = PyTuple_Pack(3, pointer, name, value);
+        Py_DECREF(pointer);
+        Py_DECREF(value);
+        return event != NULL;
+    }
+
+    bool EmitNone(PyObject* name) {
+        Py_INCREF(Py_None);
+        return Emit(name, Py_None);
+    }
+
+    // Compute the pointer of the value that is starting, and check whether it is an
+    // item of the container addressed by the prefix
+    void BeginValue() {
+        if (building || frames.empty())
+            return;
+
+        IterParseFrame& parent = frames.back();
+
+        path.resize(parent.pathLength);
+        path += '/';
+        if (parent.isObject)
+            path += parent.key;
+        else
+            path += std::to_string(parent.index++);
+
+        building = (hasPrefix
+                    && parent.pathLength == prefix.size()
+                    && path.compare(0, parent.pathLength, prefix) == 0);
+    }
+
+    // Emit the value just converted by the builder, either as a scalar event or as a
+    // complete item
+    bool EndValue(PyObject* name) {
+        if (building) {
+            if (!builder.stack.empty())
+                return true;
+            building = false;
+            name = item_name;
+        }
+        PyObject* value = builder.root;
+        builder.root = NULL;
+        return Emit(name, value);
+    }
+
+    bool Null() {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.Null() && EndValue(null_name);
+    }
+
+    bool Bool(bool b) {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.Bool(b) && EndValue(boolean_name);
+    }
+
+    bool Int(int i) {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.Int(i) && EndValue(number_name);
+    }
+
+    bool Uint(unsigned i) {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.Uint(i) && EndValue(number_name);
+    }
+
+    bool Int64(int64_t i) {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.Int64(i) && EndValue(number_name);
+    }
+
+    bool Uint64(uint64_t i) {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.Uint64(i) && EndValue(number_name);
+    }
+
+    bool Double(double d) {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.Double(d) && EndValue(number_name);
+    }
+
+    bool NaN() {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.NaN() && EndValue(number_name);
+    }
+
+    bool Infinity(bool minus) {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.Infinity(minus) && EndValue(number_name);
+    }
+
+    bool RawNumber(const char* str, SizeType length, bool copy) {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.RawNumber(str, length, copy) && EndValue(number_name);
+    }
+
+    bool String(const char* str, SizeType length, bool copy) {
+        BeginValue();
+        if (!building && hasPrefix)
+            return true;
+        return builder.String(str, length, copy) && EndValue(string_name);
+    }
+
+    bool Key(const char* str, SizeType length, bool copy) {
+        if (building)
+            return builder.Key(str, length, copy);
+
+        IterParseFrame& current = frames.back();
+
+        current.key.clear();
+        for (SizeType i = 0; i < length; i++) {
+            if (str[i] == '~')
+                current.key += "~0";
+            else if (str[i] == '/')
+                current.key += "~1";
+            else
+                current.key += str[i];
+        }
+
+        if (hasPrefix)
+            return true;
+
+        path.resize(current.pathLength);
+        PyObject* key = PyUnicode_FromStringAndSize(str, length);
+        if (key == NULL)
+            return false;
+        return Emit(map_key_name, key);
+    }
+
+    bool Start(bool isObject) {
+        IterParseFrame frame;
+        frame.isObject = isObject;
+        frame.index = 0;
+        frame.pathLength = path.size();
+        try {
+            frames.push_back(frame);
+        } catch (const std::bad_alloc&) {
+            PyErr_NoMemory();
+            return false;
+        }
+        return hasPrefix || EmitNone(isObject ? start_map_name : start_array_name);
+    }
+
+    bool End(bool isObject) {
+        path.resize(frames.back().pathLength);
+        frames.pop_back();
+        return hasPrefix || EmitNone(isObject ? end_map_name : end_array_name);
+    }
+
+    bool StartObject() {
+        BeginValue();
+        if (building)
+            return builder.StartObject();
+        return Start(true);
+    }
+
+    bool EndObject(SizeType memberCount) {
+        if (building)
+            return builder.EndObject(memberCount) && EndValue(NULL);
+        return End(true);
+    }
+
+    bool StartArray() {
+        BeginValue();
+        if (building)
+            return builder.StartArray();
+        return Start(false);
+    }
+
+    bool EndArray(SizeType elementCount) {
+        if (building)
+            return builder.EndArray(elementCount) && EndValue(NULL);
+        return End(false);
+    }
+};
+
+
+typedef struct {
+    PyObject_HEAD
+    PyObject* decoder;
+    PyObject* objectHook;
+    PyObject* json;                 // the str, the owner of the buffer or the stream
+    Py_buffer view;
+    bool isBuffer;
+    MemoryStream* ms;
+    PyReadStreamWrapper* sw;
+    Reader* reader;
+    IterParseHandler* handler;
+    unsigned numberMode;
+    unsigned parseMode;
+    bool finished;
+} EventIteratorObject;
+
+
+static void
+event_iterator_dealloc(PyObject* self)
+{
+    EventIteratorObject* it = (EventIteratorObject*) self;
+
+    delete it->handler;
+    delete it->reader;
+    delete it->ms;
+    delete it->sw;
+    if (it->isBuffer)
+        PyBuffer_Release(&it->view);
+    Py_XDECREF(it->decoder);
+    Py_XDECREF(it->objectHook);
+    Py_XDECREF(it->json);
+    Py_TYPE(self)->tp_free(self);
+}
+
+
+static PyObject*
+event_iterator_next(PyObject* self)
+{
+    EventIteratorObject* it = (EventIteratorObject*) self;
+
+    if (it->finished)
+        return NULL;
+
+    IterParseHandler& handler = *it->handler;
+    Reader& reader = *it->reader;
+    unsigned numberMode = it->numberMode;
+    unsigned parseMode = it->parseMode;
+
+    // Each step of the iterative parser invokes the handler at most once, but not all
+    // invocations produce an event
+    while (handler.event == NULL) {
+        if (reader.IterativeParseComplete()) {
+            it->finished = true;
+            return NULL;
+        }
+
+        if (it->sw != NULL)
+            DECODE_WITH(reader, IterativeParseNext, kParseNoFlags, *it->sw, handler);
+        else if (it->isBuffer)
+            DECODE_WITH(reader, IterativeParseNext, kParseValidateEncodingFlag, *it->ms,
+                        handler);
+        else
+            DECODE_WITH(reader, IterativeParseNext, kParseNoFlags, *it->ms, handler);
+
+        if (reader.HasParseError()) {
+            it->finished = true;
+            set_parse_error(reader.GetErrorOffset(), reader.GetParseErrorCode());
+            return NULL;
+        } else if (PyErr_Occurred()) {
+            // Catch possible error raised in associated stream operations
+            it->finished = true;
+            return NULL;
+        }
+    }
+
+    PyObject* event = handler.event;
+    handler.event = NULL;
+    return event;
+}
+
+
+static PyTypeObject EventIterator_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "rapidjson.EventIterator",                /* tp_name */
+    sizeof(EventIteratorObject),              /* tp_basicsize */
+    0,                                        /* tp_itemsize */
+    event_iterator_dealloc,                   /* tp_dealloc */
+    0,                                        /* tp_print */
+    0,                                        /* tp_getattr */
+    0,                                        /* tp_setattr */
+    0,                                        /* tp_compare */
+    0,                                        /* tp_repr */
+    0,                                        /* tp_as_number */
+    0,                                        /* tp_as_sequence */
+    0,                                        /* tp_as_mapping */
+    0,                                        /* tp_hash */
+    0,                                        /* tp_call */
+    0,                                        /* tp_str */
+    0,                                        /* tp_getattro */
+    0,                                        /* tp_setattro */
+    0,                                        /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                       /* tp_flags */
+    0,                                        /* tp_doc */
+    0,                                        /* tp_traverse */
+    0,                                        /* tp_clear */
+    0,                                        /* tp_richcompare */
+    0,                                        /* tp_weaklistoffset */
+    PyObject_SelfIter,                        /* tp_iter */
+    event_iterator_next,                      /* tp_iternext */
+};
+
+
+static bool
+accept_prefix_arg(PyObject* arg, bool& hasPrefix, std::string& prefix)
+{
+    if (arg == NULL || arg == Py_None) {
+        hasPrefix = false;
+        return true;
+    }
+
+    if (!PyUnicode_Check(arg)) {
+        PyErr_SetString(PyExc_TypeError, "prefix must be a string or None");
+        return false;
+    }
+
+    Py_ssize_t length;
+    const char* str = PyUnicode_AsUTF8AndSize(arg, &length);
+    if (str == NULL)
+        return false;
+
+    if (length > 0 && str[0] != '/') {
+        PyErr_Format(PyExc_ValueError,
+                     "Invalid JSON Pointer %R, must be empty or start with a slash", arg);
+        return false;
+    }
+
+    for (Py_ssize_t pos = 0; pos < length; pos++) {
+        if (str[pos] == '~'
+            && (pos + 1 == length || (str[pos+1] != '0' && str[pos+1] != '1'))) {
+            PyErr_Format(PyExc_ValueError,
+                         "Invalid JSON Pointer %R, bad escape sequence", arg);
+            return false;
+        }
+    }
+
+    hasPrefix = true;
+    prefix.assign(str, length);
+    return true;
+}
+
+
+static PyObject*
+event_iterator_new(PyObject* decoder, PyObject* json, PyObject* prefixObj,
+                   size_t chunkSize, PyObject* objectHook, unsigned numberMode,
+                   unsigned datetimeMode, unsigned uuidMode, unsigned parseMode)
+{
+    bool hasPrefix;
+    std::string prefix;
+
+    if (!accept_prefix_arg(prefixObj, hasPrefix, prefix))
+        return NULL;
+
+    const char* jsonStr = NULL;
+    Py_ssize_t jsonStrLen = 0;
+    Py_buffer view;
+    bool isBuffer = false;
+
+    if (PyUnicode_Check(json)) {
+        jsonStr = PyUnicode_AsUTF8AndSize(json, &jsonStrLen);
+        if (jsonStr == NULL)
+            return NULL;
+    } else if (PyObject_CheckBuffer(json)) {
+        // This must come before the check on the read() method, because mmap objects
+        // have both
+        if (PyObject_GetBuffer(json, &view, PyBUF_SIMPLE) < 0)
+            return NULL;
+        isBuffer = true;
+        jsonStr = (const char*) view.buf;
+        jsonStrLen = view.len;
+    } else if (!PyObject_HasAttr(json, read_name)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "Expected string, UTF-8 encoded bytes-like object or"
+                        " file-like object");
+        return NULL;
+    }
+
+    EventIteratorObject* it = PyObject_New(EventIteratorObject, &EventIterator_Type);
+    if (it == NULL) {
+        if (isBuffer)
+            PyBuffer_Release(&view);
+        return NULL;
+    }
+
+    Py_XINCREF(decoder);
+    it->decoder = decoder;
+    Py_XINCREF(objectHook);
+    it->objectHook = objectHook;
+    Py_INCREF(json);
+    it->json = json;
+    it->isBuffer = isBuffer;
+    if (isBuffer)
+        it->view = view;
+    it->ms = NULL;
+    it->sw = NULL;
+    it->handler = NULL;
+    it->numberMode = numberMode;
+    it->parseMode = parseMode;
+    it->finished = false;
+
+    it->reader = new (std::nothrow) Reader();
+    if (jsonStr != NULL)
+        it->ms = new (std::nothrow) MemoryStream(jsonStr, jsonStrLen);
+    else
+        it->sw = new (std::nothrow) PyReadStreamWrapper(json, chunkSize);
+
+    if (it->reader == NULL || (it->ms == NULL && it->sw == NULL)) {
+        Py_DECREF(it);
+        return PyErr_NoMemory();
+    }
+
+    it->handler = new (std::nothrow) IterParseHandler(decoder, objectHook, datetimeMode,
+                                                      uuidMode, numberMode, hasPrefix,
+                                                      prefix);
+    if (it->handler == NULL) {
+        Py_DECREF(it);
+        return PyErr_NoMemory();
+    }
+    if (PyErr_Occurred()) {
+        // Lookup of the decoder's hooks failed
+        Py_DECREF(it);
+        return NULL;
+    }
+
+    it->reader->IterativeParseInit();
+
+    return (PyObject*) it;
+}
+
+
+PyDoc_STRVAR(iterparse_docstring,
+             "iterparse(json, prefix=None, *, object_hook=None, number_mode=None,"
+             " datetime_mode=None, uuid_mode=None, parse_mode=None, chunk_size=65536,"
+             " allow_nan=True)\n"
+             "\n"
+             "Iterate over the parsing events of a JSON document, as (path, event, value)"
+             " tuples, or over the fully decoded items of the container addressed by the"
+             " prefix JSON Pointer.");
+
+
+static PyObject*
+iterparse(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "json",
+        "prefix",
+        "object_hook",
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "parse_mode",
+        "chunk_size",
+
+        /* compatibility with stdlib json */
+        "allow_nan",
+
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* prefixObj = NULL;
+    PyObject* objectHook = NULL;
+    PyObject* datetimeModeObj = NULL;
+    unsigned datetimeMode = DM_NONE;
+    PyObject* uuidModeObj = NULL;
+    unsigned uuidMode = UM_NONE;
+    PyObject* numberModeObj = NULL;
+    unsigned numberMode = NM_NAN;
+    PyObject* parseModeObj = NULL;
+    unsigned parseMode = PM_NONE;
+    PyObject* chunkSizeObj = NULL;
+    size_t chunkSize = 65536;
+    int allowNan = -1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|O$OOOOOOp:rapidjson.iterparse",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &prefixObj,
+                                     &objectHook,
+                                     &numberModeObj,
+                                     &datetimeModeObj,
+                                     &uuidModeObj,
+                                     &parseModeObj,
+                                     &chunkSizeObj,
+                                     &allowNan))
+        return NULL;
+
+    if (objectHook && !PyCallable_Check(objectHook)) {
+        if (objectHook == Py_None) {
+            objectHook = NULL;
+        } else {
+            PyErr_SetString(PyExc_TypeError, "object_hook is not callable");
+            return NULL;
+        }
+    }
+
+    if (!accept_number_mode_arg(numberModeObj, allowNan, numberMode))
+        return NULL;
+    if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid number_mode, combining NM_NATIVE with NM_DECIMAL"
+                        " is not supported");
+        return NULL;
+    }
+
+    if (!accept_datetime_mode_arg(datetimeModeObj, datetimeMode))
+        return NULL;
+    if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid datetime_mode, can deserialize only from"
+                        " ISO8601");
+        return NULL;
+    }
+
+    if (!accept_uuid_mode_arg(uuidModeObj, uuidMode))
+        return NULL;
+
+    if (!accept_parse_mode_arg(parseModeObj, parseMode))
+        return NULL;
+
+    if (!accept_chunk_size_arg(chunkSizeObj, chunkSize))
+        return NULL;
+
+    return event_iterator_new(NULL, jsonObject, prefixObj, chunkSize, objectHook,
+                              numberMode, datetimeMode, uuidMode, parseMode);
+}
+
+
+static PyObject*
+decoder_iterparse(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "json",
+        "prefix",
+        "chunk_size",
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* prefixObj = NULL;
+    PyObject* chunkSizeObj = NULL;
+    size_t chunkSize = 65536;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|O$O:iterparse",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &prefixObj,
+                                     &chunkSizeObj))
+        return NULL;
+
+    if (!accept_chunk_size_arg(chunkSizeObj, chunkSize))
+        return NULL;
+
+    if (!decoder_check_options(self, "iterparse", false))
+        return NULL;
+
+    DecoderObject* d = (DecoderObject*) self;
+
+    return event_iterator_new(self, jsonObject, prefixObj, chunkSize, NULL,
+                              d->numberMode, d->datetimeMode, d->uuidMode,
+                              d->parseMode);
+}
+
+
+///////////////////////
+// Columnar decoding //
+///////////////////////
+
+
+/* Decode an array of records, that is of objects sharing (mostly) the same keys, into a
+   dictionary of columns: each key is converted to a Python string only once, and the
+   values of the columns containing only numbers are collected in native buffers, that
+   become array.array instances. No dictionary is created for the records themselves,
+   while their values are built by an embedded PyHandler. */
+
+struct Column {
+    std::string name;    // the UTF-8 encoded key
+    PyObject* key;
+    PyObject* values;    // the list of the values, when they are not all numbers
+    TypedBuffer buffer;
+    bool typed;          // whether the values are still going into the buffer
+    size_t count;
+};
+
+
+struct ColumnsHandler {
+    const PointerTrie& trie;
+    size_t target;
+    unsigned numberMode;
+    PyHandler builder;
+    unsigned buildDepth;
+    bool building;
+    std::vector<ExtractFrame> stack;
+    std::vector<Column> columns;
+    size_t rows;
+    size_t current;      // the column of the current key
+    size_t position;     // the position of the current key in the record
+    bool inRecords;
+    bool inRecord;
+    bool done;
+
+    ColumnsHandler(const PointerTrie& t, size_t tn, PyObject* decoder, PyObject* hook,
+                   unsigned dm, unsigned um, unsigned nm)
+        : trie(t),
+          target(tn),
+          numberMode(nm),
+          builder(decoder, hook, dm, um, nm),
+          buildDepth(0),
+          building(false),
+          rows(0),
+          current(0),
+          position(0),
+          inRecords(false),
+          inRecord(false),
+          done(false)
+        {}
+
+    ~ColumnsHandler() {
+        Py_CLEAR(builder.root);
+        for (size_t i = 0; i < columns.size(); i++) {
+            Py_XDECREF(columns[i].key);
+            Py_XDECREF(columns[i].values);
+        }
+    }
+
+    // Build the resulting dictionary, in the order the keys were first seen
+    PyObject* Result() {
+        PyObject* result = PyDict_New();
+        if (result == NULL)
+            return NULL;
+
+        for (size_t i = 0; i < columns.size(); i++) {
+            Column& column = columns[i];
+            PyObject* values;
+
+            if (column.typed) {
+                values = column.buffer.MakeArray();
+                if (values == NULL) {
+                    Py_DECREF(result);
+                    return NULL;
+                }
+            } else {
+                values = column.values;
+                Py_INCREF(values);
+            }
+
+            int rc = PyDict_SetItem(result, column.key, values);
+            Py_DECREF(values);
+            if (rc == -1) {
+                Py_DECREF(result);
+                return NULL;
+            }
+        }
+
+        return result;
+    }
+
+    // Determine the trie node matched by a value outside of the records, and fail if
+    // it is the target but not an array
+    bool Locate(bool isArray) {
+        size_t node;
+        if (stack.empty()) {
+            node = 0;
+        } else {
+            ExtractFrame& frame = stack.back();
+            if (frame.isObject)
+                node = frame.keyNode;
+            else if (frame.node == PointerTrie::NO_POINTER_NODE)
+                node = PointerTrie::NO_POINTER_NODE;
+            else
+                node = trie.Find(frame.node, frame.index);
+            if (!frame.isObject)
+                frame.index++;
+        }
+
+        if (node == target) {
+            if (!isArray) {
+                PyErr_SetString(PyExc_ValueError, "The path does not address an array");
+                return false;
+            }
+            inRecords = true;
+        }
+
+        ExtractFrame frame;
+        frame.node = node;
+        frame.keyNode = PointerTrie::NO_POINTER_NODE;
+        frame.index = 0;
+        frame.isObject = !isArray;
+        stack.push_back(frame);
+        return true;
+    }
+
+    // Check a scalar value that is not part of a record
+    bool Skip() {
+        if (inRecords) {
+            PyErr_SetString(PyExc_ValueError, "The items of the array must be objects");
+            return false;
+        }
+        if (!Locate(false))
+            return false;
+        stack.pop_back();
+        return true;
+    }
+
+    // Switch the column to a list of Python values
+    bool Untype(Column& column) {
+        if (!column.typed)
+            return true;
+        column.typed = false;
+        return column.buffer.Flush(column.values);
+    }
+
+    bool Append(Column& column, PyObject* value) {
+        if (!Untype(column)) {
+            Py_DECREF(value);
+            return false;
+        }
+
+        if (column.count > rows) {
+            // Duplicated key, the last one wins as in a dictionary
+            Py_ssize_t last = PyList_GET_SIZE(column.values) - 1;
+            return PyList_SetItem(column.values, last, value) == 0;
+        }
+
+        int rc = PyList_Append(column.values, value);
+        Py_DECREF(value);
+        column.count++;
+        return rc == 0;
+    }
+
+    bool Built(bool ok) {
+        if (!ok)
+            return false;
+        if (buildDepth > 0)
+            return true;
+
+        building = false;
+        PyObject* value = builder.root;
+        builder.root = NULL;
+        return Append(columns[current], value);
+    }
+
+    // Whether a number can go straight into the buffer of the current column
+    bool Typed() {
+        return inRecord && !building
+            && columns[current].typed && columns[current].count == rows;
+    }
+
+    bool Added(bool ok) {
+        if (ok)
+            columns[current].count++;
+        return ok;
+    }
+
+    bool EndRecord() {
+        // Whatever was not found within the record is missing
+
+        for (size_t i = 0; i < columns.size(); i++) {
+            Column& column = columns[i];
+            if (column.count == rows) {
+                Py_INCREF(Py_None);
+                if (!Append(column, Py_None))
+                    return false;
+            }
+        }
+
+        rows++;
+        return true;
+    }
+
+    bool Null() {
+        if (building || inRecord) {
+            building = true;
+            return Built(builder.Null());
+        }
+        return Skip();
+    }
+
+    bool Bool(bool b) {
+        if (building || inRecord) {
+            building = true;
+            return Built(builder.Bool(b));
+        }
+        return Skip();
+    }
+
+    bool Int(int i) {
+        if (Typed() && Added(columns[current].buffer.AddInt(i)))
+            return true;
+        if (building || inRecord) {
+            building = true;
+            return Built(builder.Int(i));
+        }
+        return Skip();
+    }
+
+    bool Uint(unsigned i) {
+        if (Typed() && Added(columns[current].buffer.AddInt(i)))
+            return true;
+        if (building || inRecord) {
+            building = true;
+            return Built(builder.Uint(i));
+        }
+        return Skip();
+    }
+
+    bool Int64(int64_t i) {
+        if (Typed() && Added(columns[current].buffer.AddInt(i)))
+            return true;
+        if (building || inRecord) {
+            building = true;
+            return Built(builder.Int64(i));
+        }
+        return Skip();
+    }
+
+    bool Uint64(uint64_t i) {
+        if (Typed() && i <= (uint64_t) INT64_MAX
+            && Added(columns[current].buffer.AddInt((int64_t) i)))
+            return true;
+        if (building || inRecord) {
+            building = true;
+            return Built(builder.Uint64(i));
+        }
+        return Skip();
+    }
+
+    bool Double(double d) {
+        if (Typed() && Added(columns[current].buffer.AddDouble(d)))
+            return true;
+        if (building || inRecord) {
+            building = true;
+            return Built(builder.Double(d));
+        }
+        return Skip();
+    }
+
+    bool RawNumber(const char* str, SizeType length, bool copy) {
+        if (Typed()) {
+            bool isFloat = false;
+            for (SizeType i = 0; i < length; i++) {
+                if (!isdigit(str[i]) && str[i] != '-') {
+                    isFloat = true;
+                    break;
+                }
+            }
+            if (!(isFloat && (numberMode & NM_DECIMAL))
+                && Added(columns[current].buffer.AddRawNumber(str, length, isFloat)))
+                return true;
+        }
+        if (building || inRecord) {
+            building = true;
+            return Built(builder.RawNumber(str, length, copy));
+        }
+        return Skip();
+    }
+
+    bool String(const char* str, SizeType length, bool copy) {
+        if (building || inRecord) {
+            building = true;
+            return Built(builder.String(str, length, copy));
+        }
+        return Skip();
+    }
+
+    bool Key(const char* str, SizeType length, bool copy) {
+        if (building)
+            return builder.Key(str, length, copy);
+
+        if (inRecord) {
+            // Records usually have their keys in the same order, so look first at the
+            // column in the same position
+
+            size_t index = position++;
+            if (index >= columns.size()
+                || columns[index].name.size() != length
+                || memcmp(columns[index].name.data(), str, length) != 0) {
+                for (index = 0; index < columns.size(); index++)
+                    if (columns[index].name.size() == length
+                        && memcmp(columns[index].name.data(), str, length) == 0)
+                        break;
+            }
+
+            if (index == columns.size()) {
+                columns.push_back(Column());
+                Column& column = columns.back();
+                column.name.assign(str, length);
+                column.key = PyUnicode_FromStringAndSize(str, length);
+                column.values = PyList_New(0);
+                column.typed = rows == 0;
+                column.count = 0;
+                if (column.key == NULL || column.values == NULL)
+                    return false;
+
+                // The records seen so far lack the new key
+
+                for (; column.count < rows; column.count++)
+                    if (PyList_Append(column.values, Py_None) == -1)
+                        return false;
+            }
+
+            current = index;
+            return true;
+        }
+
+        ExtractFrame& frame = stack.back();
+        if (frame.node == PointerTrie::NO_POINTER_NODE)
+            frame.keyNode = PointerTrie::NO_POINTER_NODE;
+        else
+            frame.keyNode = trie.Find(frame.node, str, length);
+        return true;
+    }
+
+    bool StartObject() {
+        if (building || inRecord) {
+            building = true;
+            buildDepth++;
+            return builder.StartObject();
+        }
+        if (inRecords) {
+            inRecord = true;
+            position = 0;
+            return true;
+        }
+        return Locate(false);
+    }
+
+    bool EndObject(SizeType memberCount) {
+        if (building) {
+            buildDepth--;
+            return Built(builder.EndObject(memberCount));
+        }
+        if (inRecord) {
+            inRecord = false;
+            return EndRecord();
+        }
+        stack.pop_back();
+        return true;
+    }
+
+    bool StartArray() {
+        if (building || inRecord) {
+            building = true;
+            buildDepth++;
+            return builder.StartArray();
+        }
+        if (inRecords) {
+            PyErr_SetString(PyExc_ValueError, "The items of the array must be objects");
+            return false;
+        }
+        return Locate(true);
+    }
+
+    bool EndArray(SizeType elementCount) {
+        if (building) {
+            buildDepth--;
+            return Built(builder.EndArray(elementCount));
+        }
+        if (inRecords) {
+            // Stop the parser, all the records have been decoded
+            done = true;
+            return false;
+        }
+        stack.pop_back();
+        return true;
+    }
+};
+
+
+static PyObject*
+do_decode_columns(PyObject* decoder, PyObject* json, PyObject* pathObj, size_t chunkSize,
+                  PyObject* objectHook, unsigned numberMode, unsigned datetimeMode,
+                  unsigned uuidMode, unsigned parseMode)
+{
+    PointerTrie trie;
+    size_t target = 0;
+
+    if (pathObj != NULL && pathObj != Py_None) {
+        if (!PyUnicode_Check(pathObj)) {
+            PyErr_SetString(PyExc_TypeError, "path must be a string or None");
+            return NULL;
+        }
+
+        PyObject* pointers = PyList_New(0);
+        if (pointers == NULL)
+            return NULL;
+        bool ok = pointer_set_add(trie, pathObj, pointers);
+        Py_DECREF(pointers);
+        if (!ok)
+            return NULL;
+        target = trie.targets[0];
+    }
+
+    const char* jsonStr = NULL;
+    Py_ssize_t jsonStrLen = 0;
+    Py_buffer view;
+    bool isBuffer = false;
+
+    if (PyUnicode_Check(json)) {
+        jsonStr = PyUnicode_AsUTF8AndSize(json, &jsonStrLen);
+        if (jsonStr == NULL)
+            return NULL;
+    } else if (PyObject_CheckBuffer(json)) {
+        // This must come before the check on the read() method, because mmap objects
+        // have both
+        if (PyObject_GetBuffer(json, &view, PyBUF_SIMPLE) < 0)
+            return NULL;
+        isBuffer = true;
+        jsonStr = (const char*) view.buf;
+        jsonStrLen = view.len;
+    } else if (!PyObject_HasAttr(json, read_name)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "Expected string, UTF-8 encoded bytes-like object or"
+                        " file-like object");
+        return NULL;
+    }
+
+    Reader reader;
+    PyObject* result = NULL;
+
+    try {
+        ColumnsHandler handler(trie, target, decoder, objectHook,
+                               datetimeMode, uuidMode, numberMode);
+
+        if (!PyErr_Occurred()) {
+            // Lookup of the decoder's hooks succeeded
+
+            if (jsonStr != NULL) {
+                MemoryStream ms(jsonStr, jsonStrLen);
+
+                if (isBuffer)
+                    DECODE(reader, kParseValidateEncodingFlag, ms, handler);
+                else
+                    DECODE(reader, kParseNoFlags, ms, handler);
+            } else {
+                PyReadStreamWrapper sw(json, chunkSize);
+
+                DECODE(reader, kParseNoFlags, sw, handler);
+            }
+
+            // When the records have been decoded the handler stops the parser, and the
+            // rest of the document is neither read nor validated
+
+            if (handler.done)
+                result = handler.Result();
+            else if (reader.HasParseError())
+                set_parse_error(reader.GetErrorOffset(), reader.GetParseErrorCode());
+            else if (!PyErr_Occurred())
+                PyErr_SetString(PyExc_ValueError, "The path does not address an array");
+        }
+    } catch (const std::bad_alloc&) {
+        PyErr_NoMemory();
+    }
+
+    if (isBuffer)
+        PyBuffer_Release(&view);
+
+    return result;
+}
+
+
+PyDoc_STRVAR(loads_columns_docstring,
+             "loads_columns(json, path=None, *, object_hook=None, number_mode=None,"
+             " datetime_mode=None, uuid_mode=None, parse_mode=None, chunk_size=65536,"
+             " allow_nan=True)\n"
+             "\n"
+             "Decode an array of objects, possibly addressed by the path JSON Pointer, into"
+             " a dictionary of columns, packing the numeric ones into array.array"
+             " instances.");
+
+
+static PyObject*
+loads_columns(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "json",
+        "path",
+        "object_hook",
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "parse_mode",
+        "chunk_size",
+
+        /* compatibility with stdlib json */
+        "allow_nan",
+
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* pathObj = NULL;
+    PyObject* objectHook = NULL;
+    PyObject* datetimeModeObj = NULL;
+    unsigned datetimeMode = DM_NONE;
+    PyObject* uuidModeObj = NULL;
+    unsigned uuidMode = UM_NONE;
+    PyObject* numberModeObj = NULL;
+    unsigned numberMode = NM_NAN;
+    PyObject* parseModeObj = NULL;
+    unsigned parseMode = PM_NONE;
+    PyObject* chunkSizeObj = NULL;
+    size_t chunkSize = 65536;
+    int allowNan = -1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|O$OOOOOOp:rapidjson.loads_columns",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &pathObj,
+                                     &objectHook,
+                                     &numberModeObj,
+                                     &datetimeModeObj,
+                                     &uuidModeObj,
+                                     &parseModeObj,
+                                     &chunkSizeObj,
+                                     &allowNan))
+        return NULL;
+
+    if (objectHook && !PyCallable_Check(objectHook)) {
+        if (objectHook == Py_None) {
+            objectHook = NULL;
+        } else {
+            PyErr_SetString(PyExc_TypeError, "object_hook is not callable");
+            return NULL;
+        }
+    }
+
+    if (!accept_number_mode_arg(numberModeObj, allowNan, numberMode))
+        return NULL;
+    if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid number_mode, combining NM_NATIVE with NM_DECIMAL"
+                        " is not supported");
+        return NULL;
+    }
+
+    if (!accept_datetime_mode_arg(datetimeModeObj, datetimeMode))
+        return NULL;
+    if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid datetime_mode, can deserialize only from"
+                        " ISO8601");
+        return NULL;
+    }
+
+    if (!accept_uuid_mode_arg(uuidModeObj, uuidMode))
+        return NULL;
+
+    if (!accept_parse_mode_arg(parseModeObj, parseMode))
+        return NULL;
+
+    if (!accept_chunk_size_arg(chunkSizeObj, chunkSize))
+        return NULL;
+
+    return do_decode_columns(NULL, jsonObject, pathObj, chunkSize, objectHook,
+                             numberMode, datetimeMode, uuidMode, parseMode);
+}
+
+
+static PyObject*
+decoder_columns(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "json",
+        "path",
+        "chunk_size",
+        NULL
+    };
+    PyObject* jsonObject;
+    PyObject* pathObj = NULL;
+    PyObject* chunkSizeObj = NULL;
+    size_t chunkSize = 65536;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|O$O:columns",
+                                     (char**) kwlist,
+                                     &jsonObject,
+                                     &pathObj,
+                                     &chunkSizeObj))
+        return NULL;
+
+    if (!accept_chunk_size_arg(chunkSizeObj, chunkSize))
+        return NULL;
+
+    if (!decoder_check_options(self, "columns", false))
+        return NULL;
+
+    DecoderObject* d = (DecoderObject*) self;
+
+    return do_decode_columns(self, jsonObject, pathObj, chunkSize, NULL,
+                             d->numberMode, d->datetimeMode, d->uuidMode,
+                             d->parseMode);
+}
+
+
+//////////////////////////////
+// Schema-directed decoding //
+//////////////////////////////
+
+
+/* When a Decoder has a target type, its layout is compiled once into a Schema, a graph
+   of nodes each describing what is expected at some place of the document: a record,
+   that is a dataclass, a named tuple or a class with __slots__, built straight from
+   the members of a JSON object without an intermediate dictionary; a list or a
+   dictionary of some other type; an optional value; or anything else, that is decoded
+   as usual by an embedded PyHandler. */
+
+enum SchemaKind {
+    SK_ANY,
+    SK_RECORD,
+    SK_LIST,
+    SK_DICT,
+    SK_OPTIONAL
+};
+
+
+struct SchemaField {
+    std::string name;        // the UTF-8 encoded name
+    PyObject* pyname;
+    size_t node;
+};
+
+
+struct SchemaNode {
+    SchemaKind kind;
+    PyObject* type;
+    size_t item;             // the node of the items, for lists, dicts and optionals
+    std::vector<SchemaField> fields;
+    bool positional;         // whether all the fields can be passed positionally
+    bool setattr;            // whether the fields are set on a bare instance
+};
+
+
+struct Schema {
+    std::vector<SchemaNode> nodes;
+
+    ~Schema() {
+        for (size_t i = 0; i < nodes.size(); i++) {
+            Py_XDECREF(nodes[i].type);
+            for (size_t f = 0; f < nodes[i].fields.size(); f++)
+                Py_XDECREF(nodes[i].fields[f].pyname);
+        }
+    }
+
+    static const size_t NO_NODE = (size_t) -1;
+};
+
+
+struct SchemaCompiler {
+    Schema& schema;
+    PyObject* typing;
+    PyObject* unionType;     // types.UnionType, NULL before Python 3.10
+
+    SchemaCompiler(Schema& s)
+        : schema(s),
+          typing(NULL),
+          unionType(NULL)
+        {}
+
+    ~SchemaCompiler() {
+        Py_XDECREF(typing);
+        Py_XDECREF(unionType);
+    }
+
+    bool Init() {
+        typing = PyImport_ImportModule("typing");
+        if (typing == NULL)
+            return false;
+
+        PyObject* types = PyImport_ImportModule("types");
+        if (types == NULL)
+            return false;
+        unionType = PyObject_GetAttrString(types, "UnionType");
+        Py_DECREF(types);
+        if (unionType == NULL)
+            PyErr_Clear();
+        return true;
+    }
+
+    // Return a new reference to the given attribute, or NULL without an exception when
+    // it does not exist
+    static PyObject* Lookup(PyObject* obj, const char* name) {
+        PyObject* value = PyObject_GetAttrString(obj, name);
+        if (value == NULL && PyErr_ExceptionMatches(PyExc_AttributeError))
+            PyErr_Clear();
+        return value;
+    }
+
+    bool AddField(size_t index, PyObject* name, PyObject* hints) {
+        Py_ssize_t length;
+        const char* str = PyUnicode_AsUTF8AndSize(name, &length);
+        if (str == NULL)
+            return false;
+
+        PyObject* annotation = hints != NULL ? PyDict_GetItem(hints, name) : NULL;
+        size_t node = Add(annotation != NULL ? annotation : Py_None);
+        if (node == Schema::NO_NODE)
+            return false;
+
+        SchemaField field;
+        field.name.assign(str, length);
+        Py_INCREF(name);
+        field.pyname = name;
+        field.node = node;
+        schema.nodes[index].fields.push_back(field);
+        return true;
+    }
+
+    // Fill the fields of a record, in the order they are accepted by its constructor
+    bool AddRecord(size_t index, PyObject* type) {
+        PyObject* hints = PyObject_CallMethod(typing, "get_type_hints", "O", type);
+        if (hints == NULL)
+            return false;
+
+        bool ok = true;
+        PyObject* dataclassFields = Lookup(type, "__dataclass_fields__");
+        PyObject* fields = dataclassFields == NULL ? Lookup(type, "_fields") : NULL;
+        PyObject* slots = NULL;
+
+        if (dataclassFields != NULL) {
+            schema.nodes[index].kind = SK_RECORD;
+            schema.nodes[index].positional = true;
+
+            PyObject* dataclasses = PyImport_ImportModule("dataclasses");
+            PyObject* list = (dataclasses == NULL
+                              ? NULL
+                              : PyObject_CallMethod(dataclasses, "fields", "O", type));
+            Py_XDECREF(dataclasses);
+            ok = list != NULL;
+
+            for (Py_ssize_t i = 0; ok && i < PySequence_Fast_GET_SIZE(list); i++) {
+                PyObject* field = PySequence_Fast_GET_ITEM(list, i);
+                PyObject* init = PyObject_GetAttrString(field, "init");
+                PyObject* kwOnly = Lookup(field, "kw_only");
+                PyObject* name = PyObject_GetAttrString(field, "name");
+
+                if (init == NULL || name == NULL || PyErr_Occurred())
+                    ok = false;
+                else if (PyObject_IsTrue(init)) {
+                    if (kwOnly != NULL && PyObject_IsTrue(kwOnly))
+                        schema.nodes[index].positional = false;
+                    ok = AddField(index, name, hints);
+                }
+
+                Py_XDECREF(init);
+                Py_XDECREF(kwOnly);
+                Py_XDECREF(name);
+            }
+            Py_XDECREF(list);
+        } else if (fields != NULL && PyTuple_Check(fields)
+                   && PyType_IsSubtype((PyTypeObject*) type, &PyTuple_Type)) {
+            schema.nodes[index].kind = SK_RECORD;
+            schema.nodes[index].positional = true;
+
+            for (Py_ssize_t i = 0; ok && i < PyTuple_GET_SIZE(fields); i++)
+                ok = AddField(index, PyTuple_GET_ITEM(fields, i), hints);
+        } else if (!PyErr_Occurred()
+                   && ((PyTypeObject*) type)->tp_setattro == PyObject_GenericSetAttr) {
+            // Immutable values such as uuid.UUID guard their slots with a custom
+            // __setattr__(), and are left to the usual modes as are builtin types
+
+            slots = slots_fields((PyTypeObject*) type);
+            ok = slots != NULL;
+
+            if (ok && slots != Py_None) {
+                schema.nodes[index].kind = SK_RECORD;
+                schema.nodes[index].setattr = true;
+
+                for (Py_ssize_t i = 0; ok && i < PyTuple_GET_SIZE(slots); i++)
+                    ok = AddField(index, PyTuple_GET_ITEM(slots, i), hints);
+            }
+        }
+
+        Py_XDECREF(dataclassFields);
+        Py_XDECREF(fields);
+        Py_XDECREF(slots);
+        Py_DECREF(hints);
+        return ok && !PyErr_Occurred();
+    }
+
+    // Return the node of the given type annotation, compiling it when not already seen,
+    // and Schema::NO_NODE on errors
+    size_t Add(PyObject* type) {
+        // Reusing the node of the same type also handles recursive definitions
+
+        for (size_t i = 0; i < schema.nodes.size(); i++)
+            if (schema.nodes[i].type == type)
+                return i;
+
+        size_t index = schema.nodes.size();
+        SchemaNode node;
+        node.kind = SK_ANY;
+        Py_INCREF(type);
+        node.type = type;
+        node.item = Schema::NO_NODE;
+        node.positional = false;
+        node.setattr = false;
+        schema.nodes.push_back(node);
+
+        PyObject* origin = Lookup(type, "__origin__");
+        PyObject* args = Lookup(type, "__args__");
+        size_t item = Schema::NO_NODE;
+        bool ok = !PyErr_Occurred();
+
+        if (ok && args != NULL && PyTuple_Check(args)) {
+            Py_ssize_t nargs = PyTuple_GET_SIZE(args);
+            PyObject* unionOrigin = PyObject_GetAttrString(typing, "Union");
+            ok = unionOrigin != NULL;
+
+            if (!ok) {
+                // Nothing to do
+            } else if (origin == (PyObject*) &PyList_Type && nargs == 1) {
+                schema.nodes[index].kind = SK_LIST;
+                item = Add(PyTuple_GET_ITEM(args, 0));
+                ok = item != Schema::NO_NODE;
+            } else if (origin == (PyObject*) &PyDict_Type && nargs == 2) {
+                schema.nodes[index].kind = SK_DICT;
+                item = Add(PyTuple_GET_ITEM(args, 1));
+                ok = item != Schema::NO_NODE;
+            } else if ((origin == unionOrigin
+                        || (unionType != NULL && PyObject_TypeCheck(type,
+                                                                    (PyTypeObject*)
+                                                                    unionType)))
+                       && nargs == 2
+                       && (PyTuple_GET_ITEM(args, 0) == (PyObject*) Py_TYPE(Py_None)
+                           || PyTuple_GET_ITEM(args, 1) == (PyObject*) Py_TYPE(Py_None))) {
+                schema.nodes[index].kind = SK_OPTIONAL;
+                item = Add(PyTuple_GET_ITEM(args, 0) == (PyObject*) Py_TYPE(Py_None)
+                           ? PyTuple_GET_ITEM(args, 1)
+                           : PyTuple_GET_ITEM(args, 0));
+                ok = item != Schema::NO_NODE;
+            }
+
+            Py_XDECREF(unionOrigin);
+        } else if (ok && origin == NULL && PyType_Check(type)
+                   && type != (PyObject*) Py_TYPE(Py_None)) {
+            ok = AddRecord(index, type);
+        }
+
+        Py_XDECREF(origin);
+        Py_XDECREF(args);
+
+        if (!ok)
+            return Schema::NO_NODE;
+
+        schema.nodes[index].item = item;
+        return index;
+    }
+};
+
+
+static Schema*
+schema_compile(PyObject* target)
+{
+    Schema* schema = new (std::nothrow) Schema();
+    if (schema == NULL) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+
+    try {
+        SchemaCompiler compiler(*schema);
+        if (compiler.Init() && compiler.Add(target) != Schema::NO_NODE)
+            return schema;
+    } catch (const std::bad_alloc&) {
+        PyErr_NoMemory();
+    }
+
+    delete schema;
+    return NULL;
+}
+
+
+struct SchemaFrame {
+    size_t node;
+    PyObject* object;        // the list or the dictionary, NULL for records
+    PyObject* key;           // the current key, for dictionaries
+    size_t slots;            // the position of the record values in the handler slots
+    size_t field;            // the field of the current key, for records
+    size_t position;         // the position of the current key in the record
+};
+
+
+struct SchemaHandler {
+    const Schema& schema;
+    PyHandler builder;
+    bool building;
+    unsigned buildDepth;
+    unsigned skipDepth;
+    std::vector<SchemaFrame> stack;
+    std::vector<PyObject*> slots;
+    PyObject* root;
+
+    SchemaHandler(const Schema& s, PyObject* decoder, unsigned dm, unsigned um,
+                  unsigned nm)
+        : schema(s),
+          builder(decoder, NULL, dm, um, nm),
+          building(false),
+          buildDepth(0),
+          skipDepth(0),
+          root(NULL)
+        {}
+
+    ~SchemaHandler() {
+        Py_CLEAR(builder.root);
+        for (size_t i = 0; i < stack.size(); i++) {
+            Py_XDECREF(stack[i].object);
+            Py_XDECREF(stack[i].key);
+        }
+        for (size_t i = 0; i < slots.size(); i++)
+            Py_XDECREF(slots[i]);
+    }
+
+    // The node of the value that is starting, Schema::NO_NODE when it belongs to an
+    // unknown field and must be skipped
+    size_t Expected() const {
+        if (stack.empty())
+            return 0;
+
+        const SchemaFrame& frame = stack.back();
+        const SchemaNode& node = schema.nodes[frame.node];
+
+        if (node.kind == SK_RECORD)
+            return frame.field == Schema::NO_NODE
+                ? Schema::NO_NODE
+                : node.fields[frame.field].node;
+        return node.item;
+    }
+
+    bool Mismatch(size_t node, const char* what) {
+        PyObject* type = schema.nodes[node].type;
+        PyErr_Format(PyExc_ValueError, "Expected %s for %R", what, type);
+        return false;
+    }
+
+    bool Store(PyObject* value) {
+        if (value == NULL)
+            return false;
+
+        if (stack.empty()) {
+            root = value;
+            return true;
+        }
+
+        SchemaFrame& frame = stack.back();
+        int rc = 0;
+
+        switch (schema.nodes[frame.node].kind) {
+        case SK_RECORD:
+            Py_XSETREF(slots[frame.slots + frame.field], value);
+            return true;
+
+        case SK_LIST:
+            rc = PyList_Append(frame.object, value);
+            break;
+
+        default:
+            rc = PyDict_SetItem(frame.object, frame.key, value);
+            Py_CLEAR(frame.key);
+        }
+
+        Py_DECREF(value);
+        return rc == 0;
+    }
+
+    // Build a record from the values collected in the slots
+    PyObject* MakeRecord(const SchemaFrame& frame) {
+        const SchemaNode& node = schema.nodes[frame.node];
+        size_t count = node.fields.size();
+        PyObject** values = slots.data() + frame.slots;
+        PyObject* record = NULL;
+
+        if (node.setattr) {
+            // Slots have no default value, and one left unset would raise an
+            // AttributeError only when read
+            for (size_t i = 0; i < count; i++) {
+                if (values[i] == NULL) {
+                    PyErr_Format(PyExc_ValueError, "Missing member %R for %R",
+                                 node.fields[i].pyname, node.type);
+                    return NULL;
+                }
+            }
+
+            PyTypeObject* type = (PyTypeObject*) node.type;
+            PyObject* args = PyTuple_New(0);
+            if (args == NULL)
+                return NULL;
+            record = type->tp_new(type, args, NULL);
+            Py_DECREF(args);
+
+            for (size_t i = 0; record != NULL && i < count; i++) {
+                if (PyObject_SetAttr(record, node.fields[i].pyname, values[i]) == -1)
+                    Py_CLEAR(record);
+            }
+            return record;
+        }
+
+        size_t present = 0;
+        for (size_t i = 0; i < count; i++)
+            if (values[i] != NULL)
+                present++;
+
+        if (node.positional && present == count) {
+            PyObject* args = PyTuple_New(count);
+            if (args == NULL)
                 return NULL;
+            for (size_t i = 0; i < count; i++) {
+                PyTuple_SET_ITEM(args, i, values[i]);
+                values[i] = NULL;
+            }
+            record = PyObject_Call(node.type, args, NULL);
+            Py_DECREF(args);
+            return record;
+        }
+
+        // Some fields are missing or keyword-only: let the constructor apply the
+        // defaults
+
+        PyObject* args = PyTuple_New(0);
+        PyObject* kwargs = PyDict_New();
+        bool ok = args != NULL && kwargs != NULL;
+
+        for (size_t i = 0; ok && i < count; i++)
+            if (values[i] != NULL)
+                ok = PyDict_SetItem(kwargs, node.fields[i].pyname, values[i]) == 0;
+
+        if (ok)
+            record = PyObject_Call(node.type, args, kwargs);
+
+        Py_XDECREF(args);
+        Py_XDECREF(kwargs);
+        return record;
+    }
+
+    // Handle the start of a scalar: return 1 when it must be built by the builder, 0
+    // when it has been skipped or stored, -1 on errors
+    int BeginScalar(bool isNull) {
+        if (building)
+            return 1;
+        if (skipDepth > 0)
+            return 0;
+
+        size_t node = Expected();
+        if (node == Schema::NO_NODE)
+            return 0;
+
+        if (schema.nodes[node].kind == SK_OPTIONAL) {
+            if (isNull) {
+                Py_INCREF(Py_None);
+                return Store(Py_None) ? 0 : -1;
             }
+            node = schema.nodes[node].item;
+        }
+
+        if (schema.nodes[node].kind != SK_ANY)
+            return Mismatch(node, schema.nodes[node].kind == SK_LIST
+                            ? "a JSON array" : "a JSON object") ? 0 : -1;
+
+        building = true;
+        buildDepth = 0;
+        return 1;
+    }
+
+    bool Built(bool ok) {
+        if (!ok)
+            return false;
+        if (buildDepth > 0)
+            return true;
+
+        building = false;
+        PyObject* value = builder.root;
+        builder.root = NULL;
+        return Store(value);
+    }
+
+    // Handle the start of a container: return 1 when it must be built by the builder,
+    // 0 when it has been skipped or pushed on the stack, -1 on errors
+    int BeginContainer(bool isObject) {
+        if (building) {
+            buildDepth++;
+            return 1;
+        }
+        if (skipDepth > 0) {
+            skipDepth++;
+            return 0;
+        }
+
+        size_t node = Expected();
+        if (node == Schema::NO_NODE) {
+            skipDepth = 1;
+            return 0;
+        }
+
+        if (schema.nodes[node].kind == SK_OPTIONAL)
+            node = schema.nodes[node].item;
+
+        SchemaKind kind = schema.nodes[node].kind;
+
+        if (kind == SK_ANY) {
+            building = true;
+            buildDepth = 1;
+            return 1;
+        }
+
+        if (isObject ? kind == SK_LIST : kind != SK_LIST)
+            return Mismatch(node, kind == SK_LIST
+                            ? "a JSON array" : "a JSON object") ? 0 : -1;
+
+        SchemaFrame frame;
+        frame.node = node;
+        frame.object = NULL;
+        frame.key = NULL;
+        frame.slots = slots.size();
+        frame.field = Schema::NO_NODE;
+        frame.position = 0;
+
+        if (kind == SK_RECORD)
+            slots.resize(slots.size() + schema.nodes[node].fields.size(), NULL);
+        else {
+            frame.object = kind == SK_LIST ? PyList_New(0) : PyDict_New();
+            if (frame.object == NULL)
+                return -1;
+        }
+
+        stack.push_back(frame);
+        return 0;
+    }
+
+    // Handle the end of a container: return 1 when it was built by the builder, 0 when
+    // it has been completed, -1 on errors
+    int EndContainer() {
+        if (building) {
+            buildDepth--;
+            return 1;
+        }
+        if (skipDepth > 0) {
+            skipDepth--;
+            return 0;
+        }
+
+        SchemaFrame frame = stack.back();
+        PyObject* value;
+
+        if (frame.object != NULL)
+            value = frame.object;
+        else {
+            value = MakeRecord(frame);
+            for (size_t i = frame.slots; i < slots.size(); i++)
+                Py_CLEAR(slots[i]);
+            slots.resize(frame.slots);
+        }
+        Py_XDECREF(frame.key);
+        stack.pop_back();
+
+        return Store(value) ? 0 : -1;
+    }
+
+    bool Null() {
+        int rc = BeginScalar(true);
+        return rc > 0 ? Built(builder.Null()) : rc == 0;
+    }
+
+    bool Bool(bool b) {
+        int rc = BeginScalar(false);
+        return rc > 0 ? Built(builder.Bool(b)) : rc == 0;
+    }
+
+    bool Int(int i) {
+        int rc = BeginScalar(false);
+        return rc > 0 ? Built(builder.Int(i)) : rc == 0;
+    }
+
+    bool Uint(unsigned i) {
+        int rc = BeginScalar(false);
+        return rc > 0 ? Built(builder.Uint(i)) : rc == 0;
+    }
+
+    bool Int64(int64_t i) {
+        int rc = BeginScalar(false);
+        return rc > 0 ? Built(builder.Int64(i)) : rc == 0;
+    }
+
+    bool Uint64(uint64_t i) {
+        int rc = BeginScalar(false);
+        return rc > 0 ? Built(builder.Uint64(i)) : rc == 0;
+    }
+
+    bool Double(double d) {
+        int rc = BeginScalar(false);
+        return rc > 0 ? Built(builder.Double(d)) : rc == 0;
+    }
+
+    bool NaN() {
+        int rc = BeginScalar(false);
+        return rc > 0 ? Built(builder.NaN()) : rc == 0;
+    }
+
+    bool Infinity(bool minus) {
+        int rc = BeginScalar(false);
+        return rc > 0 ? Built(builder.Infinity(minus)) : rc == 0;
+    }
+
+    bool RawNumber(const char* str, SizeType length, bool copy) {
+        int rc = BeginScalar(false);
+        return rc > 0 ? Built(builder.RawNumber(str, length, copy)) : rc == 0;
+    }
+
+    bool String(const char* str, SizeType length, bool copy) {
+        int rc = BeginScalar(false);
+        return rc > 0 ? Built(builder.String(str, length, copy)) : rc == 0;
+    }
+
+    bool Key(const char* str, SizeType length, bool copy) {
+        if (building)
+            return builder.Key(str, length, copy);
+        if (skipDepth > 0)
+            return true;
+
+        SchemaFrame& frame = stack.back();
+        const SchemaNode& node = schema.nodes[frame.node];
+
+        if (node.kind != SK_RECORD) {
+            Py_XDECREF(frame.key);
+            frame.key = builder.MakeKey(str, length);
+            return frame.key != NULL;
+        }
+
+        // Keys usually come in the order of the fields, so look first at the field in
+        // the same position
+
+        const std::vector<SchemaField>& fields = node.fields;
+        size_t index = frame.position++;
+
+        if (index >= fields.size()
+            || fields[index].name.size() != length
+            || memcmp(fields[index].name.data(), str, length) != 0) {
+            for (index = 0; index < fields.size(); index++)
+                if (fields[index].name.size() == length
+                    && memcmp(fields[index].name.data(), str, length) == 0)
+                    break;
         }
+
+        frame.field = index < fields.size() ? index : Schema::NO_NODE;
+        return true;
+    }
+
+    bool StartObject() {
+        int rc = BeginContainer(true);
+        return rc > 0 ? builder.StartObject() : rc == 0;
+    }
+
+    bool EndObject(SizeType memberCount) {
+        int rc = EndContainer();
+        return rc > 0 ? Built(builder.EndObject(memberCount)) : rc == 0;
+    }
+
+    bool StartArray() {
+        int rc = BeginContainer(false);
+        return rc > 0 ? builder.StartArray() : rc == 0;
+    }
+
+    bool EndArray(SizeType elementCount) {
+        int rc = EndContainer();
+        return rc > 0 ? Built(builder.EndArray(elementCount)) : rc == 0;
+    }
+};
+
+
+static PyObject*
+do_schema_decode(PyObject* decoder, const char* jsonStr, Py_ssize_t jsonStrLen,
+                 bool isBuffer, PyObject* jsonStream, size_t chunkSize,
+                 unsigned numberMode, unsigned datetimeMode, unsigned uuidMode,
+                 unsigned parseMode, unsigned arrayMode, bool releaseGil)
+{
+    try {
+        SchemaHandler handler(*decoder_schema(decoder), decoder, datetimeMode, uuidMode,
+                              numberMode);
+
+        if (PyErr_Occurred())
+            // Lookup of the decoder's hooks failed
+            return NULL;
+
+        handler.builder.arrayMode = arrayMode;
+
+        return decode_with(decoder, handler, jsonStr, jsonStrLen, isBuffer, jsonStream,
+                           chunkSize, numberMode, parseMode, releaseGil);
+    } catch (const std::bad_alloc&) {
+        return PyErr_NoMemory();
+    }
+}
+
+
+// Parse the next document of Decoder.iter() into the decoder's target type
+
+static PyObject*
+document_iterator_schema_next(DocumentIteratorObject* it, const Schema& schema)
+{
+    try {
+        SchemaHandler handler(schema, it->decoder, it->datetimeMode, it->uuidMode,
+                              it->numberMode);
+
+        if (PyErr_Occurred())
+            // Lookup of the decoder's hooks failed
+            return NULL;
+
+        return document_iterator_parse(it, handler);
+    } catch (const std::bad_alloc&) {
+        return PyErr_NoMemory();
     }
-    if (allowNan != -1) {
-        if (allowNan)
-            numberMode |= NM_NAN;
+}
+
+
+////////////////////
+// Batch decoding //
+////////////////////
+
+
+/* A batch of documents is parsed by a pool of native threads, each one recording the
+   events of the next pending document into its own Tape with the GIL released; the
+   tapes are then replayed in order, holding the GIL, to build the Python values. */
+
+struct BatchItem {
+    const char* str;
+    Py_ssize_t length;
+    bool isBuffer;
+    Tape tape;
+    ParseErrorCode errorCode;
+    size_t errorOffset;
+    bool outOfMemory;
+};
+
+
+struct Batch {
+    std::vector<BatchItem> items;
+    std::atomic<size_t> next;
+    unsigned numberMode;
+    unsigned parseMode;
+
+    Batch(unsigned nm, unsigned pm)
+        : next(0),
+          numberMode(nm),
+          parseMode(pm)
+        {}
+};
+
+
+// Body of the worker threads: this must not touch any Python object
+
+static void
+batch_worker(Batch* batch)
+{
+    unsigned numberMode = batch->numberMode;
+    unsigned parseMode = batch->parseMode;
+    size_t count = batch->items.size();
+    size_t i;
+
+    while ((i = batch->next.fetch_add(1)) < count) {
+        BatchItem& item = batch->items[i];
+        Reader reader;
+        MemoryStream ms(item.str, item.length);
+        TapeRecorder<MemoryStream> recorder(item.tape, ms);
+
+        if (item.isBuffer)
+            DECODE(reader, kParseValidateEncodingFlag, ms, recorder);
         else
-            numberMode &= ~NM_NAN;
+            DECODE(reader, kParseNoFlags, ms, recorder);
+
+        item.outOfMemory = recorder.outOfMemory;
+        item.errorCode = reader.GetParseErrorCode();
+        item.errorOffset = reader.GetErrorOffset();
     }
+}
 
-    if (datetimeModeObj) {
-        if (datetimeModeObj == Py_None) {
-            datetimeMode = DM_NONE;
-        } else if (PyLong_Check(datetimeModeObj)) {
-            int mode = PyLong_AsLong(datetimeModeObj);
-            if (!valid_datetime_mode(mode)) {
-                PyErr_SetString(PyExc_ValueError, "Invalid datetime_mode");
-                return NULL;
-            }
-            datetimeMode = (unsigned) mode;
-            if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
-                PyErr_SetString(PyExc_ValueError,
-                                "Invalid datetime_mode, can deserialize only from"
-                                " ISO8601");
-                return NULL;
-            }
-        } else {
-            PyErr_SetString(PyExc_TypeError,
-                            "datetime_mode must be a non-negative integer value or None");
+
+template <typename Handler>
+static PyObject*
+replay_batch(Batch& batch, Handler& handler)
+{
+    Py_ssize_t count = (Py_ssize_t) batch.items.size();
+    PyObject* result = PyList_New(count);
+
+    if (result == NULL)
+        return NULL;
+
+    for (Py_ssize_t i = 0; i < count; i++) {
+        Tape& tape = batch.items[i].tape;
+        size_t errorOffset;
+
+        if (!replay_tape(tape, 0, tape.events.size(), handler, errorOffset)) {
+            set_parse_error(errorOffset, kParseErrorTermination);
+            Py_CLEAR(handler.root);
+            Py_DECREF(result);
             return NULL;
         }
+
+        PyList_SET_ITEM(result, i, handler.root);
+        handler.root = NULL;
+
+        // Release the memory of the tape as soon as possible
+
+        std::vector<TapeEvent>().swap(tape.events);
+        std::vector<char>().swap(tape.strings);
     }
 
-    if (uuidModeObj) {
-        if (uuidModeObj == Py_None) {
-            uuidMode = UM_NONE;
-        } else if (PyLong_Check(uuidModeObj)) {
-            int mode = PyLong_AsLong(uuidModeObj);
-            if (mode < 0 || mode >= UM_MAX) {
-                PyErr_SetString(PyExc_ValueError, "Invalid uuid_mode");
-                return NULL;
+    return result;
+}
+
+
+static PyObject*
+do_decode_many(PyObject* decoder, PyObject* documents, unsigned workers,
+               PyObject* objectHook, unsigned numberMode, unsigned datetimeMode,
+               unsigned uuidMode, unsigned parseMode, unsigned arrayMode)
+{
+    // Take a snapshot of the documents, so that the strings and the buffers stay alive
+    // even if the original container is changed while the GIL is released
+
+    PyObject* sequence = PySequence_Tuple(documents);
+    if (sequence == NULL)
+        return NULL;
+
+    Py_ssize_t count = PyTuple_GET_SIZE(sequence);
+    std::vector<Py_buffer> views;
+    PyObject* result = NULL;
+
+    try {
+        Batch batch(numberMode, parseMode);
+
+        batch.items.resize(count);
+        views.reserve(count);
+
+        for (Py_ssize_t i = 0; i < count; i++) {
+            PyObject* document = PyTuple_GET_ITEM(sequence, i);
+            BatchItem& item = batch.items[i];
+
+            item.isBuffer = false;
+
+            if (PyUnicode_Check(document)) {
+                item.str = PyUnicode_AsUTF8AndSize(document, &item.length);
+                if (item.str == NULL)
+                    goto error;
+            } else if (PyObject_CheckBuffer(document)) {
+                Py_buffer view;
+                if (PyObject_GetBuffer(document, &view, PyBUF_SIMPLE) < 0)
+                    goto error;
+                views.push_back(view);
+                item.isBuffer = true;
+                item.str = (const char*) view.buf;
+                item.length = view.len;
+            } else {
+                PyErr_SetString(PyExc_TypeError,
+                                "Expected string or UTF-8 encoded bytes-like object");
+                goto error;
+            }
+        }
+
+        if (workers == 0) {
+            workers = std::thread::hardware_concurrency();
+            if (workers == 0)
+                workers = 1;
+        }
+        if ((Py_ssize_t) workers > count)
+            workers = (unsigned) count;
+
+        Py_BEGIN_ALLOW_THREADS
+
+        // The calling thread is one of the workers: should the system refuse to start
+        // some of the others, the batch is simply processed by fewer threads
+
+        std::vector<std::thread> pool;
+        try {
+            pool.reserve(workers);
+            for (unsigned t = 1; t < workers; t++)
+                pool.push_back(std::thread(batch_worker, &batch));
+        } catch (const std::system_error&) {
+        } catch (const std::bad_alloc&) {
+        }
+
+        batch_worker(&batch);
+
+        for (size_t t = 0; t < pool.size(); t++)
+            pool[t].join();
+
+        Py_END_ALLOW_THREADS
+
+        for (size_t v = 0; v < views.size(); v++)
+            PyBuffer_Release(&views[v]);
+        views.clear();
+
+        for (Py_ssize_t i = 0; i < count; i++) {
+            const BatchItem& item = batch.items[i];
+
+            if (item.outOfMemory) {
+                PyErr_NoMemory();
+                goto error;
+            }
+            if (item.errorCode != kParseErrorNone) {
+                PyErr_Format(decode_error, "Parse error at offset %zu of document %zd: %s",
+                             item.errorOffset, i, GetParseError_En(item.errorCode));
+                goto error;
+            }
+        }
+
+        if (decoder != NULL && decoder_schema(decoder) != NULL) {
+            SchemaHandler handler(*decoder_schema(decoder), decoder, datetimeMode,
+                                  uuidMode, numberMode);
+
+            if (!PyErr_Occurred()) {
+                handler.builder.arrayMode = arrayMode;
+                result = replay_batch(batch, handler);
             }
-            uuidMode = (unsigned) mode;
         } else {
-            PyErr_SetString(PyExc_TypeError,
-                            "uuid_mode must be an integer value or None");
-            return NULL;
+            PyHandler handler(decoder, objectHook, datetimeMode, uuidMode, numberMode);
+
+            if (!PyErr_Occurred()) {
+                handler.arrayMode = arrayMode;
+                result = replay_batch(batch, handler);
+            }
         }
+    } catch (const std::bad_alloc&) {
+        PyErr_NoMemory();
     }
 
-    if (parseModeObj) {
-        if (parseModeObj == Py_None) {
-            parseMode = PM_NONE;
-        } else if (PyLong_Check(parseModeObj)) {
-            int mode = PyLong_AsLong(parseModeObj);
-            if (mode < 0 || mode >= PM_MAX) {
-                PyErr_SetString(PyExc_ValueError, "Invalid parse_mode");
-                return NULL;
+  error:
+    for (size_t v = 0; v < views.size(); v++)
+        PyBuffer_Release(&views[v]);
+    Py_DECREF(sequence);
+    return result;
+}
+
+
+static bool
+accept_workers_arg(PyObject* arg, unsigned& workers)
+{
+    if (arg != NULL && arg != Py_None) {
+        if (PyLong_Check(arg)) {
+            long value = PyLong_AsLong(arg);
+            if (value < 1 || value > 1024) {
+                if (!PyErr_Occurred() || PyErr_ExceptionMatches(PyExc_OverflowError)) {
+                    PyErr_Clear();
+                    PyErr_SetString(PyExc_ValueError,
+                                    "Invalid workers, must be an integer between 1 and"
+                                    " 1024");
+                }
+                return false;
             }
-            parseMode = (unsigned) mode;
+            workers = (unsigned) value;
         } else {
             PyErr_SetString(PyExc_TypeError,
-                            "parse_mode must be an integer value or None");
-            return NULL;
+                            "workers must be a positive integer value or None");
+            return false;
         }
     }
+    return true;
+}
 
-    if (chunkSizeObj && chunkSizeObj != Py_None) {
-        if (PyLong_Check(chunkSizeObj)) {
-            Py_ssize_t size = PyNumber_AsSsize_t(chunkSizeObj, PyExc_ValueError);
-            if (PyErr_Occurred() || size < 4 || size > UINT_MAX) {
-                PyErr_SetString(PyExc_ValueError,
-                                "Invalid chunk_size, must be an integer between 4 and"
-                                " UINT_MAX");
-                return NULL;
-            }
-            chunkSize = (size_t) size;
+
+PyDoc_STRVAR(loads_many_docstring,
+             "loads_many(documents, *, workers=None, object_hook=None, number_mode=None,"
+             " datetime_mode=None, uuid_mode=None, parse_mode=None, array_mode=None,"
+             " allow_nan=True)\n"
+             "\n"
+             "Decode an iterable of JSON strings or bytes-like objects into a list of"
+             " Python objects, parsing them in parallel on a pool of native threads.");
+
+
+static PyObject*
+loads_many(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "documents",
+        "workers",
+        "object_hook",
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "parse_mode",
+        "array_mode",
+
+        /* compatibility with stdlib json */
+        "allow_nan",
+
+        NULL
+    };
+    PyObject* documents;
+    PyObject* workersObj = NULL;
+    unsigned workers = 0;
+    PyObject* objectHook = NULL;
+    PyObject* datetimeModeObj = NULL;
+    unsigned datetimeMode = DM_NONE;
+    PyObject* uuidModeObj = NULL;
+    unsigned uuidMode = UM_NONE;
+    PyObject* numberModeObj = NULL;
+    unsigned numberMode = NM_NAN;
+    PyObject* parseModeObj = NULL;
+    unsigned parseMode = PM_NONE;
+    PyObject* arrayModeObj = NULL;
+    unsigned arrayMode = AM_NONE;
+    int allowNan = -1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$OOOOOOOp:rapidjson.loads_many",
+                                     (char**) kwlist,
+                                     &documents,
+                                     &workersObj,
+                                     &objectHook,
+                                     &numberModeObj,
+                                     &datetimeModeObj,
+                                     &uuidModeObj,
+                                     &parseModeObj,
+                                     &arrayModeObj,
+                                     &allowNan))
+        return NULL;
+
+    if (!accept_workers_arg(workersObj, workers))
+        return NULL;
+
+    if (objectHook && !PyCallable_Check(objectHook)) {
+        if (objectHook == Py_None) {
+            objectHook = NULL;
         } else {
-            PyErr_SetString(PyExc_TypeError,
-                            "chunk_size must be an unsigned integer value or None");
+            PyErr_SetString(PyExc_TypeError, "object_hook is not callable");
             return NULL;
         }
     }
 
-    return do_decode(NULL, NULL, 0, jsonObject, chunkSize, objectHook,
-                     numberMode, datetimeMode, uuidMode, parseMode);
-}
+    if (!accept_number_mode_arg(numberModeObj, allowNan, numberMode))
+        return NULL;
+    if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid number_mode, combining NM_NATIVE with NM_DECIMAL"
+                        " is not supported");
+        return NULL;
+    }
+
+    if (!accept_datetime_mode_arg(datetimeModeObj, datetimeMode))
+        return NULL;
+    if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid datetime_mode, can deserialize only from"
+                        " ISO8601");
+        return NULL;
+    }
+
+    if (!accept_uuid_mode_arg(uuidModeObj, uuidMode))
+        return NULL;
+
+    if (!accept_parse_mode_arg(parseModeObj, parseMode))
+        return NULL;
+
+    if (!accept_array_mode_arg(arrayModeObj, arrayMode))
+        return NULL;
+
+    return do_decode_many(NULL, documents, workers, objectHook, numberMode, datetimeMode,
+                          uuidMode, parseMode, arrayMode);
+}
+
+
+static PyObject*
+decoder_map(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    static char const* kwlist[] = {
+        "documents",
+        "workers",
+        NULL
+    };
+    PyObject* documents;
+    PyObject* workersObj = NULL;
+    unsigned workers = 0;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$O:map",
+                                     (char**) kwlist,
+                                     &documents,
+                                     &workersObj))
+        return NULL;
+
+    if (!accept_workers_arg(workersObj, workers))
+        return NULL;
+
+    if (!decoder_check_options(self, "map", true))
+        return NULL;
+
+    DecoderObject* d = (DecoderObject*) self;
+
+    return do_decode_many(self, documents, workers, NULL, d->numberMode,
+                          d->datetimeMode, d->uuidMode, d->parseMode, d->arrayMode);
+}
+
+
+//////////////////////////
+// Incremental decoding //
+//////////////////////////
+
+
+/* The data pushed with Decoder.feed() is scanned just enough to recognize where each
+   token ends, keeping track of strings, partial scalars and comments across calls: the
+   complete tokens are then handed to the iterative parser, whose state survives between
+   calls together with the one of its handler, so that only the bytes of the token being
+   received are retained. Lazy decoding needs the whole text of each top level value
+   instead, so in that case the nesting is tracked as well and the values are decoded
+   once complete. */
+
+enum FeedComment {
+    FC_NONE,
+    FC_SLASH,          // a slash, possibly starting a comment
+    FC_LINE,           // within a single line comment
+    FC_BLOCK,          // within a multi-line comment
+    FC_BLOCK_STAR      // within a multi-line comment, after a star
+};
+
+
+struct FeedState {
+    std::vector<char> pending;
+    size_t offset;     // the offset of the first pending byte in the data fed so far
+    size_t scanned;    // how many pending bytes have been scanned
+    size_t parsed;     // how many pending bytes have been consumed by the parser
+    size_t valueStart; // where the current top level value starts, NO_VALUE if none
+    size_t ready;      // how many complete tokens are waiting for the parser
+    size_t scalarStart; // where the current number or literal starts
+    unsigned depth;
+    unsigned comment;
+    bool inString;
+    bool escape;
+    bool inScalar;
+    bool inValue;      // whether the parser is within a top level value
+    bool busy;
+    Reader reader;
+    PyHandler* handler;
+    SchemaHandler* schemaHandler;
+    PyObject* completed; // values completed before an error, for the next call
+
+    static const size_t NO_VALUE = (size_t) -1;
+
+    FeedState()
+        : busy(false),
+          handler(NULL),
+          schemaHandler(NULL),
+          completed(NULL) {
+        Reset();
+    }
+
+    ~FeedState() {
+        Release();
+        Py_XDECREF(completed);
+    }
+
+    // Drop the handlers, that refer to the hooks of the decoder
+    void Release() {
+        if (handler != NULL) {
+            Py_XDECREF(handler->root);
+            delete handler;
+            handler = NULL;
+        }
+        if (schemaHandler != NULL) {
+            Py_XDECREF(schemaHandler->root);
+            delete schemaHandler;
+            schemaHandler = NULL;
+        }
+    }
+
+    // Drop the hooks of the decoder, while keeping the state of the handlers
+    void ReleaseHooks() {
+        if (handler != NULL)
+            handler->ReleaseHooks();
+        if (schemaHandler != NULL)
+            schemaHandler->builder.ReleaseHooks();
+    }
+
+    void Reset() {
+        Release();
+        pending.clear();
+        offset = scanned = parsed = 0;
+        valueStart = NO_VALUE;
+        ready = scalarStart = 0;
+        depth = 0;
+        comment = FC_NONE;
+        inString = escape = inScalar = inValue = false;
+        reader.IterativeParseInit();
+    }
+
+    static bool IsWhitespace(char c) {
+        return c == ' ' || c == '\n' || c == '\r' || c == '\t';
+    }
+
+    static bool IsDelimiter(char c) {
+        return IsWhitespace(c) || c == '[' || c == ']' || c == '{' || c == '}'
+            || c == '"' || c == ',' || c == ':' || c == '/';
+    }
 
+    // Compute the length of the number or literal at the start of the given bytes, as
+    // the reader would parse it; when it cannot tell, the whole length is returned and the
+    // parser will complain
+
+    static size_t ScalarLength(const char* s, size_t length) {
+        // The ones that may follow a minus sign come last
+        static const char* const literals[] = {
+            "null", "true", "false", "NaN", "Infinity", "Inf"
+        };
+        static const size_t count = sizeof(literals) / sizeof(literals[0]);
+        size_t i = 0;
+
+        if (i < length && s[i] == '-')
+            i++;
+
+        if (i < length && (s[i] < '0' || s[i] > '9')) {
+            for (size_t l = i == 0 ? 0 : 3; l < count; l++) {
+                size_t size = strlen(literals[l]);
+                if (size <= length - i && memcmp(s + i, literals[l], size) == 0)
+                    return i + size;
+            }
+            return length;
+        }
 
-PyDoc_STRVAR(decoder_doc,
-             "Decoder(number_mode=None, datetime_mode=None, uuid_mode=None,"
-             " parse_mode=None)\n"
-             "\n"
-             "Create and return a new Decoder instance.");
+        if (i < length && s[i] == '0')
+            i++;
+        else
+            while (i < length && s[i] >= '0' && s[i] <= '9')
+                i++;
+
+        if (i < length && s[i] == '.') {
+            size_t digits = ++i;
+            while (i < length && s[i] >= '0' && s[i] <= '9')
+                i++;
+            if (i == digits)
+                return length;
+        }
 
+        if (i < length && (s[i] == 'e' || s[i] == 'E')) {
+            i++;
+            if (i < length && (s[i] == '+' || s[i] == '-'))
+                i++;
+            size_t digits = i;
+            while (i < length && s[i] >= '0' && s[i] <= '9')
+                i++;
+            if (i == digits)
+                return length;
+        }
 
-static PyMemberDef decoder_members[] = {
-    {"datetime_mode",
-     T_UINT, offsetof(DecoderObject, datetimeMode), READONLY,
-     "The datetime mode, whether and how datetime literals will be recognized."},
-    {"uuid_mode",
-     T_UINT, offsetof(DecoderObject, uuidMode), READONLY,
-     "The UUID mode, whether and how UUID literals will be recognized."},
-    {"number_mode",
-     T_UINT, offsetof(DecoderObject, numberMode), READONLY,
-     "The number mode, whether numeric literals will be decoded."},
-    {"parse_mode",
-     T_UINT, offsetof(DecoderObject, parseMode), READONLY,
-     "The parse mode, whether comments and trailing commas are allowed."},
-    {NULL}
-};
+        return i;
+    }
 
+    // Account for a token just completed, returning true when it also completes a top
+    // level value, whose boundaries are then stored in start and end
+    bool EndToken(size_t last, size_t& start, size_t& end) {
+        ready++;
+        if (depth > 0)
+            return false;
+        start = valueStart;
+        end = last;
+        valueStart = NO_VALUE;
+        return true;
+    }
 
-static PyTypeObject Decoder_Type = {
-    PyVarObject_HEAD_INIT(NULL, 0)
-    "rapidjson.Decoder",                      /* tp_name */
-    sizeof(DecoderObject),                    /* tp_basicsize */
-    0,                                        /* tp_itemsize */
-    0,                                        /* tp_dealloc */
-    0,                                        /* tp_print */
-    0,                                        /* tp_getattr */
-    0,                                        /* tp_setattr */
-    0,                                        /* tp_compare */
-    0,                                        /* tp_repr */
-    0,                                        /* tp_as_number */
-    0,                                        /* tp_as_sequence */
-    0,                                        /* tp_as_mapping */
-    0,                                        /* tp_hash */
-    (ternaryfunc) decoder_call,               /* tp_call */
-    0,                                        /* tp_str */
-    0,                                        /* tp_getattro */
-    0,                                        /* tp_setattro */
-    0,                                        /* tp_as_buffer */
-    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, /* tp_flags */
-    decoder_doc,                              /* tp_doc */
-    0,                                        /* tp_traverse */
-    0,                                        /* tp_clear */
-    0,                                        /* tp_richcompare */
-    0,                                        /* tp_weaklistoffset */
-    0,                                        /* tp_iter */
-    0,                                        /* tp_iternext */
-    0,                                        /* tp_methods */
-    decoder_members,                          /* tp_members */
-    0,                                        /* tp_getset */
-    0,                                        /* tp_base */
-    0,                                        /* tp_dict */
-    0,                                        /* tp_descr_get */
-    0,                                        /* tp_descr_set */
-    0,                                        /* tp_dictoffset */
-    0,                                        /* tp_init */
-    0,                                        /* tp_alloc */
-    decoder_new,                              /* tp_new */
-    PyObject_Del,                             /* tp_free */
-};
+    // Complete the number or literal ending at the given position: it may actually be
+    // several values with nothing in between, as in "truenull", and then only the first
+    // one is accounted for, the following bytes being scanned again
+    bool EndScalar(size_t last, size_t& start, size_t& end) {
+        size_t length = ScalarLength(pending.data() + scalarStart, last - scalarStart);
+        if (length > 0 && length < last - scalarStart) {
+            last = scalarStart + length;
+            scanned = last;
+        }
+        inScalar = false;
+        return EndToken(last, start, end);
+    }
 
+    // Scan the pending bytes, counting the complete tokens, and returning true with the
+    // boundaries of the next complete top level value, if any
+
+    bool Next(bool comments, size_t& start, size_t& end) {
+        while (scanned < pending.size()) {
+            size_t i = scanned;
+            char c = pending[i];
+
+            if (comment != FC_NONE) {
+                switch (comment) {
+                case FC_SLASH:
+                    if (c == '/' || c == '*') {
+                        comment = c == '/' ? FC_LINE : FC_BLOCK;
+                        if (depth == 0)
+                            valueStart = NO_VALUE;
+                    } else {
+                        // Not a comment, but the start of an invalid token the parser
+                        // will complain about
+                        comment = FC_NONE;
+                        inScalar = true;
+                        scalarStart = i - 1;
+                        continue;
+                    }
+                    break;
+                case FC_LINE:
+                    if (c == '\n')
+                        comment = FC_NONE;
+                    break;
+                case FC_BLOCK:
+                    if (c == '*')
+                        comment = FC_BLOCK_STAR;
+                    break;
+                case FC_BLOCK_STAR:
+                    comment = c == '/' ? FC_NONE : c == '*' ? FC_BLOCK_STAR : FC_BLOCK;
+                    break;
+                }
+                scanned++;
+                continue;
+            }
 
-#define Decoder_CheckExact(v) (Py_TYPE(v) == &Decoder_Type)
-#define Decoder_Check(v) PyObject_TypeCheck(v, &Decoder_Type)
+            if (inString) {
+                scanned++;
+                if (escape)
+                    escape = false;
+                else if (c == '\\')
+                    escape = true;
+                else if (c == '"') {
+                    inString = false;
+                    if (EndToken(i + 1, start, end))
+                        return true;
+                }
+                continue;
+            }
 
+            if (inScalar) {
+                if (IsDelimiter(c)) {
+                    // The delimiter is not consumed, it will be considered again
+                    if (EndScalar(i, start, end))
+                        return true;
+                    continue;
+                }
+                scanned++;
+                continue;
+            }
 
-#define DECODE(r, f, s, h)                                              \
-    do {                                                                \
-        /* FIXME: isn't there a cleverer way to write the following?    \
-                                                                        \
-           Ideally, one would do something like:                        \
-                                                                        \
-               unsigned flags = kParseInsituFlag;                       \
-                                                                        \
-               if (! (numberMode & NM_NATIVE))                          \
-                   flags |= kParseNumbersAsStringsFlag;                 \
-               if (numberMode & NM_NAN)                                 \
-                   flags |= kParseNanAndInfFlag;                        \
-               if (parseMode & PM_COMMENTS)                             \
-                   flags |= kParseCommentsFlag;                         \
-               if (parseMode & PM_TRAILING_COMMAS)                      \
-                   flags |= kParseTrailingCommasFlag;                   \
-                                                                        \
-               reader.Parse<flags>(ss, handler);                        \
-                                                                        \
-           but C++ does not allow that...                               \
-        */                                                              \
-                                                                        \
-        if (numberMode & NM_NAN) {                                      \
-            if (numberMode & NM_NATIVE) {                               \
-                if (parseMode & PM_TRAILING_COMMAS) {                   \
-                    if (parseMode & PM_COMMENTS) {                      \
-                        r.Parse<f |                                     \
-                                kParseNanAndInfFlag |                   \
-                                kParseCommentsFlag |                    \
-                                kParseTrailingCommasFlag>(s, h);        \
-                    } else {                                            \
-                        r.Parse<f |                                     \
-                                kParseNanAndInfFlag |                   \
-                                kParseTrailingCommasFlag>(s, h);        \
-                    }                                                   \
-                } else if (parseMode & PM_COMMENTS) {                   \
-                    r.Parse<f |                                         \
-                            kParseNanAndInfFlag |                       \
-                            kParseCommentsFlag>(s, h);                  \
-                } else {                                                \
-                    r.Parse<f |                                         \
-                            kParseNanAndInfFlag>(s, h);                 \
-                }                                                       \
-            } else if (parseMode & PM_TRAILING_COMMAS) {                \
-                if (parseMode & PM_COMMENTS) {                          \
-                    r.Parse<f |                                         \
-                            kParseNumbersAsStringsFlag |                \
-                            kParseNanAndInfFlag |                       \
-                            kParseCommentsFlag |                        \
-                            kParseTrailingCommasFlag>(s, h);            \
-                } else {                                                \
-                    r.Parse<f |                                         \
-                            kParseNumbersAsStringsFlag |                \
-                            kParseNanAndInfFlag |                       \
-                            kParseTrailingCommasFlag>(s, h);            \
-                }                                                       \
-            } else if (parseMode & PM_COMMENTS) {                       \
-                r.Parse<f |                                             \
-                        kParseNumbersAsStringsFlag |                    \
-                        kParseNanAndInfFlag |                           \
-                        kParseCommentsFlag>(s, h);                      \
-            } else {                                                    \
-                r.Parse<f |                                             \
-                        kParseNumbersAsStringsFlag |                    \
-                        kParseNanAndInfFlag>(s, h);                     \
-            }                                                           \
-        } else if (numberMode & NM_NATIVE) {                            \
-            if (parseMode & PM_TRAILING_COMMAS) {                       \
-                if (parseMode & PM_COMMENTS) {                          \
-                    r.Parse<f |                                         \
-                            kParseCommentsFlag |                        \
-                            kParseTrailingCommasFlag>(s, h);            \
-                } else {                                                \
-                    r.Parse<f |                                         \
-                            kParseTrailingCommasFlag>(s, h);            \
-                }                                                       \
-            } else if (parseMode & PM_COMMENTS) {                       \
-                r.Parse<f |                                             \
-                        kParseCommentsFlag>(s, h);                      \
-            } else {                                                    \
-                r.Parse<f>(s, h);                                       \
-            }                                                           \
-        } else if (parseMode & PM_TRAILING_COMMAS) {                    \
-            if (parseMode & PM_COMMENTS) {                              \
-                r.Parse<f |                                             \
-                        kParseCommentsFlag |                            \
-                        kParseNumbersAsStringsFlag>(s, h);              \
-            } else {                                                    \
-                r.Parse<f |                                             \
-                        kParseNumbersAsStringsFlag |                    \
-                        kParseTrailingCommasFlag>(s, h);                \
-            }                                                           \
-        } else {                                                        \
-            r.Parse<f | kParseNumbersAsStringsFlag>(s, h);              \
-        }                                                               \
-    } while(0)
+            scanned++;
 
+            if (IsWhitespace(c))
+                continue;
 
-static PyObject*
-do_decode(PyObject* decoder, const char* jsonStr, Py_ssize_t jsonStrLen,
-          PyObject* jsonStream, size_t chunkSize, PyObject* objectHook,
-          unsigned numberMode, unsigned datetimeMode, unsigned uuidMode,
-          unsigned parseMode)
-{
-    PyHandler handler(decoder, objectHook, datetimeMode, uuidMode, numberMode);
-    Reader reader;
+            if (comments && c == '/') {
+                comment = FC_SLASH;
+                if (depth == 0)
+                    valueStart = i;
+                continue;
+            }
 
-    if (jsonStr != NULL) {
-        char* jsonStrCopy = (char*) PyMem_Malloc(sizeof(char) * (jsonStrLen+1));
+            if (depth == 0 && c != '}' && c != ']')
+                valueStart = i;
 
-        if (jsonStrCopy == NULL)
-            return PyErr_NoMemory();
+            switch (c) {
+            case '"':
+                inString = true;
+                break;
+            case '{':
+            case '[':
+                depth++;
+                ready++;
+                break;
+            case '}':
+            case ']':
+                if (depth == 0)
+                    valueStart = i;
+                else
+                    depth--;
+                if (EndToken(i + 1, start, end))
+                    return true;
+                break;
+            case ',':
+            case ':':
+                // Delimiters are consumed by the parser along with the following token,
+                // but at the top level they are invalid values
+                if (depth == 0 && EndToken(i + 1, start, end))
+                    return true;
+                break;
+            default:
+                inScalar = true;
+                scalarStart = i;
+            }
+        }
 
-        memcpy(jsonStrCopy, jsonStr, jsonStrLen+1);
+        return false;
+    }
 
-        InsituStringStream ss(jsonStrCopy);
+    // Signal the end of the data, completing the trailing numbers or literals, if any,
+    // and returning true with the boundaries of each top level value they complete
+    bool Finish(bool comments, size_t& start, size_t& end) {
+        while (true) {
+            if (Next(comments, start, end))
+                return true;
+            if (!inScalar)
+                return false;
+            if (EndScalar(pending.size(), start, end))
+                return true;
+        }
+    }
 
-        DECODE(reader, kParseInsituFlag, ss, handler);
+    // Drop the bytes that have been completely consumed
+
+    void Compact(bool lazy) {
+        size_t keep = lazy
+            ? (valueStart != NO_VALUE ? valueStart : scanned)
+            : parsed;
+        if (lazy)
+            ready = 0;
+        if (keep > 0) {
+            pending.erase(pending.begin(), pending.begin() + keep);
+            offset += keep;
+            scanned -= keep;
+            parsed = parsed > keep ? parsed - keep : 0;
+            if (valueStart != NO_VALUE)
+                valueStart -= keep;
+            if (inScalar)
+                scalarStart -= keep;
+        }
+    }
+};
 
-        PyMem_Free(jsonStrCopy);
-    } else {
-        PyReadStreamWrapper sw(jsonStream, chunkSize);
 
-        DECODE(reader, kParseNoFlags, sw, handler);
+// Hand the complete tokens to the iterative parser, appending the values they complete
+// to the result; at the end of the data, the parser is also driven over an incomplete
+// value, to report the error
+
+template <typename Handler>
+static bool
+feed_parse(FeedState* feed, Handler& handler, PyObject* result, bool atEnd,
+           unsigned numberMode, unsigned parseMode)
+{
+    Reader& reader = feed->reader;
+    MemoryStream ms(feed->pending.data() + feed->parsed,
+                    feed->pending.size() - feed->parsed);
+    bool ok = true;
+
+    while (ok && (feed->ready > 0 || (atEnd && (feed->inValue || feed->inString)))) {
+        bool incomplete = feed->ready == 0;
+
+        if (!incomplete)
+            feed->ready--;
+        feed->inValue = true;
+
+        DECODE_WITH(reader, IterativeParseNext,
+                    kParseStopWhenDoneFlag | kParseValidateEncodingFlag, ms, handler);
+
+        if (reader.HasParseError()) {
+            ParseErrorCode code = reader.GetParseErrorCode();
+
+            // The parser is driven only when there is some token, so an empty document
+            // means that a value starts with a delimiter
+            if (code == kParseErrorDocumentEmpty)
+                code = kParseErrorValueInvalid;
+            set_parse_error(feed->offset + feed->parsed + reader.GetErrorOffset(), code);
+            ok = false;
+        } else if (PyErr_Occurred()) {
+            ok = false;
+        } else if (reader.IterativeParseComplete()) {
+            PyObject* value = handler.root;
+            handler.root = NULL;
+            ok = PyList_Append(result, value) == 0;
+            Py_DECREF(value);
+            reader.IterativeParseInit();
+            feed->inValue = false;
+        } else if (incomplete) {
+            // Should not happen, the parser would complain about the missing data
+            PyErr_SetString(decode_error, "Parse error at end of input");
+            ok = false;
+        }
     }
 
-    if (reader.HasParseError()) {
-        size_t offset = reader.GetErrorOffset();
-
-        if (PyErr_Occurred()) {
-            PyObject* etype;
-            PyObject* evalue;
-            PyObject* etraceback;
-            PyErr_Fetch(&etype, &evalue, &etraceback);
-
-            // Try to add the offset in the error message if the exception
-            // value is a string.  Otherwise, use the original exception since
-            // we can't be sure the exception type takes a single string.
-            if (evalue != NULL && PyUnicode_Check(evalue)) {
-                PyErr_Format(etype, "Parse error at offset %zu: %S", offset, evalue);
-                Py_DECREF(etype);
-                Py_DECREF(evalue);
-                Py_XDECREF(etraceback);
-            }
-            else
-                PyErr_Restore(etype, evalue, etraceback);
+    feed->parsed += ms.Tell();
+    return ok;
+}
+
+
+static bool
+decoder_parse_fed_tokens(DecoderObject* d, FeedState* feed, PyObject* result,
+                         bool atEnd)
+{
+    if (feed->ready == 0 && !(atEnd && (feed->inValue || feed->inString)))
+        return true;
+
+    try {
+        if (d->schema != NULL) {
+            if (feed->schemaHandler == NULL) {
+                feed->schemaHandler = new SchemaHandler(*d->schema, (PyObject*) d,
+                                                        d->datetimeMode, d->uuidMode,
+                                                        d->numberMode);
+                feed->schemaHandler->builder.arrayMode = d->arrayMode;
+            } else
+                feed->schemaHandler->builder.BindHooks((PyObject*) d);
+            if (PyErr_Occurred())
+                // Lookup of the decoder's hooks failed
+                return false;
+            return feed_parse(feed, *feed->schemaHandler, result, atEnd,
+                              d->numberMode, d->parseMode);
         }
-        else
-            PyErr_Format(decode_error, "Parse error at offset %zu: %s",
-                         offset, GetParseError_En(reader.GetParseErrorCode()));
 
-        Py_XDECREF(handler.root);
-        return NULL;
-    } else if (PyErr_Occurred()) {
-        // Catch possible error raised in associated stream operations
-        Py_XDECREF(handler.root);
-        return NULL;
+        if (feed->handler == NULL) {
+            feed->handler = new PyHandler((PyObject*) d, NULL, d->datetimeMode,
+                                          d->uuidMode, d->numberMode);
+            feed->handler->arrayMode = d->arrayMode;
+        } else
+            feed->handler->BindHooks((PyObject*) d);
+        if (PyErr_Occurred())
+            return false;
+        return feed_parse(feed, *feed->handler, result, atEnd, d->numberMode,
+                          d->parseMode);
+    } catch (const std::bad_alloc&) {
+        PyErr_NoMemory();
+        return false;
     }
+}
 
-    return handler.root;
+
+static bool
+decoder_decode_fed_value(DecoderObject* d, FeedState* feed, PyObject* result,
+                         size_t start, size_t end)
+{
+    PyObject* value = do_lazy_decode(&feed->pending[start], end - start, true, NULL, 0,
+                                     d->numberMode, d->datetimeMode, d->uuidMode,
+                                     d->parseMode, false, feed->offset + start);
+    bool ok = value != NULL && PyList_Append(result, value) == 0;
+    Py_XDECREF(value);
+    return ok;
 }
 
 
+// Begin a call to feed() or close(), returning the list that will collect the values,
+// initially holding those completed before an error in the previous call
+
 static PyObject*
-decoder_call(PyObject* self, PyObject* args, PyObject* kwargs)
+decoder_feed_begin(DecoderObject* d)
 {
-    static char const* kwlist[] = {
-        "json",
-        "chunk_size",
-        NULL
-    };
-    PyObject* jsonObject;
-    PyObject* chunkSizeObj = NULL;
-    size_t chunkSize = 65536;
-
-    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$O",
-                                     (char**) kwlist,
-                                     &jsonObject,
-                                     &chunkSizeObj))
-        return NULL;
+    if (d->feed == NULL) {
+        d->feed = new (std::nothrow) FeedState();
+        if (d->feed == NULL)
+            return PyErr_NoMemory();
+    }
 
-    if (chunkSizeObj && chunkSizeObj != Py_None) {
-        if (PyLong_Check(chunkSizeObj)) {
-            Py_ssize_t size = PyNumber_AsSsize_t(chunkSizeObj, PyExc_ValueError);
-            if (PyErr_Occurred() || size < 4 || size > UINT_MAX) {
-                PyErr_SetString(PyExc_ValueError,
-                                "Invalid chunk_size, must be an integer between 4 and"
-                                " UINT_MAX");
-                return NULL;
-            }
-            chunkSize = (size_t) size;
-        } else {
-            PyErr_SetString(PyExc_TypeError,
-                            "chunk_size must be an unsigned integer value or None");
-            return NULL;
-        }
+    FeedState* feed = d->feed;
+
+    if (feed->busy) {
+        PyErr_SetString(PyExc_RuntimeError, "Decoder.feed() is not reentrant");
+        return NULL;
     }
 
-    Py_ssize_t jsonStrLen;
-    const char* jsonStr;
-    PyObject* asUnicode = NULL;
+    PyObject* result = feed->completed != NULL ? feed->completed : PyList_New(0);
+    feed->completed = NULL;
+    if (result != NULL)
+        feed->busy = true;
+    return result;
+}
 
-    if (PyUnicode_Check(jsonObject)) {
-        jsonStr = PyUnicode_AsUTF8AndSize(jsonObject, &jsonStrLen);
-        if (jsonStr == NULL)
-            return NULL;
-    } else if (PyBytes_Check(jsonObject) || PyByteArray_Check(jsonObject)) {
-        asUnicode = PyUnicode_FromEncodedObject(jsonObject, "utf-8", NULL);
-        if (asUnicode == NULL)
+
+// Conclude a call to feed() or close(): on errors the pending data is discarded, but the
+// values completed before are kept for the next call
+
+static PyObject*
+decoder_feed_end(DecoderObject* d, PyObject* result, bool ok, bool atEnd)
+{
+    FeedState* feed = d->feed;
+
+    if (!ok || atEnd) {
+        feed->Reset();
+        if (!ok && PyList_GET_SIZE(result) > 0)
+            feed->completed = result;
+        else if (!ok)
+            Py_DECREF(result);
+    } else {
+        feed->Compact(d->lazy);
+        // Do not keep the decoder alive through the bound methods of its hooks
+        if (!feed->inValue)
+            feed->Release();
+        else
+            feed->ReleaseHooks();
+    }
+
+    feed->busy = false;
+    return ok ? result : NULL;
+}
+
+
+static PyObject*
+decoder_feed(PyObject* self, PyObject* data)
+{
+    DecoderObject* d = (DecoderObject*) self;
+    const char* str;
+    Py_ssize_t length;
+    Py_buffer view;
+    bool isBuffer = false;
+
+    if (PyUnicode_Check(data)) {
+        str = PyUnicode_AsUTF8AndSize(data, &length);
+        if (str == NULL)
             return NULL;
-        jsonStr = PyUnicode_AsUTF8AndSize(asUnicode, &jsonStrLen);
-        if (jsonStr == NULL) {
-            Py_DECREF(asUnicode);
+    } else if (PyObject_CheckBuffer(data)) {
+        if (PyObject_GetBuffer(data, &view, PyBUF_SIMPLE) < 0)
             return NULL;
-        }
-    } else if (PyObject_HasAttr(jsonObject, read_name)) {
-        jsonStr = NULL;
-        jsonStrLen = 0;
+        isBuffer = true;
+        str = (const char*) view.buf;
+        length = view.len;
     } else {
         PyErr_SetString(PyExc_TypeError,
-                        "Expected string or UTF-8 encoded bytes or bytearray");
+                        "Expected string or UTF-8 encoded bytes-like object");
         return NULL;
     }
 
-    DecoderObject* d = (DecoderObject*) self;
+    PyObject* result = decoder_feed_begin(d);
+
+    if (result != NULL) {
+        FeedState* feed = d->feed;
+        bool ok = true;
+
+        try {
+            feed->pending.insert(feed->pending.end(), str, str + length);
+        } catch (const std::bad_alloc&) {
+            PyErr_NoMemory();
+            ok = false;
+        }
+
+        size_t start, end;
+        bool comments = (d->parseMode & PM_COMMENTS) != 0;
+
+        while (ok && feed->Next(comments, start, end)) {
+            if (d->lazy)
+                ok = decoder_decode_fed_value(d, feed, result, start, end);
+        }
 
-    PyObject* result = do_decode(self, jsonStr, jsonStrLen, jsonObject, chunkSize, NULL,
-                                 d->numberMode, d->datetimeMode, d->uuidMode,
-                                 d->parseMode);
+        if (ok && !d->lazy)
+            ok = decoder_parse_fed_tokens(d, feed, result, false);
 
-    if (asUnicode != NULL)
-        Py_DECREF(asUnicode);
+        result = decoder_feed_end(d, result, ok, false);
+    }
+
+    if (isBuffer)
+        PyBuffer_Release(&view);
 
     return result;
 }
 
 
 static PyObject*
-decoder_new(PyTypeObject* type, PyObject* args, PyObject* kwargs)
+decoder_close(PyObject* self, PyObject* unused)
 {
-    DecoderObject* d;
-    PyObject* datetimeModeObj = NULL;
-    unsigned datetimeMode = DM_NONE;
-    PyObject* uuidModeObj = NULL;
-    unsigned uuidMode = UM_NONE;
-    PyObject* numberModeObj = NULL;
-    unsigned numberMode = NM_NAN;
-    PyObject* parseModeObj = NULL;
-    unsigned parseMode = PM_NONE;
-    static char const* kwlist[] = {
-        "number_mode",
-        "datetime_mode",
-        "uuid_mode",
-        "parse_mode",
-        NULL
-    };
+    DecoderObject* d = (DecoderObject*) self;
+    PyObject* result = decoder_feed_begin(d);
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|OOOO:Decoder",
-                                     (char**) kwlist,
-                                     &numberModeObj,
-                                     &datetimeModeObj,
-                                     &uuidModeObj,
-                                     &parseModeObj))
+    if (result == NULL)
         return NULL;
 
-    if (numberModeObj) {
-        if (numberModeObj == Py_None) {
-            numberMode = NM_NONE;
-        } else if (PyLong_Check(numberModeObj)) {
-            int mode = PyLong_AsLong(numberModeObj);
-            if (mode < 0 || mode >= NM_MAX) {
-                PyErr_SetString(PyExc_ValueError, "Invalid number_mode");
-                return NULL;
-            }
-            numberMode = (unsigned) mode;
-            if (numberMode & NM_DECIMAL && numberMode & NM_NATIVE) {
-                PyErr_SetString(PyExc_ValueError,
-                                "Combining NM_NATIVE with NM_DECIMAL is not supported");
-                return NULL;
-            }
-        }
-    }
+    FeedState* feed = d->feed;
+    size_t start, end;
+    bool comments = (d->parseMode & PM_COMMENTS) != 0;
+    bool ok = true;
 
-    if (datetimeModeObj) {
-        if (datetimeModeObj == Py_None) {
-            datetimeMode = DM_NONE;
-        } else if (PyLong_Check(datetimeModeObj)) {
-            int mode = PyLong_AsLong(datetimeModeObj);
-            if (!valid_datetime_mode(mode)) {
-                PyErr_SetString(PyExc_ValueError, "Invalid datetime_mode");
-                return NULL;
-            }
-            datetimeMode = (unsigned) mode;
-            if (datetimeMode && datetime_mode_format(datetimeMode) != DM_ISO8601) {
-                PyErr_SetString(PyExc_ValueError,
-                                "Invalid datetime_mode, can deserialize only from"
-                                " ISO8601");
-                return NULL;
-            }
-        } else {
-            PyErr_SetString(PyExc_TypeError,
-                            "datetime_mode must be a non-negative integer value or None");
-            return NULL;
-        }
+    while (ok && feed->Finish(comments, start, end)) {
+        if (d->lazy)
+            ok = decoder_decode_fed_value(d, feed, result, start, end);
     }
 
-    if (uuidModeObj) {
-        if (uuidModeObj == Py_None) {
-            uuidMode = UM_NONE;
-        } else if (PyLong_Check(uuidModeObj)) {
-            int mode = PyLong_AsLong(uuidModeObj);
-            if (mode < 0 || mode >= UM_MAX) {
-                PyErr_SetString(PyExc_ValueError, "Invalid uuid_mode");
-                return NULL;
-            }
-            uuidMode = (unsigned) mode;
-        } else {
-            PyErr_SetString(PyExc_TypeError,
-                            "uuid_mode must be an integer value or None");
-            return NULL;
-        }
+    if (ok && feed->comment != FC_NONE && feed->comment != FC_LINE) {
+        PyErr_SetString(decode_error, "Parse error at end of input: unterminated comment");
+        ok = false;
     }
 
-    if (parseModeObj) {
-        if (parseModeObj == Py_None) {
-            parseMode = PM_NONE;
-        } else if (PyLong_Check(parseModeObj)) {
-            int mode = PyLong_AsLong(parseModeObj);
-            if (mode < 0 || mode >= PM_MAX) {
-                PyErr_SetString(PyExc_ValueError, "Invalid parse_mode");
-                return NULL;
-            }
-            parseMode = (unsigned) mode;
-        } else {
-            PyErr_SetString(PyExc_TypeError,
-                            "parse_mode must be an integer value or None");
-            return NULL;
-        }
+    if (ok && d->lazy) {
+        if (feed->valueStart != FeedState::NO_VALUE)
+            // Whatever is left is an incomplete value that the parser will reject
+            ok = decoder_decode_fed_value(d, feed, result, feed->valueStart,
+                                          feed->pending.size());
+    } else if (ok) {
+        ok = decoder_parse_fed_tokens(d, feed, result, true);
     }
 
-    d = (DecoderObject*) type->tp_alloc(type, 0);
-    if (d == NULL)
-        return NULL;
+    return decoder_feed_end(d, result, ok, true);
+}
 
-    d->datetimeMode = datetimeMode;
-    d->uuidMode = uuidMode;
-    d->numberMode = numberMode;
-    d->parseMode = parseMode;
 
-    return (PyObject*) d;
+static void
+decoder_dealloc(PyObject* self)
+{
+    DecoderObject* d = (DecoderObject*) self;
+
+    delete d->feed;
+    delete d->keyCache;
+    delete d->stringCache;
+    delete d->schema;
+    delete d->state;
+    delete d->datetimeKeys;
+    delete d->uuidKeys;
+    Py_XDECREF(d->datetimeKeysObj);
+    Py_XDECREF(d->uuidKeysObj);
+    Py_XDECREF(d->target);
+    Py_TYPE(self)->tp_free(self);
 }
 
 
@@ -2303,15 +10214,323 @@ struct DictItem {
 };
 
 
-static inline bool
-all_keys_are_string(PyObject* dict) {
-    Py_ssize_t pos = 0;
-    PyObject* key;
+static inline bool
+all_keys_are_string(PyObject* dict) {
+    Py_ssize_t pos = 0;
+    PyObject* key;
+
+    while (PyDict_Next(dict, &pos, &key, NULL))
+        if (!PyUnicode_Check(key))
+            return false;
+    return true;
+}
+
+
+// Serializers registered on an Encoder instance: the first dictionary maps a type to its
+// serializer, that may be a callable, a tuple of attribute names or one of the interned
+// "str", "repr" and "int" names; the second caches the outcome of the lookup by exact
+// type, Py_None marking types without a serializer
+
+struct SerializerRegistry {
+    PyObject* serializers;
+    PyObject* cache;
+};
+
+
+// Upper bound on the number of distinct types remembered by the cache
+
+static const Py_ssize_t MAX_SERIALIZERS_CACHE_SIZE = 1024;
+
+
+// The exact types that are always serialized natively, without consulting either the
+// registry or the decimal machinery
+
+static inline bool
+is_core_type(PyObject* object)
+{
+    PyTypeObject* type = Py_TYPE(object);
+
+    return (object == Py_None
+            || type == &PyUnicode_Type
+            || type == &PyLong_Type
+            || type == &PyFloat_Type
+            || type == &PyBool_Type
+            || type == &PyList_Type
+            || type == &PyDict_Type
+            || type == &PyTuple_Type);
+}
+
+
+// Return a new reference to the serializer registered for the type of the given object,
+// or to Py_None when there is none: only the first object of each type pays for the
+// walk thru its MRO
+
+static PyObject*
+lookup_serializer(SerializerRegistry* registry, PyObject* object)
+{
+    PyObject* type = (PyObject*) Py_TYPE(object);
+    PyObject* serializer = PyDict_GetItem(registry->cache, type);
+
+    if (serializer == NULL) {
+        PyObject* mro = Py_TYPE(object)->tp_mro;
+
+        serializer = Py_None;
+        if (mro != NULL) {
+            Py_ssize_t count = PyTuple_GET_SIZE(mro);
+
+            for (Py_ssize_t i = 0; i < count; i++) {
+                PyObject* s = PyDict_GetItem(registry->serializers,
+                                             PyTuple_GET_ITEM(mro, i));
+                if (s != NULL) {
+                    serializer = s;
+                    break;
+                }
+            }
+        }
+
+        if (PyDict_GET_SIZE(registry->cache) >= MAX_SERIALIZERS_CACHE_SIZE)
+            PyDict_Clear(registry->cache);
+
+        if (PyDict_SetItem(registry->cache, type, serializer) == -1)
+            return NULL;
+    }
+
+    Py_INCREF(serializer);
+    return serializer;
+}
+
+
+// Layouts of the classes encountered with an object_mode, computed once per exact type:
+// each is either a tuple with the OM_XXX kind of the class and a tuple with the names of
+// its fields, or Py_None for classes that are not records
+
+static PyObject* object_layouts = NULL;
+
+
+// Upper bound on the number of distinct types remembered by the layouts cache
+
+static const Py_ssize_t MAX_OBJECT_LAYOUTS_SIZE = 1024;
+
+
+// Append the slots declared by the given class to the list of names, mangling the
+// private ones as the compiler does
+
+static bool
+append_slots(PyTypeObject* type, PyObject* declared, PyObject* names)
+{
+    PyObject* slots = PySequence_Fast(declared, "__slots__ must be iterable");
+    if (slots == NULL)
+        return false;
+
+    bool ok = true;
+
+    for (Py_ssize_t i = 0; ok && i < PySequence_Fast_GET_SIZE(slots); i++) {
+        PyObject* slot = PySequence_Fast_GET_ITEM(slots, i);
+
+        if (!PyUnicode_Check(slot)) {
+            PyErr_SetString(PyExc_TypeError, "__slots__ items must be strings");
+            ok = false;
+            break;
+        }
+
+        if (PyUnicode_CompareWithASCIIString(slot, "__dict__") == 0
+            || PyUnicode_CompareWithASCIIString(slot, "__weakref__") == 0)
+            continue;
+
+        const char* str = PyUnicode_AsUTF8(slot);
+        if (str == NULL) {
+            ok = false;
+            break;
+        }
+
+        PyObject* name;
+        size_t length = strlen(str);
+        const char* owner = type->tp_name;
+
+        const char* dot = strrchr(owner, '.');
+        if (dot != NULL)
+            owner = dot + 1;
+        while (*owner == '_')
+            owner++;
+
+        if (length > 2 && str[0] == '_' && str[1] == '_'
+            && !(str[length-1] == '_' && str[length-2] == '_')
+            && *owner != '\0')
+            name = PyUnicode_FromFormat("_%s%U", owner, slot);
+        else {
+            Py_INCREF(slot);
+            name = slot;
+        }
+
+        if (name == NULL)
+            ok = false;
+        else {
+            int found = PySequence_Contains(names, name);
+            ok = found != -1 && (found || PyList_Append(names, name) == 0);
+            Py_DECREF(name);
+        }
+    }
+
+    Py_DECREF(slots);
+    return ok;
+}
+
+
+// Return a new reference to the tuple with the names of the fields of a plain Python
+// class whose instances do not have a __dict__, where each class in the hierarchy but
+// object declares its __slots__, Py_None for any other class, or NULL on errors
+
+static PyObject*
+slots_fields(PyTypeObject* type)
+{
+    PyObject* mro = type->tp_mro;
+
+    if (type->tp_dictoffset != 0 || mro == NULL || PyTuple_GET_SIZE(mro) < 2)
+        Py_RETURN_NONE;
+
+    PyObject* names = PyList_New(0);
+    if (names == NULL)
+        return NULL;
+
+    for (Py_ssize_t i = PyTuple_GET_SIZE(mro) - 1; i >= 0; i--) {
+        PyTypeObject* base = (PyTypeObject*) PyTuple_GET_ITEM(mro, i);
+
+        if (base == &PyBaseObject_Type)
+            continue;
+
+        PyObject* declared = (base->tp_dict == NULL
+                              || !PyType_HasFeature(base, Py_TPFLAGS_HEAPTYPE)
+                              ? NULL
+                              : PyDict_GetItemString(base->tp_dict, "__slots__"));
+        if (declared == NULL) {
+            Py_DECREF(names);
+            Py_RETURN_NONE;
+        }
+
+        if (PyUnicode_Check(declared)) {
+            PyObject* single = PyTuple_Pack(1, declared);
+            bool ok = single != NULL && append_slots(base, single, names);
+            Py_XDECREF(single);
+            if (!ok) {
+                Py_DECREF(names);
+                return NULL;
+            }
+        } else if (!append_slots(base, declared, names)) {
+            Py_DECREF(names);
+            return NULL;
+        }
+    }
+
+    PyObject* fields = PyList_AsTuple(names);
+    Py_DECREF(names);
+    return fields;
+}
+
+
+// Return a new reference to the layout of the given class, or NULL on errors
+
+static PyObject*
+compute_object_layout(PyTypeObject* type)
+{
+    PyObject* fields;
+    unsigned kind;
+    int isDataclass = PyObject_HasAttrString((PyObject*) type, "__dataclass_fields__");
+
+    if (isDataclass) {
+        PyObject* dataclasses = PyImport_ImportModule("dataclasses");
+        PyObject* list = (dataclasses == NULL
+                          ? NULL
+                          : PyObject_CallMethod(dataclasses, "fields", "O", type));
+        Py_XDECREF(dataclasses);
+        if (list == NULL)
+            return NULL;
+
+        Py_ssize_t count = PySequence_Fast_GET_SIZE(list);
+        fields = PyTuple_New(count);
+        for (Py_ssize_t i = 0; fields != NULL && i < count; i++) {
+            PyObject* name = PyObject_GetAttrString(PySequence_Fast_GET_ITEM(list, i),
+                                                    "name");
+            if (name == NULL)
+                Py_CLEAR(fields);
+            else
+                PyTuple_SET_ITEM(fields, i, name);
+        }
+        Py_DECREF(list);
+        if (fields == NULL)
+            return NULL;
+        kind = OM_DATACLASS;
+    } else if (PyType_IsSubtype(type, &PyTuple_Type)) {
+        fields = PyObject_GetAttrString((PyObject*) type, "_fields");
+        if (fields == NULL) {
+            if (!PyErr_ExceptionMatches(PyExc_AttributeError))
+                return NULL;
+            PyErr_Clear();
+            Py_RETURN_NONE;
+        }
+        if (!PyTuple_Check(fields)) {
+            Py_DECREF(fields);
+            Py_RETURN_NONE;
+        }
+        kind = OM_NAMEDTUPLE;
+    } else {
+        fields = slots_fields(type);
+        if (fields == NULL || fields == Py_None)
+            return fields;
+        kind = OM_SLOTS;
+    }
+
+    for (Py_ssize_t i = 0; i < PyTuple_GET_SIZE(fields); i++) {
+        if (!PyUnicode_Check(PyTuple_GET_ITEM(fields, i))) {
+            Py_DECREF(fields);
+            if (kind == OM_NAMEDTUPLE)
+                Py_RETURN_NONE;
+            PyErr_SetString(PyExc_TypeError, "Field names must be strings");
+            return NULL;
+        }
+    }
+
+    return Py_BuildValue("(IN)", kind, fields);
+}
+
+
+// Return a new reference to the names of the fields of the given object, when it is a
+// record of one of the kinds enabled by the object mode; otherwise return NULL, with an
+// exception set on errors
+
+static PyObject*
+object_fields(PyObject* object, unsigned objectMode)
+{
+    PyObject* type = (PyObject*) Py_TYPE(object);
+
+    if (object_layouts == NULL) {
+        object_layouts = PyDict_New();
+        if (object_layouts == NULL)
+            return NULL;
+    }
+
+    PyObject* layout = PyDict_GetItem(object_layouts, type);
+
+    if (layout == NULL) {
+        layout = compute_object_layout(Py_TYPE(object));
+        if (layout == NULL)
+            return NULL;
 
-    while (PyDict_Next(dict, &pos, &key, NULL))
-        if (!PyUnicode_Check(key))
-            return false;
-    return true;
+        if (PyDict_GET_SIZE(object_layouts) >= MAX_OBJECT_LAYOUTS_SIZE)
+            PyDict_Clear(object_layouts);
+
+        int r = PyDict_SetItem(object_layouts, type, layout);
+        Py_DECREF(layout);
+        if (r == -1)
+            return NULL;
+    }
+
+    if (layout == Py_None
+        || !(PyLong_AsUnsignedLong(PyTuple_GET_ITEM(layout, 0)) & objectMode))
+        return NULL;
+
+    PyObject* fields = PyTuple_GET_ITEM(layout, 1);
+    Py_INCREF(fields);
+    return fields;
 }
 
 
@@ -2321,18 +10540,21 @@ dumps_internal(
     WriterT* writer,
     PyObject* object,
     PyObject* defaultFn,
+    SerializerRegistry* registry,
     unsigned numberMode,
     unsigned datetimeMode,
     unsigned uuidMode,
     unsigned bytesMode,
     unsigned iterableMode,
-    unsigned mappingMode)
+    unsigned mappingMode,
+    unsigned objectMode)
 {
     int is_decimal;
 
-#define RECURSE(v) dumps_internal(writer, v, defaultFn,                 \
+#define RECURSE(v) dumps_internal(writer, v, defaultFn, registry,       \
                                   numberMode, datetimeMode, uuidMode,   \
-                                  bytesMode, iterableMode, mappingMode)
+                                  bytesMode, iterableMode, mappingMode, \
+                                  objectMode)
 
 #define ASSERT_VALID_SIZE(l) do {                                       \
     if (l < 0 || l > UINT_MAX) {                                        \
@@ -2340,12 +10562,92 @@ dumps_internal(
         return false;                                                   \
     } } while(0)
 
+    PyObject* serializer = NULL;
+    PyObject* fields = NULL;
+
+    if (registry != NULL && !is_core_type(object)) {
+        serializer = lookup_serializer(registry, object);
+        if (serializer == NULL)
+            return false;
+        if (serializer == Py_None)
+            Py_CLEAR(serializer);
+    }
+
+    if (serializer != NULL) {
+        bool r = true;
+
+        if (PyTuple_Check(serializer)) {
+            // Emit an object with the given attributes, in order
+            writer->StartObject();
+
+            Py_ssize_t count = PyTuple_GET_SIZE(serializer);
+
+            for (Py_ssize_t i = 0; r && i < count; i++) {
+                PyObject* name = PyTuple_GET_ITEM(serializer, i);
+                Py_ssize_t l;
+                const char* key = PyUnicode_AsUTF8AndSize(name, &l);
+                PyObject* value;
+
+                if (key == NULL || (value = PyObject_GetAttr(object, name)) == NULL) {
+                    r = false;
+                } else {
+                    writer->Key(key, (SizeType) l);
+                    if (Py_EnterRecursiveCall(" while JSONifying registered object")) {
+                        r = false;
+                    } else {
+                        r = RECURSE(value);
+                        Py_LeaveRecursiveCall();
+                    }
+                    Py_DECREF(value);
+                }
+            }
+
+            if (r)
+                writer->EndObject();
+        } else if (serializer == str_name || serializer == repr_name) {
+            PyObject* strObj = (serializer == str_name
+                                ? PyObject_Str(object)
+                                : PyObject_Repr(object));
+            Py_ssize_t l;
+            const char* str;
+
+            if (strObj == NULL
+                || (str = PyUnicode_AsUTF8AndSize(strObj, &l)) == NULL) {
+                r = false;
+            } else if (l > UINT_MAX) {
+                PyErr_SetString(PyExc_ValueError, "Out of range string size");
+                r = false;
+            } else {
+                writer->String(str, (SizeType) l);
+            }
+            Py_XDECREF(strObj);
+        } else {
+            PyObject* retval = (serializer == int_name
+                                ? PyNumber_Long(object)
+                                : PyObject_CallFunctionObjArgs(serializer, object, NULL));
+
+            if (retval == NULL) {
+                r = false;
+            } else {
+                if (Py_EnterRecursiveCall(" while JSONifying serializer result")) {
+                    r = false;
+                } else {
+                    r = RECURSE(retval);
+                    Py_LeaveRecursiveCall();
+                }
+                Py_DECREF(retval);
+            }
+        }
 
-    if (object == Py_None) {
+        Py_DECREF(serializer);
+        if (!r)
+            return false;
+    } else if (object == Py_None) {
         writer->Null();
     } else if (PyBool_Check(object)) {
         writer->Bool(object == Py_True);
     } else if (numberMode & NM_DECIMAL
+               && !is_core_type(object)
                && (is_decimal = PyObject_IsInstance(object, decimal_type))) {
         if (is_decimal == -1) {
             return false;
@@ -2410,23 +10712,49 @@ dumps_internal(
                 writer->Uint64(ui);
             }
         } else {
-            // Mimic stdlib json: subclasses of int may override __repr__, but we still
-            // want to encode them as integers in JSON; one example within the standard
-            // library is IntEnum
+            // Integers that fit in 64 bits are written directly, the bigger ones thru
+            // their textual representation
 
-            PyObject* intStrObj = PyLong_Type.tp_repr(object);
-            if (intStrObj == NULL)
+            int overflow;
+            long long i = PyLong_AsLongLongAndOverflow(object, &overflow);
+            if (i == -1 && PyErr_Occurred())
                 return false;
 
-            Py_ssize_t size;
-            const char* intStr = PyUnicode_AsUTF8AndSize(intStrObj, &size);
-            if (intStr == NULL) {
-                Py_DECREF(intStrObj);
-                return false;
+            unsigned long long ui = 0;
+            if (overflow > 0) {
+                ui = PyLong_AsUnsignedLongLong(object);
+                if (ui == (unsigned long long) -1 && PyErr_Occurred()) {
+                    PyErr_Clear();
+                    overflow = -1;
+                } else {
+                    overflow = 0;
+                }
             }
 
-            writer->RawValue(intStr, size, kNumberType);
-            Py_DECREF(intStrObj);
+            if (overflow == 0) {
+                if (ui)
+                    writer->Uint64(ui);
+                else
+                    writer->Int64(i);
+            } else {
+                // Mimic stdlib json: subclasses of int may override __repr__, but we
+                // still want to encode them as integers in JSON; one example within the
+                // standard library is IntEnum
+
+                PyObject* intStrObj = PyLong_Type.tp_repr(object);
+                if (intStrObj == NULL)
+                    return false;
+
+                Py_ssize_t size;
+                const char* intStr = PyUnicode_AsUTF8AndSize(intStrObj, &size);
+                if (intStr == NULL) {
+                    Py_DECREF(intStrObj);
+                    return false;
+                }
+
+                writer->RawValue(intStr, size, kNumberType);
+                Py_DECREF(intStrObj);
+            }
         }
     } else if (PyFloat_Check(object)) {
         double d = PyFloat_AsDouble(object);
@@ -2451,9 +10779,19 @@ dumps_internal(
             } else {
                 writer->RawValue("Infinity", 8, kNumberType);
             }
-        } else {
+        } else if (PyFloat_CheckExact(object)) {
             // The RJ dtoa() produces "strange" results for particular values, see #101:
-            // use Python's repr() to emit a raw value instead of writer->Double(d)
+            // use the same shortest round-trip conversion of float.__repr__() to emit a
+            // raw value instead of writer->Double(d), without the temporary str
+
+            char* rs = PyOS_double_to_string(d, 'r', 0, Py_DTSF_ADD_DOT_0, NULL);
+            if (rs == NULL)
+                return false;
+
+            writer->RawValue(rs, strlen(rs), kNumberType);
+            PyMem_Free(rs);
+        } else {
+            // Subclasses may override __repr__()
 
             PyObject* dr = PyObject_Repr(object);
 
@@ -2511,6 +10849,39 @@ dumps_internal(
         }
 
         writer->EndArray();
+    } else if (objectMode & OM_NAMEDTUPLE
+               && PyTuple_Check(object) && !PyTuple_CheckExact(object)
+               && ((fields = object_fields(object, objectMode)) != NULL
+                   || PyErr_Occurred())) {
+        if (fields == NULL)
+            return false;
+
+        writer->StartObject();
+
+        Py_ssize_t count = PyTuple_GET_SIZE(fields);
+        if (count > PyTuple_GET_SIZE(object))
+            count = PyTuple_GET_SIZE(object);
+
+        bool r = true;
+
+        for (Py_ssize_t i = 0; r && i < count; i++) {
+            Py_ssize_t l;
+            const char* key = PyUnicode_AsUTF8AndSize(PyTuple_GET_ITEM(fields, i), &l);
+
+            if (key == NULL || Py_EnterRecursiveCall(" while JSONifying named tuple")) {
+                r = false;
+            } else {
+                writer->Key(key, (SizeType) l);
+                r = RECURSE(PyTuple_GET_ITEM(object, i));
+                Py_LeaveRecursiveCall();
+            }
+        }
+
+        Py_DECREF(fields);
+        if (!r)
+            return false;
+
+        writer->EndObject();
     } else if (!(iterableMode & IM_ONLY_LISTS) && PyTuple_Check(object)) {
         writer->StartArray();
 
@@ -2940,6 +11311,48 @@ dumps_internal(
         memcpy(quoted + 1, s, size);
         writer->RawValue(quoted, (SizeType) size + 2, kStringType);
         Py_DECREF(hexval);
+    } else if (objectMode & (OM_DATACLASS | OM_SLOTS)
+               && ((fields = object_fields(object, objectMode)) != NULL
+                   || PyErr_Occurred())) {
+        if (fields == NULL)
+            return false;
+
+        writer->StartObject();
+
+        Py_ssize_t count = PyTuple_GET_SIZE(fields);
+        bool r = true;
+
+        for (Py_ssize_t i = 0; r && i < count; i++) {
+            PyObject* name = PyTuple_GET_ITEM(fields, i);
+            PyObject* value = PyObject_GetAttr(object, name);
+
+            if (value == NULL) {
+                // Unset attributes are omitted
+                if (PyErr_ExceptionMatches(PyExc_AttributeError))
+                    PyErr_Clear();
+                else
+                    r = false;
+                continue;
+            }
+
+            Py_ssize_t l;
+            const char* key = PyUnicode_AsUTF8AndSize(name, &l);
+
+            if (key == NULL || Py_EnterRecursiveCall(" while JSONifying object")) {
+                r = false;
+            } else {
+                writer->Key(key, (SizeType) l);
+                r = RECURSE(value);
+                Py_LeaveRecursiveCall();
+            }
+            Py_DECREF(value);
+        }
+
+        Py_DECREF(fields);
+        if (!r)
+            return false;
+
+        writer->EndObject();
     } else if (!(iterableMode & IM_ONLY_LISTS) && PyIter_Check(object)) {
         PyObject* iterator = PyObject_GetIter(object);
         if (iterator == NULL)
@@ -2963,78 +11376,217 @@ dumps_internal(
             }
         }
 
-        Py_DECREF(iterator);
+        Py_DECREF(iterator);
+
+        // PyIter_Next() may exit with an error
+        if (PyErr_Occurred())
+            return false;
+
+        writer->EndArray();
+    } else if (PyObject_TypeCheck(object, &RawJSON_Type)) {
+        const char* jsonStr;
+        Py_ssize_t l;
+        jsonStr = PyUnicode_AsUTF8AndSize(((RawJSON*) object)->value, &l);
+        if (jsonStr == NULL)
+            return false;
+        ASSERT_VALID_SIZE(l);
+        writer->RawValue(jsonStr, (SizeType) l, kStringType);
+    } else if (defaultFn) {
+        PyObject* retval = PyObject_CallFunctionObjArgs(defaultFn, object, NULL);
+        if (retval == NULL)
+            return false;
+        if (Py_EnterRecursiveCall(" while JSONifying default function result")) {
+            Py_DECREF(retval);
+            return false;
+        }
+        bool r = RECURSE(retval);
+        Py_LeaveRecursiveCall();
+        Py_DECREF(retval);
+        if (!r)
+            return false;
+    } else {
+        PyErr_Format(PyExc_TypeError, "%R is not JSON serializable", object);
+        return false;
+    }
+
+    // Catch possible error raised in associated stream operations
+    return PyErr_Occurred() ? false : true;
+
+#undef RECURSE
+#undef ASSERT_VALID_SIZE
+}
+
+
+typedef struct {
+    PyObject_HEAD
+    bool ensureAscii;
+    unsigned writeMode;
+    char indentChar;
+    unsigned indentCount;
+    unsigned datetimeMode;
+    unsigned uuidMode;
+    unsigned numberMode;
+    unsigned bytesMode;
+    unsigned iterableMode;
+    unsigned mappingMode;
+    unsigned objectMode;
+    bool returnBytes;
+    SerializerRegistry registry;
+} EncoderObject;
+
+
+PyDoc_STRVAR(dumps_docstring,
+             "dumps(obj, *, skipkeys=False, ensure_ascii=True, write_mode=WM_COMPACT,"
+             " indent=4, default=None, sort_keys=False, number_mode=None,"
+             " datetime_mode=None, uuid_mode=None, bytes_mode=BM_UTF8,"
+             " iterable_mode=IM_ANY_ITERABLE, mapping_mode=MM_ANY_MAPPING,"
+             " object_mode=OM_NONE, as_bytes=False, allow_nan=True)\n"
+             "\n"
+             "Encode a Python object into a JSON string.");
+
+
+static PyObject*
+dumps(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    /* Converts a Python object to a JSON-encoded string. */
+
+    PyObject* value;
+    int ensureAscii = true;
+    PyObject* indent = NULL;
+    PyObject* defaultFn = NULL;
+    PyObject* numberModeObj = NULL;
+    unsigned numberMode = NM_NAN;
+    PyObject* datetimeModeObj = NULL;
+    unsigned datetimeMode = DM_NONE;
+    PyObject* uuidModeObj = NULL;
+    unsigned uuidMode = UM_NONE;
+    PyObject* bytesModeObj = NULL;
+    unsigned bytesMode = BM_UTF8;
+    PyObject* writeModeObj = NULL;
+    unsigned writeMode = WM_COMPACT;
+    PyObject* iterableModeObj = NULL;
+    unsigned iterableMode = IM_ANY_ITERABLE;
+    PyObject* mappingModeObj = NULL;
+    unsigned mappingMode = MM_ANY_MAPPING;
+    PyObject* objectModeObj = NULL;
+    unsigned objectMode = OM_NONE;
+    char indentChar = ' ';
+    unsigned indentCount = 4;
+    static char const* kwlist[] = {
+        "obj",
+        "skipkeys",             // alias of MM_SKIP_NON_STRING_KEYS
+        "ensure_ascii",
+        "indent",
+        "default",
+        "sort_keys",            // alias of MM_SORT_KEYS
+        "number_mode",
+        "datetime_mode",
+        "uuid_mode",
+        "bytes_mode",
+        "write_mode",
+        "iterable_mode",
+        "mapping_mode",
+        "object_mode",
+        "as_bytes",
+
+        /* compatibility with stdlib json */
+        "allow_nan",
+
+        NULL
+    };
+    int skipKeys = false;
+    int sortKeys = false;
+    int asBytes = false;
+    int allowNan = -1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$ppOOpOOOOOOOOpp:rapidjson.dumps",
+                                     (char**) kwlist,
+                                     &value,
+                                     &skipKeys,
+                                     &ensureAscii,
+                                     &indent,
+                                     &defaultFn,
+                                     &sortKeys,
+                                     &numberModeObj,
+                                     &datetimeModeObj,
+                                     &uuidModeObj,
+                                     &bytesModeObj,
+                                     &writeModeObj,
+                                     &iterableModeObj,
+                                     &mappingModeObj,
+                                     &objectModeObj,
+                                     &asBytes,
+                                     &allowNan))
+        return NULL;
+
+    if (defaultFn && !PyCallable_Check(defaultFn)) {
+        if (defaultFn == Py_None) {
+            defaultFn = NULL;
+        } else {
+            PyErr_SetString(PyExc_TypeError, "default must be a callable");
+            return NULL;
+        }
+    }
+
+    if (!accept_indent_arg(indent, writeMode, indentCount, indentChar))
+        return NULL;
+
+    if (!accept_write_mode_arg(writeModeObj, writeMode))
+        return NULL;
+
+    if (!accept_number_mode_arg(numberModeObj, allowNan, numberMode))
+        return NULL;
+
+    if (!accept_datetime_mode_arg(datetimeModeObj, datetimeMode))
+        return NULL;
+
+    if (!accept_uuid_mode_arg(uuidModeObj, uuidMode))
+        return NULL;
 
-        // PyIter_Next() may exit with an error
-        if (PyErr_Occurred())
-            return false;
+    if (!accept_bytes_mode_arg(bytesModeObj, bytesMode))
+        return NULL;
 
-        writer->EndArray();
-    } else if (PyObject_TypeCheck(object, &RawJSON_Type)) {
-        const char* jsonStr;
-        Py_ssize_t l;
-        jsonStr = PyUnicode_AsUTF8AndSize(((RawJSON*) object)->value, &l);
-        if (jsonStr == NULL)
-            return false;
-        ASSERT_VALID_SIZE(l);
-        writer->RawValue(jsonStr, (SizeType) l, kStringType);
-    } else if (defaultFn) {
-        PyObject* retval = PyObject_CallFunctionObjArgs(defaultFn, object, NULL);
-        if (retval == NULL)
-            return false;
-        if (Py_EnterRecursiveCall(" while JSONifying default function result")) {
-            Py_DECREF(retval);
-            return false;
-        }
-        bool r = RECURSE(retval);
-        Py_LeaveRecursiveCall();
-        Py_DECREF(retval);
-        if (!r)
-            return false;
-    } else {
-        PyErr_Format(PyExc_TypeError, "%R is not JSON serializable", object);
-        return false;
-    }
+    if (!accept_iterable_mode_arg(iterableModeObj, iterableMode))
+        return NULL;
 
-    // Catch possible error raised in associated stream operations
-    return PyErr_Occurred() ? false : true;
+    if (!accept_mapping_mode_arg(mappingModeObj, mappingMode))
+        return NULL;
 
-#undef RECURSE
-#undef ASSERT_VALID_SIZE
-}
+    if (!accept_object_mode_arg(objectModeObj, objectMode))
+        return NULL;
 
+    if (skipKeys)
+        mappingMode |= MM_SKIP_NON_STRING_KEYS;
 
-typedef struct {
-    PyObject_HEAD
-    bool ensureAscii;
-    unsigned writeMode;
-    char indentChar;
-    unsigned indentCount;
-    unsigned datetimeMode;
-    unsigned uuidMode;
-    unsigned numberMode;
-    unsigned bytesMode;
-    unsigned iterableMode;
-    unsigned mappingMode;
-} EncoderObject;
+    if (sortKeys)
+        mappingMode |= MM_SORT_KEYS;
 
+    return do_encode(value, defaultFn, NULL, ensureAscii ? true : false, writeMode,
+                     indentChar, indentCount, numberMode, datetimeMode, uuidMode,
+                     bytesMode, iterableMode, mappingMode, objectMode,
+                     asBytes ? true : false);
+}
 
-PyDoc_STRVAR(dumps_docstring,
-             "dumps(obj, *, skipkeys=False, ensure_ascii=True, write_mode=WM_COMPACT,"
-             " indent=4, default=None, sort_keys=False, number_mode=None,"
-             " datetime_mode=None, uuid_mode=None, bytes_mode=BM_UTF8,"
+
+PyDoc_STRVAR(dumps_into_docstring,
+             "dumps_into(obj, buffer, offset=0, *, skipkeys=False, ensure_ascii=True,"
+             " write_mode=WM_COMPACT, indent=4, default=None, sort_keys=False,"
+             " number_mode=None, datetime_mode=None, uuid_mode=None, bytes_mode=BM_UTF8,"
              " iterable_mode=IM_ANY_ITERABLE, mapping_mode=MM_ANY_MAPPING,"
-             " allow_nan=True)\n"
+             " object_mode=OM_NONE, allow_nan=True)\n"
              "\n"
-             "Encode a Python object into a JSON string.");
+             "Encode a Python object into a JSON string written into a writable buffer,"
+             " returning its length.");
 
 
 static PyObject*
-dumps(PyObject* self, PyObject* args, PyObject* kwargs)
+dumps_into(PyObject* self, PyObject* args, PyObject* kwargs)
 {
-    /* Converts a Python object to a JSON-encoded string. */
+    /* Converts a Python object to a JSON-encoded string stored in a buffer. */
 
     PyObject* value;
+    PyObject* buffer;
+    Py_ssize_t offset = 0;
     int ensureAscii = true;
     PyObject* indent = NULL;
     PyObject* defaultFn = NULL;
@@ -3052,10 +11604,14 @@ dumps(PyObject* self, PyObject* args, PyObject* kwargs)
     unsigned iterableMode = IM_ANY_ITERABLE;
     PyObject* mappingModeObj = NULL;
     unsigned mappingMode = MM_ANY_MAPPING;
+    PyObject* objectModeObj = NULL;
+    unsigned objectMode = OM_NONE;
     char indentChar = ' ';
     unsigned indentCount = 4;
     static char const* kwlist[] = {
         "obj",
+        "buffer",
+        "offset",
         "skipkeys",             // alias of MM_SKIP_NON_STRING_KEYS
         "ensure_ascii",
         "indent",
@@ -3068,6 +11624,7 @@ dumps(PyObject* self, PyObject* args, PyObject* kwargs)
         "write_mode",
         "iterable_mode",
         "mapping_mode",
+        "object_mode",
 
         /* compatibility with stdlib json */
         "allow_nan",
@@ -3078,9 +11635,12 @@ dumps(PyObject* self, PyObject* args, PyObject* kwargs)
     int sortKeys = false;
     int allowNan = -1;
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|$ppOOpOOOOOOOp:rapidjson.dumps",
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs,
+                                     "OO|n$ppOOpOOOOOOOOp:rapidjson.dumps_into",
                                      (char**) kwlist,
                                      &value,
+                                     &buffer,
+                                     &offset,
                                      &skipKeys,
                                      &ensureAscii,
                                      &indent,
@@ -3093,6 +11653,7 @@ dumps(PyObject* self, PyObject* args, PyObject* kwargs)
                                      &writeModeObj,
                                      &iterableModeObj,
                                      &mappingModeObj,
+                                     &objectModeObj,
                                      &allowNan))
         return NULL;
 
@@ -3129,15 +11690,19 @@ dumps(PyObject* self, PyObject* args, PyObject* kwargs)
     if (!accept_mapping_mode_arg(mappingModeObj, mappingMode))
         return NULL;
 
+    if (!accept_object_mode_arg(objectModeObj, objectMode))
+        return NULL;
+
     if (skipKeys)
         mappingMode |= MM_SKIP_NON_STRING_KEYS;
 
     if (sortKeys)
         mappingMode |= MM_SORT_KEYS;
 
-    return do_encode(value, defaultFn, ensureAscii ? true : false, writeMode, indentChar,
-                     indentCount, numberMode, datetimeMode, uuidMode, bytesMode,
-                     iterableMode, mappingMode);
+    return do_buffer_encode(value, buffer, offset, defaultFn, ensureAscii ? true : false,
+                            writeMode, indentChar, indentCount, numberMode, datetimeMode,
+                            uuidMode, bytesMode, iterableMode, mappingMode,
+                            objectMode);
 }
 
 
@@ -3146,7 +11711,7 @@ PyDoc_STRVAR(dump_docstring,
              " write_mode=WM_COMPACT, indent=4, default=None, sort_keys=False,"
              " number_mode=None, datetime_mode=None, uuid_mode=None, bytes_mode=BM_UTF8,"
              " iterable_mode=IM_ANY_ITERABLE, mapping_mode=MM_ANY_MAPPING,"
-             " chunk_size=65536, allow_nan=True)\n"
+             " object_mode=OM_NONE, chunk_size=65536, allow_nan=True)\n"
              "\n"
              "Encode a Python object into a JSON stream.");
 
@@ -3175,6 +11740,8 @@ dump(PyObject* self, PyObject* args, PyObject* kwargs)
     unsigned iterableMode = IM_ANY_ITERABLE;
     PyObject* mappingModeObj = NULL;
     unsigned mappingMode = MM_ANY_MAPPING;
+    PyObject* objectModeObj = NULL;
+    unsigned objectMode = OM_NONE;
     char indentChar = ' ';
     unsigned indentCount = 4;
     PyObject* chunkSizeObj = NULL;
@@ -3196,6 +11763,7 @@ dump(PyObject* self, PyObject* args, PyObject* kwargs)
         "write_mode",
         "iterable_mode",
         "mapping_mode",
+        "object_mode",
 
         /* compatibility with stdlib json */
         "allow_nan",
@@ -3205,7 +11773,7 @@ dump(PyObject* self, PyObject* args, PyObject* kwargs)
     int skipKeys = false;
     int sortKeys = false;
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OO|$ppOOpOOOOOOOOp:rapidjson.dump",
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OO|$ppOOpOOOOOOOOOp:rapidjson.dump",
                                      (char**) kwlist,
                                      &value,
                                      &stream,
@@ -3222,6 +11790,7 @@ dump(PyObject* self, PyObject* args, PyObject* kwargs)
                                      &writeModeObj,
                                      &iterableModeObj,
                                      &mappingModeObj,
+                                     &objectModeObj,
                                      &allowNan))
         return NULL;
 
@@ -3261,16 +11830,19 @@ dump(PyObject* self, PyObject* args, PyObject* kwargs)
     if (!accept_mapping_mode_arg(mappingModeObj, mappingMode))
         return NULL;
 
+    if (!accept_object_mode_arg(objectModeObj, objectMode))
+        return NULL;
+
     if (skipKeys)
         mappingMode |= MM_SKIP_NON_STRING_KEYS;
 
     if (sortKeys)
         mappingMode |= MM_SORT_KEYS;
 
-    return do_stream_encode(value, stream, chunkSize, defaultFn,
+    return do_stream_encode(value, stream, chunkSize, defaultFn, NULL,
                             ensureAscii ? true : false, writeMode, indentChar,
                             indentCount, numberMode, datetimeMode, uuidMode, bytesMode,
-                            iterableMode, mappingMode);
+                            iterableMode, mappingMode, objectMode);
 }
 
 
@@ -3278,7 +11850,7 @@ PyDoc_STRVAR(encoder_doc,
              "Encoder(skip_invalid_keys=False, ensure_ascii=True, write_mode=WM_COMPACT,"
              " indent=4, sort_keys=False, number_mode=None, datetime_mode=None,"
              " uuid_mode=None, bytes_mode=None, iterable_mode=IM_ANY_ITERABLE,"
-             " mapping_mode=MM_ANY_MAPPING)\n\n"
+             " mapping_mode=MM_ANY_MAPPING, object_mode=OM_NONE, return_bytes=False)\n\n"
              "Create and return a new Encoder instance.");
 
 
@@ -3313,6 +11885,12 @@ static PyMemberDef encoder_members[] = {
     {"mapping_mode",
      T_UINT, offsetof(EncoderObject, mappingMode), READONLY,
      "Whether mapping values other than dicts shall be encoded as JSON objects or not."},
+    {"object_mode",
+     T_UINT, offsetof(EncoderObject, objectMode), READONLY,
+     "Which kinds of objects shall be encoded as JSON objects from their fields."},
+    {"return_bytes",
+     T_BOOL, offsetof(EncoderObject, returnBytes), READONLY,
+     "Whether the result is a bytes instance instead of a str."},
     {NULL}
 };
 
@@ -3329,6 +11907,134 @@ encoder_get_sort_keys(EncoderObject* e, void* closure)
     return PyBool_FromLong(e->mappingMode & MM_SORT_KEYS);
 }
 
+PyDoc_STRVAR(encoder_register_docstring,
+             "register(type, serializer)\n"
+             "\n"
+             "Register the `serializer` for instances of `type` and its subclasses: it may"
+             " be a callable returning a JSON-serializable value, a tuple of attribute names"
+             " to emit as a JSON object, one of the conversions \"str\", \"repr\" or"
+             " \"int\", or None to remove a previous registration.");
+
+
+static PyObject*
+encoder_register(PyObject* self, PyObject* args)
+{
+    PyObject* type;
+    PyObject* serializer;
+
+    if (!PyArg_ParseTuple(args, "OO:register", &type, &serializer))
+        return NULL;
+
+    if (!PyType_Check(type)) {
+        PyErr_SetString(PyExc_TypeError, "type must be a class");
+        return NULL;
+    }
+
+    if (serializer == Py_None) {
+        // Nothing to do
+    } else if (PyUnicode_Check(serializer)) {
+        if (PyUnicode_Compare(serializer, str_name) == 0)
+            serializer = str_name;
+        else if (PyUnicode_Compare(serializer, repr_name) == 0)
+            serializer = repr_name;
+        else if (PyUnicode_Compare(serializer, int_name) == 0)
+            serializer = int_name;
+        else {
+            if (!PyErr_Occurred())
+                PyErr_Format(PyExc_ValueError,
+                             "Invalid conversion %R, expected \"str\", \"repr\" or"
+                             " \"int\"", serializer);
+            return NULL;
+        }
+    } else if (PyTuple_Check(serializer)) {
+        Py_ssize_t count = PyTuple_GET_SIZE(serializer);
+
+        for (Py_ssize_t i = 0; i < count; i++) {
+            if (!PyUnicode_Check(PyTuple_GET_ITEM(serializer, i))) {
+                PyErr_SetString(PyExc_TypeError,
+                                "Attribute names must be strings");
+                return NULL;
+            }
+        }
+    } else if (!PyCallable_Check(serializer)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "serializer must be a callable, a tuple of attribute names,"
+                        " \"str\", \"repr\", \"int\" or None");
+        return NULL;
+    }
+
+    SerializerRegistry* registry = &((EncoderObject*) self)->registry;
+
+    if (registry->serializers == NULL) {
+        if (serializer == Py_None)
+            Py_RETURN_NONE;
+
+        registry->serializers = PyDict_New();
+        if (registry->serializers == NULL)
+            return NULL;
+
+        registry->cache = PyDict_New();
+        if (registry->cache == NULL) {
+            Py_CLEAR(registry->serializers);
+            return NULL;
+        }
+    }
+
+    if (serializer == Py_None) {
+        if (PyDict_Contains(registry->serializers, type)
+            && PyDict_DelItem(registry->serializers, type) == -1)
+            return NULL;
+    } else if (PyDict_SetItem(registry->serializers, type, serializer) == -1)
+        return NULL;
+
+    // The outcome of past lookups may have changed, subclasses included
+    PyDict_Clear(registry->cache);
+
+    Py_RETURN_NONE;
+}
+
+
+static PyMethodDef encoder_methods[] = {
+    {"register", (PyCFunction) encoder_register, METH_VARARGS,
+     encoder_register_docstring},
+    {NULL, NULL}
+};
+
+
+// The registered serializers may refer back to the encoder, for example when they are
+// its bound methods
+
+static int
+encoder_traverse(PyObject* self, visitproc visit, void* arg)
+{
+    EncoderObject* e = (EncoderObject*) self;
+
+    Py_VISIT(e->registry.serializers);
+    Py_VISIT(e->registry.cache);
+    return 0;
+}
+
+
+static int
+encoder_clear(PyObject* self)
+{
+    EncoderObject* e = (EncoderObject*) self;
+
+    Py_CLEAR(e->registry.serializers);
+    Py_CLEAR(e->registry.cache);
+    return 0;
+}
+
+
+static void
+encoder_dealloc(PyObject* self)
+{
+    PyObject_GC_UnTrack(self);
+    encoder_clear(self);
+    Py_TYPE(self)->tp_free(self);
+}
+
+
 // Backward compatibility, previously they were members of EncoderObject
 
 static PyGetSetDef encoder_props[] = {
@@ -3344,7 +12050,7 @@ static PyTypeObject Encoder_Type = {
     "rapidjson.Encoder",                      /* tp_name */
     sizeof(EncoderObject),                    /* tp_basicsize */
     0,                                        /* tp_itemsize */
-    0,                                        /* tp_dealloc */
+    (destructor) encoder_dealloc,             /* tp_dealloc */
     0,                                        /* tp_print */
     0,                                        /* tp_getattr */
     0,                                        /* tp_setattr */
@@ -3359,15 +12065,15 @@ static PyTypeObject Encoder_Type = {
     0,                                        /* tp_getattro */
     0,                                        /* tp_setattro */
     0,                                        /* tp_as_buffer */
-    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, /* tp_flags */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_GC, /* tp_flags */
     encoder_doc,                              /* tp_doc */
-    0,                                        /* tp_traverse */
-    0,                                        /* tp_clear */
+    encoder_traverse,                         /* tp_traverse */
+    encoder_clear,                            /* tp_clear */
     0,                                        /* tp_richcompare */
     0,                                        /* tp_weaklistoffset */
     0,                                        /* tp_iter */
     0,                                        /* tp_iternext */
-    0,                                        /* tp_methods */
+    encoder_methods,                          /* tp_methods */
     encoder_members,                          /* tp_members */
     encoder_props,                            /* tp_getset */
     0,                                        /* tp_base */
@@ -3378,7 +12084,7 @@ static PyTypeObject Encoder_Type = {
     0,                                        /* tp_init */
     0,                                        /* tp_alloc */
     encoder_new,                              /* tp_new */
-    PyObject_Del,                             /* tp_free */
+    PyObject_GC_Del,                          /* tp_free */
 };
 
 
@@ -3390,20 +12096,27 @@ static PyTypeObject Encoder_Type = {
     (dumps_internal(&writer,                            \
                     value,                              \
                     defaultFn,                          \
+                    registry,                           \
                     numberMode,                         \
                     datetimeMode,                       \
                     uuidMode,                           \
                     bytesMode,                          \
                     iterableMode,                       \
-                    mappingMode)                        \
-     ? PyUnicode_FromString(buf.GetString()) : NULL)
+                    mappingMode,                        \
+                    objectMode)                         \
+     ? (asBytes                                         \
+        ? PyBytes_FromStringAndSize(buf.GetString(),    \
+                                    buf.GetSize())      \
+        : PyUnicode_FromString(buf.GetString()))        \
+     : NULL)
 
 
 static PyObject*
-do_encode(PyObject* value, PyObject* defaultFn, bool ensureAscii, unsigned writeMode,
-          char indentChar, unsigned indentCount, unsigned numberMode,
+do_encode(PyObject* value, PyObject* defaultFn, SerializerRegistry* registry,
+          bool ensureAscii, unsigned writeMode, char indentChar, unsigned indentCount, unsigned numberMode,
           unsigned datetimeMode, unsigned uuidMode, unsigned bytesMode,
-          unsigned iterableMode, unsigned mappingMode)
+          unsigned iterableMode, unsigned mappingMode, unsigned objectMode,
+          bool asBytes)
 {
     if (writeMode == WM_COMPACT) {
         if (ensureAscii) {
@@ -3439,21 +12152,23 @@ do_encode(PyObject* value, PyObject* defaultFn, bool ensureAscii, unsigned write
     (dumps_internal(&writer,                    \
                     value,                      \
                     defaultFn,                  \
+                    registry,                   \
                     numberMode,                 \
                     datetimeMode,               \
                     uuidMode,                   \
                     bytesMode,                  \
                     iterableMode,               \
-                    mappingMode)                \
+                    mappingMode,                \
+                    objectMode)                 \
      ? Py_INCREF(Py_None), Py_None : NULL)
 
 
 static PyObject*
 do_stream_encode(PyObject* value, PyObject* stream, size_t chunkSize, PyObject* defaultFn,
-                 bool ensureAscii, unsigned writeMode, char indentChar,
+                 SerializerRegistry* registry, bool ensureAscii, unsigned writeMode, char indentChar,
                  unsigned indentCount, unsigned numberMode, unsigned datetimeMode,
                  unsigned uuidMode, unsigned bytesMode, unsigned iterableMode,
-                 unsigned mappingMode)
+                 unsigned mappingMode, unsigned objectMode)
 {
     PyWriteStreamWrapper os(stream, chunkSize);
 
@@ -3483,6 +12198,66 @@ do_stream_encode(PyObject* value, PyObject* stream, size_t chunkSize, PyObject*
 }
 
 
+#define DUMP_INTO_INTERNAL_CALL                 \
+    dumps_internal(&writer,                     \
+                   value,                       \
+                   defaultFn,                   \
+                   NULL,                        \
+                   numberMode,                  \
+                   datetimeMode,                \
+                   uuidMode,                    \
+                   bytesMode,                   \
+                   iterableMode,                \
+                   mappingMode,                 \
+                   objectMode)
+
+
+static PyObject*
+do_buffer_encode(PyObject* value, PyObject* buffer, Py_ssize_t offset,
+                 PyObject* defaultFn, bool ensureAscii, unsigned writeMode,
+                 char indentChar, unsigned indentCount, unsigned numberMode,
+                 unsigned datetimeMode, unsigned uuidMode, unsigned bytesMode,
+                 unsigned iterableMode, unsigned mappingMode, unsigned objectMode)
+{
+    PyBufferWriteStream os(buffer, offset);
+    bool ok;
+
+    if (!os.Open())
+        return NULL;
+
+    if (writeMode == WM_COMPACT) {
+        if (ensureAscii) {
+            Writer<PyBufferWriteStream, UTF8<>, ASCII<> > writer(os);
+            ok = DUMP_INTO_INTERNAL_CALL;
+        } else {
+            Writer<PyBufferWriteStream> writer(os);
+            ok = DUMP_INTO_INTERNAL_CALL;
+        }
+    } else if (ensureAscii) {
+        PrettyWriter<PyBufferWriteStream, UTF8<>, ASCII<> > writer(os);
+        writer.SetIndent(indentChar, indentCount);
+        if (writeMode & WM_SINGLE_LINE_ARRAY) {
+            writer.SetFormatOptions(kFormatSingleLineArray);
+        }
+        ok = DUMP_INTO_INTERNAL_CALL;
+    } else {
+        PrettyWriter<PyBufferWriteStream> writer(os);
+        writer.SetIndent(indentChar, indentCount);
+        if (writeMode & WM_SINGLE_LINE_ARRAY) {
+            writer.SetFormatOptions(kFormatSingleLineArray);
+        }
+        ok = DUMP_INTO_INTERNAL_CALL;
+    }
+
+    Py_ssize_t length = os.Close(ok);
+
+    if (length < 0)
+        return NULL;
+
+    return PyLong_FromSsize_t(length);
+}
+
+
 static PyObject*
 encoder_call(PyObject* self, PyObject* args, PyObject* kwargs)
 {
@@ -3507,6 +12282,9 @@ encoder_call(PyObject* self, PyObject* args, PyObject* kwargs)
         return NULL;
 
     EncoderObject* e = (EncoderObject*) self;
+    SerializerRegistry* registry = (e->registry.serializers != NULL
+                                    && PyDict_GET_SIZE(e->registry.serializers) != 0
+                                    ? &e->registry : NULL);
 
     if (stream != NULL && stream != Py_None) {
         if (!PyObject_HasAttr(stream, write_name)) {
@@ -3521,18 +12299,20 @@ encoder_call(PyObject* self, PyObject* args, PyObject* kwargs)
             defaultFn = PyObject_GetAttr(self, default_name);
         }
 
-        result = do_stream_encode(value, stream, chunkSize, defaultFn, e->ensureAscii,
-                                  e->writeMode, e->indentChar, e->indentCount,
+        result = do_stream_encode(value, stream, chunkSize, defaultFn, registry,
+                                  e->ensureAscii, e->writeMode, e->indentChar, e->indentCount,
                                   e->numberMode, e->datetimeMode, e->uuidMode,
-                                  e->bytesMode, e->iterableMode, e->mappingMode);
+                                  e->bytesMode, e->iterableMode, e->mappingMode,
+                                  e->objectMode);
     } else {
         if (PyObject_HasAttr(self, default_name)) {
             defaultFn = PyObject_GetAttr(self, default_name);
         }
 
-        result = do_encode(value, defaultFn, e->ensureAscii, e->writeMode, e->indentChar,
-                           e->indentCount, e->numberMode, e->datetimeMode, e->uuidMode,
-                           e->bytesMode, e->iterableMode, e->mappingMode);
+        result = do_encode(value, defaultFn, registry, e->ensureAscii, e->writeMode,
+                           e->indentChar, e->indentCount, e->numberMode, e->datetimeMode,
+                           e->uuidMode, e->bytesMode, e->iterableMode, e->mappingMode,
+                           e->objectMode, e->returnBytes);
     }
 
     if (defaultFn != NULL)
@@ -3562,6 +12342,8 @@ encoder_new(PyTypeObject* type, PyObject* args, PyObject* kwargs)
     unsigned iterableMode = IM_ANY_ITERABLE;
     PyObject* mappingModeObj = NULL;
     unsigned mappingMode = MM_ANY_MAPPING;
+    PyObject* objectModeObj = NULL;
+    unsigned objectMode = OM_NONE;
     char indentChar = ' ';
     unsigned indentCount = 4;
     static char const* kwlist[] = {
@@ -3576,12 +12358,15 @@ encoder_new(PyTypeObject* type, PyObject* args, PyObject* kwargs)
         "write_mode",
         "iterable_mode",
         "mapping_mode",
+        "object_mode",
+        "return_bytes",
         NULL
     };
     int skipInvalidKeys = false;
     int sortKeys = false;
+    int returnBytes = false;
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|ppOpOOOOOOO:Encoder",
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|ppOpOOOOOOOOp:Encoder",
                                      (char**) kwlist,
                                      &skipInvalidKeys,
                                      &ensureAscii,
@@ -3593,7 +12378,9 @@ encoder_new(PyTypeObject* type, PyObject* args, PyObject* kwargs)
                                      &bytesModeObj,
                                      &writeModeObj,
                                      &iterableModeObj,
-                                     &mappingModeObj))
+                                     &mappingModeObj,
+                                     &objectModeObj,
+                                     &returnBytes))
         return NULL;
 
     if (!accept_indent_arg(indent, writeMode, indentCount, indentChar))
@@ -3620,6 +12407,9 @@ encoder_new(PyTypeObject* type, PyObject* args, PyObject* kwargs)
     if (!accept_mapping_mode_arg(mappingModeObj, mappingMode))
         return NULL;
 
+    if (!accept_object_mode_arg(objectModeObj, objectMode))
+        return NULL;
+
     if (skipInvalidKeys)
         mappingMode |= MM_SKIP_NON_STRING_KEYS;
 
@@ -3640,6 +12430,8 @@ encoder_new(PyTypeObject* type, PyObject* args, PyObject* kwargs)
     e->bytesMode = bytesMode;
     e->iterableMode = iterableMode;
     e->mappingMode = mappingMode;
+    e->objectMode = objectMode;
+    e->returnBytes = returnBytes ? true : false;
 
     return (PyObject*) e;
 }
@@ -3833,10 +12625,26 @@ static PyMethodDef functions[] = {
      loads_docstring},
     {"load", (PyCFunction) load, METH_VARARGS | METH_KEYWORDS,
      load_docstring},
+    {"load_path", (PyCFunction) load_path, METH_VARARGS | METH_KEYWORDS,
+     load_path_docstring},
+    {"load_fd", (PyCFunction) load_fd, METH_VARARGS | METH_KEYWORDS,
+     load_fd_docstring},
     {"dumps", (PyCFunction) dumps, METH_VARARGS | METH_KEYWORDS,
      dumps_docstring},
     {"dump", (PyCFunction) dump, METH_VARARGS | METH_KEYWORDS,
      dump_docstring},
+    {"dumps_into", (PyCFunction) dumps_into, METH_VARARGS | METH_KEYWORDS,
+     dumps_into_docstring},
+    {"extract", (PyCFunction) extract, METH_VARARGS | METH_KEYWORDS,
+     extract_docstring},
+    {"iterload", (PyCFunction) iterload, METH_VARARGS | METH_KEYWORDS,
+     iterload_docstring},
+    {"iterparse", (PyCFunction) iterparse, METH_VARARGS | METH_KEYWORDS,
+     iterparse_docstring},
+    {"loads_columns", (PyCFunction) loads_columns, METH_VARARGS | METH_KEYWORDS,
+     loads_columns_docstring},
+    {"loads_many", (PyCFunction) loads_many, METH_VARARGS | METH_KEYWORDS,
+     loads_many_docstring},
     {NULL, NULL, 0, NULL} /* sentinel */
 };
 
@@ -3847,6 +12655,8 @@ module_exec(PyObject* m)
     PyObject* datetimeModule;
     PyObject* decimalModule;
     PyObject* uuidModule;
+    PyObject* arrayModule;
+    PyObject* ioModule;
 
     if (PyType_Ready(&Decoder_Type) < 0)
         return -1;
@@ -3860,6 +12670,21 @@ module_exec(PyObject* m)
     if (PyType_Ready(&RawJSON_Type) < 0)
         return -1;
 
+    if (PyType_Ready(&LazyObject_Type) < 0)
+        return -1;
+
+    if (PyType_Ready(&LazyArray_Type) < 0)
+        return -1;
+
+    if (PyType_Ready(&PointerSet_Type) < 0)
+        return -1;
+
+    if (PyType_Ready(&DocumentIterator_Type) < 0)
+        return -1;
+
+    if (PyType_Ready(&EventIterator_Type) < 0)
+        return -1;
+
     PyDateTime_IMPORT;
     if(!PyDateTimeAPI)
         return -1;
@@ -3893,9 +12718,42 @@ module_exec(PyObject* m)
         return -1;
 
     uuid_type = PyObject_GetAttrString(uuidModule, "UUID");
+    if (uuid_type == NULL) {
+        Py_DECREF(uuidModule);
+        return -1;
+    }
+
+    // SafeUUID is there since Python 3.7
+    PyObject* safeUuid = PyObject_GetAttrString(uuidModule, "SafeUUID");
     Py_DECREF(uuidModule);
 
-    if (uuid_type == NULL)
+    if (safeUuid == NULL)
+        PyErr_Clear();
+    else {
+        uuid_safe_unknown = PyObject_GetAttrString(safeUuid, "unknown");
+        Py_DECREF(safeUuid);
+        if (uuid_safe_unknown == NULL)
+            return -1;
+    }
+
+    arrayModule = PyImport_ImportModule("array");
+    if (arrayModule == NULL)
+        return -1;
+
+    array_type = PyObject_GetAttrString(arrayModule, "array");
+    Py_DECREF(arrayModule);
+
+    if (array_type == NULL)
+        return -1;
+
+    ioModule = PyImport_ImportModule("io");
+    if (ioModule == NULL)
+        return -1;
+
+    fileio_type = PyObject_GetAttrString(ioModule, "FileIO");
+    Py_DECREF(ioModule);
+
+    if (fileio_type == NULL)
         return -1;
 
     astimezone_name = PyUnicode_InternFromString("astimezone");
@@ -3906,6 +12764,22 @@ module_exec(PyObject* m)
     if (hex_name == NULL)
         return -1;
 
+    int_name = PyUnicode_InternFromString("int");
+    if (int_name == NULL)
+        return -1;
+
+    str_name = PyUnicode_InternFromString("str");
+    if (str_name == NULL)
+        return -1;
+
+    repr_name = PyUnicode_InternFromString("repr");
+    if (repr_name == NULL)
+        return -1;
+
+    is_safe_name = PyUnicode_InternFromString("is_safe");
+    if (is_safe_name == NULL)
+        return -1;
+
     timestamp_name = PyUnicode_InternFromString("timestamp");
     if (timestamp_name == NULL)
         return -1;
@@ -3962,6 +12836,18 @@ module_exec(PyObject* m)
     if (read_name == NULL)
         return -1;
 
+    readinto_name = PyUnicode_InternFromString("readinto");
+    if (readinto_name == NULL)
+        return -1;
+
+    readable_name = PyUnicode_InternFromString("readable");
+    if (readable_name == NULL)
+        return -1;
+
+    close_name = PyUnicode_InternFromString("close");
+    if (close_name == NULL)
+        return -1;
+
     write_name = PyUnicode_InternFromString("write");
     if (write_name == NULL)
         return -1;
@@ -3970,6 +12856,44 @@ module_exec(PyObject* m)
     if (encoding_name == NULL)
         return -1;
 
+    frombytes_name = PyUnicode_InternFromString("frombytes");
+    if (frombytes_name == NULL)
+        return -1;
+
+    start_map_name = PyUnicode_InternFromString("start_map");
+    if (start_map_name == NULL)
+        return -1;
+
+    map_key_name = PyUnicode_InternFromString("map_key");
+    if (map_key_name == NULL)
+        return -1;
+
+    end_map_name = PyUnicode_InternFromString("end_map");
+    if (end_map_name == NULL)
+        return -1;
+
+    start_array_name = PyUnicode_InternFromString("start_array");
+    if (start_array_name == NULL)
+        return -1;
+
+    null_name = PyUnicode_InternFromString("null");
+    if (null_name == NULL)
+        return -1;
+
+    boolean_name = PyUnicode_InternFromString("boolean");
+    if (boolean_name == NULL)
+        return -1;
+
+    number_name = PyUnicode_InternFromString("number");
+    if (number_name == NULL)
+        return -1;
+
+    item_name = PyUnicode_InternFromString("item");
+    if (item_name == NULL)
+        return -1;
+
+    check_uuid_bypass_init();
+
 #define STRINGIFY(x) XSTRINGIFY(x)
 #define XSTRINGIFY(x) #x
 
@@ -3994,6 +12918,9 @@ module_exec(PyObject* m)
         || PyModule_AddIntConstant(m, "PM_COMMENTS", PM_COMMENTS)
         || PyModule_AddIntConstant(m, "PM_TRAILING_COMMAS", PM_TRAILING_COMMAS)
 
+        || PyModule_AddIntConstant(m, "AM_NONE", AM_NONE)
+        || PyModule_AddIntConstant(m, "AM_TYPED", AM_TYPED)
+
         || PyModule_AddIntConstant(m, "BM_NONE", BM_NONE)
         || PyModule_AddIntConstant(m, "BM_UTF8", BM_UTF8)
 
@@ -4011,6 +12938,11 @@ module_exec(PyObject* m)
         || PyModule_AddIntConstant(m, "MM_SKIP_NON_STRING_KEYS", MM_SKIP_NON_STRING_KEYS)
         || PyModule_AddIntConstant(m, "MM_SORT_KEYS", MM_SORT_KEYS)
 
+        || PyModule_AddIntConstant(m, "OM_NONE", OM_NONE)
+        || PyModule_AddIntConstant(m, "OM_DATACLASS", OM_DATACLASS)
+        || PyModule_AddIntConstant(m, "OM_NAMEDTUPLE", OM_NAMEDTUPLE)
+        || PyModule_AddIntConstant(m, "OM_SLOTS", OM_SLOTS)
+
         || PyModule_AddStringConstant(m, "__version__",
                                       STRINGIFY(PYTHON_RAPIDJSON_VERSION))
         || PyModule_AddStringConstant(m, "__author__",
@@ -4049,6 +12981,56 @@ module_exec(PyObject* m)
         return -1;
     }
 
+    Py_INCREF(&LazyObject_Type);
+    if (PyModule_AddObject(m, "LazyObject", (PyObject*) &LazyObject_Type) < 0) {
+        Py_DECREF(&LazyObject_Type);
+        return -1;
+    }
+
+    Py_INCREF(&LazyArray_Type);
+    if (PyModule_AddObject(m, "LazyArray", (PyObject*) &LazyArray_Type) < 0) {
+        Py_DECREF(&LazyArray_Type);
+        return -1;
+    }
+
+    Py_INCREF(&PointerSet_Type);
+    if (PyModule_AddObject(m, "PointerSet", (PyObject*) &PointerSet_Type) < 0) {
+        Py_DECREF(&PointerSet_Type);
+        return -1;
+    }
+
+    // Make the lazy proxies recognizable as read-only mappings and sequences
+
+    PyObject* abcModule = PyImport_ImportModule("collections.abc");
+    if (abcModule == NULL)
+        return -1;
+
+    PyObject* mappingABC = PyObject_GetAttrString(abcModule, "Mapping");
+    PyObject* sequenceABC = PyObject_GetAttrString(abcModule, "Sequence");
+    Py_DECREF(abcModule);
+
+    if (mappingABC == NULL || sequenceABC == NULL) {
+        Py_XDECREF(mappingABC);
+        Py_XDECREF(sequenceABC);
+        return -1;
+    }
+
+    PyObject* registered = PyObject_CallMethod(mappingABC, "register", "O",
+                                               (PyObject*) &LazyObject_Type);
+    Py_DECREF(mappingABC);
+    if (registered == NULL) {
+        Py_DECREF(sequenceABC);
+        return -1;
+    }
+    Py_DECREF(registered);
+
+    registered = PyObject_CallMethod(sequenceABC, "register", "O",
+                                     (PyObject*) &LazyArray_Type);
+    Py_DECREF(sequenceABC);
+    if (registered == NULL)
+        return -1;
+    Py_DECREF(registered);
+
     validation_error = PyErr_NewException("rapidjson.ValidationError",
                                           PyExc_ValueError, NULL);
     if (validation_error == NULL)
@@ -81,6 +81,10 @@ if cxx and 'g++' in cxx:
     extension_options['extra_compile_args'] = [
         '-pedantic', '-Wno-long-long', '-std=c++11']
 
+    # loads_many() parses the documents on a pool of std::thread workers
+    extension_options['extra_compile_args'].append('-pthread')
+    extension_options['extra_link_args'] = ['-pthread']
+
     # Up to Python 3.7, some structures use "char*" instead of "const char*",
     # and ISO C++ forbids assigning string literal constants
     if sys.version_info < (3,7):
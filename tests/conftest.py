@@ -65,9 +65,13 @@ def pytest_generate_tests(metafunc):
             lambda j,**opts: rj.Decoder(**opts)(io.BytesIO(j.encode('utf-8')
                                                       if isinstance(j, str) else j)),
             lambda j,**opts: rj.Decoder(**opts)(io.StringIO(j)),
+            lambda j,**opts: rj.loads(j, release_gil=True, **opts),
+            lambda j,**opts: rj.Decoder(release_gil=True, **opts)(j),
         ), ids=('func[string]',
                 'func[bytestream]',
                 'func[textstream]',
                 'class[string]',
                 'class[bytestream]',
-                'class[textstream]'))
+                'class[textstream]',
+                'func[string,nogil]',
+                'class[string,nogil]'))
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Typed arrays decoding tests
+# :License:   MIT License
+#
+
+from array import array
+from decimal import Decimal
+import io
+import math
+
+import pytest
+
+import rapidjson as rj
+
+
+def typed(json, **kwargs):
+    return rj.loads(json, array_mode=rj.AM_TYPED, **kwargs)
+
+
+def assert_same(result, expected):
+    assert type(result) is type(expected)
+    if isinstance(expected, array):
+        assert result.typecode == expected.typecode
+        assert result == expected
+    elif isinstance(expected, list):
+        assert len(result) == len(expected)
+        for r, e in zip(result, expected):
+            assert_same(r, e)
+    elif isinstance(expected, dict):
+        assert list(result) == list(expected)
+        for k in expected:
+            assert_same(result[k], expected[k])
+    else:
+        assert result == expected
+
+
+@pytest.mark.parametrize('json,expected', [
+    ('[1, 2, -3]', array('q', [1, 2, -3])),
+    ('[9223372036854775807, -9223372036854775808]',
+     array('q', [9223372036854775807, -9223372036854775808])),
+    ('[1.5, -2.25e2]', array('d', [1.5, -225.0])),
+    ('[1, 2.5, 3]', array('d', [1.0, 2.5, 3.0])),
+    ('[0.5, 9007199254740992]', array('d', [0.5, 9007199254740992.0])),
+    ('[[1, 2], [3.5], []]', [array('q', [1, 2]), array('d', [3.5]), []]),
+    ('{"a": [1], "b": {"c": [2.0]}}', {'a': array('q', [1]),
+                                      'b': {'c': array('d', [2.0])}}),
+    ('[]', []),
+    ('1', 1),
+])
+def test_typed(json, expected):
+    assert_same(typed(json), expected)
+    assert_same(typed(json.encode('utf-8')), expected)
+    assert_same(rj.load(io.StringIO(json), array_mode=rj.AM_TYPED), expected)
+    assert_same(rj.Decoder(array_mode=rj.AM_TYPED)(json), expected)
+
+
+@pytest.mark.parametrize('json,expected', [
+    ('[1, "two", 3.5]', [1, 'two', 3.5]),
+    ('[1, 2.5, null]', [1, 2.5, None]),
+    ('[1, 2, true]', [1, 2, True]),
+    ('[1, 2.5, 3, {}]', [1, 2.5, 3, {}]),
+    ('[1, 2, [3]]', [1, 2, array('q', [3])]),
+    ('[1, 18446744073709551615]', [1, 18446744073709551615]),
+    ('[1, 100000000000000000000]', [1, 100000000000000000000]),
+    ('[0.5, 9007199254740993]', [0.5, 9007199254740993]),
+    ('[9007199254740993, 0.5]', [9007199254740993, 0.5]),
+])
+def test_fallback(json, expected):
+    assert_same(typed(json), expected)
+    assert_same(typed(json, release_gil=True), expected)
+
+
+def test_default():
+    assert_same(rj.loads('[1, 2]'), [1, 2])
+    assert_same(rj.loads('[1, 2]', array_mode=rj.AM_NONE), [1, 2])
+    assert rj.Decoder().array_mode == rj.AM_NONE
+    assert rj.Decoder(array_mode=rj.AM_TYPED).array_mode == rj.AM_TYPED
+
+
+def test_number_modes():
+    assert_same(typed('[1, 2.5]', number_mode=rj.NM_NATIVE), array('d', [1.0, 2.5]))
+    assert_same(typed('[1, 2]', number_mode=rj.NM_DECIMAL), array('q', [1, 2]))
+    assert_same(typed('[1, 2.5]', number_mode=rj.NM_DECIMAL), [1, Decimal('2.5')])
+
+    result = typed('[NaN, Infinity, -Infinity]')
+    assert result.typecode == 'd'
+    assert math.isnan(result[0])
+    assert result[1:] == array('d', [math.inf, -math.inf])
+
+    with pytest.raises(rj.JSONDecodeError):
+        typed('[1, NaN]', number_mode=rj.NM_NONE)
+
+
+def test_end_array_hook():
+    class Decoder(rj.Decoder):
+        def end_array(self, a):
+            return ('hooked', a)
+
+    result = Decoder(array_mode=rj.AM_TYPED)('[[1, 2], ["a"]]')
+    assert result[0] == 'hooked'
+    assert_same(result[1][0], ('hooked', array('q', [1, 2])))
+    assert result[1][1] == ('hooked', ['a'])
+
+
+def test_incremental():
+    decoder = rj.Decoder(array_mode=rj.AM_TYPED)
+    assert_same(decoder.feed('[1, 2] [3.'), [array('q', [1, 2])])
+    assert_same(decoder.feed('5]'), [array('d', [3.5])])
+    assert_same(list(decoder.iter('[1]\n[2.5]')), [array('q', [1]), array('d', [2.5])])
+
+
+@pytest.mark.parametrize('mode,exception', [
+    (-1, ValueError),
+    (rj.AM_TYPED << 1, ValueError),
+    ('typed', TypeError),
+])
+def test_invalid(mode, exception):
+    with pytest.raises(exception):
+        rj.loads('[]', array_mode=mode)
+    with pytest.raises(exception):
+        rj.Decoder(array_mode=mode)
@@ -205,3 +205,26 @@ def test_true_false():
     expected = '{"2": 3.0, "4.0": 5, "6": true, "7": 0, "false": 1}'
 
     assert dumped2 == expected"""
+
+
+@pytest.mark.parametrize('value', [
+    0, 1, -1, 2**31, -2**31, 2**53 + 1, 2**63 - 1, -2**63, 2**63, 2**64 - 1, 2**64,
+    -2**63 - 1, -2**64, 10**30, -10**30,
+])
+def test_integers_boundaries(value):
+    assert rj.dumps(value) == repr(value)
+    assert rj.dumps([value, -value]) == '[%r,%r]' % (value, -value)
+    assert rj.loads(rj.dumps(value)) == value
+
+
+def test_integer_subclasses():
+    import enum
+
+    class Answer(enum.IntEnum):
+        THE_ANSWER = 42
+
+    class Big(int):
+        def __repr__(self):
+            return 'Big'
+
+    assert rj.dumps([Answer.THE_ANSWER, Big(1), Big(2**70)]) == '[42,1,%d]' % 2**70
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Buffer protocol inputs tests
+# :License:   MIT License
+#
+
+import mmap
+import tempfile
+
+import pytest
+
+import rapidjson as rj
+
+
+JSON = '{"a": [1, 2.5, "€ 0.50"], "b": null}'
+EXPECTED = {'a': [1, 2.5, '€ 0.50'], 'b': None}
+
+
+@pytest.mark.parametrize('kind', (bytes, bytearray, memoryview))
+@pytest.mark.parametrize('decode', (
+    rj.loads,
+    lambda b: rj.loads(b, release_gil=True),
+    lambda b: rj.Decoder()(b),
+    lambda b: rj.Decoder(release_gil=True)(b),
+), ids=('func', 'func[nogil]', 'class', 'class[nogil]'))
+def test_buffer_input(kind, decode):
+    assert decode(kind(JSON.encode('utf-8'))) == EXPECTED
+
+
+def test_memoryview_slice():
+    data = b'garbage' + JSON.encode('utf-8') + b'more garbage'
+    view = memoryview(data)[7:-12]
+    assert rj.loads(view) == EXPECTED
+    assert rj.Decoder()(view) == EXPECTED
+
+
+def test_mmap_input():
+    with tempfile.TemporaryFile() as f:
+        f.write(JSON.encode('utf-8'))
+        f.flush()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            assert rj.loads(m) == EXPECTED
+            assert rj.Decoder()(m) == EXPECTED
+
+
+def test_invalid_utf8():
+    with pytest.raises(rj.JSONDecodeError, match='Invalid encoding'):
+        rj.loads(b'"\xff\xf0"')
+    with pytest.raises(rj.JSONDecodeError, match='Invalid encoding'):
+        rj.Decoder()(bytearray(b'{"\xc3": 1}'))
+
+
+def test_non_contiguous_buffer():
+    view = memoryview(b'[1, 2, 3]')[::2]
+    with pytest.raises(BufferError):
+        rj.loads(view)
+
+
+def test_invalid_input_type():
+    with pytest.raises(TypeError, match='bytes-like object'):
+        rj.loads(123)
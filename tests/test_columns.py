@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Columnar decoding tests
+# :License:   MIT License
+#
+
+from array import array
+import datetime
+from decimal import Decimal
+import io
+
+import pytest
+
+import rapidjson as rj
+
+
+RECORDS = '''
+[
+  {"id": 1, "price": 1.5, "name": "a", "tags": ["x"]},
+  {"id": 2, "price": 2, "name": "b", "tags": []},
+  {"id": 3, "price": -0.5, "name": "c", "tags": {"y": 1}}
+]
+'''
+
+
+def assert_columns(result, expected):
+    assert list(result) == list(expected)
+    for key in expected:
+        assert type(result[key]) is type(expected[key])
+        if isinstance(expected[key], array):
+            assert result[key].typecode == expected[key].typecode
+        assert result[key] == expected[key]
+
+
+EXPECTED = {
+    'id': array('q', [1, 2, 3]),
+    'price': array('d', [1.5, 2.0, -0.5]),
+    'name': ['a', 'b', 'c'],
+    'tags': [['x'], [], {'y': 1}],
+}
+
+
+@pytest.mark.parametrize('input', [
+    lambda: RECORDS,
+    lambda: RECORDS.encode('utf-8'),
+    lambda: io.StringIO(RECORDS),
+    lambda: io.BytesIO(RECORDS.encode('utf-8')),
+])
+def test_columns(input):
+    assert_columns(rj.loads_columns(input()), EXPECTED)
+    assert_columns(rj.Decoder().columns(input()), EXPECTED)
+
+
+@pytest.mark.parametrize('path', ['/items', '/nested/0/items'])
+def test_path(path):
+    doc = '{"count": 3, "items": %s, "nested": [{"items": %s}]}' % (RECORDS, RECORDS)
+    assert_columns(rj.loads_columns(doc, path), EXPECTED)
+    assert_columns(rj.loads_columns(io.StringIO(doc), path=path, chunk_size=7), EXPECTED)
+
+
+def test_empty():
+    assert rj.loads_columns('[]') == {}
+    assert rj.loads_columns('{"a": []}', '/a') == {}
+
+
+def test_missing_and_new_keys():
+    result = rj.loads_columns('[{"a": 1, "b": 2}, {"b": 3}, {"c": "x", "a": 4}]')
+    assert_columns(result, {
+        'a': [1, None, 4],
+        'b': [2, 3, None],
+        'c': [None, None, 'x'],
+    })
+
+
+def test_duplicated_keys():
+    result = rj.loads_columns('[{"a": 1, "a": 2}, {"a": 3}]')
+    assert_columns(result, {'a': [2, 3]})
+
+
+@pytest.mark.parametrize('json,expected', [
+    ('[{"a": 1}, {"a": "two"}, {"a": 3.0}]', [1, 'two', 3.0]),
+    ('[{"a": 1}, {"a": 18446744073709551616}]', [1, 18446744073709551616]),
+    ('[{"a": 0.5}, {"a": 9007199254740993}]', [0.5, 9007199254740993]),
+    ('[{"a": 1}, {"a": null}]', [1, None]),
+    ('[{"a": 1}, {"a": true}]', [1, True]),
+])
+def test_fallback(json, expected):
+    assert_columns(rj.loads_columns(json), {'a': expected})
+
+
+def test_modes():
+    result = rj.loads_columns('[{"n": 1.5, "d": "2020-01-02"}, {"n": 2, "d": null}]',
+                              number_mode=rj.NM_DECIMAL,
+                              datetime_mode=rj.DM_ISO8601)
+    assert_columns(result, {'n': [Decimal('1.5'), 2],
+                            'd': [datetime.date(2020, 1, 2), None]})
+
+    result = rj.loads_columns('[{"n": 1.5}, {"n": 2}]', number_mode=rj.NM_NATIVE)
+    assert_columns(result, {'n': array('d', [1.5, 2.0])})
+
+    result = rj.loads_columns('[{"n": NaN}]')
+    assert result['n'].typecode == 'd'
+    with pytest.raises(rj.JSONDecodeError):
+        rj.loads_columns('[{"n": NaN}]', allow_nan=False)
+
+
+def test_hooks():
+    result = rj.loads_columns('[{"a": {"x": 1}}]', object_hook=lambda d: sorted(d))
+    assert result == {'a': [['x']]}
+
+    class TupleDecoder(rj.Decoder):
+        def end_array(self, a):
+            return tuple(a)
+
+        def end_object(self, d):
+            return sorted(d)
+
+    result = TupleDecoder().columns('[{"a": [1, 2], "b": {"y": 1, "x": 2}}]')
+    assert result == {'a': [(1, 2)], 'b': [['x', 'y']]}
+
+
+def test_stops_at_the_end_of_the_array():
+    assert_columns(rj.loads_columns('{"a": [{"x": 1}], "b": ]', '/a'),
+                   {'x': array('q', [1])})
+
+
+@pytest.mark.parametrize('json,path', [
+    ('{"a": 1}', None),
+    ('[1, 2]', None),
+    ('[{"a": 1}, []]', None),
+    ('{"a": [1]}', '/b'),
+    ('{"a": {"b": 1}}', '/a'),
+    ('{"a": [{"b": 1}]}', '/a/0'),
+])
+def test_not_records(json, path):
+    with pytest.raises(ValueError):
+        rj.loads_columns(json, path)
+
+
+@pytest.mark.parametrize('path,exception', [
+    (1, TypeError),
+    ('a', ValueError),
+    ('/a~2', ValueError),
+])
+def test_invalid_path(path, exception):
+    with pytest.raises(exception):
+        rj.loads_columns('[]', path)
+
+
+def test_parse_error():
+    with pytest.raises(rj.JSONDecodeError):
+        rj.loads_columns('[{"a": 1}, {"a": }]')
+    with pytest.raises(TypeError):
+        rj.loads_columns(1)
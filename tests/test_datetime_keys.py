@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Key restricted datetime and UUID recognition tests
+# :License:   MIT License
+#
+
+from dataclasses import dataclass
+import datetime
+from typing import Any
+import uuid
+
+import pytest
+
+import rapidjson as rj
+
+
+UUID = '7202d115-7ff3-4c81-a7c1-2a1f067b1ece'
+DOCUMENT = ('{"created": "2020-01-02", "title": "2020-01-02", "id": "%s",'
+            ' "ref": "%s", "history": ["2020-03-04", {"note": "2020-05-06"}],'
+            ' "nested": {"created": "10:20:30"}}' % (UUID, UUID))
+
+
+def test_attributes():
+    decoder = rj.Decoder()
+    assert decoder.datetime_keys is None
+    assert decoder.uuid_keys is None
+
+    decoder = rj.Decoder(datetime_mode=rj.DM_ISO8601, uuid_mode=rj.UM_CANONICAL,
+                         datetime_keys=['a', 'b', 'a'], uuid_keys=iter(['c']))
+    assert decoder.datetime_keys == frozenset({'a', 'b'})
+    assert decoder.uuid_keys == frozenset({'c'})
+
+
+def test_datetime_keys():
+    decoder = rj.Decoder(datetime_mode=rj.DM_ISO8601, uuid_mode=rj.UM_CANONICAL,
+                         datetime_keys={'created', 'history'})
+    assert decoder(DOCUMENT) == {
+        'created': datetime.date(2020, 1, 2),
+        'title': '2020-01-02',
+        'id': uuid.UUID(UUID),
+        'ref': uuid.UUID(UUID),
+        'history': [datetime.date(2020, 3, 4), {'note': '2020-05-06'}],
+        'nested': {'created': datetime.time(10, 20, 30)},
+    }
+
+
+def test_uuid_keys():
+    decoder = rj.Decoder(datetime_mode=rj.DM_ISO8601, uuid_mode=rj.UM_CANONICAL,
+                         uuid_keys={'id'})
+    result = decoder(DOCUMENT)
+    assert result['id'] == uuid.UUID(UUID)
+    assert result['ref'] == UUID
+    assert result['title'] == datetime.date(2020, 1, 2)
+
+
+def test_values_outside_objects():
+    decoder = rj.Decoder(datetime_mode=rj.DM_ISO8601, datetime_keys={'a'})
+    assert decoder('"2020-01-02"') == '2020-01-02'
+    assert decoder('["2020-01-02"]') == ['2020-01-02']
+    assert decoder('{"2020-01-02": "a"}') == {'2020-01-02': 'a'}
+
+
+def test_other_entry_points():
+    decoder = rj.Decoder(datetime_mode=rj.DM_ISO8601, datetime_keys={'d'},
+                         release_gil=True)
+    expected = {'d': datetime.date(2020, 1, 2), 'e': '2020-01-02'}
+    assert decoder('{"d": "2020-01-02", "e": "2020-01-02"}') == expected
+    assert decoder.feed('{"d": "2020-01-02", "e": "2020-01-02"} ') == [expected]
+    assert list(decoder.iter('{"d": "2020-01-02", "e": "2020-01-02"}')) == [expected]
+    assert decoder.map([b'{"d": "2020-01-02", "e": "2020-01-02"}']) == [expected]
+
+
+@pytest.mark.parametrize('method,args', [
+    ('extract', ('{"t": "2020-01-02"}', ['/t'])),
+    ('iterparse', ('{"t": "2020-01-02"}',)),
+    ('columns', ('[{"t": "2020-01-02"}]',)),
+])
+def test_unsupported_methods(method, args):
+    decoder = rj.Decoder(datetime_mode=rj.DM_ISO8601, datetime_keys={'t'})
+    with pytest.raises(ValueError, match='does not support datetime_keys'):
+        result = getattr(decoder, method)(*args)
+        if method == 'iterparse':
+            next(result)
+
+
+def test_target():
+    @dataclass
+    class Record:
+        t: Any
+
+    with pytest.raises(ValueError, match='does not support datetime_keys'):
+        rj.Decoder(datetime_mode=rj.DM_ISO8601, datetime_keys={'t'}, target=Record)
+
+
+@pytest.mark.parametrize('options,exception', [
+    (dict(datetime_keys={'a'}), ValueError),
+    (dict(uuid_keys={'a'}), ValueError),
+    (dict(datetime_mode=rj.DM_ISO8601, datetime_keys={'a'}, lazy=True), ValueError),
+    (dict(datetime_mode=rj.DM_ISO8601, datetime_keys='a'), TypeError),
+    (dict(datetime_mode=rj.DM_ISO8601, datetime_keys=[1]), TypeError),
+    (dict(uuid_mode=rj.UM_CANONICAL, uuid_keys=1), TypeError),
+])
+def test_invalid(options, exception):
+    with pytest.raises(exception):
+        rj.Decoder(**options)
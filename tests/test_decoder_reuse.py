@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Decoder resources reuse tests
+# :License:   MIT License
+#
+
+import io
+import threading
+
+import pytest
+
+import rapidjson as rj
+
+
+def test_repeated_calls():
+    decoder = rj.Decoder()
+    for i in range(100):
+        assert decoder('{"a": [%d, "\\u20ac %d"], "b": {"c": null}}' % (i, i)) == {
+            'a': [i, '€ %d' % i], 'b': {'c': None}}
+
+
+def test_after_errors():
+    decoder = rj.Decoder()
+    assert decoder('[[[1]]]') == [[[1]]]
+    with pytest.raises(rj.JSONDecodeError):
+        decoder('[[[1]]')
+    with pytest.raises(rj.JSONDecodeError):
+        decoder('{"a": "b\\x"}')
+    assert decoder('{"a": "b"}') == {'a': 'b'}
+
+
+def test_varying_sizes():
+    decoder = rj.Decoder()
+    big = ['x' * 1000] * 2000
+    assert decoder(rj.dumps(big)) == big
+    assert decoder('"y"') == 'y'
+    assert decoder(io.StringIO(rj.dumps(big))) == big
+    assert decoder(b'[1]') == [1]
+
+
+def test_reentrancy():
+    class Nested(rj.Decoder):
+        def end_object(self, d):
+            if 'inner' in d:
+                d['inner'] = self(d['inner'])
+            return d
+
+    decoder = Nested()
+    assert decoder('{"inner": "[{\\"inner\\": \\"2\\"}, \\"x\\"]", "other": [1]}') == {
+        'inner': [{'inner': 2}, 'x'], 'other': [1]}
+    assert decoder('{"a": 1}') == {'a': 1}
+
+
+def test_hooks_assigned_later():
+    class Base(rj.Decoder):
+        pass
+
+    class Sub(Base):
+        pass
+
+    decoder = Sub()
+    assert decoder('[1]') == [1]
+
+    decoder.end_array = tuple
+    assert decoder('[1]') == (1,)
+    del decoder.end_array
+    assert decoder('[1]') == [1]
+
+    Base.end_array = lambda self, a: len(a)
+    assert decoder('[1]') == 1
+    Sub.end_array = lambda self, a: a * 2
+    assert decoder('[1]') == [1, 1]
+    del Sub.end_array, Base.end_array
+    assert decoder('[1]') == [1]
+
+
+def test_iterparse_keeps_decoder_alive():
+    it = rj.Decoder(key_cache_size=8).iterparse('[{"a": 1}, {"a": 2}]', '')
+    assert list(it) == [('/0', 'item', {'a': 1}), ('/1', 'item', {'a': 2})]
+
+
+def test_threads():
+    decoder = rj.Decoder(release_gil=True)
+    document = rj.dumps([{'id': i, 'name': 'n%d' % i} for i in range(1000)])
+    expected = rj.loads(document)
+    errors = []
+
+    def work():
+        try:
+            for _ in range(20):
+                assert decoder(document) == expected
+                assert decoder(document.encode('utf-8')) == expected
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Bytes output tests
+# :License:   MIT License
+#
+
+import array
+import uuid
+
+import pytest
+
+import rapidjson as rj
+
+
+VALUES = [None, 'Naïve ~𓆙~', [1, 2.5, {'a': [True, False]}], {'b': uuid.UUID(int=1)},
+          ['x' * 1000] * 100]
+
+
+@pytest.mark.parametrize('value', VALUES)
+@pytest.mark.parametrize('options', [{}, {'ensure_ascii': False},
+                                     {'write_mode': rj.WM_PRETTY},
+                                     {'write_mode': rj.WM_PRETTY, 'ensure_ascii': False}])
+def test_as_bytes(value, options):
+    options = dict(options, uuid_mode=rj.UM_CANONICAL)
+    expected = rj.dumps(value, **options).encode('utf-8')
+    assert rj.dumps(value, as_bytes=True, **options) == expected
+    assert rj.Encoder(return_bytes=True, **options)(value) == expected
+    assert rj.Encoder(**options)(value) == expected.decode('utf-8')
+
+
+def test_return_bytes_attribute():
+    assert rj.Encoder().return_bytes is False
+    assert rj.Encoder(return_bytes=True).return_bytes is True
+
+
+@pytest.mark.parametrize('value', VALUES)
+@pytest.mark.parametrize('initial', [b'', b'prefix', b'x' * 100000])
+def test_dumps_into_bytearray(value, initial):
+    expected = rj.dumps(value, ensure_ascii=False, uuid_mode=rj.UM_CANONICAL).encode(
+        'utf-8')
+
+    buffer = bytearray(initial)
+    length = rj.dumps_into(value, buffer, len(initial), ensure_ascii=False,
+                           uuid_mode=rj.UM_CANONICAL)
+    assert length == len(expected)
+    assert buffer == initial + expected
+
+    buffer = bytearray(initial)
+    length = rj.dumps_into(value, buffer, ensure_ascii=False, uuid_mode=rj.UM_CANONICAL)
+    assert length == len(expected)
+    assert buffer[:length] == expected
+    assert len(buffer) == max(len(initial), length)
+    assert buffer[length:] == initial[length:]
+
+
+def test_dumps_into_fixed_buffer():
+    area = bytearray(16)
+    assert rj.dumps_into([1, 2], memoryview(area), offset=2) == 5
+    assert area == b'\0\0[1,2]' + b'\0' * 9
+
+    target = array.array('b', [0] * 4)
+    assert rj.dumps_into('ab', target) == 4
+    assert target.tobytes() == b'"ab"'
+
+    with pytest.raises(ValueError, match='5 bytes needed'):
+        rj.dumps_into('abc', target)
+
+
+@pytest.mark.parametrize('buffer,offset,exception', [
+    (b'readonly', 0, (TypeError, BufferError)),
+    ('str', 0, TypeError),
+    (bytearray(4), 5, ValueError),
+    (bytearray(4), -1, ValueError),
+])
+def test_dumps_into_invalid_args(buffer, offset, exception):
+    with pytest.raises(exception):
+        rj.dumps_into([1], buffer, offset)
+
+
+def test_dumps_into_locked_buffer():
+    buffer = bytearray()
+
+    def default(obj):
+        buffer.extend(b'x')
+        return str(obj)
+
+    with pytest.raises(BufferError):
+        rj.dumps_into(object(), buffer, default=default)
+    assert buffer == b''
+
+    view = memoryview(buffer)
+    with pytest.raises(BufferError):
+        rj.dumps_into('x' * 1000, buffer)
+    view.release()
+
+
+@pytest.mark.parametrize('initial,offset', [
+    (b'', 0),
+    (b'0123456789', 10),
+    (b'0123456789', 3),
+    (b'x' * 10000, 0),
+])
+def test_dumps_into_errors(initial, offset):
+    buffer = bytearray(initial)
+    with pytest.raises(TypeError):
+        rj.dumps_into([1, object()], buffer, offset)
+    assert buffer == initial
+
+    with pytest.raises(TypeError):
+        rj.dumps_into(['x' * 1000, object()], buffer, offset)
+    assert buffer == initial
+
+    area = bytearray(initial)
+    with pytest.raises(TypeError):
+        rj.dumps_into(['x' * 1000, object()], memoryview(area), offset)
+    assert area == initial
+
+
+def test_dumps_into_too_small():
+    area = bytearray(b'0123456789')
+    with pytest.raises(ValueError, match='Buffer too small'):
+        rj.dumps_into(['x' * 100], memoryview(area), 2)
+    assert area == b'0123456789'
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Per-type serializers registry tests
+# :License:   MIT License
+#
+
+from collections import OrderedDict
+import datetime
+from decimal import Decimal
+import enum
+import io
+
+import pytest
+
+import rapidjson as rj
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Point3D(Point):
+    def __init__(self, x, y, z):
+        super().__init__(x, y)
+        self.z = z
+
+
+class Money:
+    def __init__(self, amount, currency):
+        self.amount = amount
+        self.currency = currency
+
+    def __str__(self):
+        return '%s %s' % (self.amount, self.currency)
+
+    def __repr__(self):
+        return 'Money(%s)' % self
+
+    def __int__(self):
+        return int(self.amount)
+
+
+def test_attributes():
+    encoder = rj.Encoder()
+    encoder.register(Point, ('y', 'x'))
+    assert encoder(Point(1, [Point(2, 3)])) == '{"y":[{"y":3,"x":2}],"x":1}'
+    assert encoder({'p': Point('é', None)}) == '{"p":{"y":null,"x":"\\u00E9"}}'
+    assert encoder(Point(1, 2), io.StringIO()) is None
+
+
+@pytest.mark.parametrize('conversion,expected', [
+    ('str', '"1.50 EUR"'),
+    ('repr', '"Money(1.50 EUR)"'),
+    ('int', '1'),
+])
+def test_conversions(conversion, expected):
+    encoder = rj.Encoder()
+    encoder.register(Money, conversion)
+    assert encoder(Money(Decimal('1.50'), 'EUR')) == expected
+
+
+def test_callable():
+    encoder = rj.Encoder()
+    encoder.register(Point, lambda p: [p.x, p.y])
+    assert encoder([Point(1, Point(2, 3))]) == '[[1,[2,3]]]'
+
+
+def test_subclasses():
+    encoder = rj.Encoder()
+    encoder.register(Point, ('x', 'y'))
+    assert encoder(Point3D(1, 2, 3)) == '{"x":1,"y":2}'
+
+    # Registering a subclass later invalidates the cached lookup
+    encoder.register(Point3D, ('x', 'y', 'z'))
+    assert encoder(Point3D(1, 2, 3)) == '{"x":1,"y":2,"z":3}'
+    assert encoder(Point(1, 2)) == '{"x":1,"y":2}'
+
+    class Color(enum.Enum):
+        red = 1
+
+    encoder.register(enum.Enum, lambda e: e.name)
+    assert encoder([Color.red]) == '["red"]'
+
+
+def test_unregister():
+    encoder = rj.Encoder()
+    encoder.register(Point, ('x', 'y'))
+    assert encoder(Point(1, 2)) == '{"x":1,"y":2}'
+    encoder.register(Point, None)
+    with pytest.raises(TypeError, match='is not JSON serializable'):
+        encoder(Point(1, 2))
+    encoder.register(Money, None)
+
+
+def test_precedence():
+    class DefaultEncoder(rj.Encoder):
+        def default(self, obj):
+            return 'default'
+
+    encoder = DefaultEncoder(number_mode=rj.NM_DECIMAL, datetime_mode=rj.DM_ISO8601)
+    encoder.register(Decimal, float)
+    encoder.register(datetime.date, lambda d: d.year)
+    assert encoder([Decimal('0.5'), datetime.date(2020, 1, 2), Point(1, 2)]) == (
+        '[0.5,2020,"default"]')
+
+    # Exact core types are always serialized natively, subclasses are not
+    encoder.register(int, 'str')
+    encoder.register(dict, lambda d: sorted(d))
+    assert encoder([1, {'b': 1, 'a': 2}]) == '[1,{"b":1,"a":2}]'
+    assert encoder([True, OrderedDict(b=1, a=2)]) == '[true,["a","b"]]'
+
+
+def test_encoders_are_independent():
+    encoder = rj.Encoder()
+    encoder.register(Point, ('x', 'y'))
+    with pytest.raises(TypeError):
+        rj.Encoder()(Point(1, 2))
+    with pytest.raises(TypeError):
+        rj.dumps(Point(1, 2))
+
+
+@pytest.mark.parametrize('type,serializer,exception', [
+    (Point(1, 2), 'str', TypeError),
+    ('Point', 'str', TypeError),
+    (Point, 'float', ValueError),
+    (Point, ('x', 1), TypeError),
+    (Point, ['x', 'y'], TypeError),
+    (Point, 1, TypeError),
+])
+def test_invalid_registration(type, serializer, exception):
+    with pytest.raises(exception):
+        rj.Encoder().register(type, serializer)
+
+
+def test_errors():
+    encoder = rj.Encoder()
+    encoder.register(Point, ('x', 'z'))
+    with pytest.raises(AttributeError):
+        encoder(Point(1, 2))
+
+    def fail(obj):
+        raise ValueError('Nope')
+
+    encoder.register(Point, fail)
+    with pytest.raises(ValueError, match='Nope'):
+        encoder([Point(1, 2)])
+
+    encoder.register(Point, lambda p: p)
+    with pytest.raises(RecursionError):
+        encoder(Point(1, 2))
+
+    p = Point(1, 2)
+    p.x = p
+    encoder.register(Point, ('x',))
+    with pytest.raises(RecursionError):
+        encoder(p)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- JSON Pointer extraction tests
+# :License:   MIT License
+#
+
+from decimal import Decimal
+import io
+
+import pytest
+
+import rapidjson as rj
+
+
+DOCUMENT = '''
+{
+  "user": {"id": 42, "name": "foo"},
+  "items": [{"price": 1.5}, {"price": 2.5}],
+  "a/b": 1,
+  "m~n": 2,
+  "": 3,
+  "flags": [true, false]
+}
+'''
+
+
+@pytest.mark.parametrize('pointers,expected', [
+    (['/user/id'], {'/user/id': 42}),
+    (['/user/id', '/items/1/price'], {'/user/id': 42, '/items/1/price': 2.5}),
+    (['/items/0'], {'/items/0': {'price': 1.5}}),
+    (['/a~1b', '/m~0n', '/'], {'/a~1b': 1, '/m~0n': 2, '/': 3}),
+    (['/user', '/user/name'], {'/user': {'id': 42, 'name': 'foo'},
+                               '/user/name': 'foo'}),
+    (['/missing', '/user/missing', '/items/2', '/items/-', '/items/01'], {}),
+    (['/flags/1', '/user/id/deeper'], {'/flags/1': False}),
+    ([], {}),
+])
+def test_extract(pointers, expected):
+    assert rj.extract(DOCUMENT, pointers) == expected
+    assert rj.extract(DOCUMENT.encode('utf-8'), rj.PointerSet(pointers)) == expected
+    assert rj.Decoder().extract(io.StringIO(DOCUMENT), pointers) == expected
+
+
+def test_whole_document():
+    assert rj.extract(DOCUMENT, ['']) == {'': rj.loads(DOCUMENT)}
+    assert rj.extract('1', ['', '/foo']) == {'': 1}
+
+
+def test_pointer_set():
+    ps = rj.PointerSet(iter(['/a', '/b', '/a']))
+    assert ps.pointers == ('/a', '/b')
+    assert len(ps) == 2
+    assert rj.extract('{"a": 1, "b": 2}', ps) == {'/a': 1, '/b': 2}
+    assert rj.extract('{"b": 3}', ps) == {'/b': 3}
+
+
+@pytest.mark.parametrize('pointers,exception', [
+    (['foo'], ValueError),
+    (['/foo~2'], ValueError),
+    (['/foo~'], ValueError),
+    ([1], TypeError),
+    ('/foo', TypeError),
+    (None, TypeError),
+])
+def test_invalid_pointers(pointers, exception):
+    with pytest.raises(exception):
+        rj.PointerSet(pointers)
+    with pytest.raises(exception):
+        rj.extract('{}', pointers)
+
+
+def test_modes():
+    assert rj.extract('{"a": [1.5, "2020-01-02"]}', ['/a'],
+                      number_mode=rj.NM_DECIMAL,
+                      datetime_mode=rj.DM_ISO8601) == {
+                          '/a': [Decimal('1.5'), rj.loads('"2020-01-02"',
+                                                          datetime_mode=rj.DM_ISO8601)]}
+
+    decoder = rj.Decoder(number_mode=rj.NM_DECIMAL)
+    assert decoder.extract('{"a": 1.5}', ['/a']) == {'/a': Decimal('1.5')}
+
+
+def test_hooks():
+    def hook(d):
+        return sorted(d)
+
+    assert rj.extract('{"a": {"y": 1, "x": 2}}', ['/a'], object_hook=hook) == {
+        '/a': ['x', 'y']}
+
+    class TupleDecoder(rj.Decoder):
+        def end_array(self, a):
+            return tuple(a)
+
+    assert TupleDecoder().extract('{"a": [1, [2]]}', ['/a', '/a/1/0']) == {
+        '/a': (1, (2,)), '/a/1/0': 2}
+
+
+def test_parse_errors():
+    with pytest.raises(rj.JSONDecodeError):
+        rj.extract('{"a": 1', ['/b'])
+    with pytest.raises(rj.JSONDecodeError):
+        rj.extract('{"a": 1, "b": ]', ['/a'])
+    with pytest.raises(rj.JSONDecodeError):
+        rj.Decoder().extract('{"a": {"b": 1}, "c": ]', ['/a/x'])
+
+
+def test_stop_early():
+    # Parsing stops as soon as all pointers have been resolved
+    assert rj.extract('{"a": 1, "b": ]', ['/a'], stop_early=True) == {'/a': 1}
+    assert rj.extract('{"a": {"b": 1}, "c": ]', ['/a/x'], stop_early=True) == {}
+    assert rj.Decoder().extract(io.StringIO('[1, 2, ]]'), ['/1'], stop_early=True) \
+        == {'/1': 2}
+    # ... hence the first duplicated key wins
+    assert rj.extract('{"a": 1, "a": 2}', ['/a'], stop_early=True) == {'/a': 1}
+
+
+@pytest.mark.parametrize('document,pointers,expected', [
+    ('{"a": 1, "a": 2}', ['/a'], {'/a': 2}),
+    ('{"a": {"x": 1}, "a": {"y": 2}}', ['/a/x', '/a/y'], {'/a/y': 2}),
+    ('{"a": {"x": 1}, "b": 0, "a": [3]}', ['/a', '/a/x', '/a/0'],
+     {'/a': [3], '/a/0': 3}),
+    ('{"a": {"x": 1, "x": {"y": 2}}}', ['/a/x/y'], {'/a/x/y': 2}),
+])
+def test_duplicated_keys(document, pointers, expected):
+    assert rj.extract(document, pointers) == expected
+    assert rj.Decoder().extract(document, pointers) == expected
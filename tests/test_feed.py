@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Incremental decoding tests
+# :License:   MIT License
+#
+
+import io
+
+import pytest
+
+import rapidjson as rj
+
+
+DATA = '{"a": [1, "x]}"]} [2, {"b": "\\"{"}] "three" 4 true\nnull -5.5e3 '
+EXPECTED = [{'a': [1, 'x]}']}, [2, {'b': '"{'}], 'three', 4, True, None, -5.5e3]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 1000])
+def test_feed(size):
+    decoder = rj.Decoder()
+    data = DATA.encode('utf-8')
+    result = []
+    for i in range(0, len(data), size):
+        result.extend(decoder.feed(data[i:i+size]))
+    result.extend(decoder.close())
+    assert result == EXPECTED
+
+
+def test_values_as_they_complete():
+    decoder = rj.Decoder()
+    assert decoder.feed('[1, ') == []
+    assert decoder.feed('2] {"a"') == [[1, 2]]
+    assert decoder.feed(b': 1}') == [{'a': 1}]
+    assert decoder.feed('12') == []
+    assert decoder.feed('3') == []
+    assert decoder.feed('\n') == [123]
+    assert decoder.feed('45') == []
+    assert decoder.close() == [45]
+    assert decoder.close() == []
+
+
+def test_split_utf8():
+    data = '["€ 0.50"]'.encode('utf-8')
+    decoder = rj.Decoder()
+    assert decoder.feed(data[:3]) == []
+    assert decoder.feed(data[3:]) == [['€ 0.50']]
+
+
+def test_comments():
+    decoder = rj.Decoder(parse_mode=rj.PM_COMMENTS)
+    assert decoder.feed('// a comment with a [\n1 /* another one, with a "') == [1]
+    assert decoder.feed(' */ [2, /* ] */ 3]') == [[2, 3]]
+    assert decoder.close() == []
+
+    decoder.feed('/* unterminated')
+    with pytest.raises(rj.JSONDecodeError, match='unterminated comment'):
+        decoder.close()
+
+
+def test_hooks_and_modes():
+    class TupleDecoder(rj.Decoder):
+        def end_array(self, a):
+            return tuple(a)
+
+    decoder = TupleDecoder(number_mode=rj.NM_NATIVE)
+    assert decoder.feed('[1, [2.5]] [') == [(1, (2.5,))]
+    assert decoder.feed(']') == [()]
+
+    decoder = rj.Decoder(lazy=True)
+    doc, = decoder.feed('{"a": 1}')
+    assert isinstance(doc, rj.LazyObject)
+    assert doc['a'] == 1
+
+
+def test_errors():
+    decoder = rj.Decoder()
+    with pytest.raises(rj.JSONDecodeError):
+        decoder.feed('[1, 2}')
+    # The pending data is discarded after an error
+    assert decoder.feed('[3]') == [[3]]
+
+    decoder.feed('{"a": ')
+    with pytest.raises(rj.JSONDecodeError):
+        decoder.close()
+    assert decoder.close() == []
+
+    with pytest.raises(rj.JSONDecodeError):
+        decoder.feed('] ')
+
+    with pytest.raises(rj.JSONDecodeError):
+        decoder.feed(b'"\xff" ')
+
+    with pytest.raises(TypeError):
+        decoder.feed(1)
+
+
+def test_incremental():
+    events = []
+
+    class Recorder(rj.Decoder):
+        def end_object(self, d):
+            events.append(d)
+            return d
+
+    decoder = Recorder()
+    assert decoder.feed('[{"a": 1}, {"b"') == []
+    # The first item is built before the end of the array arrives
+    assert events == [{'a': 1}]
+    assert decoder.feed(': 2}]') == [[{'a': 1}, {'b': 2}]]
+    assert events == [{'a': 1}, {'b': 2}]
+
+
+def test_values_before_errors():
+    decoder = rj.Decoder()
+    with pytest.raises(rj.JSONDecodeError, match='offset 10'):
+        decoder.feed('[1] "x" [2}')
+    assert decoder.feed('3 ') == [[1], 'x', 3]
+
+    assert decoder.feed('{"a": 1} [') == [{'a': 1}]
+    with pytest.raises(rj.JSONDecodeError):
+        decoder.close()
+    assert decoder.close() == []
+
+    with pytest.raises(rj.JSONDecodeError, match='Invalid value'):
+        decoder.feed('1 , ')
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+@pytest.mark.parametrize('data,expected', [
+    ('truenull', [True, None]),
+    ('1-1 null', [1, -1, None]),
+    ('"a"1', ['a', 1]),
+    ('0.5e3false"b"', [500.0, False, 'b']),
+])
+@pytest.mark.parametrize('size', [1, 3, 100])
+def test_adjacent_values(lazy, data, expected, size):
+    decoder = rj.Decoder(lazy=lazy)
+    result = []
+    for i in range(0, len(data), size):
+        result.extend(decoder.feed(data[i:i+size]))
+    result.extend(decoder.close())
+    assert result == expected
+    assert list(rj.iterload(io.StringIO(data))) == expected
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_adjacent_values_errors(lazy):
+    decoder = rj.Decoder(lazy=lazy)
+    with pytest.raises(rj.JSONDecodeError, match='offset 5: Missing a comma'):
+        decoder.feed('[truenull] ')
+    with pytest.raises(rj.JSONDecodeError, match='offset 6: Invalid value'):
+        decoder.feed('1 nullx ')
+
+
+def test_reentrancy():
+    class Reentrant(rj.Decoder):
+        def end_array(self, a):
+            return self.feed('1 ')
+
+    with pytest.raises(RuntimeError, match='not reentrant'):
+        Reentrant().feed('[] ')
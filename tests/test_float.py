@@ -8,6 +8,8 @@
 
 from decimal import Decimal
 import math
+import random
+import struct
 
 import pytest
 
@@ -159,3 +161,106 @@ def test_nan_c():
     dumped = rj.Encoder(number_mode=rj.NM_DECIMAL|rj.NM_NAN)(d)
     loaded = rj.Decoder(number_mode=rj.NM_DECIMAL|rj.NM_NAN)(dumped)
     assert loaded.is_nan()
+
+
+def _random_literals(count, seed):
+    rnd = random.Random(seed)
+    for _ in range(count):
+        kind = rnd.randrange(7)
+        if kind == 0:
+            value = struct.unpack('<d', rnd.getrandbits(64).to_bytes(8, 'little'))[0]
+            if math.isfinite(value):
+                yield repr(value)
+        elif kind == 1:
+            yield '%.*g' % (rnd.randint(1, 17), rnd.uniform(-1e6, 1e6))
+        elif kind == 2:
+            yield '%d.%de%d' % (rnd.randrange(10**6), rnd.randrange(10**6),
+                                rnd.randint(-40, 40))
+        elif kind == 3:
+            yield '-%d.%03d' % (rnd.randrange(10**11), rnd.randrange(1000))
+        elif kind == 4:
+            yield '%de%d' % (rnd.randrange(10**rnd.randint(1, 19)), rnd.randint(-25, 40))
+        elif kind == 5:
+            yield '%de%d' % (rnd.randrange(10**18, 10**19), rnd.randint(-320, 290))
+        else:
+            # Halfway between two doubles
+            yield '%d.0' % ((rnd.randrange(2**52, 2**53) * 2 + 1) << rnd.randint(0, 10))
+
+
+def _bits(value):
+    return struct.pack('<d', value)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_bit_identical_floats(seed):
+    literals = list(_random_literals(5000, seed))
+    expected = [_bits(float(literal)) for literal in literals]
+    assert [_bits(v) for v in rj.loads('[%s]' % ','.join(literals))] == expected
+    assert [_bits(rj.loads(literal)) for literal in literals] == expected
+    assert [_bits(v) for v in rj.loads('[%s]' % ','.join(literals),
+                                       array_mode=rj.AM_TYPED)] == expected
+
+
+@pytest.mark.parametrize('literal', [
+    '0', '-0', '7', '-7', '999999999999999999', '-999999999999999999',
+    '1000000000000000000', '-9223372036854775808', '9223372036854775808',
+    '123456789012345678901234567890',
+])
+def test_integers(literal):
+    value = rj.loads(literal)
+    assert type(value) is int
+    assert value == int(literal)
+
+
+@pytest.mark.parametrize('literal', [
+    '0.0', '-0.0', '0e0', '-0e5', '1e22', '1e23', '9007199254740993.0',
+    '9007199254740992e22', '1e-22', '1e-23', '0.1', '0.30000000000000004',
+    '2.2250738585072011e-308', '4.9e-324', '1.7976931348623157e308',
+    '0.' + '0' * 2000 + '1', '1' + '0' * 30 + '.5',
+    '-65.613616999999977', '0.1234567890123456789', '9999999999999999999e-300',
+    '18014398509481985.0', '18014398509481987.0', '1.7976931348623158e308',
+    '2.2250738585072014e-308', '2.2250738585072009e-308', '1e-342', '1e-400',
+])
+def test_edge_floats(literal):
+    assert _bits(rj.loads(literal)) == _bits(float(literal))
+    assert rj.loads(literal, number_mode=rj.NM_DECIMAL) == Decimal(literal)
+
+
+def _random_doubles(count, seed):
+    rnd = random.Random(seed)
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            # Any finite bit pattern
+            value = struct.unpack('<d', struct.pack('<Q', rnd.getrandbits(64)))[0]
+            if math.isfinite(value):
+                yield value
+        elif kind == 1:
+            yield rnd.random() * 10 ** rnd.randint(-20, 20)
+        elif kind == 2:
+            yield float(rnd.randrange(-10**17, 10**17))
+        else:
+            yield rnd.randrange(10**rnd.randint(1, 17)) / 10**rnd.randint(0, 20)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_dumps_like_repr(seed):
+    values = list(_random_doubles(20000, seed))
+    assert rj.dumps(values) == '[%s]' % ','.join(repr(v) for v in values)
+    assert rj.loads(rj.dumps(values)) == values
+
+
+@pytest.mark.parametrize('value', [
+    0.0, -0.0, 1.0, -1.5, 0.1, 1e16, 1e-5, 1e-4, 123456789012345678.0, 1e22, 1e23,
+    5e-324, -5e-324, 2.2250738585072014e-308, 1.7976931348623157e308, 0.30000000000000004,
+])
+def test_dumps_edge_floats(value):
+    assert rj.dumps(value) == repr(value)
+
+
+def test_dumps_float_subclass():
+    class Rounded(float):
+        def __repr__(self):
+            return '%.2f' % self
+
+    assert rj.dumps([Rounded(1 / 3), 1 / 3]) == '[0.33,%r]' % (1 / 3)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Documents iterator tests
+# :License:   MIT License
+#
+
+from decimal import Decimal
+import io
+import mmap
+import tempfile
+
+import pytest
+
+import rapidjson as rj
+
+
+NDJSON = '{"a": 1}\n[1, 2]\n"three"\n4\n\nnull\n'
+EXPECTED = [{'a': 1}, [1, 2], 'three', 4, None]
+
+
+@pytest.mark.parametrize('input', [
+    lambda: NDJSON,
+    lambda: NDJSON.encode('utf-8'),
+    lambda: memoryview(NDJSON.encode('utf-8')),
+    lambda: io.StringIO(NDJSON),
+    lambda: io.BytesIO(NDJSON.encode('utf-8')),
+])
+def test_iterload(input):
+    assert list(rj.iterload(input())) == EXPECTED
+    assert list(rj.Decoder().iter(input())) == EXPECTED
+
+
+@pytest.mark.parametrize('cs', [4, 5, 16, 65536])
+def test_chunk_size(cs):
+    assert list(rj.iterload(io.StringIO(NDJSON), chunk_size=cs)) == EXPECTED
+    assert list(rj.Decoder().iter(io.StringIO(NDJSON), chunk_size=cs)) == EXPECTED
+
+
+def test_concatenated():
+    assert list(rj.iterload('{}{}[] 1 "a"[{"b":2}]')) == [{}, {}, [], 1, 'a', [{'b': 2}]]
+
+
+@pytest.mark.parametrize('input', ['', '   ', '\n\n'])
+def test_empty(input):
+    assert list(rj.iterload(input)) == []
+
+
+def test_mmap():
+    with tempfile.TemporaryFile() as f:
+        f.write(NDJSON.encode('utf-8'))
+        f.flush()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            assert list(rj.iterload(mm)) == EXPECTED
+
+
+def test_lazy_consumption():
+    stream = io.StringIO('1\n2\n')
+    it = rj.iterload(stream, chunk_size=4)
+    assert next(it) == 1
+    assert next(it) == 2
+    with pytest.raises(StopIteration):
+        next(it)
+
+
+def test_parse_error():
+    it = rj.iterload('[1]\n{"a": }\n[2]\n')
+    assert next(it) == [1]
+    with pytest.raises(rj.JSONDecodeError, match='Parse error at offset 10'):
+        next(it)
+    with pytest.raises(StopIteration):
+        next(it)
+
+
+def test_options():
+    assert list(rj.iterload('1.5\n2.5', number_mode=rj.NM_DECIMAL)) == [
+        Decimal('1.5'), Decimal('2.5')]
+    assert list(rj.iterload('{"a": 1} {"b": 2}', object_hook=lambda d: list(d))) == [
+        ['a'], ['b']]
+    assert list(rj.iterload('1 // one\n2 /* two */', parse_mode=rj.PM_COMMENTS)) == [
+        1, 2]
+
+    class ListDecoder(rj.Decoder):
+        def end_array(self, a):
+            return tuple(a)
+
+    assert list(ListDecoder().iter('[1] [2]')) == [(1,), (2,)]
+
+
+def test_invalid_input():
+    with pytest.raises(TypeError):
+        rj.iterload(1)
+    with pytest.raises(TypeError):
+        rj.Decoder().iter(1)
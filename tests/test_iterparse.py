@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Events iterator tests
+# :License:   MIT License
+#
+
+import datetime
+from decimal import Decimal
+import io
+
+import pytest
+
+import rapidjson as rj
+
+
+DOCUMENT = '{"a": [1, "x", 2.5], "b/c": {"d~": null}, "e": true, "f": []}'
+EVENTS = [
+    ('', 'start_map', None),
+    ('', 'map_key', 'a'),
+    ('/a', 'start_array', None),
+    ('/a/0', 'number', 1),
+    ('/a/1', 'string', 'x'),
+    ('/a/2', 'number', 2.5),
+    ('/a', 'end_array', None),
+    ('', 'map_key', 'b/c'),
+    ('/b~1c', 'start_map', None),
+    ('/b~1c', 'map_key', 'd~'),
+    ('/b~1c/d~0', 'null', None),
+    ('/b~1c', 'end_map', None),
+    ('', 'map_key', 'e'),
+    ('/e', 'boolean', True),
+    ('', 'map_key', 'f'),
+    ('/f', 'start_array', None),
+    ('/f', 'end_array', None),
+    ('', 'end_map', None),
+]
+
+
+@pytest.mark.parametrize('input', [
+    lambda: DOCUMENT,
+    lambda: DOCUMENT.encode('utf-8'),
+    lambda: io.StringIO(DOCUMENT),
+    lambda: io.BytesIO(DOCUMENT.encode('utf-8')),
+])
+def test_events(input):
+    assert list(rj.iterparse(input())) == EVENTS
+    assert list(rj.Decoder().iterparse(input())) == EVENTS
+
+
+@pytest.mark.parametrize('cs', [4, 5, 16, 65536])
+def test_chunk_size(cs):
+    assert list(rj.iterparse(io.StringIO(DOCUMENT), chunk_size=cs)) == EVENTS
+
+
+def test_scalar_root():
+    assert list(rj.iterparse('"foo"')) == [('', 'string', 'foo')]
+    assert list(rj.iterparse(' 42 ')) == [('', 'number', 42)]
+
+
+@pytest.mark.parametrize('prefix,expected', [
+    ('/records', [('/records/0', 'item', {'id': 1, 'tags': ['a']}),
+                  ('/records/1', 'item', 2),
+                  ('/records/2', 'item', [3])]),
+    ('/other', [('/other/x', 'item', 1), ('/other/y', 'item', {'z': None})]),
+    ('', [('/records', 'item', [{'id': 1, 'tags': ['a']}, 2, [3]]),
+          ('/other', 'item', {'x': 1, 'y': {'z': None}})]),
+    ('/records/0', [('/records/0/id', 'item', 1), ('/records/0/tags', 'item', ['a'])]),
+    ('/records/1', []),
+    ('/missing', []),
+])
+def test_prefix(prefix, expected):
+    document = '{"records": [{"id": 1, "tags": ["a"]}, 2, [3]],' \
+        ' "other": {"x": 1, "y": {"z": null}}}'
+    assert list(rj.iterparse(document, prefix)) == expected
+    assert list(rj.iterparse(io.StringIO(document), prefix=prefix, chunk_size=4)) \
+        == expected
+
+
+def test_lazy_consumption():
+    stream = io.StringIO('[' + ', '.join(['1'] * 10000) + ']')
+    it = rj.iterparse(stream, '', chunk_size=16)
+    assert next(it) == ('/0', 'item', 1)
+    assert next(it) == ('/1', 'item', 1)
+    assert stream.tell() < 100
+
+
+def test_modes():
+    events = list(rj.iterparse('{"n": 1.5, "d": "2020-01-02"}',
+                               number_mode=rj.NM_DECIMAL,
+                               datetime_mode=rj.DM_ISO8601))
+    assert events[2] == ('/n', 'number', Decimal('1.5'))
+    assert events[4] == ('/d', 'string', datetime.date(2020, 1, 2))
+
+    assert list(rj.iterparse('[{"b": 1, "a": 2}]', '',
+                             object_hook=lambda d: sorted(d))) == [('/0', 'item', ['a', 'b'])]
+
+    assert list(rj.iterparse('[1, /* two */ 3,]', '',
+                             parse_mode=rj.PM_COMMENTS | rj.PM_TRAILING_COMMAS)) == [
+        ('/0', 'item', 1), ('/1', 'item', 3)]
+
+    class TupleDecoder(rj.Decoder):
+        def end_array(self, a):
+            return tuple(a)
+
+    assert list(TupleDecoder(number_mode=rj.NM_NATIVE).iterparse('[[1, [2]]]', '')) == [
+        ('/0', 'item', (1, (2,)))]
+
+
+@pytest.mark.parametrize('input', ['', '[1, }', '[1] 2', '{"a": 1', b'["\xff"]'])
+def test_parse_errors(input):
+    with pytest.raises(rj.JSONDecodeError):
+        list(rj.iterparse(input))
+
+
+def test_error_ends_iteration():
+    it = rj.iterparse('[1, }')
+    assert next(it) == ('', 'start_array', None)
+    assert next(it) == ('/0', 'number', 1)
+    with pytest.raises(rj.JSONDecodeError, match='Parse error at offset 4'):
+        next(it)
+    with pytest.raises(StopIteration):
+        next(it)
+
+
+@pytest.mark.parametrize('prefix,exception', [
+    ('foo', ValueError),
+    ('/foo~2', ValueError),
+    ('/foo~', ValueError),
+    (1, TypeError),
+])
+def test_invalid_prefix(prefix, exception):
+    with pytest.raises(exception):
+        rj.iterparse('[]', prefix)
+
+
+def test_invalid_input():
+    with pytest.raises(TypeError):
+        rj.iterparse(1)
+    with pytest.raises(TypeError):
+        rj.Decoder().iterparse(1)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Key cache tests
+# :License:   MIT License
+#
+
+import io
+
+import pytest
+
+import rapidjson as rj
+
+
+def test_disabled():
+    decoder = rj.Decoder()
+    assert decoder.key_cache_size == 0
+    assert decoder('{"a": 1}') == {'a': 1}
+    assert decoder.key_cache_info() == {'hits': 0, 'misses': 0, 'maxsize': 0,
+                                        'currsize': 0}
+
+
+def test_hits_and_misses():
+    decoder = rj.Decoder(key_cache_size=10)
+    assert decoder.key_cache_size == 10
+    assert decoder('{"a": 1, "b": {"a": 2}}') == {'a': 1, 'b': {'a': 2}}
+    assert decoder.key_cache_info() == {'hits': 1, 'misses': 2, 'maxsize': 10,
+                                        'currsize': 2}
+    assert decoder('[{"b": [1]}, {"a": []}]') == [{'b': [1]}, {'a': []}]
+    assert decoder.key_cache_info() == {'hits': 3, 'misses': 2, 'maxsize': 10,
+                                        'currsize': 2}
+
+
+def test_shared_keys():
+    decoder = rj.Decoder(key_cache_size=10)
+    first = decoder('{"key": 1}')
+    second = decoder(io.StringIO('{"key": 2}'))
+    assert next(iter(first)) is next(iter(second))
+
+
+def test_eviction():
+    decoder = rj.Decoder(key_cache_size=4)
+    for i in range(100):
+        key = 'key%d' % i
+        assert decoder('{"%s": %d, "common": 0}' % (key, i)) == {key: i, 'common': 0}
+    info = decoder.key_cache_info()
+    assert info['currsize'] == 4
+    assert info['misses'] + info['hits'] == 200
+    # The frequently used key is not evicted
+    assert info['hits'] >= 90
+
+
+def test_long_keys():
+    decoder = rj.Decoder(key_cache_size=4)
+    key = 'x' * 100
+    assert decoder('{"%s": 1}' % key) == {key: 1}
+    assert decoder.key_cache_info()['currsize'] == 0
+
+
+def test_unicode_keys():
+    decoder = rj.Decoder(key_cache_size=4)
+    assert decoder('{"€": 1, "é": 2}') == {'€': 1, 'é': 2}
+    assert decoder(b'{"\xe2\x82\xac": 3}') == {'€': 3}
+    assert decoder.key_cache_info()['hits'] == 1
+
+
+def test_hooks():
+    class KeysDecoder(rj.Decoder):
+        def end_object(self, d):
+            return sorted(d)
+
+    decoder = KeysDecoder(key_cache_size=4)
+    assert decoder('{"b": {"c": 1}, "a": 2}') == ['a', 'b']
+    assert decoder('{"c": 1, "b": 2}') == ['b', 'c']
+    assert decoder.key_cache_info()['hits'] == 2
+
+
+@pytest.mark.parametrize('size,exception', [
+    (-1, ValueError),
+    (1 << 30, ValueError),
+    ('10', TypeError),
+    (1.5, TypeError),
+])
+def test_invalid_size(size, exception):
+    with pytest.raises(exception):
+        rj.Decoder(key_cache_size=size)
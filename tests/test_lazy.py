@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Lazy decoding tests
+# :License:   MIT License
+#
+
+from collections.abc import Mapping, Sequence
+import datetime
+from decimal import Decimal
+import io
+import uuid
+
+import pytest
+
+import rapidjson as rj
+
+
+DOCUMENT = '''
+{
+  "id": 42,
+  "name": "foo",
+  "tags": ["a", "b", {"c": [1, 2.5, null]}],
+  "empty": {},
+  "nothing": [],
+  "flags": {"enabled": true, "disabled": false}
+}
+'''
+
+
+def test_lazy_attribute():
+    assert rj.Decoder().lazy is False
+    assert rj.Decoder(lazy=True).lazy is True
+
+
+@pytest.mark.parametrize('input', [
+    DOCUMENT,
+    DOCUMENT.encode('utf-8'),
+    io.StringIO(DOCUMENT),
+    io.BytesIO(DOCUMENT.encode('utf-8')),
+])
+def test_proxies(input):
+    doc = rj.Decoder(lazy=True)(input)
+    assert isinstance(doc, rj.LazyObject)
+    assert isinstance(doc, Mapping)
+    assert len(doc) == 6
+    assert list(doc) == ['id', 'name', 'tags', 'empty', 'nothing', 'flags']
+    assert doc['id'] == 42
+    assert doc.get('name') == 'foo'
+    assert doc.get('missing') is None
+    assert doc.get('missing', 1) == 1
+    assert 'flags' in doc
+    assert 'missing' not in doc
+    assert 1 not in doc
+
+    tags = doc['tags']
+    assert isinstance(tags, rj.LazyArray)
+    assert isinstance(tags, Sequence)
+    assert len(tags) == 3
+    assert tags[0] == 'a'
+    assert tags[-1]['c'][1] == 2.5
+    assert tags[1:] == ['b', tags[2]]
+    assert list(tags[2]['c']) == [1, 2.5, None]
+
+    assert len(doc['empty']) == 0
+    assert len(doc['nothing']) == 0
+    assert doc['flags'].items() == [('enabled', True), ('disabled', False)]
+    assert doc['flags'].keys() == ['enabled', 'disabled']
+    assert doc['flags'].values() == [True, False]
+
+    with pytest.raises(KeyError):
+        doc['missing']
+
+    with pytest.raises(IndexError):
+        tags[3]
+
+    with pytest.raises(TypeError):
+        tags['a']
+
+    with pytest.raises(TypeError):
+        doc['id'] = 1
+
+
+def test_caching():
+    doc = rj.Decoder(lazy=True)('{"a": {"b": [1]}, "c": "d"}')
+    assert doc['a'] is doc['a']
+    assert doc['a']['b'] is doc['a']['b']
+    assert doc['c'] is doc['c']
+
+
+def test_equality():
+    doc = rj.Decoder(lazy=True)(DOCUMENT)
+    assert doc == rj.loads(DOCUMENT)
+    assert doc == rj.Decoder(lazy=True)(DOCUMENT)
+    assert doc['tags'] != ['a', 'b']
+    assert doc.materialize() == rj.loads(DOCUMENT)
+    assert type(doc.materialize()) is dict
+    assert type(doc['tags'].materialize()) is list
+
+
+def test_scalar_root():
+    decoder = rj.Decoder(lazy=True)
+    assert decoder('1') == 1
+    assert decoder('"foo"') == 'foo'
+    assert decoder('null') is None
+
+
+def test_duplicated_keys():
+    doc = rj.Decoder(lazy=True)('{"a": 1, "b": 2, "a": 3}')
+    assert doc == {'a': 3, 'b': 2}
+    assert len(doc) == 2
+    assert list(doc) == ['a', 'b']
+    assert doc.items() == [('a', 3), ('b', 2)]
+
+
+def test_big_object_lookup():
+    members = ['"k%d": %d' % (i, i) for i in range(2000)]
+    members += ['"k7": -7', '"": 0', '"k1999": -1']
+    doc = rj.Decoder(lazy=True)('{%s}' % ', '.join(members))
+    assert len(doc) == 2001
+    assert doc['k0'] == 0
+    assert doc['k1000'] == 1000
+    assert doc['k7'] == -7
+    assert doc['k1999'] == -1
+    assert doc[''] == 0
+    assert doc.get('k2000') is None
+    assert 'k42' in doc
+    assert 'k' not in doc
+    assert 'k00' not in doc
+    assert 1 not in doc
+    with pytest.raises(KeyError):
+        doc['missing']
+    assert list(doc)[:3] == ['k0', 'k1', 'k2']
+
+
+def test_modes():
+    decoder = rj.Decoder(lazy=True,
+                         number_mode=rj.NM_DECIMAL,
+                         datetime_mode=rj.DM_ISO8601,
+                         uuid_mode=rj.UM_CANONICAL)
+    doc = decoder('{"n": 1.5, "d": "2020-01-02",'
+                  ' "u": "7202d115-7ff3-4c81-a7c1-2a1f067b1ece"}')
+    assert doc['n'] == Decimal('1.5')
+    assert doc['d'] == datetime.date(2020, 1, 2)
+    assert doc['u'] == uuid.UUID('7202d115-7ff3-4c81-a7c1-2a1f067b1ece')
+
+
+def test_parse_error():
+    with pytest.raises(rj.JSONDecodeError, match='Parse error at offset 5'):
+        rj.Decoder(lazy=True)('[1, 2')
+
+
+def test_materialization_error():
+    decoder = rj.Decoder(lazy=True, datetime_mode=rj.DM_ISO8601 | rj.DM_SHIFT_TO_UTC)
+    doc = decoder('["10:20:30+01:00"]')
+    with pytest.raises(ValueError, match='cannot be shifted to UTC'):
+        doc[0]
+
+
+def test_hooks_not_supported():
+    class Hooked(rj.Decoder):
+        def end_object(self, d):
+            return d
+
+    with pytest.raises(ValueError, match='Lazy decoding does not support'):
+        Hooked(lazy=True)
+
+
+@pytest.mark.parametrize('method,args', [
+    ('columns', ('[]',)),
+    ('extract', ('{}', ['/a'])),
+    ('iter', ('{} []',)),
+    ('iterparse', ('{}',)),
+])
+def test_methods_not_supported(method, args):
+    decoder = rj.Decoder(lazy=True)
+    with pytest.raises(ValueError, match=r'Lazy decoding does not support %s\(\)'
+                       % method):
+        getattr(decoder, method)(*args)
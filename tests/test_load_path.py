@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Whole file decoding tests
+# :License:   MIT License
+#
+
+from decimal import Decimal
+import os
+import pathlib
+import threading
+
+import pytest
+
+import rapidjson as rj
+
+
+DATUM = {'name': 'Naïve ~𓆙~', 'values': [1, 2.5, None, True], 'nested': {'a': []}}
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'datum.json'
+    path.write_text(rj.dumps(DATUM, ensure_ascii=False), 'utf-8')
+    return path
+
+
+@pytest.mark.parametrize('convert', [str, pathlib.Path, os.fsencode])
+def test_load_path(path, convert):
+    assert rj.load_path(convert(path)) == DATUM
+
+
+def test_load_fd(path):
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        assert rj.load_fd(fd) == DATUM
+        # The descriptor is left open, positioned at the end
+        assert os.read(fd, 1) == b''
+        os.lseek(fd, 0, os.SEEK_SET)
+        assert rj.load_fd(fd) == DATUM
+    finally:
+        os.close(fd)
+
+
+def test_load_fd_current_position(tmp_path):
+    path = tmp_path / 'datum.json'
+    path.write_bytes(b'garbage[1, 2]')
+    with open(str(path), 'rb') as f:
+        f.seek(7)
+        assert rj.load_fd(f.fileno()) == [1, 2]
+
+
+def test_pipe():
+    read, write = os.pipe()
+    data = rj.dumps([DATUM] * 50000).encode('utf-8')
+
+    def writer():
+        with os.fdopen(write, 'wb') as f:
+            f.write(data)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        assert rj.load_fd(read) == [DATUM] * 50000
+    finally:
+        thread.join()
+        os.close(read)
+
+
+def test_options(path):
+    assert rj.load_path(path, number_mode=rj.NM_DECIMAL)['values'][1] == Decimal('2.5')
+    assert rj.load_path(path, release_gil=True) == DATUM
+    assert rj.load_path(path, object_hook=sorted) == ['name', 'nested', 'values']
+
+
+def test_errors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        rj.load_path(tmp_path / 'missing.json')
+
+    with pytest.raises(IsADirectoryError):
+        rj.load_path(tmp_path)
+
+    with pytest.raises(TypeError):
+        rj.load_path(1.5)
+
+    with pytest.raises(TypeError):
+        rj.load_path(0)
+
+    with pytest.raises(TypeError):
+        rj.load_fd('0')
+
+    with pytest.raises(ValueError):
+        rj.load_fd(-1)
+
+    path = tmp_path / 'invalid.json'
+    path.write_bytes(b'[1, 2')
+    with pytest.raises(rj.JSONDecodeError, match='offset 5'):
+        rj.load_path(path)
+
+    path.write_bytes(b'["\xff"]')
+    with pytest.raises(rj.JSONDecodeError):
+        rj.load_path(path)
+
+    path.write_bytes(b'')
+    with pytest.raises(rj.JSONDecodeError):
+        rj.load_path(path)
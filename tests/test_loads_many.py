@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Batch decoding tests
+# :License:   MIT License
+#
+
+from array import array
+from dataclasses import dataclass
+from decimal import Decimal
+import io
+
+import pytest
+
+import rapidjson as rj
+
+
+DOCUMENTS = ['{"id": %d, "tags": ["a", "b"], "price": %d.5}' % (i, i) for i in range(200)]
+EXPECTED = [rj.loads(d) for d in DOCUMENTS]
+
+
+@pytest.mark.parametrize('workers', [None, 1, 2, 3, 8, 1024])
+def test_loads_many(workers):
+    assert rj.loads_many(DOCUMENTS, workers=workers) == EXPECTED
+    assert rj.Decoder().map(DOCUMENTS, workers=workers) == EXPECTED
+
+
+@pytest.mark.parametrize('documents', [
+    lambda: DOCUMENTS,
+    lambda: tuple(DOCUMENTS),
+    lambda: iter(DOCUMENTS),
+    lambda: (d.encode('utf-8') for d in DOCUMENTS),
+    lambda: [bytearray(d.encode('utf-8')) for d in DOCUMENTS],
+    lambda: [memoryview(d.encode('utf-8')) for d in DOCUMENTS],
+])
+def test_inputs(documents):
+    assert rj.loads_many(documents()) == EXPECTED
+
+
+def test_empty():
+    assert rj.loads_many([]) == []
+    assert rj.Decoder().map(()) == []
+
+
+def test_options():
+    assert rj.loads_many(['1.5', '[2.5]'], number_mode=rj.NM_DECIMAL) == [
+        Decimal('1.5'), [Decimal('2.5')]]
+    assert rj.loads_many(['{"a": 1}', '{"b": 2}'], object_hook=list) == [['a'], ['b']]
+    assert rj.loads_many(['[1, 2]'], array_mode=rj.AM_TYPED) == [array('q', [1, 2])]
+    assert rj.loads_many(['[1, // one\n]'],
+                         parse_mode=rj.PM_COMMENTS | rj.PM_TRAILING_COMMAS) == [[1]]
+    assert rj.loads_many(['"2020-01-02"'], datetime_mode=rj.DM_ISO8601) == [
+        rj.loads('"2020-01-02"', datetime_mode=rj.DM_ISO8601)]
+
+    with pytest.raises(ValueError):
+        rj.loads_many(['NaN'], allow_nan=False)
+
+
+def test_decoder_settings():
+    class TupleDecoder(rj.Decoder):
+        def end_array(self, a):
+            return tuple(a)
+
+    assert TupleDecoder(number_mode=rj.NM_NATIVE).map(['[1, [2.5]]', '[]']) == [
+        (1, (2.5,)), ()]
+
+    @dataclass
+    class Point:
+        x: int
+        y: int
+
+    assert rj.Decoder(target=Point).map(['{"x": 1, "y": 2}', '{"y": 4, "x": 3}']) == [
+        Point(1, 2), Point(3, 4)]
+
+    with pytest.raises(ValueError, match='Lazy decoding does not support'):
+        rj.Decoder(lazy=True).map(DOCUMENTS)
+
+
+def test_parse_errors():
+    with pytest.raises(rj.JSONDecodeError,
+                       match='Parse error at offset 2 of document 1'):
+        rj.loads_many(['1', '[2', '3', '{'], workers=4)
+
+    with pytest.raises(rj.JSONDecodeError, match='of document 0'):
+        rj.loads_many([''])
+
+    with pytest.raises(rj.JSONDecodeError):
+        rj.loads_many([b'"\xff"'])
+
+    class Failing(rj.Decoder):
+        def end_object(self, d):
+            raise ValueError('Nope')
+
+    with pytest.raises(ValueError, match='Nope'):
+        Failing().map(['[]', '{}'])
+
+
+@pytest.mark.parametrize('arg,exception', [
+    (0, ValueError),
+    (-1, ValueError),
+    (1025, ValueError),
+    (2**100, ValueError),
+    ('1', TypeError),
+    (1.0, TypeError),
+])
+def test_invalid_workers(arg, exception):
+    with pytest.raises(exception):
+        rj.loads_many([], workers=arg)
+    with pytest.raises(exception):
+        rj.Decoder().map([], workers=arg)
+
+
+def test_invalid_documents():
+    with pytest.raises(TypeError):
+        rj.loads_many(1)
+    with pytest.raises(TypeError):
+        rj.loads_many(['1', 2])
+    with pytest.raises(TypeError):
+        rj.loads_many([io.StringIO('1')])
@@ -122,3 +122,47 @@ def test_failed_validation():
 
     for stat in top_stats[:10]:
         assert stat.count_diff < 3
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class PointEncoder(rj.Encoder):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        # The bound method makes a reference cycle thru the registry
+        self.register(Point, self.encode_point)
+
+    def encode_point(self, point):
+        return [point.x, point.y]
+
+
+def test_encoder_registry_cycles():
+    tracemalloc.start()
+
+    snapshot1 = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(True, __file__),))
+
+    for j in range(1000):
+        encoder = PointEncoder()
+        encoder([Point(1, 2)])
+        plain = rj.Encoder()
+        plain.register(Point, lambda point, plain=plain: [point.x, point.y])
+        plain([Point(1, 2)])
+        del encoder, plain
+
+    del j
+
+    gc.collect()
+
+    snapshot2 = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(True, __file__),))
+
+    top_stats = snapshot2.compare_to(snapshot1, 'lineno')
+    tracemalloc.stop()
+
+    for stat in top_stats[:10]:
+        assert stat.count_diff < 3
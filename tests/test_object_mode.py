@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Native encoding of dataclasses, named tuples and slots
+# :License:   MIT License
+#
+
+from collections import namedtuple
+from dataclasses import dataclass, field
+import io
+from typing import Any, List, NamedTuple
+import uuid
+
+import pytest
+
+import rapidjson as rj
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+
+
+@dataclass
+class Shape:
+    name: str
+    points: List[Point] = field(default_factory=list)
+    extra: Any = None
+
+
+@dataclass
+class Point3D(Point):
+    z: int = 0
+
+
+class Pair(NamedTuple):
+    left: Any
+    right: Any
+
+
+Legacy = namedtuple('Legacy', 'a b')
+
+
+class Slotted:
+    __slots__ = ('a', 'b', '__weakref__')
+
+
+class MoreSlotted(Slotted):
+    __slots__ = 'c'
+
+
+class Private:
+    __slots__ = ('__secret',)
+
+    def __init__(self):
+        self.__secret = 1
+
+
+class Unslotted(Slotted):
+    pass
+
+
+def test_object_mode_attribute():
+    assert rj.Encoder().object_mode == rj.OM_NONE
+    assert rj.Encoder(object_mode=rj.OM_DATACLASS).object_mode == rj.OM_DATACLASS
+
+
+def test_default_mode():
+    with pytest.raises(TypeError, match='is not JSON serializable'):
+        rj.dumps(Point(1, 2))
+    assert rj.dumps(Pair(1, 2)) == '[1,2]'
+
+
+def test_dataclass():
+    shape = Shape('s', [Point(1, 2), Point3D(3, 4, 5)], {'a': Point(0, 0)})
+    expected = ('{"name":"s","points":[{"x":1,"y":2},{"x":3,"y":4,"z":5}],'
+                '"extra":{"a":{"x":0,"y":0}}}')
+    assert rj.dumps(shape, object_mode=rj.OM_DATACLASS) == expected
+    assert rj.Encoder(object_mode=rj.OM_DATACLASS)(shape) == expected
+
+    stream = io.StringIO()
+    rj.dump(shape, stream, object_mode=rj.OM_DATACLASS)
+    assert stream.getvalue() == expected
+
+    buffer = bytearray()
+    rj.dumps_into(shape, buffer, object_mode=rj.OM_DATACLASS)
+    assert buffer == expected.encode('utf-8')
+
+    # The layout is cached per class, also for the ones that are not records
+    for _ in range(3):
+        assert rj.dumps([Point(1, 2), Pair(3, 4)], object_mode=rj.OM_DATACLASS) == (
+            '[{"x":1,"y":2},[3,4]]')
+
+
+def test_namedtuple():
+    assert rj.dumps([Pair(1, Legacy('x', None)), (1, 2)],
+                    object_mode=rj.OM_NAMEDTUPLE) == (
+                        '[{"left":1,"right":{"a":"x","b":null}},[1,2]]')
+    assert rj.dumps(Pair(Point(1, 2), 3),
+                    object_mode=rj.OM_NAMEDTUPLE | rj.OM_DATACLASS) == (
+                        '{"left":{"x":1,"y":2},"right":3}')
+
+    with pytest.raises(TypeError):
+        rj.dumps(Point(1, 2), object_mode=rj.OM_NAMEDTUPLE)
+
+    class Plain(tuple):
+        pass
+
+    assert rj.dumps(Plain((1, 2)), object_mode=rj.OM_NAMEDTUPLE) == '[1,2]'
+
+
+def test_slots():
+    s = MoreSlotted()
+    s.a = 'é'
+    s.c = [1]
+    assert rj.dumps(s, object_mode=rj.OM_SLOTS) == '{"a":"\\u00E9","c":[1]}'
+    assert rj.dumps(Private(), object_mode=rj.OM_SLOTS) == '{"_Private__secret":1}'
+
+    with pytest.raises(TypeError):
+        rj.dumps(s, object_mode=rj.OM_DATACLASS)
+
+    # Instances that also have a __dict__ are not handled
+    with pytest.raises(TypeError):
+        rj.dumps(Unslotted(), object_mode=rj.OM_SLOTS)
+
+    # Neither are the builtin types without a __dict__
+    with pytest.raises(TypeError):
+        rj.dumps(object(), object_mode=rj.OM_SLOTS)
+
+
+def test_precedence():
+    u = uuid.UUID('7202d115-7ff3-4c81-a7c1-2a1f067b1ece')
+    assert rj.dumps(u, uuid_mode=rj.UM_CANONICAL, object_mode=rj.OM_SLOTS) == (
+        '"7202d115-7ff3-4c81-a7c1-2a1f067b1ece"')
+
+    encoder = rj.Encoder(object_mode=rj.OM_DATACLASS)
+    encoder.register(Point3D, ('z',))
+    assert encoder([Point(1, 2), Point3D(3, 4, 5)]) == '[{"x":1,"y":2},{"z":5}]'
+
+    assert rj.dumps(Pair(1, 2), iterable_mode=rj.IM_ONLY_LISTS,
+                    object_mode=rj.OM_NAMEDTUPLE) == '{"left":1,"right":2}'
+
+
+def test_errors():
+    with pytest.raises(ValueError, match='Invalid object_mode'):
+        rj.dumps(1, object_mode=rj.OM_SLOTS << 1)
+    with pytest.raises(TypeError, match='object_mode must be'):
+        rj.Encoder(object_mode='dataclass')
+
+    p = Point(1, 2)
+    p.x = p
+    with pytest.raises(RecursionError):
+        rj.dumps(p, object_mode=rj.OM_DATACLASS)
+
+    class Failing:
+        __slots__ = ('a',)
+
+    class MoreFailing(Failing):
+        __slots__ = ('b_',)
+
+        def __getattribute__(self, name):
+            if name == 'b_':
+                raise ValueError('Nope')
+            return super().__getattribute__(name)
+
+    with pytest.raises(ValueError, match='Nope'):
+        rj.dumps(MoreFailing(), object_mode=rj.OM_SLOTS)
@@ -363,6 +363,45 @@ def test_datetime_mode_loads(dumps, loads):
     assert load_as_naive == local.replace(tzinfo=None)
 
 
+@pytest.mark.parametrize('value', [
+    '2020-03-15T10:20:30+01:00',
+    '2020-03-15T00:20:30.123456+01:00',
+    '2020-03-01T00:20:30+00:30',
+    '2020-01-01T00:00:00+23:59',
+    '2020-02-28T23:59:59-00:01',
+    '2019-02-28T23:00:00-01:00',
+    '2019-12-31T20:00:00-04:00',
+    '2019-12-31T20:00:00-04:01',
+    '0001-01-01T00:00:00-01:00',
+    '9999-12-31T23:00:00+01:00',
+    '2020-03-15T10:20:30+00:00',
+])
+def test_datetime_offsets_loads(value, loads):
+    expected = datetime.fromisoformat(value)
+
+    loaded = loads('"%s"' % value, datetime_mode=rj.DM_ISO8601)
+    assert loaded == expected
+    assert loaded.utcoffset() == expected.utcoffset()
+    assert loads('"%s"' % value, datetime_mode=rj.DM_ISO8601).tzinfo is loaded.tzinfo
+
+    shifted = loads('"%s"' % value, datetime_mode=rj.DM_ISO8601 | rj.DM_SHIFT_TO_UTC)
+    assert shifted == expected
+    assert shifted.tzinfo is timezone.utc
+    assert shifted.replace(tzinfo=None) == expected.astimezone(timezone.utc).replace(
+        tzinfo=None)
+
+
+@pytest.mark.parametrize('value', [
+    '0001-01-01T00:00:00+01:00',
+    '9999-12-31T23:00:00-01:00',
+])
+def test_datetime_offsets_overflow(value, loads):
+    with pytest.raises(OverflowError):
+        datetime.fromisoformat(value).astimezone(timezone.utc)
+    with pytest.raises(OverflowError):
+        loads('"%s"' % value, datetime_mode=rj.DM_ISO8601 | rj.DM_SHIFT_TO_UTC)
+
+
 @pytest.mark.parametrize(
     'value', [date.today(), datetime.now(), time(10,20,30)])
 def test_datetime_values(value, dumps, loads):
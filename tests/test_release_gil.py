@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Two-phase decoding tests
+# :License:   MIT License
+#
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+import rapidjson as rj
+
+
+def test_release_gil_attribute():
+    assert rj.Decoder().release_gil is False
+    assert rj.Decoder(release_gil=True).release_gil is True
+
+
+def test_hooks():
+    class TupleDecoder(rj.Decoder):
+        def end_array(self, a):
+            return tuple(a)
+
+        def end_object(self, d):
+            return sorted(d.items())
+
+    td = TupleDecoder(release_gil=True)
+    assert td('[{"one": [1]}, {"two": [2, 3]}]') == ([('one', (1,))], [('two', (2, 3))])
+
+    def hook(d):
+        return list(d.values())
+
+    assert rj.loads('{"a": {"b": 1}}', object_hook=hook, release_gil=True) == [[1]]
+
+
+def test_modes():
+    assert rj.loads('[1.5, 1e300, 12345678901234567890123]',
+                    number_mode=rj.NM_DECIMAL, release_gil=True) == [
+                        Decimal('1.5'), Decimal('1e300'), 12345678901234567890123]
+    assert rj.loads('[1.5, 10]', number_mode=rj.NM_NATIVE, release_gil=True) == [1.5, 10]
+
+
+@pytest.mark.parametrize('j,offset', (
+    ('[1, 2', 5),
+    ('{"a": 1,}', 8),
+    (b'"\xff"', 1),
+))
+def test_parse_errors(j, offset):
+    with pytest.raises(rj.JSONDecodeError, match='offset %d:' % offset):
+        rj.loads(j, release_gil=True)
+
+
+def test_handler_errors():
+    class Failing(rj.Decoder):
+        def string(self, s):
+            raise ValueError('Nope')
+
+    with pytest.raises(ValueError, match='Nope'):
+        Failing(release_gil=True)('[1, 2, "x"]')
+
+
+def test_threads():
+    docs = [rj.dumps({'id': i, 'items': list(range(i % 50)), 'name': 'x' * i})
+            for i in range(200)]
+    decoder = rj.Decoder(release_gil=True)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(decoder, docs))
+    assert results == [rj.loads(d) for d in docs]
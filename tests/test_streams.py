@@ -83,3 +83,60 @@ def test_file_object():
             rj.dump(datum, stream)
             stream.seek(0)
             assert rj.load(stream) == datum
+
+
+DATUM = ['1234567890', 1234, 3.14, '~𓆙~', {'a': [True, None]}]
+
+
+@pytest.mark.parametrize('cs', (4, 7, 65536))
+@pytest.mark.parametrize('opener', [
+    lambda name: open(name, 'r', encoding='utf-8'),
+    lambda name: open(name, 'rb'),
+    lambda name: open(name, 'rb', buffering=0),
+])
+def test_file_read_methods(opener, cs, tmp_path):
+    path = tmp_path / 'datum.json'
+    path.write_text(rj.dumps(DATUM, ensure_ascii=False), 'utf-8')
+
+    with opener(str(path)) as stream:
+        assert rj.load(stream, chunk_size=cs) == DATUM
+        assert not stream.read()
+
+    with opener(str(path)) as stream:
+        assert list(rj.iterload(stream, chunk_size=cs)) == [DATUM]
+
+
+@pytest.mark.parametrize('cs', (4, 5, 65536))
+def test_readinto(cs):
+    stream = io.BytesIO(rj.dumps(DATUM, ensure_ascii=False).encode('utf-8'))
+    assert rj.load(stream, chunk_size=cs) == DATUM
+
+
+class LyingStream(io.BytesIO):
+    def readinto(self, buffer):
+        super().readinto(buffer)
+        return len(buffer) + 1
+
+
+class CattyBinaryStream(io.BytesIO):
+    def readinto(self, buffer):
+        raise CattyError('No real reason')
+
+
+def test_readinto_errors():
+    with pytest.raises(ValueError, match='readinto'):
+        rj.load(LyingStream(b'[1, 2, 3]'))
+
+    with pytest.raises(CattyError):
+        rj.load(CattyBinaryStream(b'[1, 2, 3]'))
+
+
+def test_unreadable_file(tmp_path):
+    with open(str(tmp_path / 'datum.json'), 'wb', buffering=0) as stream:
+        with pytest.raises(io.UnsupportedOperation):
+            rj.load(stream)
+
+    stream = open(str(tmp_path / 'datum.json'), 'rb', buffering=0)
+    stream.close()
+    with pytest.raises(ValueError):
+        rj.load(stream)
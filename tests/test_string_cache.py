@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- String values cache tests
+# :License:   MIT License
+#
+
+import datetime
+import io
+import uuid
+
+import pytest
+
+import rapidjson as rj
+
+
+def test_disabled():
+    decoder = rj.Decoder()
+    assert decoder.string_cache_size == 0
+    values = decoder('["OK", "OK"]')
+    assert values == ['OK', 'OK']
+    assert decoder.string_cache_info() == {'hits': 0, 'misses': 0, 'maxsize': 0,
+                                           'currsize': 0}
+
+
+def test_shared_values():
+    decoder = rj.Decoder(string_cache_size=10)
+    assert decoder.string_cache_size == 10
+    first = decoder('[{"status": "OK", "region": "eu-west-1"}, {"status": "OK"}]')
+    second = decoder(io.StringIO('{"status": "OK"}'))
+    assert first[0]['status'] is first[1]['status'] is second['status']
+    assert decoder.string_cache_info() == {'hits': 2, 'misses': 2, 'maxsize': 10,
+                                           'currsize': 2}
+
+
+def test_independent_from_keys():
+    decoder = rj.Decoder(string_cache_size=10)
+    assert decoder('{"a": "a"}') == {'a': 'a'}
+    assert decoder.string_cache_info()['misses'] == 1
+    assert decoder.key_cache_info()['misses'] == 0
+
+
+def test_eviction():
+    decoder = rj.Decoder(string_cache_size=4)
+    for i in range(100):
+        value = 'value%d' % i
+        assert decoder('["%s", "OK"]' % value) == [value, 'OK']
+    info = decoder.string_cache_info()
+    assert info['currsize'] == 4
+    assert info['hits'] >= 90
+
+
+def test_long_values():
+    decoder = rj.Decoder(string_cache_size=4)
+    value = 'x' * 100
+    assert decoder('["%s", "%s"]' % (value, value)) == [value, value]
+    assert decoder.string_cache_info()['currsize'] == 0
+
+
+def test_modes_and_hooks():
+    decoder = rj.Decoder(string_cache_size=4, datetime_mode=rj.DM_ISO8601,
+                         uuid_mode=rj.UM_CANONICAL)
+    assert decoder('["2020-01-02", "7202d115-7ff3-4c81-a7c1-2a1f067b1ece", "x"]') == [
+        datetime.date(2020, 1, 2), uuid.UUID('7202d115-7ff3-4c81-a7c1-2a1f067b1ece'), 'x']
+    assert decoder.string_cache_info()['currsize'] == 1
+
+    class UpperDecoder(rj.Decoder):
+        def string(self, s):
+            return s.upper()
+
+    decoder = UpperDecoder(string_cache_size=4)
+    assert decoder('["a", "a"]') == ['A', 'A']
+    assert decoder.string_cache_info()['hits'] == 1
+
+
+@pytest.mark.parametrize('size,exception', [
+    (-1, ValueError),
+    (1 << 30, ValueError),
+    ('10', TypeError),
+])
+def test_invalid_size(size, exception):
+    with pytest.raises(exception):
+        rj.Decoder(string_cache_size=size)
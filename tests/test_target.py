@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- Schema-directed decoding tests
+# :License:   MIT License
+#
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+import io
+from typing import Any, Dict, List, NamedTuple, Optional
+import uuid
+
+import pytest
+
+import rapidjson as rj
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+    label: Optional[str] = None
+
+
+@dataclass
+class Shape:
+    name: str
+    points: List[Point]
+    attributes: Dict[str, Point] = field(default_factory=dict)
+    extra: Any = None
+
+
+class Pair(NamedTuple):
+    left: Point
+    right: int
+
+
+class Slotted:
+    __slots__ = ('a', 'b')
+
+    def __init__(self):
+        raise AssertionError('Should not be called')
+
+
+class SlottedBase:
+    __slots__ = ('a', '__weakref__')
+
+
+class SlottedChild(SlottedBase):
+    __slots__ = 'b'
+
+
+@dataclass
+class Event:
+    id: uuid.UUID
+    at: datetime
+
+
+@dataclass
+class Node:
+    value: int
+    children: List['Node'] = field(default_factory=list)
+
+
+def test_target_attribute():
+    assert rj.Decoder().target is None
+    assert rj.Decoder(target=Point).target is Point
+
+
+def test_dataclass():
+    decoder = rj.Decoder(target=Shape)
+    shape = decoder('{"name": "s", "points": [{"x": 1, "y": 2},'
+                    ' {"y": 4, "x": 3, "label": "c"}],'
+                    ' "attributes": {"origin": {"x": 0, "y": 0}},'
+                    ' "extra": {"any": [1, "thing"]}}')
+    assert shape == Shape('s', [Point(1, 2), Point(3, 4, 'c')],
+                          {'origin': Point(0, 0)}, {'any': [1, 'thing']})
+
+
+def test_defaults_and_unknown_keys():
+    decoder = rj.Decoder(target=Shape)
+    assert decoder('{"unknown": {"a": [1, {"b": 2}]}, "points": [], "name": "n",'
+                   ' "more": 1}') == Shape('n', [])
+
+    with pytest.raises(TypeError):
+        decoder('{"name": "n"}')
+
+
+def test_namedtuple():
+    assert rj.Decoder(target=Pair)('{"right": 1, "left": {"x": 2, "y": 3}}') == Pair(
+        Point(2, 3), 1)
+    assert rj.Decoder(target=List[Pair])('[]') == []
+
+
+def test_slots():
+    s = rj.Decoder(target=Slotted)('{"b": [1], "a": "x", "c": 0}')
+    assert type(s) is Slotted
+    assert s.a == 'x'
+    assert s.b == [1]
+
+    with pytest.raises(ValueError, match="Missing member 'b'"):
+        rj.Decoder(target=Slotted)('{"a": 1}')
+    with pytest.raises(ValueError, match="Missing member 'a'"):
+        rj.Decoder(target=List[SlottedChild])('[{"a": 1, "b": 2}, {"b": 3}]')
+
+
+def test_slots_hierarchy():
+    s = rj.Decoder(target=SlottedChild)('{"a": 1, "b": 2, "__weakref__": 3}')
+    assert type(s) is SlottedChild
+    assert (s.a, s.b) == (1, 2)
+
+
+def test_value_types():
+    decoder = rj.Decoder(target=Event, uuid_mode=rj.UM_CANONICAL,
+                         datetime_mode=rj.DM_ISO8601)
+    event = decoder('{"id": "7bd0d9b6-8e5c-4f4e-9d2b-3f0e4f2c8a11",'
+                    ' "at": "2020-01-02T03:04:05+00:00"}')
+    assert event == Event(uuid.UUID('7bd0d9b6-8e5c-4f4e-9d2b-3f0e4f2c8a11'),
+                          datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+
+    decoder = rj.Decoder(target=List[uuid.UUID], uuid_mode=rj.UM_CANONICAL)
+    assert decoder('["7bd0d9b6-8e5c-4f4e-9d2b-3f0e4f2c8a11"]') == [
+        uuid.UUID('7bd0d9b6-8e5c-4f4e-9d2b-3f0e4f2c8a11')]
+
+
+def test_optional():
+    decoder = rj.Decoder(target=Dict[str, Optional[Point]])
+    assert decoder('{"a": null, "b": {"x": 1, "y": 2}}') == {'a': None, 'b': Point(1, 2)}
+
+
+def test_recursive():
+    decoder = rj.Decoder(target=Node)
+    assert decoder('{"value": 1, "children": [{"value": 2,'
+                   ' "children": [{"value": 3}]}]}') == Node(1, [Node(2, [Node(3)])])
+
+
+@pytest.mark.parametrize('target,json', [
+    (Point, '[1, 2]'),
+    (Point, '1'),
+    (List[Point], '{}'),
+    (List[Point], '[1]'),
+    (Shape, '{"name": "n", "points": {}}'),
+    (Optional[Point], '"x"'),
+])
+def test_mismatch(target, json):
+    with pytest.raises(ValueError, match='Expected a JSON'):
+        rj.Decoder(target=target)(json)
+
+
+def test_modes_and_hooks():
+    decoder = rj.Decoder(target=List[Point], number_mode=rj.NM_DECIMAL)
+    assert decoder('[{"x": 1.5, "y": 2}]') == [Point(Decimal('1.5'), 2)]
+
+    class Hooked(rj.Decoder):
+        def end_object(self, d):
+            return sorted(d)
+
+    decoder = Hooked(target=Shape)
+    assert decoder('{"name": "n", "points": [], "extra": {"b": 1, "a": 2}}') == Shape(
+        'n', [], {}, ['a', 'b'])
+
+
+def test_release_gil_and_streams():
+    json = '[{"x": 1, "y": 2}, {"x": 3, "y": 4}]'
+    expected = [Point(1, 2), Point(3, 4)]
+    assert rj.Decoder(target=List[Point], release_gil=True)(json) == expected
+    assert rj.Decoder(target=List[Point])(io.StringIO(json), chunk_size=4) == expected
+
+
+def test_feed():
+    decoder = rj.Decoder(target=Point)
+    assert decoder.feed('{"x": 1, ') == []
+    assert decoder.feed('"y": 2} {"x": 3, "y": 4}') == [Point(1, 2), Point(3, 4)]
+    assert decoder.close() == []
+
+
+def test_iter():
+    decoder = rj.Decoder(target=Point)
+    expected = [Point(1, 2), Point(3, 4, 'c')]
+    json = '{"x": 1, "y": 2}\n{"x": 3, "y": 4, "label": "c"}\n'
+    assert list(decoder.iter(json)) == expected
+    assert list(decoder.iter(io.StringIO(json), chunk_size=4)) == expected
+
+    with pytest.raises(ValueError, match='Expected a JSON object'):
+        list(decoder.iter('{"x": 1, "y": 2} [1]'))
+
+
+@pytest.mark.parametrize('method,args', [
+    ('columns', ('[]',)),
+    ('extract', ('{}', ['/x'])),
+    ('iterparse', ('{}',)),
+])
+def test_unsupported_methods(method, args):
+    decoder = rj.Decoder(target=Point)
+    with pytest.raises(ValueError, match='does not support a target type'):
+        getattr(decoder, method)(*args)
+
+
+def test_lazy_not_supported():
+    with pytest.raises(ValueError, match='Lazy decoding does not support'):
+        rj.Decoder(target=Point, lazy=True)
+
+
+def test_errors():
+    with pytest.raises(rj.JSONDecodeError):
+        rj.Decoder(target=Point)('{"x": 1')
+
+    @dataclass
+    class Unresolvable:
+        a: 'Missing'  # noqa: F821
+
+    with pytest.raises(NameError):
+        rj.Decoder(target=Unresolvable)
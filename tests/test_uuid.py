@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# :Project:   python-rapidjson -- UUID decoding tests
+# :License:   MIT License
+#
+
+import random
+import uuid
+
+import pytest
+
+import rapidjson as rj
+
+
+VALUES = [uuid.UUID(int=0),
+          uuid.UUID(int=(1 << 128) - 1),
+          uuid.UUID('7202d115-7ff3-4c81-a7c1-2a1f067b1ece'),
+          uuid.uuid1(),
+          uuid.uuid4(),
+          uuid.uuid5(uuid.NAMESPACE_DNS, 'python.org')]
+
+
+@pytest.mark.parametrize('value', VALUES)
+@pytest.mark.parametrize('um,format', [(rj.UM_CANONICAL, str),
+                                       (rj.UM_HEX, str),
+                                       (rj.UM_HEX, lambda u: u.hex),
+                                       (rj.UM_HEX, lambda u: str(u).upper()),
+                                       (rj.UM_HEX, lambda u: u.hex.upper())])
+def test_decoded_uuid(value, um, format):
+    loaded = rj.loads('["%s"]' % format(value), uuid_mode=um)[0]
+    assert type(loaded) is uuid.UUID
+    assert loaded == value
+    assert loaded.int == value.int
+    assert loaded.hex == value.hex
+    assert str(loaded) == str(value)
+    assert hash(loaded) == hash(value)
+    assert loaded.version == value.version
+    assert loaded.is_safe == uuid.UUID(str(value)).is_safe
+
+
+def test_immutable():
+    loaded = rj.loads('"7202d115-7ff3-4c81-a7c1-2a1f067b1ece"', uuid_mode=rj.UM_CANONICAL)
+    with pytest.raises(TypeError):
+        loaded.int = 0
+
+
+def test_random():
+    values = [uuid.UUID(int=random.getrandbits(128)) for i in range(1000)]
+    assert rj.loads(rj.dumps([str(v) for v in values]), uuid_mode=rj.UM_CANONICAL) == values
+    assert rj.loads(rj.dumps([v.hex for v in values]), uuid_mode=rj.UM_HEX) == values